@@ -2,7 +2,7 @@ import { useState, useRef, useEffect } from 'react'
 import PdfViewer from './components/PdfViewer'
 import LayoutOverlay from './components/LayoutOverlay'
 import BlockText from './components/BlockText'
-import { uploadFile, parsePdfWithApi, getTaskStatus, getBatchStatus, translateFullMarkdownStream, getFileUrl, getFullText, getTranslationDownloadUrl } from './api'
+import { uploadFile, parsePdfWithApi, getTaskStatus, getBatchStatus, translateFullMarkdownStream, getFileUrl, getFullText, getTranslationDownloadUrl, getBlockTranslations } from './api'
 import FullTextView from './components/FullTextView'
 import BilingualView from './components/BilingualView'
 
@@ -76,13 +76,29 @@ function App() {
       const uploadResult = await uploadFile(file)
       setPdfFile(uploadResult.filename)
       
+      // 先显示从PDF文本层提取的layout，MinerU解析完成后再替换
+      if (uploadResult.local_layout && uploadResult.local_layout.length > 0) {
+        setLayout(uploadResult.local_layout)
+      }
+      
       // 调用MinerU API解析（不等待完成，返回task_id）
       setParsingStatus('parsing')
       try {
         const parseResult = await parsePdfWithApi(file, false)
         
+        // 相同内容的文档已解析过，服务端直接返回了已有结果
+        if (parseResult.state === 'done' && parseResult.layout) {
+          setTaskId(parseResult.task_id)
+          setLayout(parseResult.layout)
+          setParsingStatus('done')
+          if (parseResult.full_md) {
+            setFullTextContent(parseResult.full_md)
+          } else {
+            loadFullText(parseResult.task_id)
+          }
+        }
         // 如果有task_id，开始轮询任务状态
-        if (parseResult.task_id) {
+        else if (parseResult.task_id) {
           setTaskId(parseResult.task_id)
           pollTaskStatus(parseResult.task_id)
         } 
@@ -140,8 +156,10 @@ function App() {
           } else {
             console.warn('未获取到layout数据，尝试从mineru_data提取')
             // 尝试从mineru_data提取layout
-            if (result.mineru_data) {
-              const extractedLayout = extractLayoutFromMineruData(result.mineru_data)
+            // mineru_data默认不随状态返回，需要时单独请求
+            const mineruData = result.mineru_data || (await getTaskStatus(taskId, { includeMineruData: true })).mineru_data
+            if (mineruData) {
+              const extractedLayout = extractLayoutFromMineruData(mineruData)
               if (extractedLayout.length > 0) {
                 console.log('从mineru_data提取layout，数量:', extractedLayout.length)
                 setLayout(extractedLayout)
@@ -230,8 +248,10 @@ function App() {
           } else {
             console.warn('未获取到layout数据，尝试从mineru_data提取')
             // 尝试从mineru_data提取layout
-            if (result.mineru_data) {
-              const extractedLayout = extractLayoutFromMineruData(result.mineru_data)
+            // mineru_data默认不随状态返回，需要时单独请求
+            const mineruData = result.mineru_data || (await getBatchStatus(batchId, { includeMineruData: true })).mineru_data
+            if (mineruData) {
+              const extractedLayout = extractLayoutFromMineruData(mineruData)
               if (extractedLayout.length > 0) {
                 console.log('从mineru_data提取layout，数量:', extractedLayout.length)
                 setLayout(extractedLayout)
@@ -255,6 +275,11 @@ function App() {
         } else if (state === 'running' || state === 'pending' || state === 'waiting-file' || state === 'converting') {
           setParsingStatus('parsing')
           
+          // 分片解析：已完成的前几页可先行显示
+          if (result.sharded && result.layout && result.layout.length > 0) {
+            setLayout(result.layout)
+          }
+          
           // 更新进度
           const progress = result.extract_progress
           if (progress) {
@@ -425,91 +450,17 @@ function App() {
     }
   }
 
-  // 将翻译后的 Markdown 映射到 layout 中的文本块
-  const mapTranslationToBlocks = (translatedMarkdown, layoutBlocks) => {
-    if (!translatedMarkdown || !layoutBlocks || layoutBlocks.length === 0) {
-      return
-    }
-
+  // 从服务端获取按 block_id 对齐的译文，并写入 layout 中的文本块
+  const applyBlockTranslations = async (activeTaskId, targetLang) => {
     try {
-      // 将翻译后的 Markdown 按段落分割（按双换行符或标题分割）
-      const translatedParagraphs = translatedMarkdown
-        .split(/\n\n+/)
-        .map(p => p.trim())
-        .filter(p => p.length > 0)
-
-      // 为每个 layout 块查找对应的翻译段落
-      const updatedLayout = layoutBlocks.map(block => {
-        if (!block.text || block.text.trim().length === 0) {
-          return block
-        }
-
-        const originalText = block.text.trim()
-        
-        // 方法1：尝试精确匹配（去除标点符号和空白后比较）
-        const normalizeText = (text) => {
-          return text
-            .toLowerCase()
-            .replace(/[^\w\s]/g, '')
-            .replace(/\s+/g, ' ')
-            .trim()
-        }
-
-        const normalizedOriginal = normalizeText(originalText)
-        
-        // 在翻译段落中查找最匹配的段落
-        let bestMatch = null
-        let bestScore = 0
-
-        for (const translatedPara of translatedParagraphs) {
-          const normalizedTranslated = normalizeText(translatedPara)
-          
-          // 计算相似度（简单的包含关系或长度相似度）
-          let score = 0
-          
-          // 如果翻译段落包含原文的关键词，给高分
-          const originalWords = normalizedOriginal.split(/\s+/).filter(w => w.length > 3)
-          const translatedWords = normalizedTranslated.split(/\s+/).filter(w => w.length > 3)
-          
-          const commonWords = originalWords.filter(w => translatedWords.includes(w))
-          if (commonWords.length > 0) {
-            score = commonWords.length / Math.max(originalWords.length, translatedWords.length)
-          }
-          
-          // 如果长度相似，也加分
-          const lengthRatio = Math.min(originalText.length, translatedPara.length) / 
-                              Math.max(originalText.length, translatedPara.length)
-          score += lengthRatio * 0.3
-          
-          if (score > bestScore) {
-            bestScore = score
-            bestMatch = translatedPara
-          }
-        }
-
-        // 如果找到匹配的翻译（相似度 > 0.3），则使用它
-        if (bestMatch && bestScore > 0.3) {
-          return {
-            ...block,
-            translated_text: bestMatch
-          }
-        }
-
-        // 如果没找到匹配，尝试基于位置匹配（按顺序）
-        const blockIndex = layoutBlocks.indexOf(block)
-        if (blockIndex >= 0 && blockIndex < translatedParagraphs.length) {
-          return {
-            ...block,
-            translated_text: translatedParagraphs[blockIndex]
-          }
-        }
-
-        return block
-      })
-
-      // 更新 layout state
-      setLayout(updatedLayout)
-      console.log(`已将翻译映射到 ${updatedLayout.filter(b => b.translated_text).length} 个文本块`)
+      const result = await getBlockTranslations(activeTaskId, targetLang)
+      const translations = result.translations || {}
+      setLayout(prevLayout => prevLayout.map(block => (
+        translations[block.block_id]
+          ? { ...block, translated_text: translations[block.block_id] }
+          : block
+      )))
+      console.log(`已将翻译映射到 ${result.aligned_count} 个文本块`)
     } catch (err) {
       console.error('映射翻译到文本块失败:', err)
     }
@@ -589,7 +540,7 @@ function App() {
           
           // 将翻译后的 Markdown 映射到 layout 中的文本块
           if (content && layout.length > 0) {
-            mapTranslationToBlocks(content, layout)
+            applyBlockTranslations(activeTaskId, 'zh')
           }
           
           setTranslationProgress(prev => {
@@ -1085,6 +1036,7 @@ function App() {
                 <div className="relative inline-block">
                   <PdfViewer
                     fileUrl={getFileUrl(pdfFile, 'files')}
+                    documentId={pdfFile.replace(/\.pdf$/i, '')}
                     currentPage={currentPage}
                     onPageChange={setCurrentPage}
                     scale={1.2}
@@ -48,13 +48,28 @@ export async function parsePdfWithApi(pdfFile, wait = false) {
   return data.data
 }
 
+/**
+ * 构造layout查询参数（分页、字段投影、是否返回原始mineru_data）
+ * @param {Object} options - { pages: '1-5,8', fields: ['bbox','text'], includeMineruData: false }
+ * @returns {string} 查询字符串（含前导?，无参数时为空）
+ */
+function buildLayoutQuery(options = {}) {
+  const params = new URLSearchParams()
+  if (options.pages) params.set('pages', options.pages)
+  if (options.fields) params.set('fields', [].concat(options.fields).join(','))
+  if (options.includeMineruData) params.set('include_mineru_data', 'true')
+  const query = params.toString()
+  return query ? `?${query}` : ''
+}
+
 /**
  * 查询MinerU解析任务状态
  * @param {string} taskId - 任务ID
+ * @param {Object} options - 可选：layout查询参数，见buildLayoutQuery
  * @returns {Promise<Object>} 任务状态和结果
  */
-export async function getTaskStatus(taskId) {
-  const response = await fetch(`${API_BASE}/task/${taskId}`)
+export async function getTaskStatus(taskId, options = {}) {
+  const response = await fetch(`${API_BASE}/task/${taskId}${buildLayoutQuery(options)}`)
   const data = await response.json()
   if (!data.success) {
     throw new Error(data.message || '查询失败')
@@ -65,10 +80,11 @@ export async function getTaskStatus(taskId) {
 /**
  * 查询MinerU批量解析任务状态
  * @param {string} batchId - 批量任务ID
+ * @param {Object} options - 可选：layout查询参数，见buildLayoutQuery
  * @returns {Promise<Object>} 批量任务状态和结果
  */
-export async function getBatchStatus(batchId) {
-  const response = await fetch(`${API_BASE}/batch/${batchId}`)
+export async function getBatchStatus(batchId, options = {}) {
+  const response = await fetch(`${API_BASE}/batch/${batchId}${buildLayoutQuery(options)}`)
   const data = await response.json()
   if (!data.success) {
     throw new Error(data.message || '查询失败')
@@ -111,9 +127,10 @@ export async function parseLayout(filename = null, file = null) {
  * @param {boolean} forceRetranslate - 是否强制重新翻译所有文本块（默认: false）
  * @param {string} translationId - 翻译ID（用于保存JSON文件，可选）
  * @param {number} timestamp - 时间戳（用于保存JSON文件，可选）
+ * @param {string} taskId - 任务ID或batch_id（可选，提供时与全文翻译共用已翻译的段落）
  * @returns {Promise<Object>} 翻译结果，包含更新后的layout
  */
-export async function translateLayout(layout, targetLang = 'zh', model = null, forceRetranslate = false, translationId = null, timestamp = null) {
+export async function translateLayout(layout, targetLang = 'zh', model = null, forceRetranslate = false, translationId = null, timestamp = null, taskId = null) {
   const requestBody = {
     layout: layout,
     target_lang: targetLang,
@@ -127,6 +144,9 @@ export async function translateLayout(layout, targetLang = 'zh', model = null, f
   if (timestamp) {
     requestBody.timestamp = timestamp
   }
+  if (taskId) {
+    requestBody.task_id = taskId
+  }
   
   const response = await fetch(`${API_BASE}/translate-layout`, {
     method: 'POST',
@@ -407,6 +427,46 @@ export function getFileUrl(filename, type = 'files') {
   return `${API_BASE}/${type}/${filename}`
 }
 
+/**
+ * 获取文档的页数、页面尺寸和各页缩略图地址（服务端在首次请求时开始生成缩略图）
+ * @param {string} sha256 - 文档内容哈希（上传文件名去掉.pdf）
+ * @param {number} width - 缩略图宽度（像素，可选）
+ * @returns {Promise<Object>} 包含page_count、page_sizes、thumbnail_urls的响应
+ */
+export async function getThumbnails(sha256, width = null) {
+  const query = width ? `?width=${width}` : ''
+  const response = await fetch(`${API_BASE}/documents/${sha256}/thumbnails${query}`)
+  const data = await response.json()
+  if (!data.success) {
+    throw new Error(data.message || '获取缩略图失败')
+  }
+  return data.data
+}
+
+/**
+ * 获取一页缩略图的URL
+ * @param {string} sha256 - 文档内容哈希
+ * @param {number} page - 页码（从1开始）
+ * @param {number} width - 缩略图宽度（像素，可选）
+ * @returns {string} 缩略图URL
+ */
+export function getThumbnailUrl(sha256, page, width = null) {
+  const query = width ? `?width=${width}` : ''
+  return `${API_BASE}/documents/${sha256}/thumbnails/${page}${query}`
+}
+
+/**
+ * 获取页码范围切片PDF的URL（只包含这些页的独立PDF）
+ * @param {string} sha256 - 文档内容哈希
+ * @param {number} first - 起始页（从1开始）
+ * @param {number} last - 结束页（含，默认与起始页相同）
+ * @returns {string} 切片PDF URL
+ */
+export function getPageSliceUrl(sha256, first, last = first) {
+  const range = last > first ? `${first}-${last}` : `${first}`
+  return `${API_BASE}/documents/${sha256}/pages/${range}`
+}
+
 /**
  * 获取全文Markdown内容
  * @param {string} taskId - 任务ID或batch_id
@@ -421,6 +481,112 @@ export async function getFullText(taskId) {
   return data.data
 }
 
+/**
+ * 按block_id获取全文翻译的译文（由服务端对齐索引计算）
+ * @param {string} taskId - 任务ID或batch_id
+ * @param {string} targetLang - 目标语言
+ * @returns {Promise<Object>} 包含translations（block_id -> 译文）的响应
+ */
+export async function getBlockTranslations(taskId, targetLang = 'zh') {
+  const response = await fetch(`${API_BASE}/block-translations/${taskId}?target_lang=${encodeURIComponent(targetLang)}`)
+  const data = await response.json()
+  if (!data.success) {
+    throw new Error(data.message || '获取块译文失败')
+  }
+  return data.data
+}
+
+/**
+ * 命中测试：查询包含指定点的文本块（坐标与layout中的bbox一致）
+ * @param {string} taskId - 任务ID或batch_id
+ * @param {number} page - 页码（从1开始）
+ * @param {number} x - 横坐标
+ * @param {number} y - 纵坐标
+ * @returns {Promise<Object>} 包含block_ids和blocks的响应
+ */
+export async function hitTestLayout(taskId, page, x, y) {
+  const params = new URLSearchParams({ page, x, y })
+  const response = await fetch(`${API_BASE}/layout/${taskId}/hit?${params}`)
+  const data = await response.json()
+  if (!data.success) {
+    throw new Error(data.message || '命中测试失败')
+  }
+  return data.data
+}
+
+/**
+ * 可视区域查询：只获取与可视区域相交的文本块
+ * @param {string} taskId - 任务ID或batch_id
+ * @param {number} page - 页码（从1开始）
+ * @param {Array} rect - 可视区域 [x0, y0, x1, y1]（可选，不传时返回整页）
+ * @returns {Promise<Object>} 包含layout的响应
+ */
+export async function getLayoutViewport(taskId, page, rect = null) {
+  const params = new URLSearchParams({ page })
+  if (rect) {
+    const [x0, y0, x1, y1] = rect
+    Object.entries({ x0, y0, x1, y1 }).forEach(([key, value]) => params.append(key, value))
+  }
+  const response = await fetch(`${API_BASE}/layout/${taskId}/viewport?${params}`)
+  const data = await response.json()
+  if (!data.success) {
+    throw new Error(data.message || '可视区域查询失败')
+  }
+  return data.data
+}
+
+/**
+ * 列出已解析的文档（含翻译记录）
+ * @param {Object} options - { query, limit, offset }（可选）
+ * @returns {Promise<Object>} 包含documents和total的响应
+ */
+export async function listDocuments(options = {}) {
+  const params = new URLSearchParams()
+  if (options.query) params.append('q', options.query)
+  if (options.limit) params.append('limit', options.limit)
+  if (options.offset) params.append('offset', options.offset)
+  const response = await fetch(`${API_BASE}/documents?${params}`)
+  const data = await response.json()
+  if (!data.success) {
+    throw new Error(data.message || '获取文档列表失败')
+  }
+  return data.data
+}
+
+/**
+ * 获取磁盘占用统计（总占用、配额和每个文档的占用）
+ * @param {boolean} refresh - 是否重新扫描结果目录
+ * @returns {Promise<Object>} 包含used_bytes、quota_bytes和documents的响应
+ */
+export async function getStorageStats(refresh = false) {
+  const response = await fetch(`${API_BASE}/storage${refresh ? '?refresh=true' : ''}`)
+  const data = await response.json()
+  if (!data.success) {
+    throw new Error(data.message || '获取磁盘占用失败')
+  }
+  return data.data
+}
+
+/**
+ * 全文检索：在已解析的文档库中检索原文和译文
+ * @param {string} query - 检索词（空格分隔的多个词须同时出现）
+ * @param {Object} options - { lang, taskId, limit, offset }（可选）
+ * @returns {Promise<Object>} 包含results（带<mark>高亮的snippet）和took_ms的响应
+ */
+export async function searchDocuments(query, options = {}) {
+  const params = new URLSearchParams({ q: query })
+  if (options.lang) params.append('lang', options.lang)
+  if (options.taskId) params.append('task_id', options.taskId)
+  if (options.limit) params.append('limit', options.limit)
+  if (options.offset) params.append('offset', options.offset)
+  const response = await fetch(`${API_BASE}/search?${params}`)
+  const data = await response.json()
+  if (!data.success) {
+    throw new Error(data.message || '检索失败')
+  }
+  return data.data
+}
+
 /**
  * 获取图片URL
  * @param {string} taskId - 任务ID或batch_id
@@ -440,3 +606,57 @@ export function getTranslationDownloadUrl(filename) {
   return `${API_BASE}/download-translation/${filename}`
 }
 
+
+/**
+ * 导出双语PDF（流式推送每段页面的完成进度，完成后返回下载地址）
+ * @param {Object} source - 译文来源：{ translationFile } / { layout, taskId } / { taskId, targetLang }（全文翻译），可附带sha256
+ * @param {string} mode - overlay（原位覆盖）或 side_by_side（左原文右译文）
+ * @param {Function} onProgress - 进度回调 (completedPages, totalPages)
+ * @returns {Promise<Object>} 包含download_url和download_name的完成事件数据
+ */
+export async function exportBilingualPdf(source, mode = 'overlay', onProgress = null) {
+  const response = await fetch(`${API_BASE}/export-pdf`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json'
+    },
+    body: JSON.stringify({
+      translation_file: source.translationFile,
+      layout: source.layout,
+      task_id: source.taskId,
+      sha256: source.sha256,
+      target_lang: source.targetLang,
+      mode: mode,
+      stream: true
+    })
+  })
+  if (!response.ok || !response.body) {
+    const data = await response.json().catch(() => ({}))
+    throw new Error(data.message || `HTTP ${response.status}`)
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  for (;;) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    const events = buffer.split('\n\n')
+    buffer = events.pop() || ''
+    for (const event of events) {
+      const type = event.match(/^event: (.*)$/m)?.[1]
+      const payload = event.match(/^data: (.*)$/m)?.[1]
+      if (!type || !payload) continue
+      const data = JSON.parse(payload)
+      if (type === 'progress' && onProgress) {
+        onProgress(data.completed_pages, data.total_pages)
+      } else if (type === 'complete') {
+        return data
+      } else if (type === 'error') {
+        throw new Error(data.message || '导出失败')
+      }
+    }
+  }
+  throw new Error('导出未完成')
+}
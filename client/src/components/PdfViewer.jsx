@@ -1,27 +1,64 @@
 import { useEffect, useRef, useState } from "react"
 import * as pdfjsLib from "pdfjs-dist"
+import { getThumbnails, getPageSliceUrl } from "../api"
 
 // 配置PDF.js worker
 pdfjsLib.GlobalWorkerOptions.workerSrc = `//cdnjs.cloudflare.com/ajax/libs/pdf.js/${pdfjsLib.version}/pdf.worker.min.js`
 
 /**
  * PDF查看器组件
+ *
+ * 提供documentId时先从服务端获取页数和缩略图，立即显示可翻页的文档；
+ * 当前页只加载服务端切出的单页PDF，不必下载整个文档。获取失败时退回加载完整PDF。
+ *
  * @param {Object} props
  * @param {string} props.fileUrl - PDF文件URL
+ * @param {string} props.documentId - 文档内容哈希（可选）
  * @param {number} props.currentPage - 当前页码（从1开始）
  * @param {Function} props.onPageChange - 页码变化回调
  * @param {number} props.scale - 缩放比例
  */
-export default function PdfViewer({ fileUrl, currentPage = 1, onPageChange, scale = 1.2 }) {
+export default function PdfViewer({ fileUrl, documentId = null, currentPage = 1, onPageChange, scale = 1.2 }) {
   const canvasRef = useRef(null)
   const [totalPages, setTotalPages] = useState(0)
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState(null)
+  // 缩略图清单；null表示加载完整PDF
+  const [manifest, setManifest] = useState(null)
+  const [manifestReady, setManifestReady] = useState(false)
 
   useEffect(() => {
-    if (!fileUrl) return
+    setManifest(null)
+    setManifestReady(false)
+    if (!documentId || !/^[0-9a-f]{64}$/.test(documentId)) {
+      setManifestReady(true)
+      return
+    }
+
+    let isCancelled = false
+    getThumbnails(documentId)
+      .then((data) => {
+        if (isCancelled) return
+        setManifest(data)
+        setTotalPages(data.page_count)
+      })
+      .catch((err) => {
+        console.warn("获取缩略图失败，加载完整PDF:", err)
+      })
+      .finally(() => {
+        if (!isCancelled) setManifestReady(true)
+      })
+
+    return () => {
+      isCancelled = true
+    }
+  }, [documentId])
+
+  useEffect(() => {
+    if (!fileUrl || !manifestReady) return
 
     let renderTask = null
+    let pdf = null
     let isCancelled = false
 
     const renderPage = async () => {
@@ -29,26 +66,35 @@ export default function PdfViewer({ fileUrl, currentPage = 1, onPageChange, scal
         setLoading(true)
         setError(null)
 
-        // 加载PDF文档
-        const loadingTask = pdfjsLib.getDocument(fileUrl)
-        const pdf = await loadingTask.promise
-        
+        const canvas = canvasRef.current
+        const pageSize = manifest?.page_sizes?.[currentPage - 1]
+        if (canvas && pageSize) {
+          // 先按页面尺寸占位，加载期间显示缩略图
+          canvas.width = pageSize[0] * scale
+          canvas.height = pageSize[1] * scale
+        }
+
+        // 加载PDF文档（有缩略图清单时只加载当前页的切片）
+        const loadingTask = pdfjsLib.getDocument(manifest ? getPageSliceUrl(documentId, currentPage) : fileUrl)
+        pdf = await loadingTask.promise
+
         if (isCancelled) return
-        
-        setTotalPages(pdf.numPages)
+
+        if (!manifest) {
+          setTotalPages(pdf.numPages)
+        }
 
         // 渲染指定页面
-        const page = await pdf.getPage(currentPage)
+        const page = await pdf.getPage(manifest ? 1 : currentPage)
         const viewport = page.getViewport({ scale })
 
-        const canvas = canvasRef.current
         if (!canvas || isCancelled) return
 
         const ctx = canvas.getContext("2d")
-        
+
         // 清除之前的渲染
         ctx.clearRect(0, 0, canvas.width, canvas.height)
-        
+
         canvas.width = viewport.width
         canvas.height = viewport.height
 
@@ -80,8 +126,11 @@ export default function PdfViewer({ fileUrl, currentPage = 1, onPageChange, scal
       if (renderTask) {
         renderTask.cancel()
       }
+      if (pdf) {
+        pdf.destroy()
+      }
     }
-  }, [fileUrl, currentPage, scale])
+  }, [fileUrl, documentId, manifest, manifestReady, currentPage, scale])
 
   if (error) {
     return (
@@ -91,9 +140,20 @@ export default function PdfViewer({ fileUrl, currentPage = 1, onPageChange, scal
     )
   }
 
+  const thumbnailUrl = manifest?.thumbnail_urls?.[currentPage - 1]
+  const pageSize = manifest?.page_sizes?.[currentPage - 1]
+
   return (
     <div className="relative inline-block">
-      {loading && (
+      {loading && thumbnailUrl && (
+        <img
+          src={thumbnailUrl}
+          alt={`第 ${currentPage} 页`}
+          className="absolute top-0 left-0 border rounded bg-white z-20"
+          style={pageSize ? { width: pageSize[0] * scale, height: pageSize[1] * scale } : undefined}
+        />
+      )}
+      {loading && !thumbnailUrl && (
         <div className="absolute inset-0 flex items-center justify-center bg-gray-100 bg-opacity-75 z-30">
           <p className="text-gray-600">加载中...</p>
         </div>
@@ -107,7 +167,20 @@ export default function PdfViewer({ fileUrl, currentPage = 1, onPageChange, scal
           第 {currentPage} 页 / 共 {totalPages} 页
         </div>
       )}
+      {manifest && onPageChange && (
+        <div className="mt-2 flex gap-2 overflow-x-auto pb-2 w-0 min-w-full">
+          {manifest.thumbnail_urls.map((url, index) => (
+            <button
+              key={url}
+              onClick={() => onPageChange(index + 1)}
+              className={`flex-shrink-0 border rounded ${index + 1 === currentPage ? "border-blue-500 ring-2 ring-blue-300" : "border-gray-200"}`}
+              title={`第 ${index + 1} 页`}
+            >
+              <img src={url} alt={`第 ${index + 1} 页`} loading="lazy" className="block h-24 w-auto bg-white" />
+            </button>
+          ))}
+        </div>
+      )}
     </div>
   )
 }
-
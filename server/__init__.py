@@ -6,6 +6,7 @@ from pathlib import Path
 from flask import Flask
 from flask_caching import Cache
 from server.config import config
+from server.fast_json import init_json
 
 # 初始化缓存
 cache = Cache()
@@ -23,6 +24,9 @@ def create_app(config_name='default'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     
+    # JSON响应使用快速序列化（orjson，未安装时为标准库）
+    init_json(app)
+    
     # 初始化缓存
     cache.init_app(app)
     
@@ -42,10 +46,20 @@ def create_app(config_name='default'):
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     
+    # 初始化文档目录（首次启动时导入旧版索引和已有结果目录）
+    from server.catalog import init_catalog
+    with app.app_context():
+        init_catalog()
+    
     # 注册Blueprint
     from server.routes import api_bp
     app.register_blueprint(api_bp, url_prefix='/api')
     
+    # 在后台把启用全文检索之前已完成的文档补充进检索索引
+    from server.routes import schedule_library_indexing
+    with app.app_context():
+        schedule_library_indexing()
+    
     # CORS支持（开发环境）
     if app.config['DEBUG']:
         from flask_cors import CORS
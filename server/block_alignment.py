@@ -0,0 +1,315 @@
+"""
+块-译文对齐模块：在全文分块时记录每个layout块对应full.md中的哪些段落，
+翻译完成后按该索引直接得到每个block_id的译文，无需在前端做模糊匹配
+"""
+import bisect
+import hashlib
+import logging
+import re
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+from server.fast_json import dump_file, load_file
+
+logger = logging.getLogger(__name__)
+
+# 对齐索引和分块译文的文件名（位于full.md所在目录）
+ALIGNMENT_FILENAME = 'alignment.json'
+TRANSLATED_CHUNKS_TEMPLATE = 'full_translated_{lang}.chunks.json'
+
+# 整块文本定位失败时，用前若干个规范化字符作为锚点再次定位
+ANCHOR_CHARS = 32
+
+# 段落分隔：一个或多个空行
+PARAGRAPH_SEPARATOR = re.compile(r'\n[ \t]*\n\s*')
+
+# Markdown标题前缀（layout块的文本不含标题标记，分配译文时去掉）
+HEADING_PREFIX = re.compile(r'^(#{1,6})\s+')
+
+
+def _normalize_with_offsets(text: str) -> Tuple[str, List[int]]:
+    # 只保留字母和数字（小写），并记录每个字符在原文中的位置
+    chars = []
+    offsets = []
+    for idx, ch in enumerate(text):
+        if ch.isalnum():
+            chars.append(ch.lower())
+            offsets.append(idx)
+    return "".join(chars), offsets
+
+
+def _normalize(text: str) -> str:
+    return "".join(ch.lower() for ch in text if ch.isalnum())
+
+
+def split_paragraph_spans(text: str, base: int = 0) -> List[Tuple[int, int]]:
+    """
+    按空行切分段落，返回每个段落在原文中的起止位置
+
+    Args:
+        text: 文本
+        base: 偏移量（text在完整文档中的起始位置）
+
+    Returns:
+        [(start, end), ...]，空段落会被忽略
+    """
+    spans = []
+    start = 0
+    for match in PARAGRAPH_SEPARATOR.finditer(text):
+        if text[start:match.start()].strip():
+            spans.append((base + start, base + match.start()))
+        start = match.end()
+    if text[start:].strip():
+        spans.append((base + start, base + len(text)))
+    return spans
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """
+    按空行切分段落（与split_paragraph_spans规则一致）
+
+    Args:
+        text: 文本
+
+    Returns:
+        去除首尾空白后的段落列表
+    """
+    return [text[start:end].strip() for start, end in split_paragraph_spans(text or '')]
+
+
+def locate_chunks(text: str, chunks: List[str]) -> List[Tuple[int, int]]:
+    """
+    定位每个分块在原文中的起止位置（分块按顺序且互不重叠，顺序扫描即可）
+
+    Args:
+        text: full.md原文
+        chunks: chunk_markdown_text的分块结果
+
+    Returns:
+        [(start, end), ...]；无法定位的分块为(-1, -1)
+    """
+    spans = []
+    cursor = 0
+    for chunk in chunks:
+        start = text.find(chunk, cursor)
+        if start < 0:
+            spans.append((-1, -1))
+            continue
+        end = start + len(chunk)
+        spans.append((start, end))
+        cursor = end
+    return spans
+
+
+def build_alignment_index(text: str, chunks: List[str], layout: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    构建块-段落对齐索引
+
+    layout与full.md均按阅读顺序排列，因此在规范化文本上从游标处向后查找即可，
+    每个块只定位一次；找不到时才回退为全文查找。
+
+    Args:
+        text: full.md原文
+        chunks: 分块结果（翻译时的最小单位）
+        layout: 文本块列表（需包含block_id和text）
+
+    Returns:
+        对齐索引：chunks记录每个分块内的段落数，blocks记录每个block_id覆盖的段落范围
+    """
+    chunk_spans = locate_chunks(text, chunks)
+
+    # 全局段落列表：(start, end, chunk_index, paragraph_index_in_chunk)
+    paragraphs = []
+    chunk_entries = []
+    for chunk_idx, (chunk, (start, end)) in enumerate(zip(chunks, chunk_spans)):
+        para_spans = split_paragraph_spans(chunk, base=start) if start >= 0 else []
+        for para_idx, (para_start, para_end) in enumerate(para_spans):
+            paragraphs.append((para_start, para_end, chunk_idx, para_idx))
+        chunk_entries.append({
+            "start": start,
+            "end": end,
+            "paragraph_count": len(para_spans)
+        })
+    para_starts = [para[0] for para in paragraphs]
+
+    normalized_text, offsets = _normalize_with_offsets(text)
+
+    def paragraph_at(offset: int) -> int:
+        return max(bisect.bisect_right(para_starts, offset) - 1, 0)
+
+    blocks = {}
+    unaligned = []
+    cursor = 0
+    for block in layout:
+        block_id = block.get("block_id")
+        needle = _normalize(block.get("text") or "")
+        if not block_id or not needle or not paragraphs:
+            continue
+
+        pos = normalized_text.find(needle, cursor)
+        if pos < 0:
+            pos = normalized_text.find(needle)
+        if pos < 0 and len(needle) > ANCHOR_CHARS:
+            # 块文本在full.md中可能被公式或链接打断，只用开头定位
+            needle = needle[:ANCHOR_CHARS]
+            pos = normalized_text.find(needle, cursor)
+            if pos < 0:
+                pos = normalized_text.find(needle)
+        if pos < 0:
+            unaligned.append(block_id)
+            continue
+
+        start = offsets[pos]
+        end = offsets[pos + len(needle) - 1] + 1
+        first = paragraph_at(start)
+        last = paragraph_at(end - 1)
+        blocks[block_id] = {
+            "start": start,
+            "end": end,
+            "paragraphs": [
+                [paragraphs[idx][2], paragraphs[idx][3]] for idx in range(first, last + 1)
+            ]
+        }
+        cursor = pos + len(needle)
+
+    if unaligned:
+        logger.info(f"对齐索引: {len(unaligned)} 个文本块未能在full.md中定位")
+
+    return {
+        "source_sha256": hashlib.sha256(text.encode('utf-8')).hexdigest(),
+        "chunks": chunk_entries,
+        "blocks": blocks,
+        "unaligned": unaligned
+    }
+
+
+def get_alignment_path(full_md_path: Path) -> Path:
+    return Path(full_md_path).parent / ALIGNMENT_FILENAME
+
+
+def get_translated_chunks_path(full_md_path: Path, target_lang: str) -> Path:
+    return Path(full_md_path).parent / TRANSLATED_CHUNKS_TEMPLATE.format(lang=target_lang)
+
+
+def save_alignment_index(full_md_path: Path, index: Dict[str, Any]) -> Path:
+    """
+    保存对齐索引到full.md所在目录
+
+    Args:
+        full_md_path: full.md路径
+        index: build_alignment_index的结果
+
+    Returns:
+        索引文件路径
+    """
+    path = get_alignment_path(full_md_path)
+    dump_file(path, index)
+    logger.info(f"对齐索引已保存: {len(index['blocks'])} 个文本块 -> {path}")
+    return path
+
+
+def load_alignment_index(full_md_path: Path) -> Optional[Dict[str, Any]]:
+    """
+    读取对齐索引
+
+    Args:
+        full_md_path: full.md路径
+
+    Returns:
+        对齐索引；不存在时返回None
+    """
+    path = get_alignment_path(full_md_path)
+    if not path.exists():
+        return None
+    return load_file(path)
+
+
+def save_translated_chunks(full_md_path: Path, target_lang: str, translated_chunks: List[str]) -> Path:
+    """
+    按分块保存译文，分块顺序与对齐索引中的chunks一致
+
+    Args:
+        full_md_path: full.md路径
+        target_lang: 目标语言
+        translated_chunks: 每个分块的译文
+
+    Returns:
+        文件路径
+    """
+    path = get_translated_chunks_path(full_md_path, target_lang)
+    dump_file(path, translated_chunks)
+    return path
+
+
+def load_translated_chunks(full_md_path: Path, target_lang: str) -> Optional[List[str]]:
+    """
+    读取按分块保存的译文
+
+    Args:
+        full_md_path: full.md路径
+        target_lang: 目标语言
+
+    Returns:
+        分块译文列表；不存在时返回None
+    """
+    path = get_translated_chunks_path(full_md_path, target_lang)
+    if not path.exists():
+        return None
+    return load_file(path)
+
+
+def align_block_translations(index: Dict[str, Any], translated_chunks: List[str]) -> Tuple[Dict[str, str], List[str]]:
+    """
+    根据对齐索引把分块译文分配给每个block_id（线性时间）
+
+    译文分块的段落数与原文一致时按段落序号一一对应，并去掉Markdown标题标记；
+    LLM合并或拆分了段落时无法确定对应关系，该分块内的块不分配译文，作为未对齐返回。
+
+    Args:
+        index: 对齐索引
+        translated_chunks: 每个分块的译文
+
+    Returns:
+        ({block_id: 译文}, 因段落数不一致而未对齐的block_id列表)
+    """
+    chunk_paragraphs = [split_paragraphs(chunk or '') for chunk in translated_chunks]
+    chunk_entries = index.get("chunks", [])
+    mismatched_chunks = {
+        chunk_idx for chunk_idx, paragraphs in enumerate(chunk_paragraphs)
+        if chunk_idx < len(chunk_entries) and paragraphs
+        and len(paragraphs) != chunk_entries[chunk_idx]["paragraph_count"]
+    }
+    if mismatched_chunks:
+        logger.warning(f"{len(mismatched_chunks)} 个分块的译文段落数与原文不一致，其中的块不分配译文")
+
+    result = {}
+    unaligned = []
+    for block_id, entry in index.get("blocks", {}).items():
+        if any(chunk_idx in mismatched_chunks for chunk_idx, _ in entry["paragraphs"]):
+            unaligned.append(block_id)
+            continue
+        parts = []
+        seen = set()
+        for chunk_idx, para_idx in entry["paragraphs"]:
+            key = (chunk_idx, para_idx)
+            if chunk_idx >= len(chunk_paragraphs) or para_idx >= len(chunk_paragraphs[chunk_idx]) or key in seen:
+                continue
+            seen.add(key)
+            parts.append(HEADING_PREFIX.sub('', chunk_paragraphs[chunk_idx][para_idx].strip(), count=1))
+        if parts:
+            result[block_id] = "\n\n".join(parts)
+    return result, unaligned
+
+
+def map_block_translations(index: Dict[str, Any], translated_chunks: List[str]) -> Dict[str, str]:
+    """
+    根据对齐索引得到每个block_id的译文（段落数不一致的分块中的块不包含在内）
+
+    Args:
+        index: 对齐索引
+        translated_chunks: 每个分块的译文
+
+    Returns:
+        {block_id: 译文}
+    """
+    return align_block_translations(index, translated_chunks)[0]
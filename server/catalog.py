@@ -0,0 +1,519 @@
+"""
+文档目录模块：用嵌入式SQLite数据库记录上传文件、MinerU任务、解析结果、layout产物和翻译记录
+
+请求处理中只做带索引的查询，不再探测路径或遍历MINERU_FOLDER。旧版本的document_index.json
+和未登记的结果目录在应用启动时一次性导入（只在目录首次创建时执行）。
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# 目录数据库文件名（位于MINERU_FOLDER下）
+CATALOG_FILENAME = 'catalog.db'
+
+# 旧版JSON索引文件名（导入后重命名为.migrated）
+LEGACY_INDEX_FILENAME = 'document_index.json'
+
+# 结果目录中MinerU输出的文件名
+LAYOUT_JSON_NAME = 'layout.json'
+FULL_MD_NAME = 'full.md'
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS uploads (
+        sha256 TEXT PRIMARY KEY,
+        filename TEXT,
+        original_filename TEXT,
+        size INTEGER,
+        pages INTEGER,
+        uploaded_at INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS tasks (
+        task_id TEXT PRIMARY KEY,
+        sha256 TEXT,
+        state TEXT NOT NULL,
+        original_filename TEXT,
+        json_path TEXT,
+        extract_dir TEXT,
+        full_md_path TEXT,
+        images_dir TEXT,
+        submitted_at INTEGER,
+        completed_at INTEGER
+    )""",
+    "CREATE INDEX IF NOT EXISTS tasks_sha256 ON tasks(sha256, state)",
+    # 每个内容哈希对应的（最近一次）完成结果
+    """CREATE TABLE IF NOT EXISTS documents (
+        sha256 TEXT PRIMARY KEY,
+        task_id TEXT NOT NULL,
+        completed_at INTEGER
+    )""",
+    "CREATE INDEX IF NOT EXISTS documents_completed ON documents(completed_at)",
+    """CREATE TABLE IF NOT EXISTS artifacts (
+        path TEXT PRIMARY KEY,
+        source_path TEXT NOT NULL,
+        sha256 TEXT,
+        kind TEXT,
+        block_count INTEGER,
+        size INTEGER,
+        built_at INTEGER
+    )""",
+    "CREATE INDEX IF NOT EXISTS artifacts_sha256 ON artifacts(sha256)",
+    """CREATE TABLE IF NOT EXISTS translations (
+        file TEXT PRIMARY KEY,
+        mode TEXT NOT NULL,
+        doc_key TEXT,
+        task_id TEXT,
+        translation_id TEXT,
+        target_lang TEXT,
+        model TEXT,
+        translated_count INTEGER,
+        skipped_count INTEGER,
+        failed_count INTEGER,
+        total_count INTEGER,
+        created_at INTEGER,
+        updated_at INTEGER
+    )""",
+    "CREATE INDEX IF NOT EXISTS translations_doc ON translations(doc_key, updated_at)",
+    "CREATE INDEX IF NOT EXISTS translations_task ON translations(task_id)",
+    # 结果目录的磁盘占用和最近访问时间（磁盘配额按LRU回收）
+    """CREATE TABLE IF NOT EXISTS storage (
+        task_id TEXT PRIMARY KEY,
+        extracted_bytes INTEGER,
+        retained_bytes INTEGER,
+        archive_bytes INTEGER,
+        last_access INTEGER,
+        evicted_at INTEGER
+    )""",
+    "CREATE INDEX IF NOT EXISTS storage_lru ON storage(evicted_at, last_access)",
+    """CREATE TABLE IF NOT EXISTS catalog_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )""",
+]
+
+_TASK_COLUMNS = ('task_id', 'sha256', 'state', 'original_filename', 'json_path', 'extract_dir',
+                 'full_md_path', 'images_dir', 'submitted_at', 'completed_at')
+
+# 写操作串行执行；已初始化的数据库路径
+_write_lock = threading.Lock()
+_initialized = set()
+
+
+def get_catalog_path() -> Path:
+    return Path(current_app.config['MINERU_FOLDER']) / CATALOG_FILENAME
+
+
+@contextmanager
+def _connect():
+    path = get_catalog_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        if str(path) not in _initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            _initialized.add(str(path))
+        yield conn
+    finally:
+        conn.close()
+
+
+def _now() -> int:
+    return int(time.time())
+
+
+def init_catalog():
+    """
+    初始化目录数据库，并一次性导入旧版JSON索引和未登记的结果目录（需在应用上下文中调用）
+    """
+    with _write_lock, _connect() as conn:
+        if conn.execute("SELECT 1 FROM catalog_meta WHERE key = 'imported'").fetchone():
+            return
+        mineru_folder = Path(current_app.config['MINERU_FOLDER'])
+        imported = _import_legacy_index(conn, mineru_folder / LEGACY_INDEX_FILENAME)
+        scanned = _import_result_dirs(conn, mineru_folder)
+        conn.execute("INSERT OR REPLACE INTO catalog_meta(key, value) VALUES ('imported', ?)", (str(_now()),))
+        conn.commit()
+    if imported or scanned:
+        logger.info(f"文档目录初始化完成: 导入旧索引 {imported} 条，补充结果目录 {scanned} 个")
+
+
+def _import_legacy_index(conn, index_path: Path) -> int:
+    if not index_path.exists():
+        return 0
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        logger.warning(f"读取旧版文档索引失败，跳过导入: {e}")
+        return 0
+
+    for task_id, entry in (data.get('tasks') or {}).items():
+        conn.execute(
+            "INSERT OR IGNORE INTO tasks(task_id, sha256, state, original_filename, submitted_at) VALUES (?, ?, ?, ?, ?)",
+            (task_id, entry.get('sha256'), entry.get('state') or 'pending', entry.get('original_filename'),
+             entry.get('submitted_at'))
+        )
+    for sha256, entry in (data.get('documents') or {}).items():
+        _complete_task(conn, entry['task_id'], sha256, entry, entry.get('completed_at'))
+    os.replace(index_path, index_path.with_name(index_path.name + '.migrated'))
+    return len(data.get('documents') or {})
+
+
+def _import_result_dirs(conn, mineru_folder: Path) -> int:
+    # 早期版本未登记的结果目录：目录名即task_id
+    known = {row[0] for row in conn.execute("SELECT task_id FROM tasks WHERE state = 'done'")}
+    count = 0
+    for task_dir in mineru_folder.iterdir() if mineru_folder.exists() else []:
+        if not task_dir.is_dir() or task_dir.name in known:
+            continue
+        json_path = next(task_dir.rglob(LAYOUT_JSON_NAME), None)
+        if json_path is None:
+            continue
+        full_md = json_path.parent / FULL_MD_NAME
+        images_dir = json_path.parent / 'images'
+        conn.execute(
+            """INSERT INTO tasks(task_id, state, json_path, extract_dir, full_md_path, images_dir, completed_at)
+               VALUES (?, 'done', ?, ?, ?, ?, ?)
+               ON CONFLICT(task_id) DO UPDATE SET
+                   state = 'done', json_path = excluded.json_path, extract_dir = excluded.extract_dir,
+                   full_md_path = excluded.full_md_path, images_dir = excluded.images_dir,
+                   completed_at = excluded.completed_at""",
+            (task_dir.name, str(json_path), str(task_dir), str(full_md) if full_md.exists() else None,
+             str(images_dir) if images_dir.exists() else None, int(json_path.stat().st_mtime))
+        )
+        count += 1
+    return count
+
+
+def _complete_task(conn, task_id: str, sha256: Optional[str], paths: Dict[str, Any], completed_at: int = None):
+    completed_at = completed_at or _now()
+    conn.execute(
+        """INSERT INTO tasks(task_id, sha256, state, original_filename, json_path, extract_dir, full_md_path, images_dir, completed_at)
+           VALUES (?, ?, 'done', ?, ?, ?, ?, ?, ?)
+           ON CONFLICT(task_id) DO UPDATE SET
+               sha256 = COALESCE(excluded.sha256, sha256), state = 'done',
+               original_filename = COALESCE(excluded.original_filename, original_filename),
+               json_path = excluded.json_path, extract_dir = excluded.extract_dir,
+               full_md_path = excluded.full_md_path, images_dir = excluded.images_dir,
+               completed_at = excluded.completed_at""",
+        (task_id, sha256, paths.get('original_filename'), _str(paths.get('json_path')), _str(paths.get('extract_dir')),
+         _str(paths.get('full_md_path')), _str(paths.get('images_dir')), completed_at)
+    )
+    if sha256:
+        conn.execute(
+            """INSERT INTO documents(sha256, task_id, completed_at) VALUES (?, ?, ?)
+               ON CONFLICT(sha256) DO UPDATE SET task_id = excluded.task_id, completed_at = excluded.completed_at""",
+            (sha256, task_id, completed_at)
+        )
+
+
+def _str(value) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+def record_upload(sha256: str, filename: str, size: int, original_filename: str = None, pages: int = None):
+    """
+    记录上传文件（相同内容重复上传时只更新文件名和页数）
+
+    Args:
+        sha256: 文档内容哈希
+        filename: 按内容哈希保存的文件名
+        size: 文件大小（字节）
+        original_filename: 原始文件名
+        pages: 页数（可选）
+    """
+    with _write_lock, _connect() as conn:
+        conn.execute(
+            """INSERT INTO uploads(sha256, filename, original_filename, size, pages, uploaded_at) VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(sha256) DO UPDATE SET
+                   original_filename = COALESCE(excluded.original_filename, original_filename),
+                   pages = COALESCE(excluded.pages, pages)""",
+            (sha256, filename, original_filename, size, pages, _now())
+        )
+        conn.commit()
+
+
+def get_upload(sha256: str) -> Optional[Dict[str, Any]]:
+    if not sha256:
+        return None
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM uploads WHERE sha256 = ?", (sha256,)).fetchone()
+    return dict(row) if row else None
+
+
+def record_task(task_id: str, sha256: str = None, original_filename: str = None):
+    """
+    记录已提交到MinerU的任务或批次
+    """
+    with _write_lock, _connect() as conn:
+        conn.execute(
+            """INSERT INTO tasks(task_id, sha256, state, original_filename, submitted_at) VALUES (?, ?, 'pending', ?, ?)
+               ON CONFLICT(task_id) DO UPDATE SET
+                   sha256 = COALESCE(excluded.sha256, sha256),
+                   original_filename = COALESCE(excluded.original_filename, original_filename)""",
+            (task_id, sha256, original_filename, _now())
+        )
+        conn.commit()
+
+
+def record_result(task_id: str, paths: Dict[str, Any], sha256: str = None) -> Optional[str]:
+    """
+    记录已完成的MinerU结果
+
+    Args:
+        task_id: 任务ID或batch_id
+        paths: 结果路径信息（json_path、extract_dir、full_md_path、images_dir）
+        sha256: 文档内容哈希（可选，默认使用提交任务时记录的哈希）
+
+    Returns:
+        文档哈希；无法确定时返回None
+    """
+    with _write_lock, _connect() as conn:
+        row = conn.execute("SELECT sha256 FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        sha256 = sha256 or (row['sha256'] if row else None)
+        _complete_task(conn, task_id, sha256, paths)
+        conn.commit()
+    return sha256
+
+
+def get_task(task_id: str) -> Optional[Dict[str, Any]]:
+    """
+    按task_id/batch_id查询任务记录（无论是否完成）
+    """
+    if not task_id:
+        return None
+    with _connect() as conn:
+        row = conn.execute(f"SELECT {', '.join(_TASK_COLUMNS)} FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def get_document_task(sha256: str) -> Optional[Dict[str, Any]]:
+    """
+    按内容哈希查询对应的已完成任务记录
+    """
+    if not sha256:
+        return None
+    with _connect() as conn:
+        row = conn.execute(
+            f"SELECT {', '.join('t.' + column for column in _TASK_COLUMNS)} "
+            "FROM documents d JOIN tasks t ON t.task_id = d.task_id WHERE d.sha256 = ?",
+            (sha256,)
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def list_document_tasks() -> List[Dict[str, Any]]:
+    """
+    列出每个文档当前对应的已完成任务记录
+    """
+    with _connect() as conn:
+        rows = conn.execute(
+            f"SELECT {', '.join('t.' + column for column in _TASK_COLUMNS)} "
+            "FROM documents d JOIN tasks t ON t.task_id = d.task_id ORDER BY d.completed_at DESC"
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def record_artifact(path, source_path, kind: str, block_count: int, sha256: str = None):
+    """
+    记录生成的layout产物
+    """
+    path = Path(path)
+    with _write_lock, _connect() as conn:
+        conn.execute(
+            """INSERT OR REPLACE INTO artifacts(path, source_path, sha256, kind, block_count, size, built_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (str(path), str(source_path), sha256, kind, block_count,
+             path.stat().st_size if path.exists() else None, _now())
+        )
+        conn.commit()
+
+
+def record_storage(task_id: str, extracted_bytes: int, retained_bytes: int, archive_bytes: int,
+                   evicted_at: Optional[int] = None):
+    """
+    记录结果目录的磁盘占用（首次记录时访问时间为当前时间）
+
+    Args:
+        task_id: 任务ID或batch_id
+        extracted_bytes: 可回收的解压内容大小
+        retained_bytes: 始终保留的内容（layout产物、译文）大小
+        archive_bytes: 归档大小
+        evicted_at: 回收时间；未回收时为None
+    """
+    with _write_lock, _connect() as conn:
+        conn.execute(
+            """INSERT INTO storage(task_id, extracted_bytes, retained_bytes, archive_bytes, last_access, evicted_at)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(task_id) DO UPDATE SET
+                   extracted_bytes = excluded.extracted_bytes, retained_bytes = excluded.retained_bytes,
+                   archive_bytes = excluded.archive_bytes, evicted_at = excluded.evicted_at""",
+            (task_id, extracted_bytes, retained_bytes, archive_bytes, _now(), evicted_at)
+        )
+        conn.commit()
+
+
+def touch_storage(task_id: str):
+    """
+    更新结果目录的最近访问时间
+    """
+    with _write_lock, _connect() as conn:
+        conn.execute("UPDATE storage SET last_access = ? WHERE task_id = ?", (_now(), task_id))
+        conn.commit()
+
+
+def get_storage(task_id: str) -> Optional[Dict[str, Any]]:
+    if not task_id:
+        return None
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM storage WHERE task_id = ?", (task_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def list_storage(evicted: Optional[bool] = None) -> List[Dict[str, Any]]:
+    """
+    按最近访问时间（从旧到新）列出结果目录的磁盘占用，附带文档哈希和原始文件名
+
+    Args:
+        evicted: True只列出已回收的，False只列出未回收的，None全部列出
+    """
+    where = ''
+    if evicted is not None:
+        where = f"WHERE s.evicted_at IS {'NOT ' if evicted else ''}NULL"
+    with _connect() as conn:
+        rows = conn.execute(
+            f"""SELECT s.*, t.sha256, COALESCE(t.original_filename, u.original_filename) AS original_filename
+                FROM storage s
+                LEFT JOIN tasks t ON t.task_id = s.task_id
+                LEFT JOIN uploads u ON u.sha256 = t.sha256
+                {where} ORDER BY s.last_access"""
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def list_untracked_results() -> List[str]:
+    """
+    列出已完成但尚未记录磁盘占用的任务（启用磁盘配额之前的结果）
+    """
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT t.task_id FROM tasks t LEFT JOIN storage s ON s.task_id = t.task_id "
+            "WHERE t.state = 'done' AND s.task_id IS NULL"
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+def record_translation(file: str, mode: str, doc_key: str = None, task_id: str = None, translation_id: str = None,
+                       target_lang: str = None, model: str = None, stats: Dict[str, int] = None):
+    """
+    记录一次翻译（layout翻译按translation_id累计，全文翻译每次一条）
+
+    Args:
+        file: 翻译结果文件名（位于translations目录下）
+        mode: layout或full
+        doc_key: 文档标识（内容哈希或task_id）
+        task_id: 任务ID或batch_id
+        translation_id: 前端提供的翻译ID
+        target_lang: 目标语言
+        model: 使用的模型
+        stats: translated_count/skipped_count/failed_count/total_count
+    """
+    stats = stats or {}
+    now = _now()
+    with _write_lock, _connect() as conn:
+        conn.execute(
+            """INSERT INTO translations(file, mode, doc_key, task_id, translation_id, target_lang, model,
+                   translated_count, skipped_count, failed_count, total_count, created_at, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(file) DO UPDATE SET
+                   doc_key = COALESCE(excluded.doc_key, doc_key),
+                   task_id = COALESCE(excluded.task_id, task_id),
+                   model = COALESCE(excluded.model, model),
+                   translated_count = excluded.translated_count, skipped_count = excluded.skipped_count,
+                   failed_count = excluded.failed_count, total_count = excluded.total_count,
+                   updated_at = excluded.updated_at""",
+            (file, mode, doc_key, task_id, translation_id, target_lang, model,
+             stats.get('translated_count'), stats.get('skipped_count'), stats.get('failed_count'),
+             stats.get('total_count'), now, now)
+        )
+        conn.commit()
+
+
+def get_translation(file: str) -> Optional[Dict[str, Any]]:
+    """
+    按翻译结果文件名查询翻译记录
+    """
+    if not file:
+        return None
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM translations WHERE file = ?", (file,)).fetchone()
+    return dict(row) if row else None
+
+
+def query_documents(limit: int = 50, offset: int = 0, query: str = None) -> Dict[str, Any]:
+    """
+    分页列出已解析的文档（按完成时间倒序），附带上传信息、layout产物和翻译记录
+
+    Args:
+        limit: 返回条数
+        offset: 跳过的条数
+        query: 按原始文件名过滤（可选，子串匹配）
+
+    Returns:
+        {"documents": [...], "total": 总数}
+    """
+    where, params = '', []
+    if query:
+        where = "WHERE COALESCE(t.original_filename, u.original_filename) LIKE ?"
+        params.append(f"%{query}%")
+    base = f"""
+        FROM documents d
+        JOIN tasks t ON t.task_id = d.task_id
+        LEFT JOIN uploads u ON u.sha256 = d.sha256
+        {where}
+    """
+    with _connect() as conn:
+        total = conn.execute(f"SELECT COUNT(*) {base}", params).fetchone()[0]
+        rows = conn.execute(
+            f"""SELECT d.sha256, d.task_id, d.completed_at, t.submitted_at,
+                       COALESCE(t.original_filename, u.original_filename) AS original_filename,
+                       u.filename, u.size, u.pages, t.full_md_path IS NOT NULL AS has_full_md
+                {base} ORDER BY d.completed_at DESC LIMIT ? OFFSET ?""",
+            params + [limit, offset]
+        ).fetchall()
+        documents = [dict(row) for row in rows]
+
+        keys = [document['sha256'] for document in documents]
+        translations, artifacts = {}, {}
+        if keys:
+            marks = ', '.join('?' * len(keys))
+            for row in conn.execute(
+                f"""SELECT doc_key, file, mode, translation_id, target_lang, model, translated_count,
+                           skipped_count, failed_count, total_count, updated_at
+                    FROM translations WHERE doc_key IN ({marks}) ORDER BY updated_at DESC""",
+                keys
+            ):
+                translations.setdefault(row['doc_key'], []).append({k: row[k] for k in row.keys() if k != 'doc_key'})
+            for row in conn.execute(
+                f"SELECT sha256, kind, block_count, size, built_at FROM artifacts WHERE sha256 IN ({marks})",
+                keys
+            ):
+                artifacts.setdefault(row['sha256'], []).append({k: row[k] for k in row.keys() if k != 'sha256'})
+
+    for document in documents:
+        document['has_full_md'] = bool(document['has_full_md'])
+        document['translations'] = translations.get(document['sha256'], [])
+        document['artifacts'] = artifacts.get(document['sha256'], [])
+    return {"documents": documents, "total": total}
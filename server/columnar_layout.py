@@ -0,0 +1,420 @@
+"""
+列式layout模块：用定长类型数组保存layout，代替逐块的Python字典
+
+- page: int32，每块的页码
+- bbox: float32，n×4矩阵（按行展开）
+- type: uint16类型编码 + 类型名表
+- text / block_id: UTF-8字节缓冲区 + uint64偏移量
+- extra: uint32编码 + 去重后的附加字段表（如source、page_size）
+
+块按页码排序保存，按页切片只切分memoryview，不复制数据；
+二进制文件可通过mmap直接映射为各列。API边界仍使用原有的字典列表格式。
+"""
+import json
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# 每块固定的字段，其余字段保存在extra表中
+CORE_FIELDS = ("page", "bbox", "text", "type", "block_id")
+
+# 二进制格式：魔数、版本、字节序标记，以及块数和各段长度
+MAGIC = b'PTLAYOUT'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<8sHH I Q Q Q Q')
+_ALIGN = 8
+
+
+def _pad(length: int) -> int:
+    return (-length) % _ALIGN
+
+
+def _compact_float(value: float) -> Any:
+    # float32只有约7位有效数字，按该精度输出，整数值输出为int
+    value = float(f"{value:.7g}")
+    return int(value) if value.is_integer() else value
+
+
+class LayoutRow:
+    """
+    layout中一个块的只读视图（不复制列数据）
+    """
+    __slots__ = ('_layout', '_index')
+
+    def __init__(self, layout: 'ColumnarLayout', index: int):
+        self._layout = layout
+        self._index = index
+
+    @property
+    def page(self) -> int:
+        return self._layout._page[self._index]
+
+    @property
+    def bbox(self) -> List[Any]:
+        start = self._index * 4
+        return [_compact_float(v) for v in self._layout._bbox[start:start + 4]]
+
+    @property
+    def text(self) -> str:
+        return self._layout._string(self._layout._text_offsets, self._layout._text_buf, self._index)
+
+    @property
+    def type(self) -> str:
+        return self._layout._types[self._layout._type_codes[self._index]]
+
+    @property
+    def block_id(self) -> str:
+        return self._layout._string(self._layout._id_offsets, self._layout._id_buf, self._index)
+
+    @property
+    def extra(self) -> Dict[str, Any]:
+        code = self._layout._extra_codes[self._index]
+        return self._layout._extras[code] if code else {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        row = {
+            "page": self.page,
+            "bbox": self.bbox,
+            "text": self.text,
+            "type": self.type
+        }
+        # 旧格式解析结果没有block_id，转换回去时保持原样
+        block_id = self.block_id
+        if block_id:
+            row["block_id"] = block_id
+        row.update(self.extra)
+        return row
+
+    def __repr__(self):
+        return f"LayoutRow(page={self.page}, block_id={self.block_id!r}, type={self.type!r})"
+
+
+class ColumnarLayout:
+    """
+    列式存储的layout，可按页零拷贝切片，可保存为可mmap的二进制文件
+    """
+
+    def __init__(self, page, bbox, type_codes, types, text_offsets, text_buf,
+                 id_offsets, id_buf, extra_codes, extras, _owner=None):
+        self._page = page
+        self._bbox = bbox
+        self._type_codes = type_codes
+        self._types = types
+        self._text_offsets = text_offsets
+        self._text_buf = text_buf
+        self._id_offsets = id_offsets
+        self._id_buf = id_buf
+        self._extra_codes = extra_codes
+        self._extras = extras
+        # 持有mmap等底层对象，保证切片存活期间映射不被关闭
+        self._owner = _owner
+
+    @staticmethod
+    def _string(offsets, buf, index: int) -> str:
+        return bytes(buf[offsets[index]:offsets[index + 1]]).decode('utf-8')
+
+    @classmethod
+    def from_dicts(cls, blocks: Iterable[Dict[str, Any]]) -> 'ColumnarLayout':
+        """
+        由字典列表构建（按页码稳定排序，同页内保持原顺序）
+
+        Args:
+            blocks: layout字典列表
+
+        Returns:
+            ColumnarLayout
+        """
+        blocks = sorted(blocks, key=lambda block: block.get("page") or 0)
+
+        page = array('i')
+        bbox = array('f')
+        type_codes = array('H')
+        text_offsets = array('Q', [0])
+        id_offsets = array('Q', [0])
+        extra_codes = array('I')
+        text_buf = bytearray()
+        id_buf = bytearray()
+        types: List[str] = []
+        type_index: Dict[str, int] = {}
+        # extra表的0号位置表示“无附加字段”
+        extras: List[Dict[str, Any]] = [{}]
+        extra_index: Dict[str, int] = {}
+
+        for block in blocks:
+            page.append(int(block.get("page") or 0))
+
+            box = list(block.get("bbox") or [])[:4]
+            bbox.extend(float(v) for v in box + [0.0] * (4 - len(box)))
+
+            block_type = block.get("type") or ""
+            if block_type not in type_index:
+                type_index[block_type] = len(types)
+                types.append(block_type)
+            type_codes.append(type_index[block_type])
+
+            text_buf += (block.get("text") or "").encode('utf-8')
+            text_offsets.append(len(text_buf))
+            id_buf += str(block.get("block_id") or "").encode('utf-8')
+            id_offsets.append(len(id_buf))
+
+            extra = {key: value for key, value in block.items() if key not in CORE_FIELDS}
+            if extra:
+                key = json.dumps(extra, ensure_ascii=False, sort_keys=True)
+                if key not in extra_index:
+                    extra_index[key] = len(extras)
+                    extras.append(extra)
+                extra_codes.append(extra_index[key])
+            else:
+                extra_codes.append(0)
+
+        return cls(
+            memoryview(page), memoryview(bbox), memoryview(type_codes), types,
+            memoryview(text_offsets), memoryview(bytes(text_buf)),
+            memoryview(id_offsets), memoryview(bytes(id_buf)),
+            memoryview(extra_codes), extras
+        )
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """
+        转换为原有的字典列表格式（API边界使用）
+        """
+        return [row.to_dict() for row in self]
+
+    def __len__(self):
+        return len(self._page)
+
+    def __getitem__(self, index: int) -> LayoutRow:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return LayoutRow(self, index)
+
+    def __iter__(self) -> Iterator[LayoutRow]:
+        for index in range(len(self)):
+            yield LayoutRow(self, index)
+
+    def raw_bbox(self, index: int) -> tuple:
+        """
+        返回第index块的bbox原始值(x0, y0, x1, y1)，不做格式化
+        """
+        start = index * 4
+        return tuple(self._bbox[start:start + 4])
+
+    @property
+    def page_column(self) -> memoryview:
+        """
+        页码列（int32，只读视图）
+        """
+        return self._page.toreadonly()
+
+    @property
+    def bbox_column(self) -> memoryview:
+        """
+        bbox列（float32，按行展开的n×4矩阵，只读视图）
+        """
+        return self._bbox.toreadonly()
+
+    def with_bbox(self, bbox: array) -> 'ColumnarLayout':
+        """
+        返回替换了bbox列的新layout，其余列共享
+
+        Args:
+            bbox: 长度为4n的float32数组
+
+        Returns:
+            ColumnarLayout
+        """
+        if len(bbox) != len(self) * 4:
+            raise ValueError("bbox列长度与块数不一致")
+        return ColumnarLayout(
+            self._page, memoryview(bbox), self._type_codes, self._types,
+            self._text_offsets, self._text_buf, self._id_offsets, self._id_buf,
+            self._extra_codes, self._extras, _owner=self._owner
+        )
+
+    def pages(self) -> List[int]:
+        """
+        返回包含文本块的页码（升序去重）
+        """
+        result = []
+        for page_no in self._page:
+            if not result or result[-1] != page_no:
+                result.append(page_no)
+        return result
+
+    def _slice(self, start: int, end: int) -> 'ColumnarLayout':
+        # 偏移量保持绝对位置，文本缓冲区整体共享
+        return ColumnarLayout(
+            self._page[start:end], self._bbox[start * 4:end * 4],
+            self._type_codes[start:end], self._types,
+            self._text_offsets[start:end + 1], self._text_buf,
+            self._id_offsets[start:end + 1], self._id_buf,
+            self._extra_codes[start:end], self._extras,
+            _owner=self._owner
+        )
+
+    def page_slice(self, page_no: int) -> 'ColumnarLayout':
+        """
+        获取某一页的块（memoryview切片，不复制数据）
+
+        Args:
+            page_no: 页码（从1开始）
+
+        Returns:
+            只包含该页块的ColumnarLayout；该页没有块时长度为0
+        """
+        start = bisect_left(self._page, page_no)
+        end = bisect_right(self._page, page_no, lo=start)
+        return self._slice(start, end)
+
+    def page_range(self, first: int, last: int) -> 'ColumnarLayout':
+        """
+        获取[first, last]页范围内的块（不复制数据）
+        """
+        start = bisect_left(self._page, first)
+        end = bisect_right(self._page, last, lo=start)
+        return self._slice(start, end)
+
+    def to_bytes(self) -> bytes:
+        """
+        序列化为二进制格式（小端序，各段8字节对齐，可直接mmap加载）
+        """
+        n = len(self)
+        text_base = self._text_offsets[0] if n else 0
+        id_base = self._id_offsets[0] if n else 0
+        text_offsets = array('Q', (v - text_base for v in self._text_offsets)) if n else array('Q', [0])
+        id_offsets = array('Q', (v - id_base for v in self._id_offsets)) if n else array('Q', [0])
+        text_buf = bytes(self._text_buf[text_base:text_base + text_offsets[-1]])
+        id_buf = bytes(self._id_buf[id_base:id_base + id_offsets[-1]])
+
+        used_extras = sorted(set(self._extra_codes))
+        remap = {0: 0}
+        extras = [{}]
+        for code in used_extras:
+            if code:
+                remap[code] = len(extras)
+                extras.append(self._extras[code])
+        extra_codes = array('I', (remap[code] for code in self._extra_codes))
+        meta = json.dumps({"types": self._types, "extras": extras}, ensure_ascii=False).encode('utf-8')
+
+        columns = [
+            array('i', self._page), array('f', self._bbox), array('H', self._type_codes),
+            text_offsets, id_offsets, extra_codes
+        ]
+        if sys.byteorder != 'little':
+            for column in columns:
+                column.byteswap()
+
+        sections = [column.tobytes() for column in columns] + [text_buf, id_buf, meta]
+        header = _HEADER.pack(MAGIC, FORMAT_VERSION, 0, n, len(text_buf), len(id_buf), len(meta), 0)
+        parts = [header]
+        for section in sections:
+            parts.append(section)
+            parts.append(b'\0' * _pad(len(section)))
+        return b''.join(parts)
+
+    def save(self, path: Path):
+        """
+        写入二进制文件（先写临时文件再替换）
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(self.to_bytes())
+        tmp_path.replace(path)
+
+    @classmethod
+    def from_buffer(cls, buffer, _owner=None) -> 'ColumnarLayout':
+        """
+        从二进制数据构建，各列直接引用buffer（不复制）
+
+        Args:
+            buffer: bytes、mmap等支持缓冲区协议的对象
+
+        Returns:
+            ColumnarLayout
+        """
+        view = memoryview(buffer)
+        magic, version, _, n, text_len, id_len, meta_len, _ = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise ValueError("不是列式layout文件")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"不支持的列式layout版本: {version}")
+        if sys.byteorder != 'little':
+            # 大端机器上无法零拷贝读取，复制后转换字节序
+            return cls._from_buffer_swapped(bytes(view), n, text_len, id_len, meta_len)
+
+        offset = _HEADER.size
+
+        def take(length: int, fmt: str = None):
+            nonlocal offset
+            section = view[offset:offset + length]
+            offset += length + _pad(length)
+            return section.cast(fmt) if fmt else section
+
+        page = take(4 * n, 'i')
+        bbox = take(16 * n, 'f')
+        type_codes = take(2 * n, 'H')
+        text_offsets = take(8 * (n + 1), 'Q')
+        id_offsets = take(8 * (n + 1), 'Q')
+        extra_codes = take(4 * n, 'I')
+        text_buf = take(text_len)
+        id_buf = take(id_len)
+        meta = json.loads(bytes(take(meta_len)).decode('utf-8'))
+
+        return cls(page, bbox, type_codes, meta["types"], text_offsets, text_buf,
+                   id_offsets, id_buf, extra_codes, meta["extras"], _owner=_owner or buffer)
+
+    @classmethod
+    def _from_buffer_swapped(cls, data: bytes, n: int, text_len: int, id_len: int, meta_len: int) -> 'ColumnarLayout':
+        offset = _HEADER.size
+        columns = []
+        for fmt, count in (('i', n), ('f', n * 4), ('H', n), ('Q', n + 1), ('Q', n + 1), ('I', n)):
+            column = array(fmt)
+            length = column.itemsize * count
+            column.frombytes(data[offset:offset + length])
+            column.byteswap()
+            columns.append(memoryview(column))
+            offset += length + _pad(length)
+        text_buf = memoryview(data[offset:offset + text_len])
+        offset += text_len + _pad(text_len)
+        id_buf = memoryview(data[offset:offset + id_len])
+        offset += id_len + _pad(id_len)
+        meta = json.loads(data[offset:offset + meta_len].decode('utf-8'))
+        page, bbox, type_codes, text_offsets, id_offsets, extra_codes = columns
+        return cls(page, bbox, type_codes, meta["types"], text_offsets, text_buf,
+                   id_offsets, id_buf, extra_codes, meta["extras"])
+
+    @classmethod
+    def load(cls, path: Path, use_mmap: bool = True) -> 'ColumnarLayout':
+        """
+        加载二进制文件；默认使用mmap，只有访问到的页才会读入内存
+
+        Args:
+            path: 文件路径
+            use_mmap: 是否使用mmap（否则整体读入）
+
+        Returns:
+            ColumnarLayout
+        """
+        with open(path, 'rb') as f:
+            if not use_mmap:
+                return cls.from_buffer(f.read())
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls.from_buffer(mapped, _owner=mapped)
+
+
+def load_layout_dicts(path: Path) -> Optional[List[Dict[str, Any]]]:
+    """
+    读取列式layout文件并转换为字典列表；文件不存在时返回None
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    return ColumnarLayout.load(path).to_dicts()
@@ -35,8 +35,66 @@ class Config:
     MINERU_TIMEOUT = int(os.environ.get('MINERU_TIMEOUT', '300'))  # 5分钟超时
     MINERU_MODEL_VERSION = os.environ.get('MINERU_MODEL_VERSION', 'vlm')  # pipeline 或 vlm
     
+    # MinerU分片解析配置（超大PDF按页拆分并发解析）
+    MINERU_SHARD_THRESHOLD_PAGES = int(os.environ.get('MINERU_SHARD_THRESHOLD_PAGES', '0'))  # 超过该页数自动分片，0表示仅在请求sharded=true时分片
+    MINERU_SHARD_SIZE_PAGES = int(os.environ.get('MINERU_SHARD_SIZE_PAGES', '50'))  # 每个分片的页数
+    MINERU_SHARD_UPLOAD_WORKERS = int(os.environ.get('MINERU_SHARD_UPLOAD_WORKERS', '4'))  # 分片并发上传数
+    
+    # 选择性OCR配置（只有扫描页/图片页提交MinerU，文本页本地解析）
+    MINERU_SELECTIVE_OCR = os.environ.get('MINERU_SELECTIVE_OCR', 'false').lower() == 'true'  # 默认路由方式，也可通过请求参数routing指定
+    OCR_ROUTING_MIN_TEXT_CHARS = int(os.environ.get('OCR_ROUTING_MIN_TEXT_CHARS', '50'))  # 文本层字符数低于该值视为扫描页
+    OCR_ROUTING_IMAGE_RATIO = float(os.environ.get('OCR_ROUTING_IMAGE_RATIO', '0.5'))  # 图片面积占比达到该值视为图片页
+    
+    # 本地PyMuPDF快速解析配置（MinerU结果返回前先显示文本层layout）
+    LOCAL_LAYOUT_ENABLED = os.environ.get('LOCAL_LAYOUT_ENABLED', 'true').lower() == 'true'
+    LOCAL_LAYOUT_MERGE = os.environ.get('LOCAL_LAYOUT_MERGE', 'true').lower() == 'true'  # MinerU未覆盖的页保留本地结果
+    LOCAL_LAYOUT_PARALLEL_PAGES = int(os.environ.get('LOCAL_LAYOUT_PARALLEL_PAGES', '32'))  # 达到该页数时使用进程池
+    LOCAL_LAYOUT_WORKERS = int(os.environ.get('LOCAL_LAYOUT_WORKERS', '0')) or None  # 进程池大小，默认CPU核数
+    
+    # 双语PDF导出（PyMuPDF，按页段并行渲染）
+    PDF_EXPORT_PARALLEL_PAGES = int(os.environ.get('PDF_EXPORT_PARALLEL_PAGES', '16'))  # 达到该页数时使用进程池
+    PDF_EXPORT_WORKERS = int(os.environ.get('PDF_EXPORT_WORKERS', '0')) or None  # 进程池大小，默认CPU核数
+    PDF_EXPORT_FONT_FILE = os.environ.get('PDF_EXPORT_FONT_FILE', '')  # 译文字体文件（TTF/OTF），默认PyMuPDF内置CJK字体
+    
+    # 页面缩略图与PDF切片（首次请求时生成并缓存，前端无需加载整个PDF即可翻页）
+    THUMBNAIL_WIDTH = int(os.environ.get('THUMBNAIL_WIDTH', '160'))  # 默认缩略图宽度（像素）
+    THUMBNAIL_FORMAT = os.environ.get('THUMBNAIL_FORMAT', 'webp')  # webp（需要Pillow，否则使用jpeg）/jpeg/png
+    THUMBNAIL_QUALITY = int(os.environ.get('THUMBNAIL_QUALITY', '70'))  # 有损格式的质量（1-100）
+    THUMBNAIL_PARALLEL_PAGES = int(os.environ.get('THUMBNAIL_PARALLEL_PAGES', '16'))  # 达到该页数时使用进程池
+    THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', '0')) or None  # 进程池大小，默认CPU核数
+    PDF_SLICE_MAX_PAGES = int(os.environ.get('PDF_SLICE_MAX_PAGES', '50'))  # 单次切片的最大页数
+    
+    # layout产物缓存配置（规范化layout持久化在MinerU结果旁，进程内LRU缓存）
+    LAYOUT_CACHE_ENTRIES = int(os.environ.get('LAYOUT_CACHE_ENTRIES', '64'))  # 进程内最多缓存的layout数量
+    LAYOUT_NORMALIZE_BBOX = os.environ.get('LAYOUT_NORMALIZE_BBOX', 'true').lower() == 'true'  # 按PDF页面尺寸把bbox统一换算为页面坐标
+    LAYOUT_PARSE_WORKERS = int(os.environ.get('LAYOUT_PARSE_WORKERS', '0')) or None  # 大文件pdf_info并行解析的进程数，默认CPU核数
+    LAYOUT_PARSE_PARALLEL_MB = float(os.environ.get('LAYOUT_PARSE_PARALLEL_MB', '32'))  # MinerU JSON达到该大小（MB）时才并行解析
+    
     # 翻译目标语言
     DEFAULT_TARGET_LANG = 'zh'
+    TRANSLATE_MERGE_FRAGMENTS = os.environ.get('TRANSLATE_MERGE_FRAGMENTS', 'true').lower() == 'true'  # 跨栏/跨页的段落片段合并后整体翻译
+    TRANSLATION_LOG_COMPACT_EVERY = int(os.environ.get('TRANSLATION_LOG_COMPACT_EVERY', 50))  # layout翻译日志追加多少次后在后台合并为快照
+    
+    # 压缩存储：MinerU原始JSON（生成layout产物后）、译文和翻译归档（gzip/zstd/none，zstd需安装zstandard）
+    ARTIFACT_COMPRESSION = os.environ.get('ARTIFACT_COMPRESSION', 'gzip')
+    JSON_COMPACT_ARTIFACTS = os.environ.get('JSON_COMPACT_ARTIFACTS', 'true').lower() == 'true'  # JSON产物紧凑格式，false时缩进便于调试
+    
+    # 磁盘配额：MINERU_FOLDER超过配额时按LRU回收解压的结果目录（保留layout产物和译文，访问时从归档恢复）
+    DISK_QUOTA_MB = float(os.environ.get('DISK_QUOTA_MB', '0'))  # 0表示不限制
+    DISK_QUOTA_MIN_IDLE_SECONDS = int(os.environ.get('DISK_QUOTA_MIN_IDLE_SECONDS', '300'))  # 最近该秒数内访问过的结果不回收
+    
+    # 共享存储后端：上传文件、MinerU结果和翻译在多个节点间共享，本地目录作为读穿缓存
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'none')  # none/local/s3
+    STORAGE_LOCAL_ROOT = os.environ.get('STORAGE_LOCAL_ROOT', '')  # local：共享目录（如NFS挂载点）
+    STORAGE_S3_ENDPOINT = os.environ.get('STORAGE_S3_ENDPOINT', '')  # s3：如 https://s3.amazonaws.com 或 http://minio:9000
+    STORAGE_S3_BUCKET = os.environ.get('STORAGE_S3_BUCKET', '')
+    STORAGE_S3_ACCESS_KEY = os.environ.get('STORAGE_S3_ACCESS_KEY', '')
+    STORAGE_S3_SECRET_KEY = os.environ.get('STORAGE_S3_SECRET_KEY', '')
+    STORAGE_S3_REGION = os.environ.get('STORAGE_S3_REGION', 'us-east-1')
+    STORAGE_S3_PREFIX = os.environ.get('STORAGE_S3_PREFIX', '')  # 对象键前缀，多套部署共用一个bucket时区分
+    
+    # 全文检索（SQLite FTS5，索引文件位于MINERU_FOLDER下）
+    SEARCH_ENABLED = os.environ.get('SEARCH_ENABLED', 'true').lower() == 'true'
     
     # 缓存配置
     CACHE_TYPE = 'simple'
@@ -0,0 +1,400 @@
+"""
+磁盘配额模块：MINERU_FOLDER超过DISK_QUOTA_MB时按最近访问时间（LRU）回收解压后的MinerU结果
+
+回收时把结果目录中可回收的文件（图片、原始JSON、Markdown等）打包为 archives/<task_id>.zip 后删除，
+layout产物、译文、对齐索引和分片清单始终保留。归档中记录每个文件的mtime，再次访问时原样解压恢复，
+layout产物的源文件指纹不变，不需要重新解析。访问时间和各目录的占用记录在文档目录（catalog）中。
+"""
+import fnmatch
+import logging
+import os
+import shutil
+import threading
+import time
+import zipfile
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from flask import current_app
+
+from server.block_alignment import ALIGNMENT_FILENAME
+from server.catalog import (
+    get_storage,
+    list_storage,
+    list_untracked_results,
+    record_storage,
+    touch_storage
+)
+from server.fast_json import dumps_bytes, loads
+from server.mineru_shards import MANIFEST_FILENAME
+
+logger = logging.getLogger(__name__)
+
+# 归档目录名（位于MINERU_FOLDER下）
+ARCHIVES_DIRNAME = 'archives'
+
+# 归档内记录文件mtime和大小的清单
+ARCHIVE_MANIFEST = '.archive_manifest.json'
+
+# 回收时保留的文件（layout产物、译文、对齐索引、分片清单）
+RETAINED_PATTERNS = ('*.layout', '*.layout.meta', 'full_translated_*', ALIGNMENT_FILENAME, MANIFEST_FILENAME)
+
+# 已压缩的格式直接存入归档，不再压缩
+STORED_SUFFIXES = {'.png', '.jpg', '.jpeg', '.webp', '.gif', '.gz', '.zst', '.zip', '.pdf'}
+
+# MINERU_FOLDER下不属于单个结果目录的内容（计入总占用，但不回收）
+SHARED_DIRNAMES = ('translations', 'segments', 'page_sizes', 'local_layouts', 'exports', 'page_cache')
+
+# 超出配额时回收到配额的该比例以下，避免每次新结果都触发回收
+LOW_WATERMARK = 0.9
+
+# 访问时间的最小更新间隔（秒）
+TOUCH_INTERVAL = 60
+
+_task_locks = defaultdict(threading.Lock)
+_last_touch: Dict[str, float] = {}
+# 暂不回收的结果（如正在上传到存储后端），值为持有次数
+_held = Counter()
+_enforcing = threading.Lock()
+
+
+def get_archive_path(task_id: str) -> Path:
+    return Path(current_app.config['MINERU_FOLDER']) / ARCHIVES_DIRNAME / f"{task_id}.zip"
+
+
+def _task_dir(task_id: str) -> Path:
+    return Path(current_app.config['MINERU_FOLDER']) / task_id
+
+
+def _quota_bytes() -> int:
+    return int((current_app.config.get('DISK_QUOTA_MB') or 0) * 1024 * 1024)
+
+
+def is_retained(relpath: str) -> bool:
+    name = relpath.rsplit('/', 1)[-1]
+    return any(fnmatch.fnmatch(name, pattern) for pattern in RETAINED_PATTERNS)
+
+
+def _walk(root: Path):
+    # 返回(相对路径, 绝对路径, stat)，相对路径统一使用/分隔
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = list(os.scandir(current))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(Path(entry.path))
+            elif entry.is_file(follow_symlinks=False):
+                path = Path(entry.path)
+                yield path.relative_to(root).as_posix(), path, entry.stat()
+
+
+def _dir_size(root: Path) -> int:
+    return sum(stat.st_size for _, _, stat in _walk(root))
+
+
+def _evictable_files(task_id: str) -> List[Tuple[str, Path, os.stat_result]]:
+    return [item for item in _walk(_task_dir(task_id)) if not is_retained(item[0]) and not item[0].endswith('.tmp')]
+
+
+def scan_task(task_id: str) -> Dict[str, int]:
+    """
+    统计结果目录的占用
+
+    Returns:
+        {"extracted_bytes": 可回收的大小, "retained_bytes": 保留的大小}
+    """
+    extracted = retained = 0
+    for relpath, _, stat in _walk(_task_dir(task_id)):
+        if is_retained(relpath):
+            retained += stat.st_size
+        else:
+            extracted += stat.st_size
+    return {"extracted_bytes": extracted, "retained_bytes": retained}
+
+
+def _archive_size(task_id: str) -> int:
+    archive = get_archive_path(task_id)
+    return archive.stat().st_size if archive.exists() else 0
+
+
+def track_result(task_id: str):
+    """
+    记录新完成结果的占用，并在后台检查配额
+
+    Args:
+        task_id: 任务ID或batch_id
+    """
+    if not task_id or not _task_dir(task_id).is_dir():
+        return
+    usage = scan_task(task_id)
+    record_storage(task_id, usage['extracted_bytes'], usage['retained_bytes'], _archive_size(task_id))
+    schedule_enforcement()
+
+
+def touch(task_id: str):
+    """
+    记录结果目录被访问（同一目录每TOUCH_INTERVAL秒最多写一次）
+    """
+    now = time.time()
+    if now - _last_touch.get(task_id, 0) < TOUCH_INTERVAL:
+        return
+    _last_touch[task_id] = now
+    touch_storage(task_id)
+
+
+def _read_manifest(archive: Path) -> Dict[str, List[int]]:
+    with zipfile.ZipFile(archive) as zip_file:
+        return loads(zip_file.read(ARCHIVE_MANIFEST))
+
+
+def _write_archive(task_id: str, files: List[Tuple[str, Path, os.stat_result]]) -> Path:
+    # 当前文件与已有归档一致时（上次恢复后未变化）直接复用
+    archive = get_archive_path(task_id)
+    manifest = {relpath: [stat.st_mtime_ns, stat.st_size] for relpath, _, stat in files}
+    if archive.exists():
+        try:
+            if _read_manifest(archive) == manifest:
+                return archive
+        except Exception as e:
+            logger.warning(f"归档清单读取失败，重新归档: {archive.name}: {e}")
+
+    archive.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = archive.with_name(archive.name + '.tmp')
+    with zipfile.ZipFile(tmp_path, 'w') as zip_file:
+        for relpath, path, _ in files:
+            compress_type = zipfile.ZIP_STORED if path.suffix.lower() in STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+            zip_file.write(path, relpath, compress_type=compress_type)
+        zip_file.writestr(ARCHIVE_MANIFEST, dumps_bytes(manifest))
+    os.replace(tmp_path, archive)
+    return archive
+
+
+def _remove_empty_dirs(root: Path):
+    for current, _, _ in sorted(os.walk(root), key=lambda item: len(item[0]), reverse=True):
+        if Path(current) != root and not os.listdir(current):
+            os.rmdir(current)
+
+
+def evict(task_id: str) -> int:
+    """
+    归档并删除结果目录中可回收的文件（hold_extracted期间不回收）
+
+    Args:
+        task_id: 任务ID或batch_id
+
+    Returns:
+        释放的字节数（扣除新增的归档大小）
+    """
+    with _task_locks[task_id]:
+        entry = get_storage(task_id)
+        if (entry and entry.get('evicted_at')) or _held[task_id]:
+            return 0
+        files = _evictable_files(task_id)
+        if not files:
+            return 0
+        archive_before = _archive_size(task_id)
+        archive = _write_archive(task_id, files)
+        removed = 0
+        for _, path, stat in files:
+            path.unlink()
+            removed += stat.st_size
+        _remove_empty_dirs(_task_dir(task_id))
+        archive_bytes = archive.stat().st_size
+        record_storage(task_id, 0, scan_task(task_id)['retained_bytes'], archive_bytes, evicted_at=int(time.time()))
+    logger.info(f"磁盘配额：已回收 {task_id}（{removed} 字节，归档 {archive_bytes} 字节）")
+    return removed - (archive_bytes - archive_before)
+
+
+@contextmanager
+def hold_extracted(task_id: str):
+    """
+    在with块内保持结果目录为解压状态：已回收时先从归档恢复，期间配额检查跳过该结果，释放后重新检查配额
+
+    Args:
+        task_id: 任务ID或batch_id
+    """
+    with _task_locks[task_id]:
+        _held[task_id] += 1
+    try:
+        ensure_extracted(task_id)
+        yield
+    finally:
+        with _task_locks[task_id]:
+            _held[task_id] -= 1
+            if _held[task_id] <= 0:
+                del _held[task_id]
+        # 持有期间跳过的回收在释放后补上
+        schedule_enforcement()
+
+
+def is_evicted(task_id: str) -> bool:
+    entry = get_storage(task_id)
+    return bool(entry and entry.get('evicted_at'))
+
+
+def ensure_extracted(task_id: str) -> bool:
+    """
+    访问结果目录前调用：已回收时从归档恢复，并记录访问时间
+
+    Args:
+        task_id: 任务ID或batch_id
+
+    Returns:
+        是否从归档恢复了文件
+    """
+    entry = get_storage(task_id)
+    if not entry:
+        return False
+    if not entry.get('evicted_at'):
+        touch(task_id)
+        return False
+
+    with _task_locks[task_id]:
+        entry = get_storage(task_id)
+        if not entry or not entry.get('evicted_at'):
+            return False
+        archive = get_archive_path(task_id)
+        if not archive.exists():
+            logger.error(f"磁盘配额：{task_id} 的归档不存在，无法恢复")
+            return False
+
+        task_dir = _task_dir(task_id).resolve()
+        with zipfile.ZipFile(archive) as zip_file:
+            manifest = loads(zip_file.read(ARCHIVE_MANIFEST))
+            for relpath, (mtime_ns, _) in manifest.items():
+                target = (task_dir / relpath).resolve()
+                if task_dir not in target.parents:
+                    raise ValueError(f"归档中的路径不合法: {relpath}")
+                target.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = target.with_name(target.name + '.tmp')
+                with zip_file.open(relpath) as src, open(tmp_path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                os.replace(tmp_path, target)
+                # 恢复原mtime，layout产物和ETag缓存的源文件指纹保持有效
+                os.utime(target, ns=(mtime_ns, mtime_ns))
+
+        usage = scan_task(task_id)
+        record_storage(task_id, usage['extracted_bytes'], usage['retained_bytes'], archive.stat().st_size)
+        touch_storage(task_id)
+        _last_touch[task_id] = time.time()
+    logger.info(f"磁盘配额：已从归档恢复 {task_id}（{len(manifest)} 个文件）")
+    schedule_enforcement()
+    return True
+
+
+def _shared_bytes() -> int:
+    mineru_folder = Path(current_app.config['MINERU_FOLDER'])
+    total = sum(_dir_size(mineru_folder / name) for name in SHARED_DIRNAMES)
+    # 目录数据库、检索索引等顶层文件
+    total += sum(path.stat().st_size for path in mineru_folder.iterdir() if path.is_file())
+    return total
+
+
+def refresh_usage():
+    """
+    重新统计所有结果目录的占用（包括启用配额之前完成的结果）
+    """
+    for task_id in list_untracked_results():
+        if _task_dir(task_id).is_dir():
+            usage = scan_task(task_id)
+            record_storage(task_id, usage['extracted_bytes'], usage['retained_bytes'], _archive_size(task_id))
+    for entry in list_storage():
+        task_id = entry['task_id']
+        with _task_locks[task_id]:
+            usage = scan_task(task_id)
+            if entry.get('evicted_at'):
+                usage['extracted_bytes'] = 0
+            record_storage(task_id, usage['extracted_bytes'], usage['retained_bytes'], _archive_size(task_id),
+                           evicted_at=entry.get('evicted_at'))
+
+
+def get_usage(refresh: bool = False) -> Dict[str, Any]:
+    """
+    统计磁盘占用
+
+    Args:
+        refresh: 是否重新扫描结果目录（否则使用上次记录的数据）
+
+    Returns:
+        总占用、配额和每个文档的占用（按最近访问时间从旧到新）
+    """
+    if refresh:
+        refresh_usage()
+    documents = list_storage()
+    shared_bytes = _shared_bytes()
+    used = shared_bytes + sum(
+        (entry['extracted_bytes'] or 0) + (entry['retained_bytes'] or 0) + (entry['archive_bytes'] or 0)
+        for entry in documents
+    )
+    for entry in documents:
+        entry['evicted'] = bool(entry.get('evicted_at'))
+    return {
+        "quota_bytes": _quota_bytes(),
+        "used_bytes": used,
+        "shared_bytes": shared_bytes,
+        "extracted_bytes": sum(entry['extracted_bytes'] or 0 for entry in documents),
+        "retained_bytes": sum(entry['retained_bytes'] or 0 for entry in documents),
+        "archive_bytes": sum(entry['archive_bytes'] or 0 for entry in documents),
+        "evicted_count": sum(1 for entry in documents if entry['evicted']),
+        "documents": documents
+    }
+
+
+def enforce_quota() -> Dict[str, Any]:
+    """
+    超出配额时按LRU回收结果目录，直到占用低于配额的LOW_WATERMARK；
+    最近DISK_QUOTA_MIN_IDLE_SECONDS秒内访问过的结果不回收
+
+    Returns:
+        {"used_bytes": 回收后的占用, "quota_bytes": 配额, "evicted": [task_id, ...]}
+    """
+    quota = _quota_bytes()
+    if not quota:
+        return {"used_bytes": None, "quota_bytes": 0, "evicted": []}
+    with _enforcing:
+        return _enforce(quota)
+
+
+def _enforce(quota: int) -> Dict[str, Any]:
+    usage = get_usage(refresh=True)
+    used = usage['used_bytes']
+    evicted = []
+    if used > quota:
+        target = quota * LOW_WATERMARK
+        idle_before = time.time() - current_app.config.get('DISK_QUOTA_MIN_IDLE_SECONDS', 300)
+        for entry in list_storage(evicted=False):
+            if used <= target:
+                break
+            if (entry['last_access'] or 0) > idle_before or not entry['extracted_bytes'] or _held[entry['task_id']]:
+                continue
+            try:
+                used -= evict(entry['task_id'])
+                evicted.append(entry['task_id'])
+            except Exception as e:
+                logger.warning(f"磁盘配额：回收 {entry['task_id']} 失败: {e}")
+        if used > quota:
+            logger.warning(f"磁盘配额：占用 {used} 字节仍超过配额 {quota} 字节，没有可回收的结果")
+    return {"used_bytes": used, "quota_bytes": quota, "evicted": evicted}
+
+
+def schedule_enforcement():
+    """
+    在后台线程中检查配额（已有检查在进行时跳过，检查本身串行执行）
+    """
+    if not _quota_bytes() or _enforcing.locked():
+        return
+    app = current_app._get_current_object()
+
+    def run():
+        try:
+            with app.app_context():
+                enforce_quota()
+        except Exception as e:
+            logger.warning(f"磁盘配额检查失败: {e}")
+
+    threading.Thread(target=run, daemon=True).start()
@@ -0,0 +1,208 @@
+"""
+文档存储模块：按内容哈希保存上传文件，并通过文档目录（catalog）维护已完成MinerU结果的索引
+相同内容的PDF只保存一份、只解析一次
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from server.catalog import get_document_task, get_task, list_document_tasks, record_result, record_task
+from server.disk_quota import is_evicted, touch
+from server.storage_sync import ensure_local_result, import_remote_document, import_remote_task
+from server.stored_files import read_stored_json, stored_exists
+
+logger = logging.getLogger(__name__)
+
+# 流式写入时每次读取的字节数
+CHUNK_SIZE = 1024 * 1024
+
+
+def save_upload_content_addressed(file_storage, upload_folder: Path) -> Dict[str, Any]:
+    """
+    边写盘边计算SHA256，并以内容哈希作为文件名保存上传文件
+
+    Args:
+        file_storage: Flask/Werkzeug的FileStorage对象
+        upload_folder: 上传目录
+
+    Returns:
+        包含sha256、filename、filepath、size的字典
+    """
+    upload_folder = Path(upload_folder)
+    upload_folder.mkdir(parents=True, exist_ok=True)
+
+    original_name = file_storage.filename or ''
+    extension = original_name.rsplit('.', 1)[1].lower() if '.' in original_name else 'bin'
+
+    hasher = hashlib.sha256()
+    size = 0
+    # 先写入临时文件，哈希计算完成后再原子重命名
+    fd, tmp_name = tempfile.mkstemp(dir=str(upload_folder), suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            while True:
+                chunk = file_storage.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                tmp_file.write(chunk)
+                size += len(chunk)
+
+        sha256 = hasher.hexdigest()
+        filepath = upload_folder / f"{sha256}.{extension}"
+        if filepath.exists():
+            # 相同内容已存在，丢弃临时文件
+            os.unlink(tmp_name)
+            logger.info(f"文件内容已存在，复用: {filepath.name}")
+        else:
+            os.replace(tmp_name, filepath)
+            logger.info(f"文件已按内容哈希保存: {filepath.name} ({size} 字节)")
+    except Exception:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+    return {
+        "sha256": sha256,
+        "filename": filepath.name,
+        "filepath": filepath,
+        "size": size
+    }
+
+
+def register_pending(task_id: str, sha256: str, original_filename: str = None):
+    """
+    记录已提交到MinerU但尚未完成的任务与文档哈希的对应关系
+
+    Args:
+        task_id: MinerU的task_id或batch_id
+        sha256: 文档内容哈希
+        original_filename: 原始文件名（可选）
+    """
+    if not task_id or not sha256:
+        return
+    record_task(task_id, sha256, original_filename)
+
+
+def register_completed(task_id: str, zip_info: Dict[str, Any], sha256: str = None) -> Optional[str]:
+    """
+    记录已完成的MinerU结果，供后续相同内容的上传直接复用
+
+    Args:
+        task_id: MinerU的task_id或batch_id（即结果目录名）
+        zip_info: download_and_extract_zip返回的路径信息
+        sha256: 文档内容哈希（可选，默认从待完成任务记录中查找）
+
+    Returns:
+        文档哈希；无法确定时返回None
+    """
+    sha256 = record_result(task_id, zip_info, sha256=sha256)
+    if not sha256:
+        logger.debug(f"任务 {task_id} 没有对应的文档哈希，只记录结果路径")
+        return None
+    logger.info(f"已索引MinerU结果: {sha256[:12]} -> {task_id}")
+    return sha256
+
+
+def _valid_entry(entry: Optional[Dict[str, Any]], rehydrate: bool = True) -> Optional[Dict[str, Any]]:
+    # 结果目录可能被手动删除，此时索引视为失效；本地没有的从存储后端下载
+    # rehydrate为True时按磁盘配额回收的结果从归档恢复；为False时只读取保留的layout产物，不恢复
+    if not entry or entry.get('state') != 'done':
+        return None
+    if rehydrate:
+        ensure_local_result(entry['task_id'])
+    elif is_evicted(entry['task_id']):
+        return entry
+    json_path = entry.get('json_path')
+    if not json_path or not stored_exists(json_path):
+        return None
+    return entry
+
+
+def _touched(entry: Optional[Dict[str, Any]], rehydrate: bool) -> Optional[Dict[str, Any]]:
+    # 不恢复结果目录时也记录访问时间（恢复时ensure_extracted已记录），常用文档不会被优先回收
+    if entry and not rehydrate:
+        touch(entry['task_id'])
+    return entry
+
+
+def lookup_document(sha256: str, rehydrate: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    按内容哈希查找已完成的MinerU结果
+
+    Args:
+        sha256: 文档内容哈希
+        rehydrate: 是否恢复按磁盘配额回收的结果目录（只读取layout时为False）
+
+    Returns:
+        索引条目；不存在或结果文件已丢失时返回None（本节点没有时查找共享存储后端）
+    """
+    entry = _valid_entry(get_document_task(sha256), rehydrate) or _valid_entry(import_remote_document(sha256), rehydrate)
+    return _touched(entry, rehydrate)
+
+
+def list_documents() -> List[Dict[str, Any]]:
+    """
+    列出所有已完成且结果文件仍存在的文档（已按磁盘配额回收的结果不恢复，也视为有效）
+
+    Returns:
+        索引条目列表（带sha256字段）
+    """
+    return [entry for entry in list_document_tasks() if _valid_entry(entry, rehydrate=False)]
+
+
+def lookup_task(task_id: str, rehydrate: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    按task_id/batch_id查找已完成的MinerU结果
+
+    Args:
+        task_id: MinerU的task_id或batch_id
+        rehydrate: 是否恢复按磁盘配额回收的结果目录（只读取layout时为False）
+
+    Returns:
+        索引条目（未关联文档哈希的旧任务sha256为None）；任务未完成或结果文件已丢失时返回None（本节点没有时查找共享存储后端）
+    """
+    entry = _valid_entry(get_task(task_id), rehydrate) or _valid_entry(import_remote_task(task_id), rehydrate)
+    return _touched(entry, rehydrate)
+
+
+def load_cached_result(entry: Dict[str, Any], include_mineru_data: bool = True) -> Dict[str, Any]:
+    """
+    读取索引条目对应的本地结果（MinerU原始数据和full.md）
+
+    Args:
+        entry: lookup_document/lookup_task返回的索引条目
+        include_mineru_data: 是否读取原始MinerU数据（不读取时为None）
+
+    Returns:
+        包含mineru_data和full_md的字典
+    """
+    mineru_data = None
+    if include_mineru_data:
+        mineru_data = read_stored_json(entry['json_path'])
+
+    full_md = None
+    full_md_path = entry.get('full_md_path')
+    if full_md_path and Path(full_md_path).exists():
+        full_md = Path(full_md_path).read_text(encoding='utf-8')
+
+    return {
+        "mineru_data": mineru_data,
+        "full_md": full_md
+    }
+
+
+def get_task_sha256(task_id: str) -> Optional[str]:
+    """
+    获取task_id/batch_id对应的文档内容哈希（无论任务是否完成）
+
+    Args:
+        task_id: MinerU的task_id或batch_id
+
+    Returns:
+        文档哈希；未记录时返回None
+    """
+    entry = get_task(task_id)
+    return entry.get('sha256') if entry else None
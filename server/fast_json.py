@@ -0,0 +1,158 @@
+"""
+快速JSON序列化模块：使用orjson（requirements.txt中的依赖），环境中没有时退回标准库json
+
+用于Flask的JSON响应（get_standard_response/jsonify）、SSE事件和layout等JSON产物的读写。
+输出统一为UTF-8（不转义非ASCII字符）；产物默认紧凑格式，JSON_COMPACT_ARTIFACTS=false时缩进便于调试。
+orjson不支持的对象（如超过64位的整数）自动改用标准库序列化，两者输出的JSON语义相同。
+"""
+import dataclasses
+import decimal
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Union
+
+from flask import current_app, has_app_context
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，未安装时使用标准库
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# 当前使用的JSON实现
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(obj: Any) -> Any:
+    # 两种实现都不支持的类型
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, Path):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    if hasattr(obj, 'item') and callable(obj.item):
+        # numpy标量
+        return obj.item()
+    if hasattr(obj, 'tolist') and callable(obj.tolist):
+        return obj.tolist()
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(obj: Any, indent: bool) -> str:
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2, default=_default)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_default)
+
+
+def dumps_bytes(obj: Any, indent: bool = False) -> bytes:
+    """
+    序列化为UTF-8编码的JSON
+
+    Args:
+        obj: 待序列化的对象
+        indent: 是否缩进（两个空格）
+
+    Returns:
+        JSON字节串
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default,
+                                option=_ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+        except TypeError:
+            pass
+    return _stdlib_dumps(obj, indent).encode('utf-8')
+
+
+def dumps(obj: Any, indent: bool = False) -> str:
+    """
+    序列化为JSON字符串（参数同dumps_bytes）
+    """
+    if orjson is not None:
+        return dumps_bytes(obj, indent).decode('utf-8')
+    return _stdlib_dumps(obj, indent)
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def artifacts_compact() -> bool:
+    if has_app_context():
+        return current_app.config.get('JSON_COMPACT_ARTIFACTS', True)
+    return True
+
+
+def dump_file(path, obj: Any, indent: bool = None, atomic: bool = False):
+    """
+    把对象写入JSON文件
+
+    Args:
+        path: 文件路径
+        obj: 待序列化的对象
+        indent: 是否缩进；为None时按JSON_COMPACT_ARTIFACTS配置
+        atomic: 是否先写临时文件再替换
+    """
+    if indent is None:
+        indent = not artifacts_compact()
+    path = Path(path)
+    data = dumps_bytes(obj, indent)
+    target = path.with_name(path.name + '.tmp') if atomic else path
+    with open(target, 'wb') as f:
+        f.write(data)
+    if atomic:
+        os.replace(target, path)
+
+
+def load_file(path) -> Any:
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+class FastJSONProvider(JSONProvider):
+    """
+    Flask的JSON提供者：jsonify直接生成字节串，不经过str再编码
+    """
+
+    mimetype = 'application/json'
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(obj, indent=bool(kwargs.get('indent')))
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        return loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
+
+
+def init_json(app):
+    """
+    为应用启用快速JSON提供者
+    """
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+    if orjson is None:
+        logger.warning("未安装orjson（见requirements.txt），JSON序列化使用标准库json")
+    else:
+        logger.debug(f"JSON序列化使用 {BACKEND}")
+
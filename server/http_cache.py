@@ -0,0 +1,106 @@
+"""
+HTTP缓存模块：为PDF、图片和MinerU文件生成基于内容哈希的强ETag，并设置缓存头
+
+按内容哈希命名的文件（上传的PDF、MinerU按哈希命名的图片）内容永不变化，可长期缓存（immutable）；
+其他文件的ETag为内容SHA256，按（路径、mtime、大小）在进程内缓存，文件不变时不重复计算。
+条件请求（If-None-Match/If-Modified-Since -> 304）和Range请求（206）由send_file处理。
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from flask import Response, request
+
+# 内容寻址文件的缓存时间（1年）
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# 计算哈希时每次读取的字节数
+CHUNK_SIZE = 1024 * 1024
+
+# 进程内最多缓存的文件哈希数
+MAX_CACHED_DIGESTS = 4096
+
+_CONTENT_HASH_NAME = re.compile(r'^[0-9a-f]{64}$')
+
+_digests: "OrderedDict[tuple, str]" = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+def is_content_addressed(path) -> bool:
+    """
+    文件名（不含扩展名）是否为SHA256哈希
+    """
+    return bool(_CONTENT_HASH_NAME.match(Path(path).name.split('.', 1)[0]))
+
+
+def file_etag(path) -> str:
+    """
+    计算文件的强ETag（内容SHA256）；按内容哈希命名的文件直接使用文件名中的哈希
+
+    Args:
+        path: 实际文件路径
+
+    Returns:
+        ETag值（不含引号）
+    """
+    path = Path(path)
+    if is_content_addressed(path):
+        return path.name.split('.', 1)[0]
+
+    stat = path.stat()
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    with _digests_lock:
+        digest = _digests.get(key)
+        if digest is not None:
+            _digests.move_to_end(key)
+            return digest
+
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    digest = hasher.hexdigest()
+
+    with _digests_lock:
+        _digests[key] = digest
+        while len(_digests) > MAX_CACHED_DIGESTS:
+            _digests.popitem(last=False)
+    return digest
+
+
+def apply_cache_headers(response: Response, immutable: bool = False) -> Response:
+    """
+    设置Cache-Control：内容寻址文件长期缓存，其他文件可以缓存但每次使用前须用ETag重新验证
+
+    Args:
+        response: 文件响应
+        immutable: 内容是否永不变化
+    """
+    if immutable:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def make_conditional_json(response: Response) -> Response:
+    """
+    为JSON响应添加基于内容的ETag，客户端缓存仍然有效时返回304
+
+    Args:
+        response: jsonify生成的响应
+
+    Returns:
+        原响应或304响应
+    """
+    response.set_etag(hashlib.sha256(response.get_data()).hexdigest())
+    apply_cache_headers(response)
+    return response.make_conditional(request)
@@ -0,0 +1,64 @@
+"""
+JSON序列化基准测试：在实际的layout或MinerU JSON文件上比较标准库json与fast_json的耗时
+
+用法: python -m server.json_benchmark data/mineru/<task_id>/layout.json --repeat 5
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict
+
+from server.fast_json import BACKEND, dumps_bytes, loads
+
+
+def _time_best(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def benchmark(data: Any, repeat: int = 5) -> Dict[str, float]:
+    """
+    对比标准库与当前实现的序列化耗时（毫秒，取多次中的最小值）
+
+    Args:
+        data: 待序列化的对象（如layout列表或MinerU原始JSON）
+        repeat: 重复次数
+
+    Returns:
+        各项耗时和输出大小
+    """
+    compact = dumps_bytes(data)
+    return {
+        # 原jsonify默认行为：ASCII转义并排序键
+        "stdlib_jsonify_ms": _time_best(lambda: json.dumps(data, ensure_ascii=True, sort_keys=True), repeat),
+        "stdlib_indent_ms": _time_best(lambda: json.dumps(data, ensure_ascii=False, indent=2), repeat),
+        "fast_dumps_ms": _time_best(lambda: dumps_bytes(data), repeat),
+        "stdlib_loads_ms": _time_best(lambda: json.loads(compact), repeat),
+        "fast_loads_ms": _time_best(lambda: loads(compact), repeat),
+        "indent_bytes": len(json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')),
+        "compact_bytes": len(compact),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON序列化基准测试')
+    parser.add_argument('path', help='layout或MinerU JSON文件（可为压缩存储的逻辑路径）')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    from server.stored_files import read_stored_json
+    data = read_stored_json(args.path)
+    results = benchmark(data, args.repeat)
+    print(f"JSON实现: {BACKEND}")
+    for key, value in results.items():
+        print(f"{key:>20}: {value:.2f}" if isinstance(value, float) else f"{key:>20}: {value}")
+    print(f"{'dumps_speedup':>20}: {results['stdlib_jsonify_ms'] / results['fast_dumps_ms']:.1f}x")
+    print(f"{'loads_speedup':>20}: {results['stdlib_loads_ms'] / results['fast_loads_ms']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""
+流式JSON读取模块：逐个解码大JSON文件中数组的元素，内存占用只与单个元素（一页）成正比
+基于标准库json.JSONDecoder.raw_decode实现，不依赖第三方库
+"""
+import json
+import re
+from typing import Any, Iterator, Optional, TextIO
+
+# 每次从文件读取的字符数
+READ_SIZE = 1 << 16
+
+_WHITESPACE = ' \t\n\r'
+
+# 跳过值时需要关注的字符：字符串外的括号和引号、字符串内的引号和转义符
+_STRUCTURAL = re.compile(r'["\[\]{}]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+# 可能是数字后续部分的字符（如缓冲区末尾的 "12." 或 "1e"）
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+
+
+class JsonStreamReader:
+    """
+    在文本流上按需读取JSON的增量解析器
+
+    只支持本项目需要的操作：进入对象/数组、逐个读取键或元素、跳过值。
+    缓冲区中已消费的部分会被及时丢弃。
+    """
+
+    def __init__(self, fp: TextIO, read_size: int = READ_SIZE):
+        self._fp = fp
+        self._read_size = read_size
+        self._buf = ''
+        self._pos = 0
+        # 已丢弃的字符数，用于计算绝对位置
+        self._offset = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, min_size: int = None) -> bool:
+        # 丢弃已消费的部分，再读取新数据
+        if self._eof:
+            return False
+        if self._pos:
+            self._buf = self._buf[self._pos:]
+            self._offset += self._pos
+            self._pos = 0
+        chunk = self._fp.read(max(self._read_size, min_size or 0))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf += chunk
+        return True
+
+    def peek(self) -> Optional[str]:
+        """
+        跳过空白并返回下一个字符（不消费）；到达文件末尾时返回None
+        """
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return None
+
+    def tell(self) -> int:
+        """
+        返回当前读取位置（从流开头算起的字符数，不跳过空白）
+        """
+        return self._offset + self._pos
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise json.JSONDecodeError(f"期望 {char!r}，实际为 {found!r}", self._buf, self._pos)
+        self._pos += 1
+
+    def read_value(self) -> Any:
+        """
+        解码下一个完整的JSON值；缓冲区不足时成倍读取更多数据后重试
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill(len(self._buf)):
+                    continue
+                raise
+            # 数字在缓冲区末尾结束时可能被截断（包括只读到小数点或指数符号），需读到更多数据再确认
+            if (not self._eof and isinstance(value, (int, float)) and _NUMBER_TAIL.fullmatch(self._buf, end)
+                    and self._fill(len(self._buf))):
+                continue
+            self._pos = end
+            return value
+
+    def skip_value(self):
+        """
+        跳过下一个JSON值而不解码：对象和数组只按括号深度和字符串边界扫描，
+        已扫描的部分随读随丢，内存占用与被跳过的值的大小无关
+        """
+        if self.peek() not in ('{', '[', '"'):
+            # 数字、true/false/null很短，直接解码
+            self.read_value()
+            return
+        depth = 0
+        in_string = False
+        while True:
+            if in_string:
+                match = _STRING_SPECIAL.search(self._buf, self._pos)
+                if match is None:
+                    self._pos = len(self._buf)
+                elif match.group() == '\\':
+                    if match.end() < len(self._buf):
+                        # 转义符和被转义的字符一起跳过
+                        self._pos = match.end() + 1
+                        continue
+                    # 转义符在缓冲区末尾，保留它等读入下一个字符
+                    self._pos = match.start()
+                else:
+                    self._pos = match.end()
+                    in_string = False
+                    if depth == 0:
+                        return
+                    continue
+            else:
+                match = _STRUCTURAL.search(self._buf, self._pos)
+                if match is None:
+                    self._pos = len(self._buf)
+                else:
+                    self._pos = match.end()
+                    char = match.group()
+                    if char == '"':
+                        in_string = True
+                    elif char in '{[':
+                        depth += 1
+                    else:
+                        depth -= 1
+                        if depth == 0:
+                            return
+                    continue
+            if not self._fill():
+                raise json.JSONDecodeError("JSON值未结束", self._buf, self._pos)
+
+    def iter_object_keys(self) -> Iterator[str]:
+        """
+        进入对象并逐个返回键；调用方必须在下一次迭代前读取或跳过对应的值
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self._pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise json.JSONDecodeError(f"对象中出现意外字符 {char!r}", self._buf, self._pos - 1)
+
+    def iter_array(self) -> Iterator[Any]:
+        """
+        进入数组并逐个解码返回元素
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.read_value()
+            char = self.peek()
+            self._pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise json.JSONDecodeError(f"数组中出现意外字符 {char!r}", self._buf, self._pos - 1)
@@ -0,0 +1,274 @@
+"""
+layout产物模块：每个MinerU结果文件只解析一次
+
+规范化后的layout以列式二进制格式保存在源JSON旁边，并记录源文件指纹（mtime、大小）、
+解析器版本和换算bbox所用的页面尺寸；进程内再用有界LRU缓存。源文件变化、解析器版本升级
+或页面尺寸变化时才重新解析。产物生成后源JSON按ARTIFACT_COMPRESSION压缩存储。
+源JSON按磁盘配额回收后，产物按元数据中记录的源文件指纹继续使用，不需要恢复源文件。
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from flask import current_app, has_app_context
+
+from server.catalog import record_artifact
+from server.columnar_layout import ColumnarLayout
+from server.mineru_parser import LAYOUT_PARSER_VERSION, PARALLEL_MIN_BYTES, parse_mineru_layout, parse_mineru_layout_file
+from server.page_geometry import load_page_sizes, normalize_layout
+from server.stored_files import compress_stored, get_compression_codec, resolve_stored
+
+logger = logging.getLogger(__name__)
+
+# 解析方式：mineru为四种MinerU格式的通用解析，pages为/api/layout使用的旧格式解析
+PARSERS: Dict[str, Callable[[str], List[Dict[str, Any]]]] = {
+    'mineru': parse_mineru_layout_file,
+    'pages': parse_mineru_layout
+}
+
+# 默认LRU容量（条目数）
+DEFAULT_CACHE_ENTRIES = 64
+
+
+def _fingerprint(source_path: Path) -> Tuple[int, int]:
+    # 源文件可能已压缩存储，按实际文件计算指纹
+    resolved = resolve_stored(source_path)[0]
+    if resolved is None:
+        raise FileNotFoundError(str(source_path))
+    stat = os.stat(resolved)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _source_fingerprint(source_path: Path, meta_path: Path) -> Tuple[int, int]:
+    # 源文件按磁盘配额回收后只保留layout产物：以元数据中记录的源文件指纹为准，不恢复源文件
+    try:
+        return _fingerprint(source_path)
+    except FileNotFoundError:
+        if not meta_path.exists():
+            raise
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return meta["source_mtime_ns"], meta["source_size"]
+
+
+def _page_sizes_digest(page_sizes: Optional[List[List[float]]]) -> Optional[str]:
+    if not page_sizes:
+        return None
+    return hashlib.sha1(json.dumps(page_sizes).encode('utf-8')).hexdigest()
+
+
+def get_artifact_paths(source_path: Path, kind: str = 'mineru') -> Tuple[Path, Path]:
+    """
+    获取layout产物及其元数据文件路径（与源文件位于同一目录）
+
+    Returns:
+        (产物路径, 元数据路径)
+    """
+    source_path = Path(source_path)
+    artifact = source_path.with_name(f"{source_path.name}.{kind}.layout")
+    return artifact, artifact.with_name(artifact.name + '.meta')
+
+
+class LayoutLRU:
+    """
+    进程内layout缓存：键为源文件路径，值为(指纹, ColumnarLayout)
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, fingerprint: tuple) -> Optional[ColumnarLayout]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != fingerprint:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, fingerprint: tuple, layout: ColumnarLayout):
+        with self._lock:
+            self._entries[key] = (fingerprint, layout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+_cache = LayoutLRU()
+
+
+def get_layout_cache() -> LayoutLRU:
+    """
+    获取进程内layout缓存（容量取自配置LAYOUT_CACHE_ENTRIES）
+    """
+    if has_app_context():
+        _cache.max_entries = current_app.config.get('LAYOUT_CACHE_ENTRIES', DEFAULT_CACHE_ENTRIES)
+    return _cache
+
+
+def _parse_source(source_path: Path, kind: str) -> List[Dict[str, Any]]:
+    if kind != 'mineru' or not has_app_context():
+        return PARSERS[kind](str(source_path))
+    # 大文件的pdf_info按页分段并行解析
+    max_workers = current_app.config.get('LAYOUT_PARSE_WORKERS') or os.cpu_count() or 1
+    min_mb = current_app.config.get('LAYOUT_PARSE_PARALLEL_MB')
+    min_bytes = int(min_mb * 1024 * 1024) if min_mb is not None else PARALLEL_MIN_BYTES
+    return parse_mineru_layout_file(str(source_path), max_workers=max_workers, parallel_min_bytes=min_bytes)
+
+
+def _read_artifact(artifact: Path, meta_path: Path, fingerprint: tuple, sizes_digest: Optional[str]) -> Optional[ColumnarLayout]:
+    if not artifact.exists() or not meta_path.exists():
+        return None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get("parser_version") != LAYOUT_PARSER_VERSION:
+            return None
+        if (meta.get("source_mtime_ns"), meta.get("source_size")) != fingerprint:
+            return None
+        if meta.get("page_sizes_digest") != sizes_digest:
+            return None
+        return ColumnarLayout.load(artifact)
+    except Exception as e:
+        logger.warning(f"读取layout产物失败，将重新解析: {e}")
+        return None
+
+
+def _write_meta(meta_path: Path, fingerprint: tuple, kind: str, layout: ColumnarLayout,
+                page_sizes: Optional[List[List[float]]]):
+    meta = {
+        "kind": kind,
+        "parser_version": LAYOUT_PARSER_VERSION,
+        "source_mtime_ns": fingerprint[0],
+        "source_size": fingerprint[1],
+        "block_count": len(layout),
+        # 有页面尺寸时bbox已换算为页面坐标（pt）
+        "coord_space": "page" if page_sizes else "source",
+        "page_sizes_digest": _page_sizes_digest(page_sizes),
+        "page_sizes": page_sizes
+    }
+    tmp_path = meta_path.with_name(meta_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def _compress_source(source_path: Path, kind: str, fingerprint: tuple) -> tuple:
+    # layout产物生成后，MinerU原始JSON只在需要原始数据时才读取，改为压缩存储
+    if kind != 'mineru' or not has_app_context() or not source_path.exists():
+        return fingerprint
+    codec = get_compression_codec()
+    if not codec:
+        return fingerprint
+    compress_stored(source_path, codec)
+    return _fingerprint(source_path)
+
+
+def get_layout_artifact(source_path, kind: str = 'mineru', sha256: str = None) -> ColumnarLayout:
+    """
+    获取源JSON对应的列式layout：依次查找进程内LRU、磁盘产物，都失效时才重新解析
+
+    Args:
+        source_path: MinerU JSON文件路径
+        kind: 解析方式（mineru或pages）
+        sha256: 文档内容哈希（提供时按该文档的页面尺寸把bbox换算为页面坐标）
+
+    Returns:
+        ColumnarLayout
+
+    Raises:
+        FileNotFoundError: 源文件不存在，且没有可用的layout产物
+    """
+    source_path = Path(source_path)
+    page_sizes = None
+    if sha256 and has_app_context() and current_app.config.get('LAYOUT_NORMALIZE_BBOX', True):
+        page_sizes = load_page_sizes(sha256)
+    sizes_digest = _page_sizes_digest(page_sizes)
+    artifact, meta_path = get_artifact_paths(source_path, kind)
+    fingerprint = _source_fingerprint(source_path, meta_path)
+    cache = get_layout_cache()
+    key = f"{kind}:{source_path.resolve()}"
+
+    layout = cache.get(key, fingerprint + (sizes_digest,))
+    if layout is not None:
+        return layout
+
+    layout = _read_artifact(artifact, meta_path, fingerprint, sizes_digest)
+    if layout is None:
+        if resolve_stored(source_path)[0] is None:
+            # 源文件已回收且产物失效（如页面尺寸变化），由调用方恢复结果目录后重试
+            raise FileNotFoundError(str(source_path))
+        logger.info(f"解析layout并生成产物: {source_path.name} ({kind})")
+        layout = normalize_layout(ColumnarLayout.from_dicts(_parse_source(source_path, kind)), page_sizes)
+        try:
+            layout.save(artifact)
+            fingerprint = _compress_source(source_path, kind, fingerprint)
+            _write_meta(meta_path, fingerprint, kind, layout, page_sizes)
+            if has_app_context():
+                record_artifact(artifact, source_path, kind, len(layout), sha256)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"保存layout产物失败: {e}")
+
+    cache.put(key, fingerprint + (sizes_digest,), layout)
+    return layout
+
+
+def load_columnar_file(path) -> Optional[ColumnarLayout]:
+    """
+    通过进程内LRU加载已有的列式layout文件（如本地PyMuPDF layout缓存）
+
+    Args:
+        path: 列式layout文件路径
+
+    Returns:
+        ColumnarLayout；文件不存在时返回None
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    fingerprint = _fingerprint(path)
+    cache = get_layout_cache()
+    key = f"file:{path.resolve()}"
+    layout = cache.get(key, fingerprint)
+    if layout is None:
+        layout = ColumnarLayout.load(path)
+        cache.put(key, fingerprint, layout)
+    return layout
+
+
+def load_layout(source_path, kind: str = 'mineru', sha256: str = None) -> List[Dict[str, Any]]:
+    """
+    获取源JSON对应的layout（字典列表，供API返回）
+
+    Args:
+        source_path: MinerU JSON文件路径
+        kind: 解析方式（mineru或pages）
+        sha256: 文档内容哈希（提供时bbox为页面坐标）
+
+    Returns:
+        layout列表
+    """
+    return get_layout_artifact(source_path, kind, sha256).to_dicts()
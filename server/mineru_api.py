@@ -2,7 +2,6 @@
 MinerU API调用模块：通过API调用MinerU服务解析PDF
 根据MinerU官方API文档实现
 """
-import json
 import logging
 import requests
 import time
@@ -12,6 +11,8 @@ from typing import Dict, Any, Optional, List
 from flask import current_app, url_for
 from pathlib import Path
 
+from server.stored_files import read_stored_json
+
 logger = logging.getLogger(__name__)
 
 
@@ -398,15 +399,16 @@ def parse_pdf_with_mineru_api(
         
         # 读取JSON文件
         json_path = zip_info['json_path']
-        with open(json_path, 'r', encoding='utf-8') as f:
-            mineru_data = json.load(f)
+        mineru_data = read_stored_json(json_path)
         
         return {
             "task_id": task_id,
             "state": "done",
             "mineru_data": mineru_data,
             "json_path": json_path,
-            "extract_dir": zip_info['extract_dir']
+            "extract_dir": zip_info['extract_dir'],
+            "full_md_path": zip_info.get('full_md_path'),
+            "images_dir": zip_info.get('images_dir')
         }
         
     except Exception as e:
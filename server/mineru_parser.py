@@ -1,13 +1,39 @@
 """
 MinerU JSON解析模块：将MinerU输出的JSON转换为layout.json格式
 """
+import itertools
 import json
 import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+
+from server.fast_json import dump_file
+from server.json_stream import JsonStreamReader
+from server.stored_files import open_stored, resolve_stored
 
 logger = logging.getLogger(__name__)
 
+# 解析器版本：规范化规则（字段、block_id生成方式等）变化时递增，已持久化的layout产物随之失效
+LAYOUT_PARSER_VERSION = 1
+
+# 文件达到该大小时，pdf_info按页分段交给进程池并行解析
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+
+# 查找分段点附近的页起点时，初始读取的字节数
+BOUNDARY_WINDOW = 1 << 20
+
+# 对象起点候选：字符串值以'{'结尾时（如LaTeX的"x^{"）也会出现'{"'，解码失败且不是被窗口截断时跳过该候选
+_OBJECT_START = re.compile(r'\{\s*"')
+
+# 各格式的解析耗时统计
+_parse_stats: Dict[str, Dict[str, Any]] = {}
+_parse_stats_lock = threading.Lock()
+
 
 def parse_mineru_layout(input_path: str, output_path: str = None) -> List[Dict[str, Any]]:
     """
@@ -21,36 +47,42 @@ def parse_mineru_layout(input_path: str, output_path: str = None) -> List[Dict[s
         包含页面、位置和文本的列表
     """
     try:
-        with open(input_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
         layout = []
         
-        # 遍历所有页面
-        for page in data.get("pages", []):
-            page_no = page.get("page_no", 0)
+        with open_stored(input_path, 'r') as f:
+            reader = JsonStreamReader(f)
+            if reader.peek() != '{':
+                raise json.JSONDecodeError("顶层不是JSON对象", "", 0)
             
-            # 遍历页面中的所有块
-            for block in page.get("blocks", []):
-                if block.get("type") == "text":
-                    # 合并所有行的文本
-                    lines = block.get("lines", [])
-                    text = " ".join([line.get("text", "") for line in lines if isinstance(line, dict)])
+            for key in reader.iter_object_keys():
+                if key != "pages":
+                    reader.skip_value()
+                    continue
+                
+                # 逐页解码，避免一次性加载整个文件
+                for page in reader.iter_array():
+                    page_no = page.get("page_no", 0)
                     
-                    if text.strip():  # 只添加非空文本块
-                        layout.append({
-                            "page": page_no,
-                            "bbox": block.get("bbox", [0, 0, 0, 0]),
-                            "text": text.strip(),
-                            "type": "text"
-                        })
+                    # 遍历页面中的所有块
+                    for block in page.get("blocks", []):
+                        if block.get("type") == "text":
+                            # 合并所有行的文本
+                            lines = block.get("lines", [])
+                            text = " ".join([line.get("text", "") for line in lines if isinstance(line, dict)])
+                            
+                            if text.strip():  # 只添加非空文本块
+                                layout.append({
+                                    "page": page_no,
+                                    "bbox": block.get("bbox", [0, 0, 0, 0]),
+                                    "text": text.strip(),
+                                    "type": "text"
+                                })
         
         # 如果指定了输出路径，保存结果
         if output_path:
             output_file = Path(output_path)
             output_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(layout, f, ensure_ascii=False, indent=2)
+            dump_file(output_file, layout)
             logger.info(f"Layout文件已保存到: {output_path}")
         
         logger.info(f"解析完成，共提取 {len(layout)} 个文本块")
@@ -66,3 +98,609 @@ def parse_mineru_layout(input_path: str, output_path: str = None) -> List[Dict[s
         logger.error(f"解析过程中发生错误: {e}", exc_info=True)
         raise
 
+
+def _block_id(block: dict, page_no: int, block_counter: int) -> str:
+    return (
+        block.get("block_id")
+        or block.get("id")
+        or block.get("uuid")
+        or f"p{page_no}_b{block_counter}"
+    )
+
+
+def _iter_pdf_info_page(page_data: dict) -> Iterator[Dict[str, Any]]:
+    # 格式1：pdf_info中的一页
+    # 获取页码（page_idx从0开始，前端需要从1开始）
+    page_idx = page_data.get("page_idx", 0)
+    page_no = page_idx + 1
+    
+    # 获取段落块
+    para_blocks = page_data.get("para_blocks", [])
+    if not para_blocks:
+        logger.debug(f"第{page_no}页没有para_blocks")
+        return
+    
+    logger.debug(f"第{page_no}页有 {len(para_blocks)} 个段落块")
+    
+    block_counter = 0
+    for block in para_blocks:
+        block_type = block.get("type", "")
+        
+        # 只处理text和title类型的块
+        if block_type not in ["text", "title"]:
+            continue
+        
+        # 获取bbox
+        bbox = block.get("bbox", [])
+        if not bbox or len(bbox) < 4:
+            continue
+        
+        # 从lines -> spans -> content中提取文本
+        text_parts = []
+        for line in block.get("lines", []):
+            if not isinstance(line, dict):
+                continue
+            for span in line.get("spans", []):
+                if isinstance(span, dict):
+                    content = span.get("content", "")
+                    if content:
+                        text_parts.append(content)
+        
+        # 合并文本
+        text = " ".join(text_parts).strip()
+        
+        if text:  # 只添加非空文本块
+            block_id = _block_id(block, page_no, block_counter)
+            block_counter += 1
+            yield {
+                "page": page_no,
+                "bbox": bbox,
+                "text": text,
+                "type": block_type,
+                "block_id": block_id
+            }
+
+
+def _iter_content_list(items: Iterable[dict]) -> Iterator[Dict[str, Any]]:
+    # 格式2：content_list中的文本块（编号在整个文档内连续）
+    block_counter = 0
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        text = (item.get("text") or "").strip()
+        if not text:
+            continue
+        
+        bbox = item.get("bbox", [])
+        if not bbox or len(bbox) < 4:
+            continue
+        
+        page_idx = item.get("page_idx", 0)
+        page_no = page_idx + 1
+        
+        block_type = item.get("type", "text")
+        if item.get("text_level") == 1:
+            block_type = "title"
+        
+        block_id = _block_id(item, page_no, block_counter)
+        block_counter += 1
+        yield {
+            "page": page_no,
+            "bbox": bbox,
+            "text": text,
+            "type": block_type,
+            "block_id": block_id
+        }
+
+
+def _iter_model_page(page_idx: int, page_blocks: list) -> Iterator[Dict[str, Any]]:
+    # 格式3：model.json中的一页
+    page_no = page_idx + 1
+    if not isinstance(page_blocks, list):
+        return
+    
+    block_counter = 0
+    for block in page_blocks:
+        if not isinstance(block, dict):
+            continue
+        
+        content = (block.get("content") or "").strip()
+        if not content:
+            continue
+        
+        bbox = block.get("bbox", [])
+        if not bbox or len(bbox) < 4:
+            continue
+        
+        # model.json中的bbox是相对坐标(0-1)，这里保持原样，
+        # 生成layout产物时由page_geometry按PDF页面尺寸换算为页面坐标
+        block_type = block.get("type", "text")
+        
+        block_id = _block_id(block, page_no, block_counter)
+        block_counter += 1
+        yield {
+            "page": page_no,
+            "bbox": bbox,
+            "text": content,
+            "type": block_type,
+            "block_id": block_id
+        }
+
+
+def _iter_legacy_page(page: dict) -> Iterator[Dict[str, Any]]:
+    # 格式4：旧格式pages中的一页
+    # 支持多种页码字段名
+    page_no = page.get("page_no") or page.get("page") or page.get("pageNo") or page.get("page_idx", 0) + 1
+    
+    blocks = page.get("blocks", [])
+    if not blocks:
+        logger.debug(f"第{page_no}页没有blocks")
+        return
+    
+    logger.debug(f"第{page_no}页有 {len(blocks)} 个块")
+    
+    block_counter = 0
+    for block_idx, block in enumerate(blocks):
+        block_type = block.get("type", "")
+        if block_type not in ["text", "title"]:
+            continue
+        
+        # 合并所有行的文本
+        lines = block.get("lines", [])
+        if not lines:
+            logger.debug(f"第{page_no}页第{block_idx}个文本块没有lines")
+            continue
+        
+        text_parts = []
+        for line in lines:
+            if isinstance(line, dict):
+                line_text = line.get("text", "") or line.get("content", "")
+                if line_text:
+                    text_parts.append(line_text)
+        
+        text = " ".join(text_parts).strip()
+        
+        if text:  # 只添加非空文本块
+            bbox = block.get("bbox") or block.get("bbox_coords") or [0, 0, 0, 0]
+            block_id = _block_id(block, page_no, block_counter)
+            block_counter += 1
+            yield {
+                "page": page_no,
+                "bbox": bbox,
+                "text": text,
+                "type": block_type,
+                "block_id": block_id
+            }
+
+
+def _is_content_list_item(item: Any) -> bool:
+    return isinstance(item, dict) and "text" in item and "page_idx" in item
+
+
+def iter_mineru_layout(mineru_data: Any) -> Iterator[Dict[str, Any]]:
+    """
+    逐个生成MinerU数据（已加载到内存）中的文本块，支持的格式与parse_mineru_layout_from_data相同
+    
+    Args:
+        mineru_data: MinerU返回的JSON数据
+    
+    Yields:
+        {"page": 1, "bbox": [...], "text": "...", "type": "text/title", "block_id": "..."}
+    """
+    if not mineru_data:
+        logger.warning("mineru_data为空")
+        return
+    
+    # 格式1: layout.json格式 - {"pdf_info": [...]}
+    if isinstance(mineru_data, dict) and "pdf_info" in mineru_data:
+        logger.info("检测到layout.json格式（pdf_info）")
+        pdf_info = mineru_data.get("pdf_info", [])
+        logger.info(f"开始解析，共 {len(pdf_info)} 页")
+        for page_data in pdf_info:
+            yield from _iter_pdf_info_page(page_data)
+        return
+    
+    if isinstance(mineru_data, list):
+        first_item = mineru_data[0]
+        # 格式2: content_list.json格式 - [{"text": "...", "bbox": [...], "page_idx": 0}, ...]
+        if _is_content_list_item(first_item):
+            logger.info("检测到content_list.json格式")
+            logger.info(f"开始解析，共 {len(mineru_data)} 个文本块")
+            yield from _iter_content_list(mineru_data)
+            return
+        
+        # 格式3: model.json格式 - [[{...}, ...], ...] (二维数组，第一维是页面)
+        if isinstance(first_item, list):
+            logger.info("检测到model.json格式（二维数组）")
+            logger.info(f"开始解析，共 {len(mineru_data)} 页")
+            for page_idx, page_blocks in enumerate(mineru_data):
+                yield from _iter_model_page(page_idx, page_blocks)
+            return
+    
+    # 格式4: 旧格式 - {"pages": [...]}
+    pages = mineru_data.get("pages", []) if isinstance(mineru_data, dict) else []
+    if pages:
+        logger.info("检测到旧格式（pages）")
+        logger.info(f"开始解析，共 {len(pages)} 页")
+        for page in pages:
+            yield from _iter_legacy_page(page)
+        return
+    
+    # 如果都不匹配，记录警告
+    logger.warning("未识别到支持的MinerU数据格式")
+    logger.debug(f"mineru_data keys/type: {list(mineru_data.keys()) if isinstance(mineru_data, dict) else type(mineru_data)}")
+    logger.debug(f"示例数据: {json.dumps(mineru_data if isinstance(mineru_data, dict) else (mineru_data[0] if isinstance(mineru_data, list) and len(mineru_data) > 0 else {}), ensure_ascii=False, indent=2)[:1000]}")
+
+
+def iter_mineru_layout_file(input_path: str, info: dict = None) -> Iterator[Dict[str, Any]]:
+    """
+    流式解析MinerU JSON文件，逐页解码并生成文本块，不构建完整的JSON树
+    
+    峰值内存只与单页（pdf_info/model/pages格式）或单个条目（content_list格式）成正比。
+    对象格式中以最先出现的pdf_info或pages数组为准，其余键直接跳过。
+    
+    Args:
+        input_path: MinerU输出的JSON文件路径
+        info: 可选，用于回传识别到的格式（info["format"]）
+    
+    Yields:
+        与iter_mineru_layout相同的文本块
+    """
+    info = info if info is not None else {}
+    with open_stored(input_path, 'r') as f:
+        reader = JsonStreamReader(f)
+        first_char = reader.peek()
+        
+        if first_char == '{':
+            for key in reader.iter_object_keys():
+                if key == "pdf_info" and reader.peek() == '[':
+                    logger.info("检测到layout.json格式（pdf_info），流式解析")
+                    info["format"] = "pdf_info"
+                    for page_data in reader.iter_array():
+                        if isinstance(page_data, dict):
+                            yield from _iter_pdf_info_page(page_data)
+                    return
+                if key == "pages" and reader.peek() == '[':
+                    logger.info("检测到旧格式（pages），流式解析")
+                    info["format"] = "pages"
+                    for page in reader.iter_array():
+                        if isinstance(page, dict):
+                            yield from _iter_legacy_page(page)
+                    return
+                reader.skip_value()
+        
+        elif first_char == '[':
+            items = reader.iter_array()
+            first_item = next(items, None)
+            if _is_content_list_item(first_item):
+                logger.info("检测到content_list.json格式，流式解析")
+                info["format"] = "content_list"
+                yield from _iter_content_list(itertools.chain([first_item], items))
+                return
+            if isinstance(first_item, list):
+                logger.info("检测到model.json格式（二维数组），流式解析")
+                info["format"] = "model"
+                for page_idx, page_blocks in enumerate(itertools.chain([first_item], items)):
+                    yield from _iter_model_page(page_idx, page_blocks)
+                return
+        
+        logger.warning(f"未识别到支持的MinerU数据格式: {input_path}")
+
+
+def _find_pdf_info_start(input_path: str) -> Optional[int]:
+    # 以latin-1读取时字符位置即字节位置，只用于定位顶层的pdf_info数组
+    with open(input_path, 'r', encoding='latin-1') as f:
+        reader = JsonStreamReader(f)
+        if reader.peek() != '{':
+            return None
+        for key in reader.iter_object_keys():
+            if key == "pdf_info" and reader.peek() == '[':
+                return reader.tell()
+            reader.skip_value()
+    return None
+
+
+def _is_pdf_info_page(value: Any) -> bool:
+    return isinstance(value, dict) and "page_idx" in value and ("para_blocks" in value or "preproc_blocks" in value)
+
+
+def _is_truncated(error: json.JSONDecodeError, text: str) -> bool:
+    # 解码到缓冲区末尾才出错，或字符串一直延续到末尾，说明对象被读取窗口截断
+    return error.pos >= len(text) - 1 or error.msg.startswith('Unterminated string')
+
+
+def _find_page_start(f, offset: int) -> Optional[int]:
+    """
+    查找offset之后pdf_info中下一页的起始字节位置
+    
+    依次试解码offset之后的每个对象：是页对象则返回其位置，否则跳过整个对象继续查找。
+    对象被读取窗口截断时扩大窗口重试；候选位置不是真正的对象起点（位于字符串内）时跳过该候选。
+    """
+    decoder = json.JSONDecoder()
+    window = BOUNDARY_WINDOW
+    pos = 0
+    while True:
+        f.seek(offset)
+        raw = f.read(window)
+        at_eof = len(raw) < window
+        text = raw.decode('latin-1')
+        truncated = False
+        while True:
+            match = _OBJECT_START.search(text, pos)
+            if not match:
+                break
+            try:
+                value, end = decoder.raw_decode(text, match.start())
+            except json.JSONDecodeError as e:
+                if not at_eof and _is_truncated(e, text):
+                    truncated = True
+                    pos = match.start()
+                    break
+                pos = match.end()
+                continue
+            if _is_pdf_info_page(value):
+                return offset + match.start()
+            pos = end
+        if at_eof:
+            return None
+        if truncated:
+            window *= 2
+        else:
+            # 窗口内已没有对象起点，保留少量重叠后继续向后读取
+            offset += max(pos, len(text) - 16)
+            pos = 0
+
+
+def _parse_pdf_info_range(input_path: str, start: int, end: Optional[int]) -> List[Dict[str, Any]]:
+    """
+    解析pdf_info数组中[start, end)字节范围内的若干页（在子进程中运行）
+    
+    Args:
+        input_path: MinerU JSON文件路径
+        start: 第一页的起始字节位置
+        end: 下一段第一页的起始字节位置（None表示读到数组末尾）
+    
+    Returns:
+        这几页的文本块
+    """
+    with open(input_path, 'rb') as f:
+        f.seek(start)
+        raw = f.read(end - start) if end is not None else f.read()
+    text = raw.decode('utf-8')
+    decoder = json.JSONDecoder()
+    layout = []
+    pos = 0
+    length = len(text)
+    while True:
+        while pos < length and text[pos] in ' \t\n\r,':
+            pos += 1
+        if pos >= length or text[pos] == ']':
+            break
+        page_data, pos = decoder.raw_decode(text, pos)
+        if isinstance(page_data, dict):
+            layout.extend(_iter_pdf_info_page(page_data))
+    return layout
+
+
+def parse_pdf_info_parallel(input_path: str, max_workers: int) -> Optional[List[Dict[str, Any]]]:
+    """
+    按页把pdf_info分段，用进程池并行解析，按文件顺序合并（结果与串行解析完全一致）
+    
+    Args:
+        input_path: MinerU JSON文件路径
+        max_workers: 进程数
+    
+    Returns:
+        layout列表；不是pdf_info格式或无法分段时返回None
+    """
+    array_start = _find_pdf_info_start(input_path)
+    if array_start is None:
+        return None
+    
+    size = os.path.getsize(input_path)
+    starts = [array_start + 1]
+    with open(input_path, 'rb') as f:
+        for part in range(1, max_workers):
+            split = array_start + (size - array_start) * part // max_workers
+            page_start = _find_page_start(f, max(split, starts[-1] + 1))
+            # 该分段点之后找不到页起点时只放弃这一个分段点
+            if page_start is not None and page_start > starts[-1]:
+                starts.append(page_start)
+    if len(starts) < 2:
+        return None
+    
+    ends = starts[1:] + [None]
+    logger.info(f"pdf_info按页分为 {len(starts)} 段，使用进程池并行解析")
+    with ProcessPoolExecutor(max_workers=len(starts)) as executor:
+        results = executor.map(_parse_pdf_info_range, [input_path] * len(starts), starts, ends)
+        return [block for part in results for block in part]
+
+
+def _record_parse_time(fmt: str, mode: str, elapsed: float, block_count: int):
+    with _parse_stats_lock:
+        stats = _parse_stats.setdefault(fmt, {"count": 0, "parallel_count": 0, "blocks": 0, "seconds": 0.0, "max_seconds": 0.0})
+        stats["count"] += 1
+        stats["parallel_count"] += 1 if mode == "parallel" else 0
+        stats["blocks"] += block_count
+        stats["seconds"] += elapsed
+        stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+
+def get_parse_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    返回各格式的解析耗时统计（次数、并行次数、块数、总耗时、平均和最长耗时）
+    """
+    with _parse_stats_lock:
+        return {
+            fmt: {**stats, "avg_seconds": round(stats["seconds"] / stats["count"], 4) if stats["count"] else 0}
+            for fmt, stats in _parse_stats.items()
+        }
+
+
+def parse_mineru_layout_file(input_path: str, max_workers: int = None,
+                             parallel_min_bytes: int = PARALLEL_MIN_BYTES) -> List[Dict[str, Any]]:
+    """
+    流式解析MinerU JSON文件得到layout（只需要layout、不需要原始数据时使用）
+    
+    大文件的pdf_info格式按页分段并行解析，小文件、其他格式和压缩存储的文件在当前线程中串行（流式解压）解析。
+    
+    Args:
+        input_path: MinerU输出的JSON文件路径
+        max_workers: 并行解析的进程数（为空或1时只串行解析）
+        parallel_min_bytes: 文件达到该大小时才并行解析
+    
+    Returns:
+        与parse_mineru_layout_from_data相同格式的列表
+    """
+    start_time = time.perf_counter()
+    info = {}
+    layout = None
+    
+    resolved, encoding = resolve_stored(input_path)
+    if resolved is None:
+        raise FileNotFoundError(input_path)
+    
+    # 分段需要按字节随机读取，只对未压缩文件并行
+    if max_workers and max_workers > 1 and encoding is None and os.path.getsize(resolved) >= parallel_min_bytes:
+        try:
+            layout = parse_pdf_info_parallel(input_path, max_workers)
+        except Exception as e:
+            logger.warning(f"并行解析失败，改为串行解析: {e}")
+            layout = None
+        if layout is not None:
+            info = {"format": "pdf_info", "mode": "parallel"}
+    
+    if layout is None:
+        layout = list(iter_mineru_layout_file(input_path, info))
+        info["mode"] = "serial"
+    
+    elapsed = time.perf_counter() - start_time
+    fmt = info.get("format", "unknown")
+    _record_parse_time(fmt, info["mode"], elapsed, len(layout))
+    logger.info(f"解析完成，共提取 {len(layout)} 个文本块（{fmt}，{'并行' if info['mode'] == 'parallel' else '串行'}，耗时 {elapsed:.2f}秒）")
+    return layout
+
+
+def parse_mineru_layout_from_data(mineru_data: dict) -> list:
+    """
+    从MinerU JSON数据中解析layout
+    
+    支持多种格式：
+    1. layout.json格式：{"pdf_info": [{"para_blocks": [...], "page_idx": 0}, ...]}
+    2. content_list.json格式：[{"text": "...", "bbox": [...], "page_idx": 0}, ...]
+    3. model.json格式：[[{"type": "...", "content": "...", "bbox": [...]}, ...], ...]
+    4. 旧格式：{"pages": [{"blocks": [...], "page_no": 1}, ...]}
+    
+    Args:
+        mineru_data: MinerU返回的JSON数据
+    
+    Returns:
+        包含页面、位置和文本的列表，格式：[{"page": 1, "bbox": [x1, y1, x2, y2], "text": "...", "type": "text/title"}, ...]
+    """
+    try:
+        layout = list(iter_mineru_layout(mineru_data))
+    except Exception as e:
+        logger.error(f"解析MinerU数据失败: {e}", exc_info=True)
+        return []
+    
+    if mineru_data:
+        logger.info(f"解析完成，共提取 {len(layout)} 个文本块")
+    return layout
+
+
+def _global_page(pages: List[int], local_idx: int) -> int:
+    """
+    将分片内的页码索引（从0开始）映射为原文档中的页码（从1开始）
+    """
+    if local_idx < len(pages):
+        return pages[local_idx]
+    # 分片返回的页数多于预期时，顺延最后一页
+    return pages[-1] + (local_idx - len(pages) + 1) if pages else local_idx + 1
+
+
+def merge_mineru_data(parts: List[tuple]) -> Any:
+    """
+    合并多个分片的MinerU JSON数据，并将页码换算为原文档页码
+    
+    支持parse_mineru_layout_from_data识别的四种格式，合并结果与第一个分片格式一致。
+    页码换算后，parse_mineru_layout_from_data生成的block_id（p{page}_b{n}）也随之使用原文档页码。
+    
+    Args:
+        parts: [(pages, mineru_data), ...]，pages为该分片各页对应的原文档页码列表（从1开始）
+    
+    Returns:
+        合并后的MinerU JSON数据
+    """
+    parts = [(pages, data) for pages, data in parts if data]
+    if not parts:
+        return {}
+    
+    first = parts[0][1]
+    
+    # 格式1: layout.json格式 - {"pdf_info": [...]}
+    if isinstance(first, dict) and "pdf_info" in first:
+        merged_pages = []
+        for pages, data in parts:
+            for i, page_data in enumerate(data.get("pdf_info", [])):
+                local_idx = page_data.get("page_idx", i)
+                merged_pages.append({**page_data, "page_idx": _global_page(pages, local_idx) - 1})
+        merged_pages.sort(key=lambda p: p["page_idx"])
+        return {**first, "pdf_info": merged_pages}
+    
+    if isinstance(first, list) and first:
+        # 格式2: content_list.json格式
+        if isinstance(first[0], dict):
+            merged_items = []
+            for pages, data in parts:
+                for item in data:
+                    if isinstance(item, dict):
+                        page_no = _global_page(pages, item.get("page_idx", 0))
+                        merged_items.append({**item, "page_idx": page_no - 1})
+            merged_items.sort(key=lambda item: item["page_idx"])
+            return merged_items
+        
+        # 格式3: model.json格式 - 按位置表示页码，缺失的页用空列表占位
+        if isinstance(first[0], list):
+            page_map = {}
+            for pages, data in parts:
+                for local_idx, page_blocks in enumerate(data):
+                    page_map[_global_page(pages, local_idx)] = page_blocks
+            total = max(page_map) if page_map else 0
+            return [page_map.get(page_no, []) for page_no in range(1, total + 1)]
+    
+    # 格式4: 旧格式 - {"pages": [...]}
+    if isinstance(first, dict) and "pages" in first:
+        merged_pages = []
+        for pages, data in parts:
+            for i, page in enumerate(data.get("pages", [])):
+                local_no = page.get("page_no") or page.get("page") or page.get("pageNo") or page.get("page_idx", i) + 1
+                merged_pages.append({**page, "page_no": _global_page(pages, local_no - 1)})
+        merged_pages.sort(key=lambda p: p["page_no"])
+        return {**first, "pages": merged_pages}
+    
+    logger.warning("未识别到支持的MinerU数据格式，仅返回第一个分片")
+    return first
+
+
+def layout_to_pdf_info(layout: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    将layout列表转换为layout.json（pdf_info）格式，便于与MinerU结果合并保存
+    
+    Args:
+        layout: layout列表
+    
+    Returns:
+        {"pdf_info": [...]}格式的数据
+    """
+    pages = {}
+    for block in layout:
+        page_no = block.get("page", 1)
+        page_data = pages.setdefault(page_no, {"page_idx": page_no - 1, "para_blocks": []})
+        if block.get("page_size"):
+            page_data["page_size"] = block["page_size"]
+        page_data["para_blocks"].append({
+            "type": block.get("type", "text"),
+            "bbox": block.get("bbox", [0, 0, 0, 0]),
+            "lines": [{"spans": [{"type": "text", "content": block.get("text", "")}]}]
+        })
+    return {"pdf_info": [pages[page_no] for page_no in sorted(pages)]}
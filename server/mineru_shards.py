@@ -0,0 +1,527 @@
+"""
+MinerU分片解析模块：将PDF按页拆分为多个子任务并发提交，并合并结果
+- 超大PDF按固定页数分片，已完成的分片可以先行阅读
+- 选择性OCR：只有扫描页/图片页提交MinerU，其余页使用本地PyMuPDF解析结果
+"""
+import logging
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Optional, List
+from flask import current_app
+
+from server.fast_json import dump_file, load_file
+from server.mineru_api import get_file_upload_urls, upload_file_to_url, download_and_extract_zip
+from server.mineru_parser import merge_mineru_data, layout_to_pdf_info, parse_mineru_layout_from_data
+from server.pdf_local import load_local_layout, layout_to_markdown, classify_pages
+from server.stored_files import read_stored_json
+
+logger = logging.getLogger(__name__)
+
+# 分片清单文件名（位于MINERU_FOLDER/<batch_id>下）
+MANIFEST_FILENAME = 'shards.json'
+
+# 合并结果时的互斥锁，避免并发轮询重复下载同一分片
+_merge_lock = threading.Lock()
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """
+    获取PDF页数
+
+    Args:
+        pdf_path: PDF文件路径
+
+    Returns:
+        页数
+    """
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def plan_page_shards(total_pages: int, shard_size: int) -> List[List[int]]:
+    """
+    按固定页数规划分片
+
+    Args:
+        total_pages: 总页数
+        shard_size: 每个分片的页数
+
+    Returns:
+        每个分片包含的页码列表（从1开始）
+    """
+    shard_size = max(1, shard_size)
+    return [
+        list(range(start, min(start + shard_size, total_pages + 1)))
+        for start in range(1, total_pages + 1, shard_size)
+    ]
+
+
+def split_pdf_pages(pdf_path: str, pages: List[int], output_path: Path) -> Path:
+    """
+    将指定页拷贝为一个独立的PDF文件
+
+    Args:
+        pdf_path: 源PDF路径
+        pages: 页码列表（从1开始）
+        output_path: 输出路径
+
+    Returns:
+        输出路径
+    """
+    import fitz  # PyMuPDF
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with fitz.open(pdf_path) as src, fitz.open() as dst:
+        for page_no in pages:
+            dst.insert_pdf(src, from_page=page_no - 1, to_page=page_no - 1)
+        dst.save(str(output_path), garbage=3, deflate=True)
+    return output_path
+
+
+def should_shard(pdf_path: str, requested: Optional[str] = None) -> bool:
+    """
+    判断是否对PDF启用分片解析
+
+    Args:
+        pdf_path: PDF文件路径
+        requested: 请求参数sharded的取值（'true'/'false'/None）
+
+    Returns:
+        是否分片
+    """
+    if requested is not None and requested != '':
+        return requested.lower() == 'true'
+
+    threshold = current_app.config.get('MINERU_SHARD_THRESHOLD_PAGES', 0)
+    if not threshold or not str(pdf_path).lower().endswith('.pdf'):
+        return False
+    try:
+        return count_pdf_pages(pdf_path) > threshold
+    except Exception as e:
+        logger.warning(f"读取PDF页数失败，不启用分片: {e}")
+        return False
+
+
+def get_manifest_path(batch_id: str) -> Path:
+    return Path(current_app.config['MINERU_FOLDER']) / batch_id / MANIFEST_FILENAME
+
+
+def load_shard_manifest(batch_id: str) -> Optional[Dict[str, Any]]:
+    """
+    读取分片清单
+
+    Args:
+        batch_id: 批量任务ID
+
+    Returns:
+        分片清单；不是分片任务时返回None
+    """
+    manifest_path = get_manifest_path(batch_id)
+    if not manifest_path.exists():
+        return None
+    return load_file(manifest_path)
+
+
+def save_shard_manifest(batch_id: str, manifest: Dict[str, Any]):
+    manifest_path = get_manifest_path(batch_id)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    dump_file(manifest_path, manifest, atomic=True)
+
+
+def submit_sharded_parse(
+    pdf_path: str,
+    filename: str,
+    sha256: str = None,
+    model_version: str = None,
+    shards: List[List[int]] = None,
+    shard_options: List[Dict[str, Any]] = None,
+    local_pages: List[int] = None
+) -> Dict[str, Any]:
+    """
+    将PDF按页拆分为多个分片，通过批量上传接口并发提交到MinerU
+
+    Args:
+        pdf_path: 本地PDF路径
+        filename: 原始文件名
+        sha256: 文档内容哈希（可选，用于data_id和去重索引）
+        model_version: 模型版本
+        shards: 自定义分片页码列表（可选，默认按MINERU_SHARD_SIZE_PAGES规划）
+        shard_options: 每个分片额外的MinerU文件参数（可选，如is_ocr）
+        local_pages: 不提交MinerU、使用本地layout的页码列表（可选）
+
+    Returns:
+        分片清单
+    """
+    total_pages = count_pdf_pages(pdf_path)
+    if shards is None:
+        shard_size = current_app.config.get('MINERU_SHARD_SIZE_PAGES', 50)
+        shards = plan_page_shards(total_pages, shard_size)
+
+    stem = filename.rsplit('.', 1)[0] if '.' in filename else filename
+    doc_key = sha256 or f"{stem}_{int(time.time())}"
+    shard_dir = Path(current_app.config['UPLOAD_FOLDER']) / 'shards' / doc_key
+
+    # 拆分PDF
+    shard_entries = []
+    for idx, pages in enumerate(shards):
+        shard_path = split_pdf_pages(pdf_path, pages, shard_dir / f"part{idx}.pdf")
+        shard_entries.append({
+            "index": idx,
+            "pages": pages,
+            "name": f"{stem}_part{idx}.pdf",
+            "data_id": f"{doc_key[:64]}_s{idx}",
+            "options": shard_options[idx] if shard_options else {},
+            "path": str(shard_path),
+            "state": "pending"
+        })
+    logger.info(f"PDF已拆分为 {len(shard_entries)} 个分片，共 {total_pages} 页")
+
+    # 一次性申请所有分片的上传URL
+    files_data = [
+        {"name": entry["name"], "data_id": entry["data_id"], **entry["options"]}
+        for entry in shard_entries
+    ]
+    upload_info = get_file_upload_urls(files_data, model_version)
+    upload_urls = upload_info.get('file_urls', [])
+    batch_id = upload_info.get('batch_id')
+    if len(upload_urls) != len(shard_entries):
+        raise Exception(f"上传URL数量({len(upload_urls)})与分片数量({len(shard_entries)})不一致")
+
+    # 并发上传分片，MinerU会并行解析同一批次中的文件
+    max_workers = min(len(shard_entries), current_app.config.get('MINERU_SHARD_UPLOAD_WORKERS', 4))
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [
+            executor.submit(upload_file_to_url, entry["path"], url)
+            for entry, url in zip(shard_entries, upload_urls)
+        ]
+        for future in futures:
+            future.result()
+
+    manifest = {
+        "batch_id": batch_id,
+        "filename": filename,
+        "sha256": sha256,
+        "total_pages": total_pages,
+        "shards": shard_entries,
+        "local_pages": local_pages or [],
+        "created_at": int(time.time())
+    }
+    save_shard_manifest(batch_id, manifest)
+    logger.info(f"分片任务已提交: batch_id={batch_id}, 分片数={len(shard_entries)}")
+    return manifest
+
+
+def _merge_images(src_dir: Path, dst_dir: Path):
+    # MinerU的图片以内容哈希命名，不同分片之间不会冲突
+    if not src_dir.exists():
+        return
+    dst_dir.mkdir(parents=True, exist_ok=True)
+    for image in src_dir.iterdir():
+        target = dst_dir / image.name
+        if image.is_file() and not target.exists():
+            shutil.copy2(image, target)
+
+
+def _contiguous_runs(pages: List[int]) -> List[List[int]]:
+    runs = []
+    for page_no in sorted(pages):
+        if runs and runs[-1][-1] == page_no - 1:
+            runs[-1].append(page_no)
+        else:
+            runs.append([page_no])
+    return runs
+
+
+def _write_merged_output(batch_dir: Path, ready: List[Dict[str, Any]], local_layout: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    合并已完成分片（以及本地解析页）的JSON、full.md和图片，写入batch目录
+    """
+    parts = []
+    md_parts = []
+    for entry in ready:
+        data = read_stored_json(entry["json_path"])
+        if local_layout and not (isinstance(data, dict) and "pdf_info" in data):
+            # 与本地结果合并时统一转换为pdf_info格式
+            data = layout_to_pdf_info(parse_mineru_layout_from_data(data))
+        parts.append((entry["pages"], data))
+        full_md_path = entry.get("full_md_path")
+        if full_md_path and Path(full_md_path).exists():
+            md_parts.append((entry["pages"][0], Path(full_md_path).read_text(encoding='utf-8').strip('\n')))
+        if entry.get("images_dir"):
+            _merge_images(Path(entry["images_dir"]), batch_dir / 'images')
+
+    if local_layout:
+        local_pages = sorted({block["page"] for block in local_layout})
+        # 本地页使用原文档页码，排在最前面保证合并结果为pdf_info格式
+        parts.insert(0, (list(range(1, max(local_pages) + 1)), layout_to_pdf_info(local_layout)))
+        for run in _contiguous_runs(local_pages):
+            run_blocks = [block for block in local_layout if run[0] <= block["page"] <= run[-1]]
+            md_parts.append((run[0], layout_to_markdown(run_blocks)))
+
+    merged_data = merge_mineru_data(parts)
+    json_path = batch_dir / 'layout.json'
+    dump_file(json_path, merged_data)
+
+    # full.md没有页码标记，按各部分的起始页排列
+    md_parts.sort(key=lambda part: part[0])
+    full_md_path = batch_dir / 'full.md'
+    full_md_path.write_text('\n\n'.join(text for _, text in md_parts), encoding='utf-8')
+
+    images_dir = batch_dir / 'images'
+    return {
+        "mineru_data": merged_data,
+        "json_path": str(json_path),
+        "extract_dir": str(batch_dir),
+        "full_md_path": str(full_md_path),
+        "images_dir": str(images_dir) if images_dir.exists() else None
+    }
+
+
+def remove_shard_files(manifest: Dict[str, Any]):
+    """
+    删除上传到MinerU的分片PDF（位于UPLOAD_FOLDER/shards/<doc_key>下，只在提交时使用）
+
+    Args:
+        manifest: 分片清单
+    """
+    shard_dirs = set()
+    for entry in manifest["shards"]:
+        path = Path(entry.get("path") or '')
+        if entry.get("path") and path.exists():
+            path.unlink()
+            shard_dirs.add(path.parent)
+    for shard_dir in shard_dirs:
+        try:
+            shard_dir.rmdir()
+        except OSError:
+            # 同一文档的其他分片任务仍在使用该目录
+            pass
+    if shard_dirs:
+        logger.info(f"已删除分片PDF: {manifest.get('batch_id')}")
+
+
+def collect_sharded_result(batch_id: str, manifest: Dict[str, Any], extract_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    下载已完成的分片，并合并所有已完成分片（以及本地解析页），不要求从第一页开始连续
+
+    全部分片完成或失败后删除上传用的分片PDF
+
+    Args:
+        batch_id: 批量任务ID
+        manifest: 分片清单
+        extract_results: MinerU批量查询返回的extract_result列表
+
+    Returns:
+        包含state、extract_progress、shards和合并结果路径的字典
+    """
+    batch_dir = Path(current_app.config['MINERU_FOLDER']) / batch_id
+    results_by_id = {item.get('data_id'): item for item in extract_results if item.get('data_id')}
+    results_by_name = {item.get('file_name'): item for item in extract_results}
+
+    with _merge_lock:
+        changed = False
+        extracted_pages = 0
+        err_msgs = []
+
+        for entry in manifest["shards"]:
+            item = results_by_id.get(entry["data_id"]) or results_by_name.get(entry["name"]) or {}
+            state = item.get('state', entry["state"])
+
+            if state == 'done' and entry["state"] != 'done':
+                zip_url = item.get('full_zip_url')
+                if zip_url:
+                    zip_info = download_and_extract_zip(zip_url, batch_dir / 'shards' / str(entry["index"]))
+                    entry.update({
+                        "state": "done",
+                        "json_path": zip_info.get('json_path'),
+                        "full_md_path": zip_info.get('full_md_path'),
+                        "images_dir": zip_info.get('images_dir')
+                    })
+                    changed = True
+            elif state != entry["state"] and entry["state"] != 'done':
+                entry["state"] = state
+                changed = True
+
+            if entry["state"] == 'done':
+                extracted_pages += len(entry["pages"])
+            else:
+                progress = item.get('extract_progress') or {}
+                extracted_pages += progress.get('extracted_pages', 0)
+            if entry["state"] == 'failed':
+                err_msgs.append(f"分片{entry['index']}: {item.get('err_msg', '解析失败')}")
+
+        # 已完成的分片和本地解析页都可以先行阅读
+        ready = [entry for entry in manifest["shards"] if entry["state"] == 'done']
+        local_pages = set(manifest.get("local_pages") or [])
+        local_layout = None
+        if local_pages:
+            local_layout = [
+                block for block in (load_local_layout(manifest.get("sha256")) or [])
+                if block.get("page") in local_pages
+            ]
+
+        readable_pages = sum(len(entry["pages"]) for entry in ready) + len(local_pages)
+        merged = None
+        has_output = bool(ready or local_layout)
+        if has_output and (changed or manifest.get("readable_pages") != readable_pages):
+            merged = _write_merged_output(batch_dir, ready, local_layout)
+            manifest["readable_pages"] = readable_pages
+            changed = True
+        elif has_output:
+            merged = {
+                "json_path": str(batch_dir / 'layout.json'),
+                "extract_dir": str(batch_dir),
+                "full_md_path": str(batch_dir / 'full.md'),
+                "images_dir": str(batch_dir / 'images') if (batch_dir / 'images').exists() else None
+            }
+
+        if changed:
+            save_shard_manifest(batch_id, manifest)
+
+    states = [entry["state"] for entry in manifest["shards"]]
+    if all(state == 'done' for state in states):
+        overall_state = 'done'
+    elif any(state == 'failed' for state in states):
+        overall_state = 'failed'
+    elif any(state in ('running', 'converting', 'done') for state in states):
+        overall_state = 'running'
+    else:
+        overall_state = states[0] if states else 'pending'
+
+    if states and all(state in ('done', 'failed') for state in states):
+        remove_shard_files(manifest)
+
+    return {
+        "state": overall_state,
+        "err_msg": '; '.join(err_msgs),
+        "extract_progress": {
+            "extracted_pages": extracted_pages,
+            "total_pages": manifest["total_pages"]
+        },
+        "readable_pages": readable_pages,
+        "local_pages": sorted(local_pages),
+        "shards": [
+            {"index": entry["index"], "pages": [entry["pages"][0], entry["pages"][-1]], "state": entry["state"]}
+            for entry in manifest["shards"]
+        ],
+        "merged": merged
+    }
+
+
+def should_route_ocr(requested: Optional[str] = None) -> bool:
+    """
+    判断是否启用选择性OCR路由
+
+    Args:
+        requested: 请求参数routing的取值（'selective'/'full'/None）
+
+    Returns:
+        是否启用
+    """
+    if requested:
+        return requested.lower() == 'selective'
+    return current_app.config.get('MINERU_SELECTIVE_OCR', False)
+
+
+def plan_ocr_routing(pdf_path: str) -> Dict[str, Any]:
+    """
+    预扫描PDF，确定哪些页需要提交MinerU
+
+    Args:
+        pdf_path: PDF文件路径
+
+    Returns:
+        包含scanned_pages、figure_pages和local_pages的字典
+    """
+    classes = classify_pages(
+        pdf_path,
+        min_text_chars=current_app.config.get('OCR_ROUTING_MIN_TEXT_CHARS', 50),
+        image_ratio_threshold=current_app.config.get('OCR_ROUTING_IMAGE_RATIO', 0.5)
+    )
+    routing = {
+        "scanned_pages": [item["page"] for item in classes if item["kind"] == "scanned"],
+        "figure_pages": [item["page"] for item in classes if item["kind"] == "figure"],
+        "local_pages": [item["page"] for item in classes if item["kind"] == "text"]
+    }
+    logger.info(
+        f"页面预扫描: 文本页 {len(routing['local_pages'])}，"
+        f"扫描页 {len(routing['scanned_pages'])}，图片页 {len(routing['figure_pages'])}"
+    )
+    return routing
+
+
+def submit_selective_parse(
+    pdf_path: str,
+    filename: str,
+    sha256: str,
+    model_version: str = None,
+    routing: Dict[str, Any] = None
+) -> Dict[str, Any]:
+    """
+    只将扫描页和图片页提交MinerU（扫描页开启is_ocr），文本页使用本地解析结果
+
+    Args:
+        pdf_path: 本地PDF路径
+        filename: 原始文件名
+        sha256: 文档内容哈希（本地layout按此缓存）
+        model_version: 模型版本
+        routing: plan_ocr_routing的结果（可选）
+
+    Returns:
+        分片清单
+    """
+    routing = routing or plan_ocr_routing(pdf_path)
+    shard_size = current_app.config.get('MINERU_SHARD_SIZE_PAGES', 50)
+
+    shards = []
+    shard_options = []
+    for pages, is_ocr in ((routing["scanned_pages"], True), (routing["figure_pages"], False)):
+        for start in range(0, len(pages), shard_size):
+            shards.append(pages[start:start + shard_size])
+            shard_options.append({"is_ocr": is_ocr})
+
+    manifest = submit_sharded_parse(
+        pdf_path, filename, sha256, model_version,
+        shards=shards,
+        shard_options=shard_options,
+        local_pages=routing["local_pages"]
+    )
+    manifest["routing"] = routing
+    save_shard_manifest(manifest["batch_id"], manifest)
+    return manifest
+
+
+def complete_local_only(sha256: str, local_layout: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    所有页都有可用文本层时，直接将本地解析结果保存为完成的结果目录，不调用MinerU
+
+    Args:
+        sha256: 文档内容哈希
+        local_layout: 本地提取的layout
+
+    Returns:
+        与download_and_extract_zip返回格式一致的路径信息，并包含task_id
+    """
+    task_id = f"local_{sha256[:16]}"
+    result_dir = Path(current_app.config['MINERU_FOLDER']) / task_id
+    result_dir.mkdir(parents=True, exist_ok=True)
+
+    json_path = result_dir / 'layout.json'
+    dump_file(json_path, layout_to_pdf_info(local_layout))
+
+    full_md_path = result_dir / 'full.md'
+    full_md_path.write_text(layout_to_markdown(local_layout), encoding='utf-8')
+
+    logger.info(f"全部页面均为文本页，使用本地解析结果: {task_id}")
+    return {
+        "task_id": task_id,
+        "json_path": str(json_path),
+        "extract_dir": str(result_dir),
+        "full_md_path": str(full_md_path),
+        "images_dir": None
+    }
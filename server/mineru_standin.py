@@ -0,0 +1,400 @@
+"""
+MinerU本地替身服务：实现与mineru.net/api/v4兼容的任务、批量、上传和结果下载接口
+用于离线测试以及解析流程的吞吐量、轮询压力测试
+
+启动方式:
+    python -m server.mineru_standin --port 8001 --delay 5 --fail-rate 0.1 --layout-format cycle
+
+然后将主服务的MINERU_BASE_URL指向 http://127.0.0.1:8001/api/v4 即可
+"""
+import argparse
+import io
+import json
+import logging
+import random
+import struct
+import threading
+import time
+import uuid
+import zipfile
+import zlib
+from collections import Counter
+from typing import Dict, Any, List
+from flask import Flask, Blueprint, request, jsonify, Response, url_for, current_app
+
+logger = logging.getLogger(__name__)
+
+# parse_mineru_layout_from_data支持的四种格式
+LAYOUT_FORMATS = ['pdf_info', 'content_list', 'model', 'pages']
+
+
+def _build_sample_png() -> bytes:
+    """
+    生成1x1透明PNG，作为结果ZIP中的示例图片
+    """
+    def chunk(tag: bytes, body: bytes) -> bytes:
+        return struct.pack('>I', len(body)) + tag + body + struct.pack('>I', zlib.crc32(tag + body) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', 1, 1, 8, 6, 0, 0, 0)
+    pixels = zlib.compress(b'\x00\x00\x00\x00\x00')
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', pixels) + chunk(b'IEND', b'')
+
+
+SAMPLE_PNG = _build_sample_png()
+SAMPLE_IMAGE_NAME = 'standin_sample.png'
+
+standin_bp = Blueprint('mineru_standin', __name__)
+
+
+class StandinState:
+    """
+    替身服务的内存状态：任务、批量任务、上传文件和请求计数
+    """
+
+    def __init__(self, delay: float, fail_rate: float, layout_format: str, default_pages: int, seed: int = None):
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.layout_format = layout_format
+        self.default_pages = default_pages
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self.batches: Dict[str, List[str]] = {}
+        self.request_counts = Counter()
+        self._format_cursor = 0
+
+    def next_format(self) -> str:
+        if self.layout_format != 'cycle':
+            return self.layout_format
+        fmt = LAYOUT_FORMATS[self._format_cursor % len(LAYOUT_FORMATS)]
+        self._format_cursor += 1
+        return fmt
+
+    def new_task(self, file_name: str, data_id: str = None, started: bool = True) -> Dict[str, Any]:
+        task_id = uuid.uuid4().hex
+        task = {
+            "task_id": task_id,
+            "file_name": file_name,
+            "data_id": data_id,
+            "format": self.next_format(),
+            "will_fail": self.random.random() < self.fail_rate,
+            "started_at": time.time() if started else None,
+            "pages": self.default_pages
+        }
+        self.tasks[task_id] = task
+        return task
+
+
+def get_state() -> StandinState:
+    return current_app.config['STANDIN_STATE']
+
+
+def mineru_response(data: Dict[str, Any], code: int = 0, msg: str = 'ok'):
+    return jsonify({"code": code, "msg": msg, "trace_id": uuid.uuid4().hex, "data": data})
+
+
+def count_pages(content: bytes, default: int) -> int:
+    """
+    尝试用PyMuPDF读取上传PDF的页数，失败时使用默认页数
+    """
+    try:
+        import fitz  # PyMuPDF
+        with fitz.open(stream=content, filetype='pdf') as doc:
+            return max(1, doc.page_count)
+    except Exception:
+        return default
+
+
+def task_status(task: Dict[str, Any], delay: float) -> Dict[str, Any]:
+    """
+    根据提交后经过的时间推算任务状态：pending -> running -> done/failed
+    """
+    status = {
+        "task_id": task["task_id"],
+        "file_name": task["file_name"],
+        "data_id": task["data_id"],
+        "err_msg": "",
+        "full_zip_url": ""
+    }
+    if task["started_at"] is None:
+        status["state"] = "waiting-file"
+        return status
+
+    elapsed = time.time() - task["started_at"]
+    if elapsed < delay * 0.2:
+        status["state"] = "pending"
+    elif elapsed < delay:
+        total = task["pages"]
+        extracted = min(total, int(total * elapsed / delay)) if delay else total
+        status["state"] = "running"
+        status["extract_progress"] = {
+            "extracted_pages": extracted,
+            "total_pages": total,
+            "start_time": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(task["started_at"]))
+        }
+    elif task["will_fail"]:
+        status["state"] = "failed"
+        status["err_msg"] = "standin: injected failure"
+    else:
+        status["state"] = "done"
+        status["full_zip_url"] = url_for('mineru_standin.download_result', task_id=task["task_id"], _external=True)
+    return status
+
+
+def build_layout_json(fmt: str, pages: int, title: str) -> Any:
+    """
+    按指定格式生成示例MinerU JSON，每页包含一个标题块和两个正文块
+    """
+    def page_texts(page_no):
+        return [
+            ("title", f"{title} - Section {page_no}"),
+            ("text", f"This is the first paragraph on page {page_no}. It ends with a full stop."),
+            ("text", f"The second paragraph on page {page_no} continues")
+        ]
+
+    bboxes = [[72, 72, 540, 100], [72, 120, 540, 300], [72, 320, 540, 500]]
+
+    if fmt == 'pdf_info':
+        return {
+            "pdf_info": [
+                {
+                    "page_idx": page_no - 1,
+                    "page_size": [612, 792],
+                    "para_blocks": [
+                        {"type": block_type, "bbox": bbox, "lines": [{"spans": [{"type": "text", "content": text}]}]}
+                        for (block_type, text), bbox in zip(page_texts(page_no), bboxes)
+                    ]
+                }
+                for page_no in range(1, pages + 1)
+            ],
+            "_backend": "standin",
+            "_version_name": "standin"
+        }
+
+    if fmt == 'content_list':
+        items = []
+        for page_no in range(1, pages + 1):
+            for (block_type, text), bbox in zip(page_texts(page_no), bboxes):
+                item = {"type": "text", "text": text, "bbox": bbox, "page_idx": page_no - 1}
+                if block_type == 'title':
+                    item["text_level"] = 1
+                items.append(item)
+        return items
+
+    if fmt == 'model':
+        # model.json的bbox为相对坐标(0-1)
+        return [
+            [
+                {"type": block_type, "content": text, "bbox": [round(v / 612 if i % 2 == 0 else v / 792, 4) for i, v in enumerate(bbox)]}
+                for (block_type, text), bbox in zip(page_texts(page_no), bboxes)
+            ]
+            for page_no in range(1, pages + 1)
+        ]
+
+    return {
+        "pages": [
+            {
+                "page_no": page_no,
+                "blocks": [
+                    {"type": block_type, "bbox": bbox, "lines": [{"text": text}]}
+                    for (block_type, text), bbox in zip(page_texts(page_no), bboxes)
+                ]
+            }
+            for page_no in range(1, pages + 1)
+        ]
+    }
+
+
+def build_result_zip(fmt: str, pages: int, title: str) -> bytes:
+    """
+    生成与MinerU结果ZIP结构一致的压缩包（JSON、full.md和images目录）
+    """
+    json_names = {
+        'pdf_info': 'layout.json',
+        'content_list': 'content_list.json',
+        'model': 'model.json',
+        'pages': 'result.json'
+    }
+    layout_data = build_layout_json(fmt, pages, title)
+
+    md_lines = []
+    for page_no in range(1, pages + 1):
+        md_lines.append(f"# {title} - Section {page_no}")
+        md_lines.append(f"This is the first paragraph on page {page_no}. It ends with a full stop.")
+        md_lines.append(f"The second paragraph on page {page_no} continues")
+    md_lines.append(f"![](images/{SAMPLE_IMAGE_NAME})")
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr(json_names[fmt], json.dumps(layout_data, ensure_ascii=False))
+        zip_file.writestr('full.md', '\n\n'.join(md_lines))
+        zip_file.writestr(f'images/{SAMPLE_IMAGE_NAME}', SAMPLE_PNG)
+    return buffer.getvalue()
+
+
+@standin_bp.before_request
+def count_request():
+    state = get_state()
+    with state.lock:
+        state.request_counts[request.endpoint or request.path] += 1
+    if request.endpoint in ('mineru_standin.download_result', 'mineru_standin.upload_file', 'mineru_standin.stats'):
+        return None
+    # 与线上服务一致：需要携带Bearer Token（内容不校验）
+    if not request.headers.get('Authorization', '').startswith('Bearer '):
+        return mineru_response({}, code=-10001, msg='missing token'), 401
+    return None
+
+
+@standin_bp.route('/api/v4/extract/task', methods=['POST'])
+def create_task():
+    data = request.get_json() or {}
+    file_url = data.get('url')
+    if not file_url:
+        return mineru_response({}, code=-60001, msg='url is required')
+
+    state = get_state()
+    with state.lock:
+        task = state.new_task(file_url.rsplit('/', 1)[-1] or 'file.pdf', data.get('data_id'))
+    logger.info(f"[standin] 创建任务: {task['task_id']} ({task['format']})")
+    return mineru_response({"task_id": task["task_id"]})
+
+
+@standin_bp.route('/api/v4/extract/task/<task_id>', methods=['GET'])
+def get_task(task_id: str):
+    state = get_state()
+    with state.lock:
+        task = state.tasks.get(task_id)
+    if not task:
+        return mineru_response({}, code=-60012, msg='task not found')
+    return mineru_response(task_status(task, state.delay))
+
+
+@standin_bp.route('/api/v4/file-urls/batch', methods=['POST'])
+def create_batch():
+    data = request.get_json() or {}
+    files = data.get('files') or []
+    if not files:
+        return mineru_response({}, code=-60001, msg='files is required')
+
+    state = get_state()
+    batch_id = uuid.uuid4().hex
+    with state.lock:
+        task_ids = [
+            state.new_task(item.get('name', f'file{idx}.pdf'), item.get('data_id'), started=False)["task_id"]
+            for idx, item in enumerate(files)
+        ]
+        state.batches[batch_id] = task_ids
+
+    file_urls = [
+        url_for('mineru_standin.upload_file', task_id=task_id, _external=True)
+        for task_id in task_ids
+    ]
+    logger.info(f"[standin] 创建批量任务: {batch_id}, 文件数: {len(files)}")
+    return mineru_response({"batch_id": batch_id, "file_urls": file_urls})
+
+
+@standin_bp.route('/upload/<task_id>', methods=['PUT'])
+def upload_file(task_id: str):
+    state = get_state()
+    content = request.get_data()
+    with state.lock:
+        task = state.tasks.get(task_id)
+        if not task:
+            return Response(status=404)
+        task["pages"] = count_pages(content, state.default_pages)
+        task["started_at"] = time.time()
+    logger.info(f"[standin] 收到上传: {task_id}, {len(content)} 字节, {task['pages']} 页")
+    return Response(status=200)
+
+
+@standin_bp.route('/api/v4/extract-results/batch/<batch_id>', methods=['GET'])
+def get_batch(batch_id: str):
+    state = get_state()
+    with state.lock:
+        task_ids = state.batches.get(batch_id)
+        tasks = [state.tasks[task_id] for task_id in task_ids] if task_ids else None
+    if tasks is None:
+        return mineru_response({}, code=-60012, msg='batch not found')
+
+    extract_result = []
+    for task in tasks:
+        status = task_status(task, state.delay)
+        status.pop("task_id")
+        extract_result.append(status)
+    return mineru_response({"batch_id": batch_id, "extract_result": extract_result})
+
+
+@standin_bp.route('/results/<task_id>.zip', methods=['GET'])
+def download_result(task_id: str):
+    state = get_state()
+    with state.lock:
+        task = state.tasks.get(task_id)
+    if not task:
+        return Response(status=404)
+    title = task["file_name"].rsplit('.', 1)[0]
+    return Response(build_result_zip(task["format"], task["pages"], title), mimetype='application/zip')
+
+
+@standin_bp.route('/standin/stats', methods=['GET'])
+def stats():
+    """
+    返回各接口的请求次数，用于评估轮询压力
+    """
+    state = get_state()
+    with state.lock:
+        states = Counter(task_status(task, state.delay)["state"] for task in state.tasks.values())
+        return jsonify({
+            "requests": dict(state.request_counts),
+            "tasks": len(state.tasks),
+            "batches": len(state.batches),
+            "task_states": dict(states)
+        })
+
+
+def create_standin_app(
+    delay: float = 5.0,
+    fail_rate: float = 0.0,
+    layout_format: str = 'pdf_info',
+    default_pages: int = 3,
+    seed: int = None
+) -> Flask:
+    """
+    创建MinerU替身服务应用
+
+    Args:
+        delay: 每个任务从提交到完成的处理时间（秒）
+        fail_rate: 任务失败的概率（0-1）
+        layout_format: 结果JSON格式（pdf_info/content_list/model/pages，或cycle轮流使用四种格式）
+        default_pages: 无法读取页数时（URL任务或非PDF）使用的页数
+        seed: 随机种子（用于复现失败注入）
+
+    Returns:
+        Flask应用实例
+    """
+    if layout_format != 'cycle' and layout_format not in LAYOUT_FORMATS:
+        raise ValueError(f"不支持的格式: {layout_format}")
+
+    app = Flask(__name__)
+    app.config['STANDIN_STATE'] = StandinState(delay, fail_rate, layout_format, default_pages, seed)
+    app.register_blueprint(standin_bp)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MinerU本地替身服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--delay', type=float, default=5.0, help='任务处理时间（秒）')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='失败注入概率（0-1）')
+    parser.add_argument('--layout-format', default='pdf_info', choices=LAYOUT_FORMATS + ['cycle'])
+    parser.add_argument('--pages', type=int, default=3, help='无法读取页数时的默认页数')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    app = create_standin_app(args.delay, args.fail_rate, args.layout_format, args.pages, args.seed)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+页面几何模块：入库时用PyMuPDF记录每页尺寸，并把layout的bbox统一换算为页面坐标
+
+规范坐标系为PDF页面坐标（单位pt，左上角为原点，x0<=x1、y0<=y1，不超出页面）。
+MinerU各格式的bbox单位不同：pdf_info/content_list/旧格式为页面坐标，model.json为0-1相对坐标，
+部分版本的content_list为0-1000千分比坐标。换算按页判断单位，对整列bbox用NumPy一次完成。
+"""
+import json
+import logging
+import os
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from flask import current_app
+
+from server.columnar_layout import ColumnarLayout
+
+logger = logging.getLogger(__name__)
+
+# 页面尺寸缓存目录（位于MINERU_FOLDER下）
+PAGE_SIZES_DIRNAME = 'page_sizes'
+
+# 超出页面尺寸该比例时，认为该页bbox不是页面坐标
+OVERFLOW_TOLERANCE = 1.05
+
+# 千分比坐标的取值上限
+PERMILLE_SCALE = 1000.0
+
+# 页面尺寸只与文档内容有关，进程内缓存已读取的结果
+_sizes_cache: Dict[str, List[List[float]]] = {}
+_sizes_lock = threading.Lock()
+
+
+def get_page_sizes_path(sha256: str) -> Path:
+    return Path(current_app.config['MINERU_FOLDER']) / PAGE_SIZES_DIRNAME / f"{sha256}.json"
+
+
+def read_page_sizes(pdf_path: str) -> List[List[float]]:
+    """
+    用PyMuPDF读取每页尺寸
+
+    Args:
+        pdf_path: PDF文件路径
+
+    Returns:
+        [[宽, 高], ...]，第i项对应第i+1页
+    """
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        return [[round(page.rect.width, 2), round(page.rect.height, 2)] for page in doc]
+
+
+def build_page_sizes(pdf_path: str, sha256: str) -> Optional[List[List[float]]]:
+    """
+    记录并缓存PDF的页面尺寸（按内容哈希缓存，相同文档只读取一次）
+
+    Args:
+        pdf_path: PDF文件路径
+        sha256: 文档内容哈希
+
+    Returns:
+        页面尺寸列表；不是PDF或读取失败时返回None
+    """
+    if not sha256 or not str(pdf_path).lower().endswith('.pdf'):
+        return None
+
+    path = get_page_sizes_path(sha256)
+    if path.exists():
+        return load_page_sizes(sha256)
+
+    try:
+        sizes = read_page_sizes(str(pdf_path))
+    except Exception as e:
+        logger.warning(f"读取PDF页面尺寸失败: {e}")
+        return None
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(sizes, f)
+    os.replace(tmp_path, path)
+    with _sizes_lock:
+        _sizes_cache[sha256] = sizes
+    logger.info(f"已记录页面尺寸: {sha256[:12]} ({len(sizes)} 页)")
+    return sizes
+
+
+def load_page_sizes(sha256: str) -> Optional[List[List[float]]]:
+    """
+    读取文档的页面尺寸；尚未记录但上传文件仍在时补充记录
+
+    Args:
+        sha256: 文档内容哈希
+
+    Returns:
+        页面尺寸列表；无法获取时返回None
+    """
+    if not sha256:
+        return None
+    with _sizes_lock:
+        sizes = _sizes_cache.get(sha256)
+    if sizes is not None:
+        return sizes
+
+    path = get_page_sizes_path(sha256)
+    if not path.exists():
+        pdf_path = Path(current_app.config['UPLOAD_FOLDER']) / f"{sha256}.pdf"
+        return build_page_sizes(str(pdf_path), sha256) if pdf_path.exists() else None
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            sizes = json.load(f)
+    except Exception as e:
+        logger.warning(f"读取页面尺寸失败: {e}")
+        return None
+    with _sizes_lock:
+        _sizes_cache[sha256] = sizes
+    return sizes
+
+
+def normalize_bbox_array(pages: np.ndarray, boxes: np.ndarray, page_sizes: List[List[float]]) -> np.ndarray:
+    """
+    把bbox换算为页面坐标（按页判断单位，整列一次计算）
+
+    单位判断规则：一页内所有坐标都在[0, 1]内视为相对坐标；超出页面尺寸但不超过1000视为千分比坐标；
+    其余视为页面坐标。没有尺寸信息的页只规范坐标顺序，不做缩放和裁剪。
+
+    Args:
+        pages: 每块的页码（n，按页码升序）
+        boxes: bbox矩阵（n×4）
+        page_sizes: 页面尺寸列表
+
+    Returns:
+        规范化后的bbox矩阵（n×4，float32）
+    """
+    n = len(pages)
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(n, 4)
+    if n == 0:
+        return boxes.astype(np.float32)
+
+    # 每块所在页的宽高，缺失的页为NaN
+    sizes = np.asarray(page_sizes or [], dtype=np.float64).reshape(-1, 2)
+    known = (pages >= 1) & (pages <= len(sizes))
+    sizes = np.vstack([sizes, [np.nan, np.nan]])
+    size = sizes[np.where(known, pages - 1, len(sizes) - 1)]
+    width, height = size[:, 0], size[:, 1]
+
+    # 按页统计坐标范围（pages已排序，可用reduceat分段）
+    starts = np.flatnonzero(np.r_[True, pages[1:] != pages[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    max_x = np.maximum.reduceat(np.maximum(boxes[:, 0], boxes[:, 2]), starts)
+    max_y = np.maximum.reduceat(np.maximum(boxes[:, 1], boxes[:, 3]), starts)
+    min_xy = np.minimum.reduceat(boxes.min(axis=1), starts)
+    page_width, page_height = width[starts], height[starts]
+
+    relative = (max_x <= 1.0) & (max_y <= 1.0) & (min_xy >= 0) & ~np.isnan(page_width)
+    overflow = (max_x > page_width * OVERFLOW_TOLERANCE) | (max_y > page_height * OVERFLOW_TOLERANCE)
+    permille = ~relative & overflow & (max_x <= PERMILLE_SCALE) & (max_y <= PERMILLE_SCALE)
+    unit = np.repeat(np.where(relative, 1.0, np.where(permille, PERMILLE_SCALE, 0.0)), counts)
+
+    scaled = unit > 0
+    scale_x = np.where(scaled, width / np.where(scaled, unit, 1.0), 1.0)
+    scale_y = np.where(scaled, height / np.where(scaled, unit, 1.0), 1.0)
+    boxes = boxes * np.column_stack([scale_x, scale_y, scale_x, scale_y])
+
+    # 统一坐标顺序，并裁剪到页面范围内
+    x0 = np.minimum(boxes[:, 0], boxes[:, 2])
+    x1 = np.maximum(boxes[:, 0], boxes[:, 2])
+    y0 = np.minimum(boxes[:, 1], boxes[:, 3])
+    y1 = np.maximum(boxes[:, 1], boxes[:, 3])
+    max_w = np.where(np.isnan(width), np.inf, width)
+    max_h = np.where(np.isnan(height), np.inf, height)
+    result = np.column_stack([
+        np.clip(x0, 0, max_w), np.clip(y0, 0, max_h),
+        np.clip(x1, 0, max_w), np.clip(y1, 0, max_h)
+    ])
+
+    converted = int(relative.sum() + permille.sum())
+    if converted:
+        logger.info(f"bbox单位换算: 相对坐标 {int(relative.sum())} 页，千分比坐标 {int(permille.sum())} 页")
+    return result.astype(np.float32)
+
+
+def normalize_layout(layout: ColumnarLayout, page_sizes: Optional[List[List[float]]]) -> ColumnarLayout:
+    """
+    把列式layout的bbox换算为页面坐标
+
+    Args:
+        layout: ColumnarLayout（块按页码排序）
+        page_sizes: 页面尺寸列表（为空时原样返回）
+
+    Returns:
+        bbox已规范化的ColumnarLayout
+    """
+    if not page_sizes or not len(layout):
+        return layout
+    pages = np.frombuffer(layout.page_column, dtype=np.int32)
+    boxes = np.frombuffer(layout.bbox_column, dtype=np.float32)
+    bbox = array('f')
+    bbox.frombytes(normalize_bbox_array(pages, boxes, page_sizes).tobytes())
+    return layout.with_bbox(bbox)
@@ -0,0 +1,384 @@
+"""
+双语PDF导出模块：用PyMuPDF把译文写入原PDF中每个layout块的bbox
+
+- overlay：在原页面上抹去原文（文本层一并删除），在原位置写入译文
+- side_by_side：左侧原页面，右侧为写入译文的页面
+
+页面按连续页段分配到进程池并行渲染，每段在子进程中生成独立的PDF；全部完成后按页序合并，
+合并时去除各段重复嵌入的字体，再对整个文档做一次字体子集化。
+导出结果按源文件、模式和译文内容的哈希命名缓存，相同内容再次导出直接返回。
+"""
+import hashlib
+import logging
+import math
+import os
+import re
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from flask import current_app
+
+from server.fast_json import dumps_bytes
+
+logger = logging.getLogger(__name__)
+
+# 导出结果目录（位于MINERU_FOLDER下）
+EXPORTS_DIRNAME = 'exports'
+
+# 支持的导出模式
+EXPORT_MODES = ('overlay', 'side_by_side')
+
+# 不写入译文的块类型（图片、公式等保留原样）
+SKIPPED_TYPES = ('image', 'figure', 'equation', 'interline_equation', 'formula')
+
+# 译文字号范围（pt），在范围内选能放进bbox的最大字号
+MIN_FONT_SIZE = 4.0
+MAX_FONT_SIZE = 14.0
+
+# 每个进程任务的最少页数
+MIN_PAGES_PER_CHUNK = 4
+
+# 译文在PDF中使用的字体资源名
+FONT_NAME = 'trfont'
+
+PageBlocks = Dict[int, List[Tuple[List[float], str]]]
+
+
+def get_exports_folder() -> Path:
+    return Path(current_app.config['MINERU_FOLDER']) / EXPORTS_DIRNAME
+
+
+def collect_page_blocks(layout: List[Dict[str, Any]]) -> PageBlocks:
+    """
+    按页整理需要写入的译文（没有译文、译文与原文相同或不写入的块类型跳过）
+
+    Args:
+        layout: 带translated_text的layout数组（bbox为页面坐标）
+
+    Returns:
+        {页码（从0开始）: [(bbox, 译文), ...]}
+    """
+    pages: PageBlocks = {}
+    for block in layout:
+        translated_text = (block.get('translated_text') or '').strip()
+        bbox = block.get('bbox')
+        if not translated_text or translated_text == (block.get('text') or '').strip():
+            continue
+        if block.get('type') in SKIPPED_TYPES or not bbox or len(bbox) != 4:
+            continue
+        page_no = block.get('page') or block.get('page_no') or block.get('pageNo') or 1
+        pages.setdefault(int(page_no) - 1, []).append(([float(v) for v in bbox], translated_text))
+    return pages
+
+
+def export_key(source_sha256: str, mode: str, page_blocks: PageBlocks) -> str:
+    """
+    导出结果的缓存键：源文件内容哈希、导出模式和译文内容
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{source_sha256}:{mode}:".encode('utf-8'))
+    digest.update(dumps_bytes(sorted(page_blocks.items())))
+    return digest.hexdigest()
+
+
+def _page_ranges(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    # 每个进程分到约两段，完成一段就能推送进度
+    size = max(MIN_PAGES_PER_CHUNK, -(-page_count // (workers * 2)))
+    return [(start, min(start + size, page_count) - 1) for start in range(0, page_count, size)]
+
+
+# 换行单位：中日韩字符逐字断行，其他文字按空白分词
+_TOKEN_PATTERN = re.compile(
+    r'[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]|[^\s\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]+|\s+'
+)
+
+
+class _FontMetrics:
+    """
+    译文字体的字形ID和字宽（字号为1时），按字符缓存
+
+    PyMuPDF的insert_textbox每次调用都重新注册字体，并对无空格的中日韩文本按前缀反复计算宽度，
+    一页几十个块时占据大部分导出时间；这里直接排版并生成文本绘制指令。
+    """
+
+    def __init__(self, font):
+        self.font = font
+        self.ascender = font.ascender
+        self.line_height = max(font.ascender - font.descender, 1.2)
+        self._glyphs: Dict[str, Tuple[int, float]] = {}
+        self._fallback = self.glyph('?') if font.has_glyph(ord('?')) else (0, 0.5)
+
+    def glyph(self, char: str) -> Tuple[int, float]:
+        cached = self._glyphs.get(char)
+        if cached is None:
+            gid = self.font.has_glyph(ord(char))
+            cached = (gid, self.font.glyph_advance(ord(char))) if gid else self._fallback
+            self._glyphs[char] = cached
+        return cached
+
+    def width(self, text: str) -> float:
+        return sum(self.glyph(char)[1] for char in text)
+
+    def wrap(self, text: str, max_width: float) -> List[str]:
+        """
+        按最大宽度（字号为1时的单位）断行；超过一行宽度的单词逐字断开
+        """
+        lines = []
+        for paragraph in text.split('\n'):
+            line, line_width = '', 0.0
+            for token in _TOKEN_PATTERN.findall(paragraph):
+                token_width = self.width(token)
+                if line_width + token_width <= max_width or (token.isspace() and line):
+                    line, line_width = line + token, line_width + token_width
+                    continue
+                if line.strip():
+                    lines.append(line.rstrip())
+                line, line_width = '', 0.0
+                if token.isspace():
+                    continue
+                for char in token if token_width > max_width else [token]:
+                    char_width = self.width(char)
+                    if line and line_width + char_width > max_width:
+                        lines.append(line)
+                        line, line_width = '', 0.0
+                    line, line_width = line + char, line_width + char_width
+            lines.append(line.rstrip())
+        return lines
+
+    def fit(self, text: str, width: float, height: float) -> Tuple[float, List[str]]:
+        """
+        选择能放进矩形的最大字号（精度0.5pt）
+
+        Returns:
+            (字号, 各行文本)；最小字号也放不下时按最小字号返回，超出部分向下延伸
+        """
+        # 按面积估计上限（断行只会多占空间），再以0.5pt为步长向下试排，通常一两次即可
+        text_width = self.width(text) or 1.0
+        estimate = math.sqrt(width * height / (text_width * self.line_height))
+        size = math.floor(min(MAX_FONT_SIZE, height / self.line_height, estimate) * 2) / 2
+        while size > MIN_FONT_SIZE:
+            lines = self.wrap(text, width / size)
+            if len(lines) * size * self.line_height <= height:
+                return size, lines
+            size -= 0.5
+        return MIN_FONT_SIZE, self.wrap(text, width / MIN_FONT_SIZE)
+
+    def operators(self, rect, text: str) -> Tuple[str, bool]:
+        """
+        生成在矩形内绘制文本的PDF指令（坐标为y轴向下的页面坐标，由调用方设置变换矩阵）
+
+        Returns:
+            (指令, 是否完整放进矩形)
+        """
+        size, lines = self.fit(text, rect.width, rect.height)
+        ops = [f"BT /{FONT_NAME} {size:g} Tf"]
+        for idx, line in enumerate(lines):
+            if not line:
+                continue
+            baseline = rect.y0 + size * (self.ascender + idx * self.line_height)
+            glyphs = ''.join(f"{self.glyph(char)[0]:04x}" for char in line)
+            ops.append(f"1 0 0 -1 {rect.x0:.2f} {baseline:.2f} Tm <{glyphs}> Tj")
+        ops.append("ET")
+        return '\n'.join(ops), len(lines) * size * self.line_height <= rect.height
+
+
+def _append_contents(page, data: bytes):
+    """
+    在页面内容之后追加一个内容流（原内容先用q/Q包裹，避免图形状态影响新内容）
+    """
+    doc = page.parent
+    page.wrap_contents()
+    xref = doc.get_new_xref()
+    doc.update_object(xref, "<<>>")
+    doc.update_stream(xref, data)
+    contents = page.get_contents() + [xref]
+    doc.xref_set_key(page.xref, "Contents", "[" + " ".join(f"{item} 0 R" for item in contents) + "]")
+
+
+def _add_font_resource(page, font_xref: int):
+    """
+    让页面引用已嵌入的字体（insert_font每次调用都会重新嵌入一份字体）
+    """
+    doc = page.parent
+    # Resources和Font都可能是间接引用，xref_set_key的路径不能跨越间接引用
+    kind, value = doc.xref_get_key(page.xref, 'Resources')
+    target, prefix = (int(value.split()[0]), '') if kind == 'xref' else (page.xref, 'Resources/')
+    kind, value = doc.xref_get_key(target, prefix + 'Font')
+    target, prefix = (int(value.split()[0]), '') if kind == 'xref' else (target, prefix + 'Font/')
+    doc.xref_set_key(target, prefix + FONT_NAME, f"{font_xref} 0 R")
+
+
+def _write_blocks(page, metrics: _FontMetrics, blocks: List[Tuple[List[float], str]], dx: float = 0) -> int:
+    """
+    把译文写入页面（bbox为页面显示坐标，dx为水平偏移）
+
+    Returns:
+        以最小字号仍超出bbox的块数
+    """
+    import fitz  # PyMuPDF
+
+    # 显示坐标 -> 未旋转的页面坐标 -> PDF坐标
+    matrix = page.derotation_matrix * ~page.transformation_matrix
+    ops = ["q", " ".join(f"{value:g}" for value in matrix) + " cm", "0 g"]
+    overflow = 0
+    for bbox, text in blocks:
+        block_ops, fitted = metrics.operators(fitz.Rect(bbox[0] + dx, bbox[1], bbox[2] + dx, bbox[3]), text)
+        ops.append(block_ops)
+        overflow += 0 if fitted else 1
+    ops.append("Q")
+    _append_contents(page, '\n'.join(ops).encode('ascii'))
+    return overflow
+
+
+def render_page_range(pdf_path: str, first: int, last: int, page_blocks: PageBlocks,
+                      mode: str, font_file: Optional[str] = None) -> bytes:
+    """
+    渲染一段连续页面（可在子进程中运行，不依赖Flask上下文）
+
+    Args:
+        pdf_path: 源PDF路径
+        first: 起始页（从0开始，含）
+        last: 结束页（含）
+        page_blocks: 这些页的译文（collect_page_blocks的结果）
+        mode: overlay或side_by_side
+        font_file: 译文字体文件（默认使用PyMuPDF内置的CJK字体）
+
+    Returns:
+        这段页面的PDF（完整嵌入字体，合并后再统一子集化）
+    """
+    import fitz  # PyMuPDF
+
+    metrics = _FontMetrics(fitz.Font(fontfile=font_file) if font_file else fitz.Font('cjk'))
+    with fitz.open(pdf_path) as src:
+        # 抹去原文后的页面
+        cleaned = fitz.open()
+        cleaned.insert_pdf(src, from_page=first, to_page=last)
+        redact_options = {"images": fitz.PDF_REDACT_IMAGE_NONE}
+        # 保留bbox内的矢量图形（表格线等）；PyMuPDF 1.24.1之前没有graphics参数，也不会删除矢量图形
+        if hasattr(fitz, 'PDF_REDACT_LINE_ART_NONE'):
+            redact_options["graphics"] = fitz.PDF_REDACT_LINE_ART_NONE
+        for offset, page in enumerate(cleaned):
+            blocks = page_blocks.get(first + offset) or []
+            for bbox, _ in blocks:
+                page.add_redact_annot(fitz.Rect(bbox) * page.derotation_matrix, fill=(1, 1, 1))
+            if blocks:
+                page.apply_redactions(**redact_options)
+
+        if mode == 'side_by_side':
+            output = fitz.open()
+            for offset, page in enumerate(cleaned):
+                width, height = page.rect.width, page.rect.height
+                target = output.new_page(width=width * 2, height=height)
+                target.show_pdf_page(fitz.Rect(0, 0, width, height), src, first + offset)
+                target.show_pdf_page(fitz.Rect(width, 0, width * 2, height), cleaned, offset)
+            cleaned.close()
+        else:
+            output = cleaned
+
+        overflow = 0
+        font_xref = None
+        for offset, page in enumerate(output):
+            blocks = page_blocks.get(first + offset)
+            if blocks:
+                # 字体只嵌入一次，其他页引用同一个对象
+                if font_xref is None:
+                    font_xref = page.insert_font(fontname=FONT_NAME, fontbuffer=metrics.font.buffer)
+                else:
+                    _add_font_resource(page, font_xref)
+                dx = page.rect.width / 2 if mode == 'side_by_side' else 0
+                overflow += _write_blocks(page, metrics, blocks, dx)
+        if overflow:
+            logger.debug(f"第 {first + 1}-{last + 1} 页有 {overflow} 个块以最小字号写入仍超出bbox")
+        data = output.tobytes()
+        output.close()
+    return data
+
+
+def _merge(parts: List[bytes], output_path: Path):
+    """
+    按页序合并各段PDF：先去除重复嵌入的字体，再对整个文档做一次字体子集化，原子写入
+    """
+    import fitz  # PyMuPDF
+
+    merged = fitz.open()
+    for data in parts:
+        with fitz.open('pdf', data) as part:
+            merged.insert_pdf(part)
+    # garbage=4合并内容相同的流（各段嵌入的同一字体）
+    deduplicated = merged.tobytes(garbage=4)
+    merged.close()
+
+    with fitz.open('pdf', deduplicated) as doc:
+        doc.subset_fonts()
+        # 相同内容可能被并发导出，临时文件名不能相同
+        tmp_path = output_path.with_name(f"{output_path.name}.{uuid.uuid4().hex}.tmp")
+        doc.save(str(tmp_path), garbage=3, deflate=True)
+    os.replace(tmp_path, output_path)
+
+
+def export_pdf(pdf_path: str, page_blocks: PageBlocks, output_path: Path, mode: str = 'overlay',
+               parallel_threshold: int = 16, max_workers: int = None,
+               font_file: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    导出双语PDF，按页段完成顺序产出进度
+
+    Args:
+        pdf_path: 源PDF路径
+        page_blocks: 译文（collect_page_blocks的结果）
+        output_path: 导出文件路径
+        mode: overlay或side_by_side
+        parallel_threshold: 页数达到该值时使用进程池并行渲染
+        max_workers: 进程池大小（默认CPU核数）
+        font_file: 译文字体文件
+
+    Yields:
+        每完成一段页面产出 {"first_page", "last_page", "completed_pages", "total_pages"}（页码从1开始）
+    """
+    import fitz  # PyMuPDF
+
+    if mode not in EXPORT_MODES:
+        raise ValueError(f"不支持的导出模式: {mode}")
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+
+    max_workers = max_workers or os.cpu_count() or 1
+    parallel = page_count >= parallel_threshold and max_workers > 1
+    ranges = _page_ranges(page_count, max_workers) if parallel else [(0, page_count - 1)]
+
+    def blocks_in(first: int, last: int) -> PageBlocks:
+        return {page: blocks for page, blocks in page_blocks.items() if first <= page <= last}
+
+    parts: Dict[int, bytes] = {}
+    completed_pages = 0
+
+    def progress(first: int, last: int) -> Dict[str, Any]:
+        return {
+            "first_page": first + 1,
+            "last_page": last + 1,
+            "completed_pages": completed_pages,
+            "total_pages": page_count
+        }
+
+    if parallel:
+        logger.info(f"导出PDF: {page_count} 页，使用 {min(max_workers, len(ranges))} 个进程并行渲染 {len(ranges)} 段")
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(ranges))) as executor:
+            futures = {
+                executor.submit(render_page_range, pdf_path, first, last, blocks_in(first, last), mode, font_file):
+                    (first, last)
+                for first, last in ranges
+            }
+            for future in as_completed(futures):
+                first, last = futures[future]
+                parts[first] = future.result()
+                completed_pages += last - first + 1
+                yield progress(first, last)
+    else:
+        for first, last in ranges:
+            parts[first] = render_page_range(pdf_path, first, last, blocks_in(first, last), mode, font_file)
+            completed_pages += last - first + 1
+            yield progress(first, last)
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    _merge([parts[first] for first, _ in ranges], output_path)
+    logger.info(f"导出PDF完成: {output_path.name}（{page_count} 页，{output_path.stat().st_size} 字节）")
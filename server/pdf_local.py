@@ -0,0 +1,276 @@
+"""
+本地PDF解析模块：使用PyMuPDF从PDF文本层提取文本块和位置信息
+输出格式与parse_mineru_layout_from_data一致，用于MinerU结果返回前的快速预览
+"""
+import logging
+import os
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from flask import current_app
+
+from server.columnar_layout import ColumnarLayout, load_layout_dicts
+
+logger = logging.getLogger(__name__)
+
+# 本地layout缓存目录（位于MINERU_FOLDER下）
+LOCAL_LAYOUT_DIRNAME = 'local_layouts'
+
+# 字号超过正文字号该倍数的短文本块视为标题
+TITLE_SIZE_RATIO = 1.2
+TITLE_MAX_CHARS = 200
+
+
+def _block_text_and_size(block: Dict[str, Any]) -> tuple:
+    # 每行内的span直接拼接，行之间用空格连接
+    lines = []
+    sizes = []
+    for line in block.get("lines", []):
+        spans = line.get("spans", [])
+        line_text = "".join(span.get("text", "") for span in spans).strip()
+        if line_text:
+            lines.append(line_text)
+        sizes.extend(span.get("size", 0) for span in spans if span.get("text", "").strip())
+    return " ".join(lines).strip(), max(sizes) if sizes else 0
+
+
+def extract_page_blocks(pdf_path: str, page_numbers: List[int]) -> List[Dict[str, Any]]:
+    """
+    提取指定页的文本块（可在子进程中运行，不依赖Flask上下文）
+
+    Args:
+        pdf_path: PDF文件路径
+        page_numbers: 页码列表（从1开始）
+
+    Returns:
+        文本块列表（尚未分配block_id），每项包含page、bbox、text、type和page_size
+    """
+    import fitz  # PyMuPDF
+
+    blocks = []
+    with fitz.open(pdf_path) as doc:
+        for page_no in page_numbers:
+            page = doc[page_no - 1]
+            page_size = [round(page.rect.width, 2), round(page.rect.height, 2)]
+            page_dict = page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)
+
+            raw_blocks = []
+            for block in page_dict.get("blocks", []):
+                if block.get("type") != 0:  # 只处理文本块
+                    continue
+                text, size = _block_text_and_size(block)
+                if text:
+                    raw_blocks.append((block, text, size))
+
+            if not raw_blocks:
+                continue
+
+            # 以页面内出现最多的字号（按0.5pt取整，并列时取较小者）作为正文字号
+            body_size = min(statistics.multimode(round(size * 2) / 2 for _, _, size in raw_blocks))
+
+            for block, text, size in raw_blocks:
+                is_title = size >= body_size * TITLE_SIZE_RATIO and len(text) <= TITLE_MAX_CHARS
+                blocks.append({
+                    "page": page_no,
+                    "bbox": [round(v, 2) for v in block["bbox"]],
+                    "text": text,
+                    "type": "title" if is_title else "text",
+                    "page_size": page_size
+                })
+    return blocks
+
+
+def _split_pages(page_count: int, parts: int) -> List[List[int]]:
+    # 按连续页段切分，保证合并后的顺序与串行解析一致
+    size = max(1, -(-page_count // parts))
+    return [list(range(start, min(start + size, page_count + 1))) for start in range(1, page_count + 1, size)]
+
+
+def extract_layout_local(pdf_path: str, parallel_threshold: int = 32, max_workers: int = None) -> List[Dict[str, Any]]:
+    """
+    使用PyMuPDF提取整个PDF的layout，大文档按页分段并行处理
+
+    Args:
+        pdf_path: PDF文件路径
+        parallel_threshold: 页数达到该值时使用进程池并行提取
+        max_workers: 进程池大小（默认CPU核数）
+
+    Returns:
+        layout列表，格式与parse_mineru_layout_from_data一致，并带有source="local"
+    """
+    import fitz  # PyMuPDF
+
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if page_count >= parallel_threshold and max_workers > 1:
+        page_groups = _split_pages(page_count, max_workers)
+        logger.info(f"本地解析: {page_count} 页，使用 {len(page_groups)} 个进程并行提取")
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(page_groups))) as executor:
+            results = executor.map(extract_page_blocks, [pdf_path] * len(page_groups), page_groups)
+            raw_blocks = [block for group in results for block in group]
+    else:
+        raw_blocks = extract_page_blocks(pdf_path, list(range(1, page_count + 1)))
+
+    layout = []
+    counters = {}
+    for block in raw_blocks:
+        page_no = block["page"]
+        block_counter = counters.get(page_no, 0)
+        counters[page_no] = block_counter + 1
+        layout.append({
+            **block,
+            "block_id": f"p{page_no}_b{block_counter}",
+            "source": "local"
+        })
+
+    logger.info(f"本地解析完成，共提取 {len(layout)} 个文本块")
+    return layout
+
+
+def get_local_layout_path(sha256: str) -> Path:
+    return Path(current_app.config['MINERU_FOLDER']) / LOCAL_LAYOUT_DIRNAME / f"{sha256}.layout"
+
+
+def build_local_layout(pdf_path: str, sha256: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    提取并缓存PDF的本地layout（按内容哈希缓存，相同文档只提取一次）
+
+    Args:
+        pdf_path: PDF文件路径
+        sha256: 文档内容哈希
+
+    Returns:
+        layout列表；未启用或提取失败时返回None
+    """
+    if not current_app.config.get('LOCAL_LAYOUT_ENABLED', True):
+        return None
+    if not str(pdf_path).lower().endswith('.pdf'):
+        return None
+
+    cache_path = get_local_layout_path(sha256)
+    if cache_path.exists():
+        return load_local_layout(sha256)
+
+    try:
+        layout = extract_layout_local(
+            str(pdf_path),
+            parallel_threshold=current_app.config.get('LOCAL_LAYOUT_PARALLEL_PAGES', 32),
+            max_workers=current_app.config.get('LOCAL_LAYOUT_WORKERS')
+        )
+    except Exception as e:
+        logger.warning(f"本地解析PDF失败: {e}")
+        return None
+
+    # 以列式二进制格式缓存，读取时通过mmap映射
+    ColumnarLayout.from_dicts(layout).save(cache_path)
+    return layout
+
+
+def load_local_layout(sha256: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    读取已缓存的本地layout
+
+    Args:
+        sha256: 文档内容哈希
+
+    Returns:
+        layout列表；不存在时返回None
+    """
+    if not sha256:
+        return None
+    try:
+        return load_layout_dicts(get_local_layout_path(sha256))
+    except Exception as e:
+        logger.warning(f"读取本地layout失败: {e}")
+        return None
+
+
+def merge_local_layout(mineru_layout: List[Dict[str, Any]], local_layout: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    合并MinerU layout和本地layout：MinerU已覆盖的页使用MinerU结果，其余页保留本地结果
+
+    Args:
+        mineru_layout: MinerU解析得到的layout
+        local_layout: 本地提取的layout
+
+    Returns:
+        按页码排序的合并结果
+    """
+    if not local_layout:
+        return mineru_layout
+    mineru_pages = {block.get("page") for block in mineru_layout}
+    fallback = [block for block in local_layout if block.get("page") not in mineru_pages]
+    if not fallback:
+        return mineru_layout
+    # sorted是稳定排序，同一页内保持原有阅读顺序
+    return sorted(mineru_layout + fallback, key=lambda block: block.get("page", 0))
+
+
+def classify_pages(pdf_path: str, min_text_chars: int = 50, image_ratio_threshold: float = 0.5) -> List[Dict[str, Any]]:
+    """
+    预扫描PDF，判断每页是否有可用的文本层
+
+    Args:
+        pdf_path: PDF文件路径
+        min_text_chars: 文本层字符数低于该值视为扫描页
+        image_ratio_threshold: 图片面积占比达到该值视为图片为主的页
+
+    Returns:
+        每页的分类结果，kind为text（本地解析）、scanned（需OCR）或figure（图片为主，交给MinerU）
+    """
+    import fitz  # PyMuPDF
+
+    results = []
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            page_rect = page.rect
+            page_area = max(page_rect.width * page_rect.height, 1)
+
+            text = page.get_text("text").strip()
+            text_chars = len(text)
+            # 文本层存在但大量乱码（常见于字体缺少ToUnicode映射）时同样需要OCR
+            garbled = text_chars > 0 and text.count('\ufffd') / text_chars > 0.1
+
+            image_area = 0
+            for info in page.get_image_info():
+                rect = fitz.Rect(info["bbox"]) & page_rect
+                if not rect.is_empty:
+                    image_area += rect.width * rect.height
+            image_ratio = min(image_area / page_area, 1.0)
+
+            if text_chars < min_text_chars or garbled:
+                kind = "scanned"
+            elif image_ratio >= image_ratio_threshold:
+                kind = "figure"
+            else:
+                kind = "text"
+
+            results.append({
+                "page": page.number + 1,
+                "kind": kind,
+                "text_chars": text_chars,
+                "image_ratio": round(image_ratio, 3)
+            })
+    return results
+
+
+def layout_to_markdown(layout: List[Dict[str, Any]]) -> str:
+    """
+    将layout转换为Markdown文本（标题块输出为一级标题）
+
+    Args:
+        layout: layout列表
+
+    Returns:
+        Markdown文本
+    """
+    parts = []
+    for block in layout:
+        text = (block.get("text") or "").strip()
+        if not text:
+            continue
+        parts.append(f"# {text}" if block.get("type") == "title" else text)
+    return "\n\n".join(parts)
@@ -0,0 +1,273 @@
+"""
+页面缩略图与PDF切片模块：服务端用PyMuPDF生成低分辨率页面图片和按页切出的独立PDF
+
+前端不必先通过PDF.js加载整个PDF：先用缩略图显示可翻页的文档，当前页再按需加载只含该页的小PDF。
+- 缩略图：首次请求时同步生成请求的页，其余页在后台按页段并行生成（页数多时使用进程池）；
+  默认输出WebP（需要Pillow，见requirements.txt），环境中没有Pillow时退回JPEG
+- 切片：按页码范围生成独立PDF
+缩略图和单页切片按文档内容哈希缓存在 MINERU_FOLDER/page_cache/<sha256>/ 下，多页切片不缓存。
+"""
+import io
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from flask import current_app
+
+try:
+    from PIL import Image, features
+except ImportError:  # 未安装Pillow时WebP缩略图退回JPEG
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# 缩略图和单页切片的缓存目录（位于MINERU_FOLDER下）
+PAGE_CACHE_DIRNAME = 'page_cache'
+
+# 缩略图格式与文件后缀
+THUMBNAIL_SUFFIXES = {'webp': '.webp', 'jpeg': '.jpg', 'png': '.png'}
+
+# 缩略图宽度（像素）的范围，请求的宽度按该步长取整，避免缓存过多尺寸
+MIN_THUMBNAIL_WIDTH = 32
+MAX_THUMBNAIL_WIDTH = 1600
+THUMBNAIL_WIDTH_STEP = 32
+
+# 每个进程任务的最少页数
+MIN_PAGES_PER_CHUNK = 8
+
+# 正在后台生成的缩略图（文档哈希, 宽度）
+_generating = set()
+_generating_lock = threading.Lock()
+_warned_webp = False
+
+
+def get_page_cache_dir(sha256: str) -> Path:
+    return Path(current_app.config['MINERU_FOLDER']) / PAGE_CACHE_DIRNAME / sha256
+
+
+def get_thumbnail_format() -> str:
+    """
+    读取配置的缩略图格式（webp/jpeg/png），Pillow不可用时WebP退回JPEG
+    """
+    fmt = (current_app.config.get('THUMBNAIL_FORMAT') or 'webp').lower()
+    if fmt == 'jpg':
+        fmt = 'jpeg'
+    if fmt == 'webp' and (Image is None or not features.check('webp')):
+        global _warned_webp
+        if not _warned_webp:
+            _warned_webp = True
+            logger.warning("未安装Pillow或Pillow不支持WebP（见requirements.txt），缩略图使用JPEG")
+        return 'jpeg'
+    return fmt if fmt in THUMBNAIL_SUFFIXES else 'jpeg'
+
+
+def normalize_width(width: Optional[int]) -> int:
+    """
+    把请求的缩略图宽度限制在允许范围内并按步长取整（默认THUMBNAIL_WIDTH）
+    """
+    width = width or current_app.config.get('THUMBNAIL_WIDTH', 160)
+    width = min(max(int(width), MIN_THUMBNAIL_WIDTH), MAX_THUMBNAIL_WIDTH)
+    return max(MIN_THUMBNAIL_WIDTH, round(width / THUMBNAIL_WIDTH_STEP) * THUMBNAIL_WIDTH_STEP)
+
+
+def thumbnail_path(cache_dir: Path, page_no: int, width: int, fmt: str) -> Path:
+    return cache_dir / f"thumb_{width}_{page_no}{THUMBNAIL_SUFFIXES[fmt]}"
+
+
+def _write_atomic(path: Path, data: bytes):
+    # 同一页可能被请求线程和后台任务同时生成，临时文件名不能相同
+    tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _encode(pix, fmt: str, quality: int) -> bytes:
+    if fmt == 'webp':
+        image = Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+        buffer = io.BytesIO()
+        image.save(buffer, 'WEBP', quality=quality, method=4)
+        return buffer.getvalue()
+    if fmt == 'jpeg':
+        return pix.tobytes('jpeg', jpg_quality=quality)
+    return pix.tobytes('png')
+
+
+def render_thumbnails(pdf_path: str, page_numbers: List[int], width: int, fmt: str, quality: int,
+                      cache_dir: str) -> int:
+    """
+    生成指定页的缩略图（可在子进程中运行，不依赖Flask上下文；已存在的跳过）
+
+    Args:
+        pdf_path: PDF文件路径
+        page_numbers: 页码列表（从1开始）
+        width: 缩略图宽度（像素）
+        fmt: 图片格式（webp/jpeg/png）
+        quality: 有损格式的质量（1-100）
+        cache_dir: 缓存目录
+
+    Returns:
+        新生成的缩略图数量
+    """
+    import fitz  # PyMuPDF
+
+    cache_dir = Path(cache_dir)
+    count = 0
+    with fitz.open(pdf_path) as doc:
+        for page_no in page_numbers:
+            path = thumbnail_path(cache_dir, page_no, width, fmt)
+            if path.exists() or not 1 <= page_no <= doc.page_count:
+                continue
+            page = doc[page_no - 1]
+            zoom = width / page.rect.width
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False, colorspace=fitz.csRGB)
+            _write_atomic(path, _encode(pix, fmt, quality))
+            count += 1
+    return count
+
+
+def _page_chunks(page_numbers: List[int], workers: int) -> List[List[int]]:
+    size = max(MIN_PAGES_PER_CHUNK, -(-len(page_numbers) // (workers * 2)))
+    return [page_numbers[start:start + size] for start in range(0, len(page_numbers), size)]
+
+
+def schedule_thumbnails(pdf_path: Path, sha256: str, width: int, page_count: int):
+    """
+    在后台生成文档所有页的缩略图（同一文档和宽度只有一个生成任务）
+
+    Args:
+        pdf_path: PDF文件路径
+        sha256: 文档内容哈希
+        width: 缩略图宽度
+        page_count: 页数
+    """
+    config = current_app.config
+    cache_dir = get_page_cache_dir(sha256)
+    fmt = get_thumbnail_format()
+    missing = [page_no for page_no in range(1, page_count + 1)
+               if not thumbnail_path(cache_dir, page_no, width, fmt).exists()]
+    key = (sha256, width)
+    with _generating_lock:
+        if not missing or key in _generating:
+            return
+        _generating.add(key)
+
+    quality = config.get('THUMBNAIL_QUALITY', 70)
+    max_workers = config.get('THUMBNAIL_WORKERS') or os.cpu_count() or 1
+    parallel = len(missing) >= config.get('THUMBNAIL_PARALLEL_PAGES', 16) and max_workers > 1
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    args = (str(pdf_path), width, fmt, quality, str(cache_dir))
+
+    def run():
+        try:
+            if parallel:
+                chunks = _page_chunks(missing, max_workers)
+                with ProcessPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+                    futures = [executor.submit(render_thumbnails, args[0], chunk, *args[1:]) for chunk in chunks]
+                    count = sum(future.result() for future in futures)
+            else:
+                count = render_thumbnails(args[0], missing, *args[1:])
+            logger.info(f"已生成缩略图: {sha256[:12]} {width}px（{count} 页）")
+        except Exception as e:
+            logger.warning(f"生成缩略图失败: {sha256[:12]}: {e}")
+        finally:
+            with _generating_lock:
+                _generating.discard(key)
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def get_thumbnail(pdf_path: Path, sha256: str, page_no: int, width: int, page_count: int) -> Optional[Path]:
+    """
+    获取一页的缩略图：尚未生成时同步生成该页，并在后台生成其余页
+
+    Returns:
+        缩略图路径；页码超出范围时返回None
+    """
+    if not 1 <= page_no <= page_count:
+        return None
+    cache_dir = get_page_cache_dir(sha256)
+    fmt = get_thumbnail_format()
+    path = thumbnail_path(cache_dir, page_no, width, fmt)
+    if not path.exists():
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        render_thumbnails(str(pdf_path), [page_no], width, fmt, current_app.config.get('THUMBNAIL_QUALITY', 70),
+                          str(cache_dir))
+        schedule_thumbnails(pdf_path, sha256, width, page_count)
+    return path
+
+
+def thumbnail_status(sha256: str, width: int, page_count: int) -> Dict[str, Any]:
+    """
+    缩略图生成进度
+
+    Returns:
+        {"format", "ready_count", "generating"}
+    """
+    cache_dir = get_page_cache_dir(sha256)
+    fmt = get_thumbnail_format()
+    prefix, suffix = f"thumb_{width}_", THUMBNAIL_SUFFIXES[fmt]
+    ready = 0
+    if cache_dir.is_dir():
+        ready = sum(1 for name in os.listdir(cache_dir) if name.startswith(prefix) and name.endswith(suffix))
+    with _generating_lock:
+        generating = (sha256, width) in _generating
+    return {"format": fmt, "ready_count": min(ready, page_count), "generating": generating}
+
+
+def parse_page_range(value: str, page_count: int) -> Optional[tuple]:
+    """
+    解析页码范围（"3" 或 "3-7"，从1开始，含两端）
+
+    Returns:
+        (起始页, 结束页)；格式错误或超出范围时返回None
+    """
+    try:
+        parts = [int(part) for part in str(value).split('-', 1)]
+    except ValueError:
+        return None
+    first, last = parts[0], parts[-1]
+    if not 1 <= first <= last <= page_count:
+        return None
+    return first, last
+
+
+def _render_slice(pdf_path: Path, first: int, last: int) -> bytes:
+    import fitz  # PyMuPDF
+
+    with fitz.open(str(pdf_path)) as src, fitz.open() as doc:
+        doc.insert_pdf(src, from_page=first - 1, to_page=last - 1)
+        # 不生成新的文件ID，同一范围每次切出的字节相同（ETag和Range请求保持一致）
+        return doc.tobytes(garbage=3, deflate=True, no_new_id=True)
+
+
+def slice_pdf(pdf_path: Path, sha256: str, first: int, last: int) -> bytes:
+    """
+    切出页码范围内的页面为独立PDF
+
+    只缓存单页切片（每个文档最多页数个文件）；页码范围的组合数随页数平方增长，多页切片每次重新生成，不缓存
+
+    Args:
+        pdf_path: PDF文件路径
+        sha256: 文档内容哈希
+        first: 起始页（从1开始，含）
+        last: 结束页（含）
+
+    Returns:
+        切片PDF的内容
+    """
+    if first != last:
+        return _render_slice(pdf_path, first, last)
+
+    cache_dir = get_page_cache_dir(sha256)
+    path = cache_dir / f"page_{first}.pdf"
+    if path.exists():
+        return path.read_bytes()
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    data = _render_slice(pdf_path, first, last)
+    _write_atomic(path, data)
+    logger.debug(f"已生成PDF切片: {sha256[:12]} 第 {first} 页（{len(data)} 字节）")
+    return data
@@ -0,0 +1,179 @@
+"""
+阅读顺序重建模块：把跨栏、跨页被拆成多个块的段落合并为一个逻辑段落再翻译
+
+MinerU在段落跨栏或跨页时常输出多个para_blocks，逐块翻译会把一句话拆成几次LLM调用。
+这里按阅读顺序检测续接片段（前一块没有句末标点、后一块以小写字母开头、两块在阅读顺序上相邻），
+合并后整体翻译，再按原文长度把译文分回每个物理块。
+"""
+import re
+from typing import Any, Dict, List, Sequence
+
+# 句末标点（含右引号、右括号包裹的情况由_strip_closers处理）
+TERMINAL_PUNCTUATION = '.!?。！？…:：;；'
+CLOSERS = '"\'”’)）]】」』'
+
+# 只有正文块参与合并（标题、公式、表格等保持独立）
+MERGEABLE_TYPES = {'text', ''}
+
+# 单个逻辑段落的最大字符数，避免长列表等被连成一整段
+MAX_SEGMENT_CHARS = 4000
+
+# 拆分译文时在目标位置附近寻找断点的范围（占译文长度的比例）
+SPLIT_SEARCH_RATIO = 0.15
+
+_CJK = re.compile(r'[぀-ヿ㐀-䶿一-鿿가-힯]')
+_BREAK_CHARS = set(' \t\n，,、；;：:。.！!？?）)】」』”’')
+
+
+def _strip_closers(text: str) -> str:
+    return text.rstrip().rstrip(CLOSERS)
+
+
+def _is_cjk(char: str) -> bool:
+    return bool(_CJK.match(char))
+
+
+def _follows(prev: Dict[str, Any], block: Dict[str, Any]) -> bool:
+    # 同页：下一块在同栏下方或在右侧的下一栏；跨页：只允许紧邻的下一页
+    prev_page = prev.get('page') or 0
+    page = block.get('page') or 0
+    if page == prev_page + 1:
+        return True
+    if page != prev_page:
+        return False
+    prev_box = prev.get('bbox') or []
+    box = block.get('bbox') or []
+    if len(prev_box) < 4 or len(box) < 4:
+        return True
+    below = box[1] >= prev_box[1]
+    next_column = box[0] >= prev_box[2] - (prev_box[2] - prev_box[0]) * 0.1
+    return below or next_column
+
+
+def is_continuation(prev: Dict[str, Any], block: Dict[str, Any]) -> bool:
+    """
+    判断block是否是prev所在段落的续接片段
+
+    Args:
+        prev: 阅读顺序中的前一个文本块
+        block: 当前文本块
+
+    Returns:
+        是否应与前一块合并
+    """
+    if (prev.get('type') or '') not in MERGEABLE_TYPES or (block.get('type') or '') not in MERGEABLE_TYPES:
+        return False
+    prev_text = _strip_closers(prev.get('text') or '')
+    text = (block.get('text') or '').lstrip()
+    if not prev_text or not text:
+        return False
+    if prev_text[-1] in TERMINAL_PUNCTUATION:
+        return False
+    if not _follows(prev, block):
+        return False
+
+    first = text[0]
+    if first.islower():
+        return True
+    # 中日韩文本没有大小写，前后都是CJK字符且前一块没有句末标点时视为续接
+    return _is_cjk(prev_text[-1]) and _is_cjk(first)
+
+
+def build_reading_segments(layout: Sequence[Dict[str, Any]], max_chars: int = MAX_SEGMENT_CHARS) -> List[List[int]]:
+    """
+    按阅读顺序把续接片段分组
+
+    Args:
+        layout: layout数组（顺序即阅读顺序）
+        max_chars: 单个逻辑段落的最大字符数
+
+    Returns:
+        块序号分组，每组为一个逻辑段落；空文本块单独成组
+    """
+    segments: List[List[int]] = []
+    current: List[int] = []
+    current_chars = 0
+
+    for idx, block in enumerate(layout):
+        text = (block.get('text') or '').strip()
+        if not text:
+            segments.append([idx])
+            continue
+        if current:
+            prev = layout[current[-1]]
+            if is_continuation(prev, block) and current_chars + len(text) <= max_chars:
+                current.append(idx)
+                current_chars += len(text)
+                continue
+            segments.append(current)
+        current = [idx]
+        current_chars = len(text)
+
+    if current:
+        segments.append(current)
+    segments.sort(key=lambda group: group[0])
+    return segments
+
+
+def join_fragments(texts: Sequence[str]) -> str:
+    """
+    把片段拼接为一个段落：行尾连字符断词直接相连，CJK之间不加空格，其余以空格连接
+    """
+    result = ''
+    for text in texts:
+        text = text.strip()
+        if not result:
+            result = text
+        elif result.endswith('-') and text[:1].islower():
+            result = result[:-1] + text
+        elif _is_cjk(result[-1]) and _is_cjk(text[0]):
+            result += text
+        else:
+            result += ' ' + text
+    return result
+
+
+def split_translation(translated: str, sources: Sequence[str]) -> List[str]:
+    """
+    按各片段原文长度的比例把译文分回每个片段，断点尽量落在空白或标点之后
+
+    Args:
+        translated: 合并段落的译文
+        sources: 各片段原文
+
+    Returns:
+        与sources等长的译文片段列表
+    """
+    translated = translated.strip()
+    if len(sources) <= 1:
+        return [translated]
+
+    weights = [max(len(source.strip()), 1) for source in sources]
+    total = sum(weights)
+    length = len(translated)
+    window = max(1, int(length * SPLIT_SEARCH_RATIO))
+
+    cuts = []
+    cumulative = 0
+    previous = 0
+    for weight in weights[:-1]:
+        cumulative += weight
+        target = round(length * cumulative / total)
+        best = None
+        for offset in range(window + 1):
+            for pos in (target - offset, target + offset):
+                if previous < pos < length and translated[pos - 1] in _BREAK_CHARS:
+                    best = pos
+                    break
+            if best is not None:
+                break
+        cut = best if best is not None else min(max(target, previous), length)
+        cuts.append(cut)
+        previous = cut
+
+    parts = []
+    start = 0
+    for cut in cuts + [length]:
+        parts.append(translated[start:cut].strip())
+        start = cut
+    return parts
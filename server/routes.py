@@ -1,15 +1,20 @@
 """
 API路由模块：定义所有REST API端点
 """
-import json
+import hashlib
+import io
 import logging
 import os
+import re
+import threading
 import time
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from flask import Blueprint, request, jsonify, send_from_directory, current_app, Response, stream_with_context
+from flask import Blueprint, request, jsonify, send_file, send_from_directory, current_app, Response, stream_with_context
 from werkzeug.utils import secure_filename
-from server.mineru_parser import parse_mineru_layout
+from server.layout_artifact import load_layout, get_layout_artifact, load_columnar_file, get_layout_cache
+from server.mineru_parser import get_parse_stats
+from server.spatial_index import get_spatial_index, parse_float_args
 from server.mineru_api import (
     create_extract_task, 
     get_task_result, 
@@ -21,9 +26,66 @@ from server.mineru_api import (
     download_and_extract_zip
 )
 from server.translator_llm import translate_mineru_json, translate_with_llm
+from server.pdf_local import build_local_layout, load_local_layout, merge_local_layout, get_local_layout_path
+from server.page_geometry import build_page_sizes, load_page_sizes
+from server.reading_order import build_reading_segments, join_fragments, split_translation
+from server.search_index import index_document, index_translations, indexed_documents, search as search_library
+from server.mineru_shards import (
+    should_shard,
+    submit_sharded_parse,
+    load_shard_manifest,
+    collect_sharded_result,
+    should_route_ocr,
+    plan_ocr_routing,
+    submit_selective_parse,
+    complete_local_only
+)
+from server.disk_quota import enforce_quota, get_usage, track_result
+from server.document_store import (
+    save_upload_content_addressed,
+    register_pending,
+    register_completed,
+    lookup_document,
+    lookup_task,
+    list_documents,
+    load_cached_result,
+    get_task_sha256
+)
+from server.block_alignment import (
+    build_alignment_index,
+    get_alignment_path,
+    get_translated_chunks_path,
+    save_alignment_index,
+    load_alignment_index,
+    save_translated_chunks,
+    load_translated_chunks,
+    align_block_translations,
+    map_block_translations
+)
+from server.segment_store import TARGET_LANG_PATTERN, get_segment_store, translate_chunk_with_segments
+from server.translation_log import get_translation_log
+from server.catalog import get_translation, get_upload, query_documents, record_translation, record_upload
+from server import fast_json
+from server.http_cache import apply_cache_headers, file_etag, is_content_addressed, make_conditional_json
+from server.storage_sync import (
+    ensure_local_result,
+    fetch_file,
+    make_publisher,
+    publish_files_in_background,
+    publish_result_in_background
+)
+from server.pdf_export import EXPORT_MODES, collect_page_blocks, export_key, export_pdf, get_exports_folder
+from server.pdf_pages import (
+    get_thumbnail, normalize_width, parse_page_range, schedule_thumbnails, slice_pdf, thumbnail_status
+)
+from server.stored_files import get_compression_codec, read_stored_json, send_stored, stored_exists, write_stored_text
 
 logger = logging.getLogger(__name__)
 
+# 文档内容哈希和任务ID的允许格式（会用于拼接存储路径）
+SHA256_PATTERN = re.compile(r'[0-9a-f]{64}')
+TASK_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]+')
+
 api_bp = Blueprint('api', __name__)
 
 
@@ -61,6 +123,98 @@ def get_standard_response(success: bool, message: str = "", data: dict = None):
     return jsonify(response)
 
 
+def parse_page_ranges(spec: str) -> set:
+    """
+    解析页码范围参数，如 "1-5"、"3"、"1-3,8,10-12"
+    
+    Args:
+        spec: 页码范围字符串
+    
+    Returns:
+        页码集合（从1开始）
+    
+    Raises:
+        ValueError: 格式错误
+    """
+    pages = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = (int(v) for v in part.split('-', 1))
+        else:
+            start = end = int(part)
+        if start < 1 or end < start:
+            raise ValueError(f"无效的页码范围: {part}")
+        pages.update(range(start, end + 1))
+    if not pages:
+        raise ValueError("页码范围为空")
+    return pages
+
+
+def parse_layout_query() -> dict:
+    """
+    读取layout裁剪参数（查询参数或表单字段）
+    
+    - pages: 只返回指定页的块，如 "1-5"
+    - fields: 每个块只保留的字段，如 "block_id,page,bbox"
+    - include_mineru_data: 为true时才返回原始mineru_data
+    
+    Raises:
+        ValueError: 参数格式错误
+    """
+    pages_spec = request.values.get('pages')
+    fields_spec = request.values.get('fields')
+    try:
+        pages = parse_page_ranges(pages_spec) if pages_spec else None
+    except ValueError as e:
+        raise ValueError(f"pages参数格式错误: {e}")
+    fields = [field.strip() for field in fields_spec.split(',') if field.strip()] if fields_spec else None
+    return {
+        "pages": pages,
+        "pages_spec": pages_spec,
+        "fields": fields,
+        "include_mineru_data": request.values.get('include_mineru_data', 'false').lower() == 'true'
+    }
+
+
+def shape_layout_result(data: dict, query: dict) -> dict:
+    """
+    按裁剪参数处理任务结果中的layout/local_layout，并按需去掉原始mineru_data
+    
+    Args:
+        data: 任务结果
+        query: parse_layout_query的结果
+    
+    Returns:
+        新的结果字典
+    """
+    data = dict(data)
+    if not query['include_mineru_data']:
+        data.pop('mineru_data', None)
+    
+    pages = query['pages']
+    fields = query['fields']
+    for key in ('layout', 'local_layout'):
+        blocks = data.get(key)
+        if not isinstance(blocks, list):
+            continue
+        if pages is not None:
+            if key == 'layout':
+                data['layout_pages'] = sorted({block.get('page') for block in blocks if block.get('page') is not None})
+                data['total_layout_count'] = len(blocks)
+            blocks = [block for block in blocks if block.get('page') in pages]
+        if fields:
+            blocks = [{field: block[field] for field in fields if field in block} for block in blocks]
+        data[key] = blocks
+        if key == 'layout' and 'layout_count' in data:
+            data['layout_count'] = len(blocks)
+    if pages is not None:
+        data['pages'] = query['pages_spec']
+    return data
+
+
 def chunk_markdown_text(text: str, max_chars: int = 1800) -> list:
     if not text:
         return []
@@ -104,27 +258,355 @@ def format_sse(event: str, data: dict) -> str:
     """
     构建符合SSE协议的消息字符串
     """
-    payload = json.dumps(data, ensure_ascii=False)
+    payload = fast_json.dumps(data)
     return f"event: {event}\ndata: {payload}\n\n"
 
 
+def merge_with_local_layout(layout: list, sha256: str = None) -> list:
+    """
+    将MinerU layout与本地PyMuPDF layout合并，MinerU未覆盖的页使用本地结果
+    
+    Args:
+        layout: MinerU解析得到的layout
+        sha256: 文档内容哈希（用于查找本地layout缓存）
+    
+    Returns:
+        合并后的layout；未启用合并或没有本地结果时原样返回
+    """
+    if not sha256 or not current_app.config.get('LOCAL_LAYOUT_MERGE', True):
+        return layout
+    return merge_local_layout(layout, load_local_layout(sha256))
+
+
+def get_entry_layout_artifact(entry: dict):
+    """
+    读取索引条目对应的列式layout；结果目录已按磁盘配额回收时直接使用保留的layout产物，
+    只有产物失效（如页面尺寸变化）时才恢复结果目录并重新解析
+    
+    Args:
+        entry: lookup_task/lookup_document返回的索引条目（可以是未恢复的）
+    
+    Returns:
+        ColumnarLayout
+    """
+    try:
+        return get_layout_artifact(entry['json_path'], sha256=entry.get('sha256'))
+    except FileNotFoundError:
+        if not ensure_local_result(entry['task_id']):
+            raise
+        return get_layout_artifact(entry['json_path'], sha256=entry.get('sha256'))
+
+
+def load_document_layout(json_path, sha256: str = None) -> list:
+    """
+    读取MinerU结果的layout（bbox已换算为页面坐标），并合并本地layout
+    
+    Args:
+        json_path: MinerU JSON文件路径
+        sha256: 文档内容哈希（用于页面尺寸和本地layout）
+    
+    Returns:
+        layout列表
+    """
+    return merge_with_local_layout(load_layout(json_path, sha256=sha256), sha256)
+
+
+def build_cached_result(entry: dict, include_mineru_data: bool = False) -> dict:
+    """
+    根据文档索引条目构建与任务完成时一致的响应数据
+    
+    Args:
+        entry: document_store中的索引条目（不读取mineru_data时可以是未恢复的，full_md此时可能为None）
+        include_mineru_data: 是否读取原始mineru_data（大文件较慢，默认不读取）
+    
+    Returns:
+        包含task_id、layout、page_sizes、mineru_data和full_md的字典
+    """
+    cached = load_cached_result(entry, include_mineru_data=include_mineru_data)
+    layout = merge_with_local_layout(get_entry_layout_artifact(entry).to_dicts(), entry.get('sha256'))
+    return {
+        "task_id": entry['task_id'],
+        "state": "done",
+        "deduplicated": True,
+        "sha256": entry.get('sha256'),
+        "layout_count": len(layout),
+        "layout": layout,
+        "page_sizes": load_page_sizes(entry.get('sha256')),
+        "mineru_data": cached['mineru_data'],
+        "full_md": cached['full_md'],
+        "json_path": entry.get('json_path'),
+        "extract_dir": entry.get('extract_dir'),
+        "full_md_path": entry.get('full_md_path'),
+        "images_dir": entry.get('images_dir')
+    }
+
+
+def build_sharded_batch_result(batch_id: str, manifest: dict, extract_results: list, include_mineru_data: bool = True) -> dict:
+    """
+    构建分片批量任务的查询结果，所有已完成分片（及本地解析页）的合并结果作为layout返回
+    
+    Args:
+        batch_id: 批量任务ID
+        manifest: 分片清单
+        extract_results: MinerU批量查询返回的extract_result列表
+        include_mineru_data: 是否读取合并后的原始mineru_data
+    
+    Returns:
+        批量任务状态和（部分）结果
+    """
+    sharded = collect_sharded_result(batch_id, manifest, extract_results)
+    merged = sharded.get('merged')
+    
+    layout = []
+    mineru_data = None
+    if merged:
+        mineru_data = merged.get('mineru_data') if include_mineru_data else None
+        if mineru_data is None and include_mineru_data:
+            mineru_data = read_stored_json(merged['json_path'])
+        layout = load_layout(merged['json_path'], sha256=manifest.get('sha256'))
+        
+        if sharded['state'] == 'done':
+            register_and_index_result(batch_id, merged, sha256=manifest.get('sha256'))
+    
+    # 尚未完成的分片使用本地解析结果补齐
+    layout = merge_with_local_layout(layout, manifest.get('sha256'))
+    
+    return {
+        "batch_id": batch_id,
+        "state": sharded['state'],
+        "file_name": manifest.get('filename', ''),
+        "err_msg": sharded['err_msg'],
+        "extract_progress": sharded['extract_progress'],
+        "sharded": True,
+        "shards": sharded['shards'],
+        "readable_pages": sharded['readable_pages'],
+        "local_pages": sharded['local_pages'],
+        "layout": layout,
+        "layout_count": len(layout),
+        "page_sizes": load_page_sizes(manifest.get('sha256')),
+        "mineru_data": mineru_data
+    }
+
+
+def load_task_layout(task_id: str) -> list:
+    """
+    读取任务对应的layout（与任务查询接口返回的block_id一致）
+    
+    Args:
+        task_id: 任务ID或batch_id
+    
+    Returns:
+        layout列表；找不到解析结果时返回空列表
+    """
+    entry = lookup_task(task_id, rehydrate=False)
+    if not entry:
+        return []
+    return merge_with_local_layout(get_entry_layout_artifact(entry).to_dicts(), entry.get('sha256'))
+
+
+def get_task_page_layout(task_id: str, page_no: int):
+    """
+    获取任务中某一页所在的列式layout（MinerU结果优先，未覆盖的页使用本地layout）
+    
+    Args:
+        task_id: 任务ID或batch_id
+        page_no: 页码（从1开始）
+    
+    Returns:
+        ColumnarLayout；任务和本地layout都不存在时返回None
+    """
+    entry = lookup_task(task_id, rehydrate=False)
+    sha256 = entry.get('sha256') if entry else get_task_sha256(task_id)
+    if entry:
+        layout = get_entry_layout_artifact(entry)
+        if len(layout.page_slice(page_no)) or not current_app.config.get('LOCAL_LAYOUT_MERGE', True):
+            return layout
+    if not sha256:
+        return None
+    return load_columnar_file(get_local_layout_path(sha256))
+
+
+def index_block_alignment(task_id: str, full_path: Path, raw_text: str, chunks: list):
+    """
+    在分块时建立layout块与full.md段落的对齐索引（失败不影响翻译）
+    
+    Args:
+        task_id: 任务ID或batch_id
+        full_path: full.md路径
+        raw_text: full.md内容
+        chunks: 分块结果
+    """
+    try:
+        layout = load_task_layout(task_id)
+        if layout:
+            save_alignment_index(full_path, build_alignment_index(raw_text, chunks, layout))
+    except Exception as e:
+        logger.warning(f"建立对齐索引失败: {e}")
+
+
+def register_and_index_result(task_id: str, zip_info: dict, sha256: str = None):
+    """
+    登记已完成的MinerU结果，并把原文加入全文检索索引（索引失败不影响解析流程）
+    
+    Args:
+        task_id: 任务ID或batch_id
+        zip_info: 结果路径信息（含json_path）
+        sha256: 文档内容哈希（可选）
+    
+    Returns:
+        文档哈希；无法确定时返回None
+    """
+    sha256 = register_completed(task_id, zip_info, sha256=sha256)
+    json_path = zip_info.get('json_path')
+    if json_path and current_app.config.get('SEARCH_ENABLED', True):
+        try:
+            entry = lookup_task(task_id, rehydrate=False) or {}
+            index_document(
+                resolve_document_key(task_id, sha256),
+                load_document_layout(json_path, sha256),
+                task_id=task_id,
+                sha256=sha256,
+                title=entry.get('original_filename')
+            )
+        except Exception as e:
+            logger.warning(f"更新全文检索索引失败: {e}")
+    track_result(task_id)
+    publish_result_in_background(task_id)
+    return sha256
+
+
+def index_full_translation(task_id: str, target_lang: str, full_path: Path, translated_chunks: list):
+    """
+    全文翻译完成后，按对齐索引把块级译文加入全文检索索引（失败不影响翻译）
+    
+    Args:
+        task_id: 任务ID或batch_id
+        target_lang: 目标语言
+        full_path: full.md路径
+        translated_chunks: 分块译文
+    """
+    if not current_app.config.get('SEARCH_ENABLED', True):
+        return
+    try:
+        index = load_alignment_index(full_path)
+        if index and len(index.get('chunks', [])) == len(translated_chunks):
+            pages = {block.get('block_id'): block.get('page') for block in load_task_layout(task_id)}
+            passages = [
+                {"page": pages.get(block_id), "block_id": block_id, "text": text}
+                for block_id, text in map_block_translations(index, translated_chunks).items()
+            ]
+        else:
+            # 没有对齐索引时按分块入库（无页码和block_id）
+            passages = [{"text": chunk} for chunk in translated_chunks]
+        index_translations(resolve_document_key(task_id), target_lang, passages, task_id=task_id)
+    except Exception as e:
+        logger.warning(f"更新译文检索索引失败: {e}")
+
+
+def record_full_translation(task_id: str, archive_name: str, translation_id: str, target_lang: str,
+                            model: str, total_chunks: int, failed_chunks: int = 0):
+    """
+    在文档目录中记录一次全文翻译（按分块统计，记录失败不影响翻译）
+    """
+    try:
+        record_translation(
+            archive_name, 'full',
+            doc_key=resolve_document_key(task_id),
+            task_id=task_id,
+            translation_id=translation_id,
+            target_lang=target_lang,
+            model=model,
+            stats={
+                "translated_count": total_chunks - failed_chunks,
+                "skipped_count": 0,
+                "failed_count": failed_chunks,
+                "total_count": total_chunks
+            }
+        )
+    except Exception as e:
+        logger.warning(f"记录翻译信息失败: {e}")
+
+
+def translation_outputs(full_path: Path, target_lang: str, archive_file: Path) -> list:
+    """
+    全文翻译写入的文件（译文、分块译文、对齐索引和翻译归档），用于发布到共享存储后端
+    """
+    return [
+        full_path.parent / f'full_translated_{target_lang}.md',
+        get_translated_chunks_path(full_path, target_lang),
+        get_alignment_path(full_path),
+        archive_file
+    ]
+
+
+def load_full_translation(task_id: str, target_lang: str) -> tuple:
+    """
+    读取任务全文翻译的对齐索引和分块译文（结果目录已回收时从归档恢复；
+    全文翻译在其他节点完成时，本地缺少的译文文件从存储后端获取）
+    
+    Args:
+        task_id: 任务ID或batch_id
+        target_lang: 目标语言
+    
+    Returns:
+        (对齐索引, 分块译文)；尚未全文翻译时对应项为None
+    
+    Raises:
+        ValueError: task_id或target_lang格式不合法（二者会用于拼接路径）
+    """
+    if not isinstance(task_id, str) or not TASK_ID_PATTERN.fullmatch(task_id):
+        raise ValueError(f"无效的task_id: {task_id}")
+    if not isinstance(target_lang, str) or not TARGET_LANG_PATTERN.fullmatch(target_lang):
+        raise ValueError(f"无效的目标语言: {target_lang}")
+    ensure_local_result(task_id)
+    full_path = Path(current_app.config['MINERU_FOLDER']) / task_id / 'full.md'
+    fetch_file(get_alignment_path(full_path))
+    fetch_file(get_translated_chunks_path(full_path, target_lang))
+    return load_alignment_index(full_path), load_translated_chunks(full_path, target_lang)
+
+
+def resolve_document_key(task_id: str = None, sha256: str = None) -> str:
+    """
+    确定段落译文存储使用的文档标识：优先内容哈希（相同PDF的不同任务共用），其次task_id
+    
+    Raises:
+        ValueError: sha256或task_id格式不合法（二者会用于拼接存储路径）
+    """
+    if sha256:
+        if not isinstance(sha256, str) or not SHA256_PATTERN.fullmatch(sha256):
+            raise ValueError(f"无效的sha256: {sha256}")
+        return sha256
+    if not task_id:
+        return None
+    if not isinstance(task_id, str) or not TASK_ID_PATTERN.fullmatch(task_id):
+        raise ValueError(f"无效的task_id: {task_id}")
+    return get_task_sha256(task_id) or task_id
+
+
 def translate_full_markdown(task_id: str, target_lang: str = 'zh', model: str = None, translation_id: str = None, timestamp: int = None) -> tuple:
     mineru_folder = Path(current_app.config['MINERU_FOLDER'])
+    # 先校验task_id和目标语言，二者会用于拼接路径
+    store = get_segment_store(resolve_document_key(task_id), target_lang)
+    ensure_local_result(task_id)
     full_path = mineru_folder / task_id / 'full.md'
     if not full_path.exists():
         raise FileNotFoundError("未找到full.md")
     
     raw_text = full_path.read_text(encoding='utf-8')
     chunks = chunk_markdown_text(raw_text)
+    index_block_alignment(task_id, full_path, raw_text, chunks)
     translated_chunks = []
     
     for chunk in chunks:
         if not chunk.strip():
             translated_chunks.append(chunk)
         else:
-            translated_chunks.append(
-                translate_with_llm(chunk, target_lang=target_lang, model=model)
+            translated_chunk, _ = translate_chunk_with_segments(
+                chunk, store, lambda text: translate_with_llm(text, target_lang=target_lang, model=model)
             )
+            translated_chunks.append(translated_chunk)
+    if store:
+        store.save()
     
     translated_text = '\n\n'.join(translated_chunks)
     
@@ -134,12 +616,17 @@ def translate_full_markdown(task_id: str, target_lang: str = 'zh', model: str =
         translation_id = f"trans_{timestamp}"
     
     output_path = full_path.parent / f'full_translated_{target_lang}.md'
-    output_path.write_text(translated_text, encoding='utf-8')
+    codec = get_compression_codec()
+    write_stored_text(output_path, translated_text, codec)
+    save_translated_chunks(full_path, target_lang, translated_chunks)
+    index_full_translation(task_id, target_lang, full_path, translated_chunks)
     
     translations_folder = mineru_folder / 'translations'
     translations_folder.mkdir(parents=True, exist_ok=True)
     archive_file = translations_folder / f"full_{translation_id}_{target_lang}_{timestamp}.md"
-    archive_file.write_text(translated_text, encoding='utf-8')
+    write_stored_text(archive_file, translated_text, codec)
+    record_full_translation(task_id, archive_file.name, translation_id, target_lang, model, len(chunks))
+    publish_files_in_background(translation_outputs(full_path, target_lang, archive_file))
     
     return translated_text, archive_file.name, len(chunks)
 
@@ -150,6 +637,9 @@ def translate_full_markdown_stream(task_id: str, target_lang: str = 'zh', model:
     将full.md按块翻译，并通过SSE实时推送进度（多并发版本）
     """
     mineru_folder = Path(current_app.config['MINERU_FOLDER'])
+    # 先校验task_id和目标语言，二者会用于拼接路径
+    store = get_segment_store(resolve_document_key(task_id), target_lang)
+    ensure_local_result(task_id)
     full_path = mineru_folder / task_id / 'full.md'
     if not full_path.exists():
         raise FileNotFoundError("未找到full.md")
@@ -157,6 +647,7 @@ def translate_full_markdown_stream(task_id: str, target_lang: str = 'zh', model:
     raw_text = full_path.read_text(encoding='utf-8')
     chunks = chunk_markdown_text(raw_text)
     total_chunks = len(chunks)
+    index_block_alignment(task_id, full_path, raw_text, chunks)
     
     if timestamp is None:
         timestamp = int(time.time())
@@ -185,7 +676,11 @@ def translate_full_markdown_stream(task_id: str, target_lang: str = 'zh', model:
         with app.app_context():
             try:
                 logger.info(f"调用LLM翻译Markdown块 [{chunk_number}/{total_chunks}]，长度={len(chunk)}")
-                translated_chunk = translate_with_llm(chunk, target_lang=target_lang, model=model)
+                translated_chunk, reused = translate_chunk_with_segments(
+                    chunk, store, lambda text: translate_with_llm(text, target_lang=target_lang, model=model)
+                )
+                if reused:
+                    logger.info(f"Markdown块 [{chunk_number}/{total_chunks}] 复用了 {reused} 个已翻译段落")
                 return idx, translated_chunk, "success", ""
             except Exception as chunk_error:
                 error_message = str(chunk_error)
@@ -195,6 +690,7 @@ def translate_full_markdown_stream(task_id: str, target_lang: str = 'zh', model:
     def event_stream():
         translated_chunks = [None] * total_chunks  # 预分配列表，保持顺序
         completed_count = 0
+        failed_count = 0
         
         try:
             init_payload = {
@@ -220,6 +716,8 @@ def translate_full_markdown_stream(task_id: str, target_lang: str = 'zh', model:
                     idx, translated_chunk, status, error_message = future.result()
                     translated_chunks[idx] = translated_chunk
                     completed_count += 1
+                    if status == "failed":
+                        failed_count += 1
                     
                     # 实时推送进度
                     progress_payload = {
@@ -242,8 +740,16 @@ def translate_full_markdown_stream(task_id: str, target_lang: str = 'zh', model:
             
             # 按顺序拼接所有翻译结果
             translated_text = '\n\n'.join(translated_chunks)
-            output_path.write_text(translated_text, encoding='utf-8')
-            archive_file.write_text(translated_text, encoding='utf-8')
+            codec = get_compression_codec()
+            write_stored_text(output_path, translated_text, codec)
+            write_stored_text(archive_file, translated_text, codec)
+            save_translated_chunks(full_path, target_lang, translated_chunks)
+            index_full_translation(task_id, target_lang, full_path, translated_chunks)
+            if store:
+                store.save()
+            record_full_translation(task_id, archive_file.name, translation_id, target_lang, model,
+                                    total_chunks, failed_count)
+            publish_files_in_background(translation_outputs(full_path, target_lang, archive_file))
             
             complete_payload = {
                 "task_id": task_id,
@@ -263,9 +769,13 @@ def translate_full_markdown_stream(task_id: str, target_lang: str = 'zh', model:
 @api_bp.route('/health', methods=['GET'])
 def health_check():
     """
-    健康检查端点
+    健康检查端点（附带layout缓存命中和各格式解析耗时统计）
     """
-    return get_standard_response(True, "服务运行正常", {"status": "ok"})
+    return get_standard_response(True, "服务运行正常", {
+        "status": "ok",
+        "layout_cache": get_layout_cache().stats(),
+        "layout_parse": get_parse_stats()
+    })
 
 
 @api_bp.route('/upload', methods=['POST'])
@@ -273,6 +783,10 @@ def upload_file():
     """
     上传PDF或JSON文件
     
+    请求参数:
+        - file: 上传的文件
+        - include_mineru_data: 文档已解析过时，为true才返回原始mineru_data（默认不返回）
+    
     返回:
         {
             "success": true/false,
@@ -298,21 +812,45 @@ def upload_file():
                 {}
             ), 400
         
-        # 保存文件
-        filename = secure_filename(file.filename)
+        # 按内容哈希保存文件（相同内容只保存一份，不会覆盖同名的其他文件）
+        original_filename = secure_filename(file.filename)
         upload_folder = Path(current_app.config['UPLOAD_FOLDER'])
-        filepath = upload_folder / filename
+        saved = save_upload_content_addressed(file, upload_folder)
+        publish_files_in_background([saved['filepath']])
+        logger.info(f"文件上传成功: {original_filename} -> {saved['filename']}")
         
-        file.save(str(filepath))
-        logger.info(f"文件上传成功: {filename}")
+        response_data = {
+            "filename": saved['filename'],
+            "filepath": str(saved['filepath']),
+            "original_filename": original_filename,
+            "sha256": saved['sha256'],
+            "size": saved['size']
+        }
+        
+        # 如果相同内容的文档已解析过，直接返回已有结果（原始mineru_data仅在请求时读取）
+        include_mineru_data = request.values.get('include_mineru_data', 'false').lower() == 'true'
+        entry = lookup_document(saved['sha256'], rehydrate=include_mineru_data)
+        if entry:
+            cached = build_cached_result(entry, include_mineru_data)
+            if not include_mineru_data:
+                cached.pop('mineru_data', None)
+            response_data.update(cached)
+        else:
+            # 否则先用PyMuPDF从文本层提取layout，MinerU结果返回前即可显示
+            local_layout = build_local_layout(saved['filepath'], saved['sha256'])
+            response_data["page_sizes"] = build_page_sizes(saved['filepath'], saved['sha256'])
+            if local_layout is not None:
+                response_data["local_layout"] = local_layout
+                response_data["local_layout_count"] = len(local_layout)
+        
+        page_sizes = response_data.get('page_sizes')
+        record_upload(saved['sha256'], saved['filename'], saved['size'], original_filename,
+                      pages=len(page_sizes) if page_sizes else None)
         
         return get_standard_response(
             True, 
             "文件上传成功", 
-            {
-                "filename": filename,
-                "filepath": str(filepath)
-            }
+            response_data
         )
         
     except Exception as e:
@@ -330,6 +868,8 @@ def parse_pdf_with_api():
         - file_url: 文件URL（可选，如果提供则直接使用，否则先上传）
         - wait: 是否等待任务完成（默认: true）
         - model_version: 模型版本（vlm 或 pipeline，默认从配置读取）
+        - pages / fields: 只返回指定页、指定字段的layout（同/task接口）
+        - include_mineru_data: 为true时才返回原始mineru_data（默认不返回）
     
     返回:
         {
@@ -339,10 +879,15 @@ def parse_pdf_with_api():
                 "task_id": "...",
                 "state": "done/pending/running",
                 "layout": [...],
-                "mineru_data": {...}
+                "mineru_data": {...}  # 仅include_mineru_data=true时返回
             }
         }
     """
+    try:
+        layout_query = parse_layout_query()
+    except ValueError as e:
+        return get_standard_response(False, str(e), {}), 400
+    
     try:
         file_url = request.form.get('file_url')
         wait_for_completion = request.form.get('wait', 'true').lower() == 'true'
@@ -350,6 +895,7 @@ def parse_pdf_with_api():
         
         pdf_path = None
         filename = None
+        sha256 = None
         
         # 如果上传了新文件
         if 'file' in request.files:
@@ -357,17 +903,101 @@ def parse_pdf_with_api():
             if file.filename and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
                 upload_folder = Path(current_app.config['UPLOAD_FOLDER'])
-                pdf_path = upload_folder / filename
-                file.save(str(pdf_path))
+                saved = save_upload_content_addressed(file, upload_folder)
+                publish_files_in_background([saved['filepath']])
+                pdf_path = saved['filepath']
+                sha256 = saved['sha256']
+                
+                # 相同内容已有完成的解析结果，直接返回，不再调用MinerU
+                entry = lookup_document(sha256, rehydrate=layout_query['include_mineru_data'])
+                if entry:
+                    logger.info(f"命中已解析文档: {filename} -> {entry['task_id']}")
+                    return get_standard_response(
+                        True,
+                        "文档已解析过，直接返回已有结果",
+                        shape_layout_result(build_cached_result(entry, layout_query['include_mineru_data']), layout_query)
+                    )
+        
+        # MinerU解析期间先返回本地提取的layout
+        local_layout = build_local_layout(pdf_path, sha256) if pdf_path else None
+        # 入库时记录页面尺寸，MinerU结果的bbox据此换算为页面坐标
+        page_sizes = build_page_sizes(pdf_path, sha256) if pdf_path else None
+        if pdf_path:
+            record_upload(sha256, saved['filename'], saved['size'], filename,
+                          pages=len(page_sizes) if page_sizes else None)
         
         # 如果没有提供file_url，使用批量上传接口
         if not file_url:
             if not pdf_path or not pdf_path.exists():
                 return get_standard_response(False, "请提供file_url或上传PDF文件", {}), 400
             
+            # 选择性OCR：只有扫描页/图片页提交MinerU，文本页使用本地解析结果
+            try:
+                if local_layout is not None and should_route_ocr(request.form.get('routing')):
+                    routing = plan_ocr_routing(str(pdf_path))
+                    if not routing['scanned_pages'] and not routing['figure_pages']:
+                        zip_info = complete_local_only(sha256, local_layout)
+                        register_pending(zip_info['task_id'], sha256, filename)
+                        register_and_index_result(zip_info['task_id'], zip_info)
+                        return get_standard_response(
+                            True,
+                            "所有页面均有文本层，已使用本地解析结果",
+                            shape_layout_result(
+                                build_cached_result(lookup_document(sha256), layout_query['include_mineru_data']),
+                                layout_query
+                            )
+                        )
+                    
+                    manifest = submit_selective_parse(str(pdf_path), filename, sha256, model_version, routing)
+                    batch_id = manifest['batch_id']
+                    register_pending(batch_id, sha256, filename)
+                    return get_standard_response(
+                        True,
+                        f"{len(routing['local_pages'])} 页已本地解析，"
+                        f"{len(routing['scanned_pages']) + len(routing['figure_pages'])} 页提交MinerU",
+                        shape_layout_result({
+                            "batch_id": batch_id,
+                            "state": "waiting-file",
+                            "sharded": True,
+                            "routing": routing,
+                            "shard_count": len(manifest['shards']),
+                            "total_pages": manifest['total_pages'],
+                            "local_layout": local_layout,
+                            "page_sizes": page_sizes,
+                            "message": "请使用batch_id查询解析结果"
+                        }, layout_query)
+                    )
+            except Exception as e:
+                logger.error(f"选择性OCR提交失败: {e}", exc_info=True)
+                return get_standard_response(False, f"选择性OCR提交失败: {str(e)}", {}), 500
+            
+            # 超大PDF按页拆分为多个分片并发解析
+            try:
+                if should_shard(str(pdf_path), request.form.get('sharded')):
+                    manifest = submit_sharded_parse(str(pdf_path), filename, sha256, model_version)
+                    batch_id = manifest['batch_id']
+                    register_pending(batch_id, sha256, filename)
+                    return get_standard_response(
+                        True,
+                        f"文件已拆分为 {len(manifest['shards'])} 个分片并上传，系统将并发解析",
+                        shape_layout_result({
+                            "batch_id": batch_id,
+                            "state": "waiting-file",
+                            "sharded": True,
+                            "shard_count": len(manifest['shards']),
+                            "total_pages": manifest['total_pages'],
+                            "local_layout": local_layout,
+                            "page_sizes": page_sizes,
+                            "message": "请使用batch_id查询解析结果，已完成的前几页可先行阅读"
+                        }, layout_query)
+                    )
+            except Exception as e:
+                logger.error(f"分片提交失败: {e}", exc_info=True)
+                return get_standard_response(False, f"分片提交失败: {str(e)}", {}), 500
+            
             # 使用批量上传接口获取上传URL
             try:
-                files_data = [{"name": filename}]
+                files_data = [{"name": filename, "data_id": sha256}]
                 upload_info = get_file_upload_urls(files_data, model_version)
                 upload_urls = upload_info.get('file_urls', [])
                 batch_id = upload_info.get('batch_id')
@@ -377,17 +1007,20 @@ def parse_pdf_with_api():
                 
                 # 上传文件
                 upload_file_to_url(str(pdf_path), upload_urls[0])
+                register_pending(batch_id, sha256, filename)
                 
                 # 注意：使用批量上传后，系统会自动提交解析任务
                 # 需要查询batch_id的结果
                 return get_standard_response(
                     True,
                     "文件已上传，系统将自动提交解析任务",
-                    {
+                    shape_layout_result({
                         "batch_id": batch_id,
                         "state": "waiting-file",
+                        "local_layout": local_layout,
+                        "page_sizes": page_sizes,
                         "message": "请使用batch_id查询解析结果"
-                    }
+                    }, layout_query)
                 )
                 
             except Exception as e:
@@ -403,27 +1036,32 @@ def parse_pdf_with_api():
                 model_version=model_version
             )
             
+            register_pending(result.get('task_id'), sha256, filename)
+            
             if result.get('state') == 'done':
+                register_and_index_result(result.get('task_id'), result)
+                
                 # 解析layout
                 mineru_data = result.get('mineru_data', {})
-                layout = parse_mineru_layout_from_data(mineru_data)
+                layout = load_document_layout(result['json_path'], sha256)
                 
                 return get_standard_response(
                     True,
                     "MinerU API解析成功",
-                    {
+                    shape_layout_result({
                         "task_id": result.get('task_id'),
                         "layout_count": len(layout),
                         "layout": layout,
+                        "page_sizes": load_page_sizes(sha256),
                         "mineru_data": mineru_data,
                         "json_path": result.get('json_path')
-                    }
+                    }, layout_query)
                 )
             else:
                 return get_standard_response(
                     True,
                     "任务已提交",
-                    result
+                    shape_layout_result({**result, "local_layout": local_layout}, layout_query)
                 )
                 
         except Exception as e:
@@ -437,262 +1075,6 @@ def parse_pdf_with_api():
         return get_standard_response(False, f"解析失败: {str(e)}", {}), 500
 
 
-def parse_mineru_layout_from_data(mineru_data: dict) -> list:
-    """
-    从MinerU JSON数据中解析layout
-    
-    支持多种格式：
-    1. layout.json格式：{"pdf_info": [{"para_blocks": [...], "page_idx": 0}, ...]}
-    2. content_list.json格式：[{"text": "...", "bbox": [...], "page_idx": 0}, ...]
-    3. model.json格式：[[{"type": "...", "content": "...", "bbox": [...]}, ...], ...]
-    4. 旧格式：{"pages": [{"blocks": [...], "page_no": 1}, ...]}
-    
-    Args:
-        mineru_data: MinerU返回的JSON数据
-    
-    Returns:
-        包含页面、位置和文本的列表，格式：[{"page": 1, "bbox": [x1, y1, x2, y2], "text": "...", "type": "text/title"}, ...]
-    """
-    layout = []
-    
-    try:
-        if not mineru_data:
-            logger.warning("mineru_data为空")
-            return layout
-        
-        # 格式1: layout.json格式 - {"pdf_info": [...]}
-        if "pdf_info" in mineru_data:
-            logger.info("检测到layout.json格式（pdf_info）")
-            pdf_info = mineru_data.get("pdf_info", [])
-            logger.info(f"开始解析，共 {len(pdf_info)} 页")
-            
-            for page_data in pdf_info:
-                # 获取页码（page_idx从0开始，前端需要从1开始）
-                page_idx = page_data.get("page_idx", 0)
-                page_no = page_idx + 1
-                
-                # 获取段落块
-                para_blocks = page_data.get("para_blocks", [])
-                if not para_blocks:
-                    logger.debug(f"第{page_no}页没有para_blocks")
-                    continue
-                
-                logger.debug(f"第{page_no}页有 {len(para_blocks)} 个段落块")
-                
-                # 遍历段落块
-                block_counter = 0
-                for block in para_blocks:
-                    block_type = block.get("type", "")
-                    
-                    # 只处理text和title类型的块
-                    if block_type not in ["text", "title"]:
-                        continue
-                    
-                    # 获取bbox
-                    bbox = block.get("bbox", [])
-                    if not bbox or len(bbox) < 4:
-                        continue
-                    
-                    # 从lines -> spans -> content中提取文本
-                    lines = block.get("lines", [])
-                    text_parts = []
-                    
-                    for line in lines:
-                        if not isinstance(line, dict):
-                            continue
-                        
-                        spans = line.get("spans", [])
-                        for span in spans:
-                            if isinstance(span, dict):
-                                content = span.get("content", "")
-                                if content:
-                                    text_parts.append(content)
-                    
-                    # 合并文本
-                    text = " ".join(text_parts).strip()
-                    
-                    if text:  # 只添加非空文本块
-                        block_id = (
-                            block.get("block_id")
-                            or block.get("id")
-                            or block.get("uuid")
-                            or f"p{page_no}_b{block_counter}"
-                        )
-                        block_counter += 1
-                        layout.append({
-                            "page": page_no,
-                            "bbox": bbox,
-                            "text": text,
-                            "type": block_type,
-                            "block_id": block_id
-                        })
-                        logger.debug(f"添加{block_type}块: 第{page_no}页, 文本长度: {len(text)}")
-            
-            logger.info(f"解析完成，共提取 {len(layout)} 个文本块")
-            return layout
-        
-        # 格式2: content_list.json格式 - [{"text": "...", "bbox": [...], "page_idx": 0}, ...]
-        if isinstance(mineru_data, list) and len(mineru_data) > 0:
-            first_item = mineru_data[0]
-            if isinstance(first_item, dict) and "text" in first_item and "page_idx" in first_item:
-                logger.info("检测到content_list.json格式")
-                logger.info(f"开始解析，共 {len(mineru_data)} 个文本块")
-                
-                block_counter = 0
-                for item in mineru_data:
-                    text = item.get("text", "").strip()
-                    if not text:
-                        continue
-                    
-                    bbox = item.get("bbox", [])
-                    if not bbox or len(bbox) < 4:
-                        continue
-                    
-                    page_idx = item.get("page_idx", 0)
-                    page_no = page_idx + 1
-                    
-                    block_type = item.get("type", "text")
-                    if item.get("text_level") == 1:
-                        block_type = "title"
-                    
-                    block_id = (
-                        item.get("block_id")
-                        or item.get("id")
-                        or item.get("uuid")
-                        or f"p{page_no}_b{block_counter}"
-                    )
-                    block_counter += 1
-
-                    layout.append({
-                        "page": page_no,
-                        "bbox": bbox,
-                        "text": text,
-                        "type": block_type,
-                        "block_id": block_id
-                    })
-                
-                logger.info(f"解析完成，共提取 {len(layout)} 个文本块")
-                return layout
-            
-            # 格式3: model.json格式 - [[{...}, ...], ...] (二维数组，第一维是页面)
-            if isinstance(first_item, list):
-                logger.info("检测到model.json格式（二维数组）")
-                logger.info(f"开始解析，共 {len(mineru_data)} 页")
-                
-                for page_idx, page_blocks in enumerate(mineru_data):
-                    block_counter = 0
-                    page_no = page_idx + 1
-                    
-                    if not isinstance(page_blocks, list):
-                        continue
-                    
-                    for block in page_blocks:
-                        if not isinstance(block, dict):
-                            continue
-                        
-                        content = block.get("content", "").strip()
-                        if not content:
-                            continue
-                        
-                        bbox = block.get("bbox", [])
-                        if not bbox or len(bbox) < 4:
-                            continue
-                        
-                        # model.json中的bbox是相对坐标(0-1)，需要转换为像素坐标
-                        # 但这里我们不知道页面尺寸，所以先保持原样
-                        # 前端可能需要根据实际页面尺寸进行转换
-                        block_type = block.get("type", "text")
-                        
-                        block_id = (
-                            block.get("block_id")
-                            or block.get("id")
-                            or block.get("uuid")
-                            or f"p{page_no}_b{block_counter}"
-                        )
-                        block_counter += 1
-
-                        layout.append({
-                            "page": page_no,
-                            "bbox": bbox,
-                            "text": content,
-                            "type": block_type,
-                            "block_id": block_id
-                        })
-                
-                logger.info(f"解析完成，共提取 {len(layout)} 个文本块")
-                return layout
-        
-        # 格式4: 旧格式 - {"pages": [...]}
-        pages = mineru_data.get("pages", [])
-        if pages:
-            logger.info("检测到旧格式（pages）")
-            logger.info(f"开始解析，共 {len(pages)} 页")
-            
-            for page_idx, page in enumerate(pages):
-                # 支持多种页码字段名
-                page_no = page.get("page_no") or page.get("page") or page.get("pageNo") or page.get("page_idx", 0) + 1
-                
-                blocks = page.get("blocks", [])
-                if not blocks:
-                    logger.debug(f"第{page_no}页没有blocks")
-                    continue
-                
-                logger.debug(f"第{page_no}页有 {len(blocks)} 个块")
-                
-                # 遍历页面中的所有块
-                block_counter = 0
-                for block_idx, block in enumerate(blocks):
-                    block_type = block.get("type", "")
-                    
-                    if block_type in ["text", "title"]:
-                        # 合并所有行的文本
-                        lines = block.get("lines", [])
-                        if not lines:
-                            logger.debug(f"第{page_no}页第{block_idx}个文本块没有lines")
-                            continue
-                        
-                        text_parts = []
-                        for line in lines:
-                            if isinstance(line, dict):
-                                line_text = line.get("text", "") or line.get("content", "")
-                                if line_text:
-                                    text_parts.append(line_text)
-                        
-                        text = " ".join(text_parts).strip()
-                        
-                        if text:  # 只添加非空文本块
-                            bbox = block.get("bbox") or block.get("bbox_coords") or [0, 0, 0, 0]
-                            block_id = (
-                                block.get("block_id")
-                                or block.get("id")
-                                or block.get("uuid")
-                                or f"p{page_no}_b{block_counter}"
-                            )
-                            block_counter += 1
-                            layout.append({
-                                "page": page_no,
-                                "bbox": bbox,
-                                "text": text,
-                                "type": block_type,
-                                "block_id": block_id
-                            })
-                            logger.debug(f"添加文本块: 第{page_no}页, 文本长度: {len(text)}")
-            
-            logger.info(f"解析完成，共提取 {len(layout)} 个文本块")
-            return layout
-        
-        # 如果都不匹配，记录警告
-        logger.warning("未识别到支持的MinerU数据格式")
-        logger.debug(f"mineru_data keys/type: {list(mineru_data.keys()) if isinstance(mineru_data, dict) else type(mineru_data)}")
-        logger.debug(f"示例数据: {json.dumps(mineru_data if isinstance(mineru_data, dict) else (mineru_data[0] if isinstance(mineru_data, list) and len(mineru_data) > 0 else {}), ensure_ascii=False, indent=2)[:1000]}")
-        
-        return layout
-        
-    except Exception as e:
-        logger.error(f"解析MinerU数据失败: {e}", exc_info=True)
-        return []
-
-
 @api_bp.route('/task/<task_id>', methods=['GET'])
 def get_mineru_task(task_id: str):
     """
@@ -701,10 +1083,27 @@ def get_mineru_task(task_id: str):
     Args:
         task_id: 任务ID
     
+    查询参数:
+        - pages: 只返回指定页的layout，如 "1-5"、"1-3,8"（同时返回layout_pages和total_layout_count）
+        - fields: 每个块只保留的字段，如 "block_id,page,bbox"
+        - include_mineru_data: 为true时才返回原始mineru_data（默认不返回）
+    
     返回:
         任务状态和结果
     """
     try:
+        layout_query = parse_layout_query()
+    except ValueError as e:
+        return get_standard_response(False, str(e), {}), 400
+    
+    try:
+        # 已完成并索引过的任务直接读取本地结果，不再查询MinerU
+        entry = lookup_task(task_id, rehydrate=layout_query['include_mineru_data'])
+        if entry:
+            return get_standard_response(True, "查询成功", shape_layout_result(
+                build_cached_result(entry, layout_query['include_mineru_data']), layout_query
+            ))
+        
         result = get_task_result(task_id)
         
         # 如果任务完成，尝试解析layout
@@ -715,24 +1114,25 @@ def get_mineru_task(task_id: str):
                     extract_dir = Path(current_app.config['MINERU_FOLDER']) / task_id
                     zip_info = download_and_extract_zip(zip_url, extract_dir)
                     
-                    # 读取JSON文件
                     json_path = zip_info['json_path']
-                    with open(json_path, 'r', encoding='utf-8') as f:
-                        mineru_data = json.load(f)
-                    
-                    layout = parse_mineru_layout_from_data(mineru_data)
+                    sha256 = get_task_sha256(task_id)
+                    layout = load_document_layout(json_path, sha256)
                     
-                    result['mineru_data'] = mineru_data
+                    # 原始JSON只在明确请求时读取
+                    if layout_query['include_mineru_data']:
+                        result['mineru_data'] = read_stored_json(json_path)
                     result['layout'] = layout
                     result['layout_count'] = len(layout)
+                    result['page_sizes'] = load_page_sizes(sha256)
                     result['json_path'] = json_path
                     result['extract_dir'] = zip_info.get('extract_dir')
                     result['full_md_path'] = zip_info.get('full_md_path')
                     result['images_dir'] = zip_info.get('images_dir')
+                    register_and_index_result(task_id, zip_info)
                 except Exception as e:
                     logger.warning(f"下载结果失败: {e}")
         
-        return get_standard_response(True, "查询成功", result)
+        return get_standard_response(True, "查询成功", shape_layout_result(result, layout_query))
         
     except Exception as e:
         logger.error(f"查询任务失败: {e}", exc_info=True)
@@ -747,14 +1147,41 @@ def get_mineru_batch(batch_id: str):
     Args:
         batch_id: 批量任务ID
     
+    查询参数:
+        - pages: 只返回指定页的layout，如 "1-5"、"1-3,8"（同时返回layout_pages和total_layout_count）
+        - fields: 每个块只保留的字段，如 "block_id,page,bbox"
+        - include_mineru_data: 为true时才返回原始mineru_data（默认不返回）
+    
     返回:
         批量任务状态和结果
     """
     try:
+        layout_query = parse_layout_query()
+    except ValueError as e:
+        return get_standard_response(False, str(e), {}), 400
+    
+    try:
+        # 已完成并索引过的批量任务直接读取本地结果，不再查询MinerU
+        entry = lookup_task(batch_id, rehydrate=layout_query['include_mineru_data'])
+        if entry:
+            return get_standard_response(True, "查询成功", shape_layout_result({
+                **build_cached_result(entry, layout_query['include_mineru_data']),
+                "batch_id": batch_id
+            }, layout_query))
+        
         result = get_batch_task_result(batch_id)
         
         # 处理批量结果
         extract_results = result.get('extract_result', [])
+        
+        # 分片任务：合并所有已完成的分片，未完成的页先行返回本地解析结果
+        manifest = load_shard_manifest(batch_id)
+        if manifest:
+            return get_standard_response(True, "查询成功", shape_layout_result(
+                build_sharded_batch_result(batch_id, manifest, extract_results, layout_query['include_mineru_data']),
+                layout_query
+            ))
+        
         if extract_results:
             # 取第一个结果（通常只有一个文件）
             first_result = extract_results[0]
@@ -768,25 +1195,27 @@ def get_mineru_batch(batch_id: str):
                         extract_dir = Path(current_app.config['MINERU_FOLDER']) / batch_id
                         zip_info = download_and_extract_zip(zip_url, extract_dir)
                         
-                        # 读取JSON文件
                         json_path = zip_info['json_path']
-                        with open(json_path, 'r', encoding='utf-8') as f:
-                            mineru_data = json.load(f)
+                        sha256 = first_result.get('data_id') or get_task_sha256(batch_id)
+                        layout = load_document_layout(json_path, sha256)
                         
-                        layout = parse_mineru_layout_from_data(mineru_data)
-                        
-                        first_result['mineru_data'] = mineru_data
+                        # 原始JSON只在明确请求时读取
+                        if layout_query['include_mineru_data']:
+                            first_result['mineru_data'] = read_stored_json(json_path)
                         first_result['layout'] = layout
                         first_result['layout_count'] = len(layout)
+                        first_result['page_sizes'] = load_page_sizes(sha256)
                         first_result['json_path'] = json_path
                         first_result['extract_dir'] = zip_info.get('extract_dir')
                         first_result['full_md_path'] = zip_info.get('full_md_path')
                         first_result['images_dir'] = zip_info.get('images_dir')
+                        # 上传时data_id即为文档内容哈希
+                        register_and_index_result(batch_id, zip_info, sha256=first_result.get('data_id'))
                     except Exception as e:
                         logger.warning(f"下载结果失败: {e}")
             
             # 返回第一个结果的状态和进度信息
-            return get_standard_response(True, "查询成功", {
+            return get_standard_response(True, "查询成功", shape_layout_result({
                 "batch_id": batch_id,
                 "state": state,
                 "file_name": first_result.get('file_name', ''),
@@ -794,8 +1223,9 @@ def get_mineru_batch(batch_id: str):
                 "extract_progress": first_result.get('extract_progress', {}),
                 "layout": first_result.get('layout', []),
                 "layout_count": first_result.get('layout_count', 0),
+                "page_sizes": first_result.get('page_sizes'),
                 "mineru_data": first_result.get('mineru_data')
-            })
+            }, layout_query))
         else:
             return get_standard_response(True, "查询成功", {
                 "batch_id": batch_id,
@@ -851,8 +1281,10 @@ def parse_layout():
         # 生成输出路径
         output_path = str(input_path).replace('.json', '_layout.json')
         
-        # 解析layout
-        layout = parse_mineru_layout(str(input_path), output_path)
+        # 解析layout（源文件未变化时直接使用已持久化的结果）
+        layout = load_layout(input_path, kind='pages')
+        if not Path(output_path).exists() or os.path.getmtime(output_path) < os.path.getmtime(input_path):
+            fast_json.dump_file(output_path, layout)
         
         return get_standard_response(
             True,
@@ -871,6 +1303,75 @@ def parse_layout():
         return get_standard_response(False, f"解析失败: {str(e)}", {}), 500
 
 
+@api_bp.route('/layout/<task_id>/hit', methods=['GET'])
+def hit_test_layout(task_id: str):
+    """
+    命中测试：返回包含指定点的文本块（坐标与layout中的bbox一致）
+    
+    查询参数:
+        - page: 页码（从1开始）
+        - x, y: 点坐标
+    """
+    try:
+        page_no = request.args.get('page', type=int)
+        point = parse_float_args(request.args, ['x', 'y'])
+        if not page_no or point is None:
+            return get_standard_response(False, "page、x、y不能为空", {}), 400
+        
+        layout = get_task_page_layout(task_id, page_no)
+        if layout is None:
+            return get_standard_response(False, "未找到该任务的layout", {}), 404
+        
+        blocks = get_spatial_index(layout).hit(page_no, *point)
+        return get_standard_response(True, "查询成功", {
+            "task_id": task_id,
+            "page": page_no,
+            "block_ids": [block.get('block_id') for block in blocks],
+            "blocks": blocks
+        })
+    except ValueError:
+        return get_standard_response(False, "坐标格式错误", {}), 400
+    except Exception as e:
+        logger.error(f"命中测试失败: {e}", exc_info=True)
+        return get_standard_response(False, f"查询失败: {str(e)}", {}), 500
+
+
+@api_bp.route('/layout/<task_id>/viewport', methods=['GET'])
+def query_layout_viewport(task_id: str):
+    """
+    可视区域查询：只返回与指定矩形相交的文本块；不传矩形时返回整页
+    
+    查询参数:
+        - page: 页码（从1开始）
+        - x0, y0, x1, y1: 可视区域（可选，坐标与layout中的bbox一致）
+    """
+    try:
+        page_no = request.args.get('page', type=int)
+        if not page_no:
+            return get_standard_response(False, "page不能为空", {}), 400
+        rect = parse_float_args(request.args, ['x0', 'y0', 'x1', 'y1'])
+        
+        layout = get_task_page_layout(task_id, page_no)
+        if layout is None:
+            return get_standard_response(False, "未找到该任务的layout", {}), 404
+        
+        if rect is None:
+            blocks = layout.page_slice(page_no).to_dicts()
+        else:
+            blocks = get_spatial_index(layout).viewport(page_no, *rect)
+        return get_standard_response(True, "查询成功", {
+            "task_id": task_id,
+            "page": page_no,
+            "layout": blocks,
+            "layout_count": len(blocks)
+        })
+    except ValueError:
+        return get_standard_response(False, "坐标格式错误", {}), 400
+    except Exception as e:
+        logger.error(f"可视区域查询失败: {e}", exc_info=True)
+        return get_standard_response(False, f"查询失败: {str(e)}", {}), 500
+
+
 @api_bp.route('/translate-layout', methods=['POST'])
 def translate_layout():
     """
@@ -880,6 +1381,8 @@ def translate_layout():
         - layout: JSON格式的layout数组
         - target_lang: 目标语言（默认: zh）
         - model: 使用的模型（可选）
+        - task_id / sha256: 文档标识（可选，提供时与全文翻译共用段落译文）
+        - merge_fragments: 是否合并跨栏/跨页的段落片段后整体翻译（默认取TRANSLATE_MERGE_FRAGMENTS）
     
     返回:
         {
@@ -904,6 +1407,13 @@ def translate_layout():
         model = data.get('model')
         force_retranslate = data.get('force_retranslate', False)  # 是否强制重新翻译
         
+        # 段落译文存储：与全文翻译共用，已翻译过的段落直接复用
+        try:
+            store = get_segment_store(resolve_document_key(data.get('task_id'), data.get('sha256')), target_lang)
+        except ValueError as e:
+            return get_standard_response(False, str(e), {}), 400
+        reused_count = 0
+        
         # 检查是否配置了通义千问
         qwen_api_key = current_app.config.get('QWEN_API_KEY', '')
         if qwen_api_key:
@@ -919,23 +1429,51 @@ def translate_layout():
         
         logger.info(f"开始翻译 {total_count} 个文本块，目标语言: {target_lang}, 强制重新翻译: {force_retranslate}")
         
-        # 翻译每个文本块 - 保持原始顺序
+        # 阅读顺序重建：跨栏/跨页被拆开的段落片段合并为一个逻辑段落，整体翻译后再分回各块
+        merge_fragments = data.get('merge_fragments', current_app.config.get('TRANSLATE_MERGE_FRAGMENTS', True))
+        segments = build_reading_segments(layout) if merge_fragments else [[idx] for idx in range(total_count)]
+        units = []
+        for indices in segments:
+            # 片段中已有译文时不整体重译，退回逐块处理
+            if len(indices) > 1 and not force_retranslate and any(layout[idx].get('translated_text') for idx in indices):
+                units.extend([idx] for idx in indices)
+            else:
+                units.append(indices)
+        merged_fragment_count = sum(len(indices) for indices in units if len(indices) > 1)
+        if merged_fragment_count:
+            logger.info(f"合并续接片段: {merged_fragment_count} 个文本块合并为 {sum(1 for indices in units if len(indices) > 1)} 个逻辑段落")
+        
+        # 翻译每个逻辑段落 - 结果按原始序号放回，保持layout顺序
         # 重要：必须保持layout的顺序，以便前端能正确匹配
-        translated_layout = []
-        for idx, block in enumerate(layout):
-            text = block.get('text', '').strip()
+        translated_layout = [None] * total_count
+        for indices in units:
+            idx = indices[0]
+            block = layout[idx]
+            sources = [(layout[i].get('text') or '').strip() for i in indices]
+            text = join_fragments(sources)
+            # 合并段落的各块共用第一个块的block_id作为段落标识
+            segment_fields = {'segment_id': block.get('block_id') or f"seg_{idx}"} if len(indices) > 1 else {}
             
             # 如果文本为空，直接添加到结果中（保持顺序）
             if not text:
-                translated_layout.append({ **block })
+                translated_layout[idx] = { **block }
                 continue
             
             # 如果已有翻译且不强制重新翻译，则跳过（但也要添加到结果中）
             if not force_retranslate and block.get('translated_text'):
-                translated_layout.append({ **block })
+                translated_layout[idx] = { **block }
                 skipped_count += 1
                 continue
             
+            if store and not force_retranslate:
+                stored_text = store.get(text)
+                if stored_text:
+                    for i, part in zip(indices, split_translation(stored_text, sources)):
+                        translated_layout[i] = { **layout[i], 'translated_text': part, **segment_fields }
+                    translated_count += len(indices)
+                    reused_count += len(indices)
+                    continue
+            
             try:
                 block_start_time = time.time()
                 
@@ -955,10 +1493,12 @@ def translate_layout():
                 if translated_text == text and len(text) > 10:
                     logger.warning(f"⚠️ 翻译结果与原文相同: {text[:50]}...")
                 
-                # 保持原始block结构，只添加translated_text
-                translated_block = { **block, 'translated_text': translated_text }
-                translated_layout.append(translated_block)
-                translated_count += 1
+                # 保持原始block结构，只添加translated_text（合并段落按原文长度比例分回各块）
+                for i, part in zip(indices, split_translation(translated_text, sources)):
+                    translated_layout[i] = { **layout[i], 'translated_text': part, **segment_fields }
+                if store:
+                    store.put(text, translated_text)
+                translated_count += len(indices)
                 if translated_count % 10 == 0:
                     logger.info(f"🎯 里程碑进度: {translated_count}/{total_count} ({translated_count*100//total_count}%)")
                     
@@ -967,10 +1507,10 @@ def translate_layout():
                 logger.error(f"❌ 翻译文本块失败 [{idx+1}/{total_count}]")
                 logger.error(f"错误信息: {error_msg}")
                 logger.error(f"错误类型: {type(e).__name__}")
-                failed_count += 1
+                failed_count += len(indices)
                 
                 # 记录第一个失败的错误详情，用于返回给前端
-                if failed_count == 1:
+                if first_error is None:
                     first_error = error_msg
                     logger.error(f"🔴 第一个翻译失败的错误详情: {error_msg}", exc_info=True)
                     import traceback
@@ -978,21 +1518,35 @@ def translate_layout():
                     logger.error(f"失败时间: {time.strftime('%Y-%m-%d %H:%M:%S')}")
                 
                 # 失败时保留原文或已有翻译，但仍要添加到结果中
-                failed_block = { **block }
-                if not failed_block.get('translated_text'):
-                    failed_block['translated_text'] = text
-                translated_layout.append(failed_block)
+                for i in indices:
+                    failed_block = { **layout[i] }
+                    if not failed_block.get('translated_text'):
+                        failed_block['translated_text'] = (failed_block.get('text') or '').strip()
+                    translated_layout[i] = failed_block
         
         # 确保所有块都被添加到translated_layout中（保持顺序）
-        # 如果有些块没有被处理（比如空文本或跳过），确保它们也在结果中
-        if len(translated_layout) < len(layout):
-            logger.warning(f"translated_layout长度({len(translated_layout)})小于原始layout长度({len(layout)})，检查是否有遗漏的块")
-            # 补充遗漏的块
-            for idx, block in enumerate(layout):
-                if idx >= len(translated_layout):
-                    translated_layout.append({ **block })
-        
-        logger.info(f"翻译完成: 成功 {translated_count} 个，跳过 {skipped_count} 个，失败 {failed_count} 个，总计 {total_count} 个文本块")
+        missing = [idx for idx, block in enumerate(translated_layout) if block is None]
+        if missing:
+            logger.warning(f"有 {len(missing)} 个块未被处理，按原样补充")
+            for idx in missing:
+                translated_layout[idx] = { **layout[idx] }
+        
+        if store:
+            store.save()
+        
+        # 块级译文加入全文检索索引（只替换本次涉及的block_id）
+        document_key = resolve_document_key(data.get('task_id'), data.get('sha256'))
+        if document_key and current_app.config.get('SEARCH_ENABLED', True):
+            try:
+                index_translations(document_key, target_lang, [
+                    {"page": block.get('page'), "block_id": block.get('block_id'), "text": block.get('translated_text')}
+                    for block in translated_layout
+                    if block.get('block_id') and block.get('translated_text') and block.get('translated_text') != block.get('text')
+                ], task_id=data.get('task_id'), replace=False)
+            except Exception as e:
+                logger.warning(f"更新译文检索索引失败: {e}")
+        
+        logger.info(f"翻译完成: 成功 {translated_count} 个（复用 {reused_count} 个），跳过 {skipped_count} 个，失败 {failed_count} 个，总计 {total_count} 个文本块")
         logger.info(f"返回的layout长度: {len(translated_layout)}，原始layout长度: {len(layout)}")
         
         # 如果有失败，提供更详细的错误信息
@@ -1026,7 +1580,6 @@ def translate_layout():
         translation_file = None
         
         if translation_id:
-            import time
             # 使用translation_id和timestamp生成固定文件名，每次合并保存（因为可能是逐个翻译）
             # 这样所有翻译结果都会保存在同一个文件中
             timestamp = data.get('timestamp')  # 如果前端提供了timestamp，使用它；否则使用当前时间
@@ -1037,80 +1590,32 @@ def translate_layout():
             translations_folder = Path(current_app.config['MINERU_FOLDER']) / 'translations'
             translations_folder.mkdir(parents=True, exist_ok=True)
             
-            # 使用固定的文件名（基于translation_id和timestamp）
+            # 使用固定的文件名（基于translation_id和timestamp），本次结果追加到日志，后台定期合并进该文件
             translation_file = translations_folder / f"translation_{translation_id}_{timestamp}.json"
             
-            # 尝试读取已有的翻译结果（如果存在）
-            existing_data = None
-            if translation_file.exists():
-                try:
-                    with open(translation_file, 'r', encoding='utf-8') as f:
-                        existing_data = json.load(f)
-                except Exception as read_error:
-                    logger.warning(f"读取已有翻译结果失败: {read_error}")
-            
-            # 合并翻译结果
-            if existing_data and isinstance(existing_data.get('layout'), list):
-                # 合并layout：优先按block_id匹配，其次回退到text+page
-                existing_layout = existing_data.get('layout', [])
-                
-                def get_block_key(block):
-                    block_id = block.get('block_id')
-                    if block_id:
-                        return f"id_{block_id}"
-                    block_text = (block.get('text') or '').strip()
-                    block_page = block.get('page') or block.get('page_no') or block.get('pageNo') or 1
-                    return f"text_{block_page}_{block_text}"
-                
-                existing_layout_map = {get_block_key(block): block for block in existing_layout}
-                
-                # 更新或添加新的翻译块
-                for new_block in translated_layout:
-                    key = get_block_key(new_block)
-                    existing_layout_map[key] = new_block
-                
-                # 合并后的layout保持原有顺序，尽量使用existing_layout顺序，追加新块
-                merged_layout = []
-                seen_keys = set()
-                for block in existing_layout:
-                    key = get_block_key(block)
-                    if key in existing_layout_map:
-                        merged_layout.append(existing_layout_map[key])
-                        seen_keys.add(key)
-                # 添加新增块
-                for key, block in existing_layout_map.items():
-                    if key not in seen_keys:
-                        merged_layout.append(block)
-                
-                # 重新计算统计数据
-                translated_count = sum(1 for blk in merged_layout if blk.get('translated_text') and blk.get('translated_text') != blk.get('text'))
-                skipped_count = sum(1 for blk in merged_layout if blk.get('translated_text') and blk.get('translated_text') == blk.get('text'))
-                failed_count = sum(1 for blk in merged_layout if not blk.get('translated_text'))
-                total_count = len(merged_layout)
-            else:
-                # 如果没有已有数据，直接使用当前结果
-                merged_layout = translated_layout
-                total_count = len(merged_layout)
-                translated_count = sum(1 for blk in merged_layout if blk.get('translated_text') and blk.get('translated_text') != blk.get('text'))
-                skipped_count = sum(1 for blk in merged_layout if blk.get('translated_text') and blk.get('translated_text') == blk.get('text'))
-                failed_count = sum(1 for blk in merged_layout if not blk.get('translated_text'))
-            
-            translation_data = {
-                "translation_id": translation_id,
-                "timestamp": timestamp,
-                "target_lang": target_lang,
-                "model": model,
-                "translated_count": translated_count,
-                "skipped_count": skipped_count,
-                "failed_count": failed_count,
-                "total_count": total_count,
-                "layout": merged_layout
-            }
-            
             try:
-                with open(translation_file, 'w', encoding='utf-8') as f:
-                    json.dump(translation_data, f, ensure_ascii=False, indent=2)
-                logger.debug(f"翻译结果已保存到: {translation_file} (共 {len(merged_layout)} 个块)")
+                translation_log = get_translation_log(translation_file, get_compression_codec(), make_publisher())
+                stats = translation_log.append({
+                    "translation_id": translation_id,
+                    "timestamp": timestamp,
+                    "target_lang": target_lang,
+                    "model": model
+                }, translated_layout)
+                translated_count = stats['translated_count']
+                skipped_count = stats['skipped_count']
+                failed_count = stats['failed_count']
+                total_count = stats['total_count']
+                translation_log.schedule_compaction(current_app.config.get('TRANSLATION_LOG_COMPACT_EVERY', 50))
+                record_translation(
+                    translation_file.name, 'layout',
+                    doc_key=resolve_document_key(data.get('task_id'), data.get('sha256')),
+                    task_id=data.get('task_id'),
+                    translation_id=translation_id,
+                    target_lang=target_lang,
+                    model=model,
+                    stats=stats
+                )
+                logger.debug(f"翻译结果已追加到: {translation_log.log_path.name} (共 {total_count} 个块)")
             except Exception as save_error:
                 logger.warning(f"保存翻译结果失败: {save_error}")
         
@@ -1119,7 +1624,9 @@ def translate_layout():
             "translated_count": translated_count,
             "skipped_count": skipped_count,
             "failed_count": failed_count,
-            "total_count": total_count
+            "total_count": total_count,
+            "reused_count": reused_count,
+            "merged_fragment_count": merged_fragment_count
         }
         
         if translation_id:
@@ -1194,6 +1701,8 @@ def translate_full_text():
         })
     except FileNotFoundError:
         return get_standard_response(False, "未找到full.md文件", {}), 404
+    except ValueError as e:
+        return get_standard_response(False, str(e), {}), 400
     except Exception as e:
         logger.error(f"全文翻译失败: {e}", exc_info=True)
         return get_standard_response(False, f"翻译失败: {str(e)}", {}), 500
@@ -1235,6 +1744,8 @@ def translate_full_text_stream():
         )
     except FileNotFoundError:
         return get_standard_response(False, "未找到full.md文件", {}), 404
+    except ValueError as e:
+        return get_standard_response(False, str(e), {}), 400
     except Exception as e:
         logger.error(f"流式翻译失败: {e}", exc_info=True)
         return get_standard_response(False, f"翻译失败: {str(e)}", {}), 500
@@ -1317,7 +1828,8 @@ def get_file(filename):
         upload_folder = Path(current_app.config['UPLOAD_FOLDER'])
         file_path = upload_folder / filename
         
-        # 检查文件是否存在
+        # 检查文件是否存在（本节点没有时从共享存储后端获取）
+        fetch_file(file_path)
         if not file_path.exists():
             logger.error(f"文件不存在: {file_path}")
             return get_standard_response(False, f"文件不存在: {filename}", {}), 404
@@ -1325,8 +1837,10 @@ def get_file(filename):
         # 确保路径是绝对路径
         upload_folder = upload_folder.resolve()
         
+        # 上传文件按内容哈希命名，ETag即哈希，可长期缓存；支持Range请求（PDF.js按需加载页面）
         logger.debug(f"返回文件: {upload_folder} / {filename}")
-        return send_from_directory(str(upload_folder), filename)
+        response = send_from_directory(str(upload_folder), filename, etag=file_etag(file_path))
+        return apply_cache_headers(response, immutable=is_content_addressed(file_path))
     except Exception as e:
         logger.error(f"获取文件失败: {e}", exc_info=True)
         return get_standard_response(False, f"文件不存在: {filename}", {}), 404
@@ -1348,14 +1862,18 @@ def get_mineru_file(filename):
         if not str(file_path.resolve()).startswith(str(mineru_folder.resolve())):
             return get_standard_response(False, "非法路径", {}), 403
         
-        if not file_path.exists():
-            return get_standard_response(False, f"文件不存在: {filename}", {}), 404
-        
         # 如果是目录，返回错误
         if file_path.is_dir():
             return get_standard_response(False, "路径是目录", {}), 400
         
-        return send_from_directory(str(file_path.parent), file_path.name)
+        # 结果目录可能已按磁盘配额回收，访问时从归档恢复
+        ensure_local_result(Path(filename).parts[0])
+        
+        # 原始JSON等可能已压缩存储，客户端支持时直接返回压缩内容
+        if not stored_exists(file_path):
+            return get_standard_response(False, f"文件不存在: {filename}", {}), 404
+        
+        return send_stored(file_path)
     except Exception as e:
         logger.error(f"获取文件失败: {e}", exc_info=True)
         return get_standard_response(False, f"文件不存在: {filename}", {}), 404
@@ -1373,30 +1891,30 @@ def get_full_text(task_id: str):
         mineru_folder = Path(current_app.config['MINERU_FOLDER'])
         
         # 尝试查找full.md文件
+        ensure_local_result(task_id)
         md_path = mineru_folder / task_id / 'full.md'
         
         if md_path.exists():
             with open(md_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
-            return get_standard_response(True, "获取成功", {
+            return make_conditional_json(get_standard_response(True, "获取成功", {
                 "content": content,
                 "path": str(md_path)
-            })
+            }))
         
-        # 如果直接路径不存在，尝试递归查找
-        task_dir = mineru_folder / task_id
-        if task_dir.exists():
-            md_files = list(task_dir.rglob('full.md'))
-            if md_files:
-                md_path = md_files[0]
+        # 如果直接路径不存在，使用文档目录中记录的路径
+        entry = lookup_task(task_id)
+        if entry and entry.get('full_md_path'):
+            md_path = Path(entry['full_md_path'])
+            if md_path.exists():
                 with open(md_path, 'r', encoding='utf-8') as f:
                     content = f.read()
                 
-                return get_standard_response(True, "获取成功", {
+                return make_conditional_json(get_standard_response(True, "获取成功", {
                     "content": content,
                     "path": str(md_path)
-                })
+                }))
         
         return get_standard_response(False, "未找到full.md文件", {}), 404
         
@@ -1405,6 +1923,213 @@ def get_full_text(task_id: str):
         return get_standard_response(False, f"获取失败: {str(e)}", {}), 500
 
 
+@api_bp.route('/documents', methods=['GET'])
+def get_documents():
+    """
+    列出已解析的文档（按完成时间倒序）
+    
+    查询参数:
+        - q: 按原始文件名过滤（可选）
+        - limit / offset: 分页（默认50 / 0，limit最大200）
+    
+    返回:
+        documents（含task_id、sha256、原始文件名、大小、页数、layout产物和翻译记录）和total
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return get_standard_response(False, "limit/offset参数格式错误", {}), 400
+    
+    try:
+        result = query_documents(limit=limit, offset=offset, query=(request.args.get('q') or '').strip() or None)
+        return get_standard_response(True, "获取成功", {
+            "limit": limit,
+            "offset": offset,
+            "count": len(result['documents']),
+            **result
+        })
+    except Exception as e:
+        logger.error(f"获取文档列表失败: {e}", exc_info=True)
+        return get_standard_response(False, f"获取失败: {str(e)}", {}), 500
+
+
+@api_bp.route('/storage', methods=['GET'])
+def get_storage_stats():
+    """
+    磁盘占用统计：总占用、配额和每个文档的解压内容、保留内容和归档大小（按最近访问时间从旧到新）
+    
+    查询参数:
+        - refresh: 为true时重新扫描结果目录
+    """
+    try:
+        refresh = request.args.get('refresh', 'false').lower() == 'true'
+        return get_standard_response(True, "获取成功", get_usage(refresh=refresh))
+    except Exception as e:
+        logger.error(f"获取磁盘占用失败: {e}", exc_info=True)
+        return get_standard_response(False, f"获取失败: {str(e)}", {}), 500
+
+
+@api_bp.route('/storage/enforce', methods=['POST'])
+def enforce_storage_quota():
+    """
+    立即检查磁盘配额，超出时按LRU回收结果目录
+    """
+    try:
+        return get_standard_response(True, "检查完成", enforce_quota())
+    except Exception as e:
+        logger.error(f"检查磁盘配额失败: {e}", exc_info=True)
+        return get_standard_response(False, f"检查失败: {str(e)}", {}), 500
+
+
+def index_library():
+    """
+    把启用全文检索之前已完成的文档补充进索引
+
+    直接读取保留的layout产物，不恢复按磁盘配额回收的结果目录；没有layout产物的文档跳过
+    """
+    indexed = indexed_documents()
+    count = 0
+    for entry in list_documents():
+        if entry['sha256'] in indexed:
+            continue
+        try:
+            layout = get_layout_artifact(entry['json_path'], sha256=entry['sha256']).to_dicts()
+            index_document(
+                entry['sha256'],
+                merge_with_local_layout(layout, entry['sha256']),
+                task_id=entry.get('task_id'),
+                sha256=entry['sha256'],
+                title=entry.get('original_filename')
+            )
+            count += 1
+        except FileNotFoundError:
+            logger.info(f"补充检索索引跳过: {entry.get('task_id')}: 结果已回收且没有layout产物")
+        except Exception as e:
+            logger.warning(f"补充检索索引失败: {entry.get('task_id')}: {e}")
+    logger.info(f"已补充检索索引: {count} 个文档")
+
+
+def schedule_library_indexing():
+    """
+    在后台线程中补充检索索引（每个进程只执行一次，完成后才标记为已补充）
+    """
+    global _library_indexing
+    if _library_indexed or not current_app.config.get('SEARCH_ENABLED', True):
+        return
+    with _library_indexing_lock:
+        if _library_indexing:
+            return
+        _library_indexing = True
+    app = current_app._get_current_object()
+
+    def run():
+        global _library_indexed, _library_indexing
+        try:
+            with app.app_context():
+                index_library()
+            _library_indexed = True
+        except Exception as e:
+            logger.warning(f"补充检索索引失败: {e}")
+        finally:
+            with _library_indexing_lock:
+                _library_indexing = False
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+# 补充检索索引的状态：已完成 / 正在后台执行
+_library_indexed = False
+_library_indexing = False
+_library_indexing_lock = threading.Lock()
+
+
+@api_bp.route('/search', methods=['GET'])
+def search_documents():
+    """
+    在已解析的文档库中检索原文和译文
+    
+    查询参数:
+        - q: 检索词（空格分隔的多个词须同时出现，英文按前缀匹配）
+        - lang: source只检索原文，zh等只检索对应译文（默认都检索）
+        - task_id: 只检索某个任务（可选）
+        - limit / offset: 分页（默认20 / 0，limit最大100）
+    
+    返回:
+        按相关度排序的结果，每条包含task_id、title、page、block_id和带<mark>高亮的snippet；
+        indexing为true时已有文档仍在后台补充索引，结果可能不完整
+    """
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return get_standard_response(False, "请提供检索词q", {}), 400
+    if not current_app.config.get('SEARCH_ENABLED', True):
+        return get_standard_response(False, "全文检索未启用", {}), 404
+    
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return get_standard_response(False, "limit/offset参数格式错误", {}), 400
+    
+    try:
+        schedule_library_indexing()
+        result = search_library(
+            query,
+            lang=request.args.get('lang') or None,
+            task_id=request.args.get('task_id') or None,
+            limit=limit,
+            offset=offset
+        )
+        return get_standard_response(True, "检索成功", {
+            "query": query,
+            "indexing": not _library_indexed,
+            "count": len(result['results']),
+            "limit": limit,
+            "offset": offset,
+            **result
+        })
+    except Exception as e:
+        logger.error(f"检索失败: {e}", exc_info=True)
+        return get_standard_response(False, f"检索失败: {str(e)}", {}), 500
+
+
+@api_bp.route('/block-translations/<task_id>', methods=['GET'])
+def get_block_translations(task_id: str):
+    """
+    按block_id获取全文翻译的译文（基于分块时建立的对齐索引）
+    
+    Args:
+        task_id: 任务ID或batch_id
+    
+    查询参数:
+        target_lang: 目标语言（默认DEFAULT_TARGET_LANG）
+    """
+    try:
+        target_lang = request.args.get('target_lang', current_app.config.get('DEFAULT_TARGET_LANG', 'zh'))
+        try:
+            index, translated_chunks = load_full_translation(task_id, target_lang)
+        except ValueError as e:
+            return get_standard_response(False, str(e), {}), 400
+        if index is None or translated_chunks is None:
+            return get_standard_response(False, "未找到该任务的全文翻译，请先执行全文翻译", {}), 404
+        
+        if len(translated_chunks) != len(index.get('chunks', [])):
+            return get_standard_response(False, "译文与对齐索引不一致，请重新翻译", {}), 409
+        
+        # 段落数不一致的分块无法确定对应关系，其中的块与定位失败的块一样作为未对齐返回
+        translations, mismatched = align_block_translations(index, translated_chunks)
+        return get_standard_response(True, "获取成功", {
+            "task_id": task_id,
+            "target_lang": target_lang,
+            "translations": translations,
+            "aligned_count": len(translations),
+            "unaligned": index.get('unaligned', []) + mismatched
+        })
+    except Exception as e:
+        logger.error(f"获取块译文失败: {e}", exc_info=True)
+        return get_standard_response(False, f"获取失败: {str(e)}", {}), 500
+
+
 @api_bp.route('/images/<task_id>/<path:image_name>', methods=['GET'])
 def get_image(task_id: str, image_name: str):
     """
@@ -1422,10 +2147,12 @@ def get_image(task_id: str, image_name: str):
         if not str(image_path.resolve()).startswith(str(mineru_folder.resolve())):
             return get_standard_response(False, "非法路径", {}), 403
         
+        ensure_local_result(task_id)
         if not image_path.exists():
             return get_standard_response(False, f"图片不存在: {image_name}", {}), 404
         
-        return send_from_directory(str(image_path.parent), image_path.name)
+        response = send_from_directory(str(image_path.parent), image_path.name, etag=file_etag(image_path))
+        return apply_cache_headers(response, immutable=is_content_addressed(image_path))
     except Exception as e:
         logger.error(f"获取图片失败: {e}", exc_info=True)
         return get_standard_response(False, f"图片不存在: {image_name}", {}), 404
@@ -1447,16 +2174,297 @@ def download_translation(filename: str):
         if not str(file_path.resolve()).startswith(str(translations_folder.resolve())):
             return get_standard_response(False, "非法路径", {}), 403
         
-        if not file_path.exists():
+        # layout翻译结果先把追加日志合并进快照
+        if file_path.suffix == '.json' and file_path.with_suffix('.jsonl').exists():
+            get_translation_log(file_path, get_compression_codec(), make_publisher()).compact()
+        
+        fetch_file(file_path)
+        if not stored_exists(file_path):
             return get_standard_response(False, f"文件不存在: {filename}", {}), 404
         
-        return send_from_directory(
-            str(file_path.parent), 
-            file_path.name,
-            as_attachment=True,
-            download_name=filename
-        )
+        return send_stored(file_path, as_attachment=True, download_name=secure_filename(filename))
     except Exception as e:
         logger.error(f"下载翻译结果失败: {e}", exc_info=True)
         return get_standard_response(False, f"下载失败: {str(e)}", {}), 500
 
+
+def resolve_upload_path(sha256: str):
+    """
+    文档哈希对应的上传PDF（本地缺少时从存储后端获取）
+    
+    Returns:
+        PDF路径；不存在时返回None
+    """
+    upload = get_upload(sha256) or {}
+    pdf_path = Path(current_app.config['UPLOAD_FOLDER']) / secure_filename(upload.get('filename') or f"{sha256}.pdf")
+    fetch_file(pdf_path)
+    return pdf_path if pdf_path.is_file() else None
+
+
+def resolve_export_source(data: dict) -> tuple:
+    """
+    确定双语PDF导出使用的源PDF和带译文的layout
+    
+    译文来源（按优先级）：translation_file（layout翻译结果文件）、layout（请求中直接提供）、
+    task_id对应的全文翻译（按对齐索引分配到各块）
+    
+    Args:
+        data: 请求参数
+    
+    Returns:
+        (源PDF路径, 文档哈希, layout, 目标语言)
+    
+    Raises:
+        FileNotFoundError: 翻译结果或源PDF不存在
+        ValueError: 无法确定源PDF
+    """
+    task_id = data.get('task_id')
+    sha256 = data.get('sha256')
+    target_lang = data.get('target_lang')
+    translation_file = data.get('translation_file')
+    
+    if translation_file:
+        translations_folder = Path(current_app.config['MINERU_FOLDER']) / 'translations'
+        file_path = translations_folder / secure_filename(translation_file)
+        if file_path.with_suffix('.jsonl').exists():
+            get_translation_log(file_path, get_compression_codec(), make_publisher()).compact()
+        fetch_file(file_path)
+        if not stored_exists(file_path):
+            raise FileNotFoundError(f"翻译结果不存在: {translation_file}")
+        snapshot = read_stored_json(file_path)
+        layout = snapshot.get('layout') or []
+        target_lang = target_lang or snapshot.get('target_lang')
+        record = get_translation(file_path.name) or {}
+        task_id = task_id or record.get('task_id')
+        if not sha256 and get_upload(record.get('doc_key')):
+            sha256 = record['doc_key']
+    elif data.get('layout'):
+        layout = data['layout']
+    elif task_id:
+        target_lang = target_lang or current_app.config.get('DEFAULT_TARGET_LANG', 'zh')
+        index, translated_chunks = load_full_translation(task_id, target_lang)
+        if index is None or translated_chunks is None:
+            raise FileNotFoundError("未找到该任务的全文翻译，请先执行全文翻译")
+        translations = map_block_translations(index, translated_chunks)
+        layout = [dict(block, translated_text=translations.get(block.get('block_id')))
+                  for block in load_task_layout(task_id)]
+    else:
+        raise ValueError("请提供translation_file、layout或task_id")
+    
+    sha256 = sha256 or get_task_sha256(task_id)
+    if not sha256:
+        raise ValueError("无法确定源PDF，请提供task_id或sha256")
+    pdf_path = resolve_upload_path(sha256)
+    if pdf_path is None:
+        raise FileNotFoundError("源PDF不存在")
+    return pdf_path, sha256, layout, target_lang
+
+
+@api_bp.route('/export-pdf', methods=['POST'])
+def export_bilingual_pdf():
+    """
+    导出双语PDF：把译文写入原PDF中每个layout块的位置
+    
+    请求参数:
+        - translation_file / layout / task_id: 译文来源（见resolve_export_source）
+        - task_id / sha256: 源文档（translation_file有翻译记录时可省略）
+        - target_lang: 目标语言（全文翻译时使用，默认DEFAULT_TARGET_LANG）
+        - mode: overlay（原位覆盖，默认）或side_by_side（左原文右译文）
+        - stream: 为true时以SSE推送每段页面的完成进度，最后返回下载地址；否则直接返回PDF
+    
+    相同源文件、模式和译文的导出结果会被缓存，再次导出直接返回。
+    """
+    try:
+        data = request.get_json() or {}
+        mode = data.get('mode', 'overlay')
+        if mode not in EXPORT_MODES:
+            return get_standard_response(False, f"不支持的导出模式: {mode}", {}), 400
+        
+        try:
+            pdf_path, sha256, layout, target_lang = resolve_export_source(data)
+        except FileNotFoundError as e:
+            return get_standard_response(False, str(e), {}), 404
+        except ValueError as e:
+            return get_standard_response(False, str(e), {}), 400
+        
+        page_blocks = collect_page_blocks(layout)
+        if not page_blocks:
+            return get_standard_response(False, "没有可写入的译文", {}), 400
+        
+        output_path = get_exports_folder() / f"{export_key(sha256, mode, page_blocks)}.pdf"
+        original_filename = (get_upload(sha256) or {}).get('original_filename') or pdf_path.name
+        download_name = f"{Path(original_filename).stem}_{target_lang or 'translated'}_{mode}.pdf"
+        cached = output_path.exists()
+        
+        config = current_app.config
+        
+        def run_export():
+            return export_pdf(
+                str(pdf_path), page_blocks, output_path, mode,
+                parallel_threshold=config.get('PDF_EXPORT_PARALLEL_PAGES', 16),
+                max_workers=config.get('PDF_EXPORT_WORKERS'),
+                font_file=config.get('PDF_EXPORT_FONT_FILE') or None
+            )
+        
+        if not data.get('stream'):
+            if not cached:
+                for _ in run_export():
+                    pass
+            response = send_from_directory(str(output_path.parent.resolve()), output_path.name,
+                                           mimetype='application/pdf', as_attachment=True,
+                                           download_name=download_name, etag=file_etag(output_path))
+            return apply_cache_headers(response, immutable=True)
+        
+        def event_stream():
+            started = time.time()
+            yield format_sse("init", {"mode": mode, "file": output_path.name, "cached": cached})
+            try:
+                if not cached:
+                    for progress in run_export():
+                        yield format_sse("progress", progress)
+                yield format_sse("complete", {
+                    "file": output_path.name,
+                    "download_url": f"/api/exports/{output_path.name}",
+                    "download_name": download_name,
+                    "size": output_path.stat().st_size,
+                    "cached": cached,
+                    "took_ms": round((time.time() - started) * 1000)
+                })
+            except Exception as e:
+                logger.error(f"导出PDF失败: {e}", exc_info=True)
+                yield format_sse("error", {"message": str(e)})
+        
+        return Response(
+            stream_with_context(event_stream()),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'  # 禁用Nginx缓冲
+            }
+        )
+    except Exception as e:
+        logger.error(f"导出PDF失败: {e}", exc_info=True)
+        return get_standard_response(False, f"导出失败: {str(e)}", {}), 500
+
+
+@api_bp.route('/exports/<filename>', methods=['GET'])
+def download_export(filename: str):
+    """
+    下载导出的双语PDF（文件名为内容哈希，可长期缓存）
+    
+    查询参数:
+        download_name: 下载时使用的文件名（可选）
+    """
+    try:
+        exports_folder = get_exports_folder().resolve()
+        file_path = exports_folder / secure_filename(filename)
+        if not file_path.is_file():
+            return get_standard_response(False, f"文件不存在: {filename}", {}), 404
+        
+        response = send_from_directory(str(exports_folder), file_path.name, mimetype='application/pdf',
+                                       as_attachment=True,
+                                       download_name=request.args.get('download_name') or file_path.name,
+                                       etag=file_etag(file_path))
+        return apply_cache_headers(response, immutable=True)
+    except Exception as e:
+        logger.error(f"下载导出文件失败: {e}", exc_info=True)
+        return get_standard_response(False, f"下载失败: {str(e)}", {}), 500
+
+
+def _document_pages(sha256: str):
+    """
+    文档的上传PDF和页面尺寸；文档不存在时返回(None, None)
+    """
+    if not SHA256_PATTERN.fullmatch(sha256):
+        return None, None
+    pdf_path = resolve_upload_path(sha256)
+    if pdf_path is None:
+        return None, None
+    return pdf_path, build_page_sizes(str(pdf_path), sha256)
+
+
+@api_bp.route('/documents/<sha256>/thumbnails', methods=['GET'])
+def get_document_thumbnails(sha256: str):
+    """
+    获取文档的页数、页面尺寸和各页缩略图地址，并在后台开始生成缩略图
+    
+    前端用它立即显示可翻页的文档，缩略图在首次请求时生成（已生成的直接返回）。
+    
+    查询参数:
+        width: 缩略图宽度（像素，默认THUMBNAIL_WIDTH，按32取整）
+    """
+    try:
+        pdf_path, page_sizes = _document_pages(sha256)
+        if pdf_path is None:
+            return get_standard_response(False, f"文档不存在: {sha256}", {}), 404
+        if not page_sizes:
+            return get_standard_response(False, "无法读取PDF页面", {}), 400
+        
+        width = normalize_width(request.args.get('width', type=int))
+        schedule_thumbnails(pdf_path, sha256, width, len(page_sizes))
+        status = thumbnail_status(sha256, width, len(page_sizes))
+        return get_standard_response(True, "获取成功", {
+            "sha256": sha256,
+            "page_count": len(page_sizes),
+            "page_sizes": page_sizes,
+            "width": width,
+            **status,
+            "thumbnail_urls": [f"/api/documents/{sha256}/thumbnails/{page_no}?width={width}"
+                               for page_no in range(1, len(page_sizes) + 1)]
+        })
+    except Exception as e:
+        logger.error(f"获取缩略图列表失败: {e}", exc_info=True)
+        return get_standard_response(False, f"获取失败: {str(e)}", {}), 500
+
+
+@api_bp.route('/documents/<sha256>/thumbnails/<int:page_no>', methods=['GET'])
+def get_document_thumbnail(sha256: str, page_no: int):
+    """
+    获取一页的缩略图（尚未生成时立即生成该页；内容不变，可长期缓存）
+    
+    查询参数:
+        width: 缩略图宽度（像素，默认THUMBNAIL_WIDTH，按32取整）
+    """
+    try:
+        pdf_path, page_sizes = _document_pages(sha256)
+        if pdf_path is None:
+            return get_standard_response(False, f"文档不存在: {sha256}", {}), 404
+        
+        width = normalize_width(request.args.get('width', type=int))
+        thumbnail = get_thumbnail(pdf_path, sha256, page_no, width, len(page_sizes or []))
+        if thumbnail is None:
+            return get_standard_response(False, f"页码超出范围: {page_no}", {}), 404
+        
+        response = send_from_directory(str(thumbnail.parent.resolve()), thumbnail.name, etag=file_etag(thumbnail))
+        return apply_cache_headers(response, immutable=True)
+    except Exception as e:
+        logger.error(f"获取缩略图失败: {e}", exc_info=True)
+        return get_standard_response(False, f"获取失败: {str(e)}", {}), 500
+
+
+@api_bp.route('/documents/<sha256>/pages/<page_range>', methods=['GET'])
+def get_document_pages(sha256: str, page_range: str):
+    """
+    切出一页或页码范围为独立的小PDF（如 /pages/3 或 /pages/3-7，页码从1开始）
+    
+    前端只需用PDF.js加载当前页的切片，不必下载整个文档。单页切片缓存，多页切片每次生成；都支持Range请求。
+    """
+    try:
+        pdf_path, page_sizes = _document_pages(sha256)
+        if pdf_path is None:
+            return get_standard_response(False, f"文档不存在: {sha256}", {}), 404
+        
+        pages = parse_page_range(page_range, len(page_sizes or []))
+        if pages is None:
+            return get_standard_response(False, f"无效的页码范围: {page_range}", {}), 400
+        first, last = pages
+        max_pages = current_app.config.get('PDF_SLICE_MAX_PAGES', 50)
+        if last - first + 1 > max_pages:
+            return get_standard_response(False, f"单次最多切出 {max_pages} 页", {}), 400
+        
+        data = slice_pdf(pdf_path, sha256, first, last)
+        response = send_file(io.BytesIO(data), mimetype='application/pdf', etag=hashlib.sha256(data).hexdigest())
+        return apply_cache_headers(response, immutable=True)
+    except Exception as e:
+        logger.error(f"PDF切片失败: {e}", exc_info=True)
+        return get_standard_response(False, f"切片失败: {str(e)}", {}), 500
@@ -0,0 +1,131 @@
+"""
+S3本地替身服务：实现对象存储后端用到的S3接口子集（路径风格URL）
+用于离线测试多节点共享存储（STORAGE_BACKEND=s3），对象保存在内存中，不校验签名
+
+支持的接口：PutObject、GetObject、HeadObject、DeleteObject、ListObjectsV2（含分页）
+
+启动方式:
+    python -m server.s3_standin --port 9000
+
+然后将主服务的STORAGE_S3_ENDPOINT指向 http://127.0.0.1:9000 即可（bucket在首次写入时自动创建）
+"""
+import argparse
+import hashlib
+import logging
+import threading
+from typing import Dict, Tuple
+from xml.sax.saxutils import escape
+from flask import Flask, Blueprint, Response, current_app, request
+
+logger = logging.getLogger(__name__)
+
+# ListObjectsV2每页返回的最大对象数
+MAX_KEYS = 1000
+
+standin_bp = Blueprint('s3_standin', __name__)
+
+
+class ObjectStore:
+    """
+    内存中的对象：(bucket, key) -> (内容, 元数据请求头)
+    """
+
+    def __init__(self):
+        self.objects: Dict[Tuple[str, str], Tuple[bytes, Dict[str, str]]] = {}
+        self.lock = threading.Lock()
+
+
+def _store() -> ObjectStore:
+    return current_app.config['S3_STANDIN_STORE']
+
+
+def _error(status: int, code: str, message: str) -> Response:
+    body = f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code><Message>{escape(message)}</Message></Error>'
+    return Response(body, status=status, mimetype='application/xml')
+
+
+@standin_bp.route('/<bucket>/<path:key>', methods=['PUT'])
+def put_object(bucket: str, key: str):
+    data = request.get_data()
+    metadata = {name: value for name, value in request.headers.items() if name.lower().startswith('x-amz-meta-')}
+    metadata['Content-Type'] = request.headers.get('Content-Type', 'application/octet-stream')
+    with _store().lock:
+        _store().objects[(bucket, key)] = (data, metadata)
+    return Response(status=200, headers={'ETag': f'"{hashlib.md5(data).hexdigest()}"'})
+
+
+@standin_bp.route('/<bucket>/<path:key>', methods=['GET', 'HEAD'])
+def get_object(bucket: str, key: str):
+    item = _store().objects.get((bucket, key))
+    if item is None:
+        return _error(404, 'NoSuchKey', key)
+    data, metadata = item
+    headers = {name: value for name, value in metadata.items() if name != 'Content-Type'}
+    headers['ETag'] = f'"{hashlib.md5(data).hexdigest()}"'
+    if request.method == 'HEAD':
+        headers['Content-Length'] = str(len(data))
+        return Response(status=200, headers=headers, mimetype=metadata['Content-Type'])
+    return Response(data, headers=headers, mimetype=metadata['Content-Type'])
+
+
+@standin_bp.route('/<bucket>/<path:key>', methods=['DELETE'])
+def delete_object(bucket: str, key: str):
+    with _store().lock:
+        _store().objects.pop((bucket, key), None)
+    return Response(status=204)
+
+
+@standin_bp.route('/<bucket>', methods=['GET'])
+def list_objects(bucket: str):
+    if request.args.get('list-type') != '2':
+        return _error(400, 'InvalidArgument', '只支持ListObjectsV2（list-type=2）')
+    prefix = request.args.get('prefix', '')
+    max_keys = min(int(request.args.get('max-keys', MAX_KEYS)), MAX_KEYS)
+    # 续页令牌直接使用上一页最后一个键
+    start_after = request.args.get('continuation-token') or request.args.get('start-after') or ''
+
+    with _store().lock:
+        keys = sorted(key for (name, key) in _store().objects if name == bucket and key.startswith(prefix)
+                      and key > start_after)
+        page = [(key, len(_store().objects[(bucket, key)][0])) for key in keys[:max_keys]]
+    truncated = len(keys) > max_keys
+
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">',
+             f'<Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix>',
+             f'<KeyCount>{len(page)}</KeyCount><MaxKeys>{max_keys}</MaxKeys>',
+             f'<IsTruncated>{"true" if truncated else "false"}</IsTruncated>']
+    if truncated:
+        parts.append(f'<NextContinuationToken>{escape(page[-1][0])}</NextContinuationToken>')
+    for key, size in page:
+        parts.append(f'<Contents><Key>{escape(key)}</Key><Size>{size}</Size></Contents>')
+    parts.append('</ListBucketResult>')
+    return Response(''.join(parts), mimetype='application/xml')
+
+
+def create_standin_app() -> Flask:
+    """
+    创建S3替身服务应用
+
+    Returns:
+        Flask应用实例
+    """
+    app = Flask(__name__)
+    app.config['S3_STANDIN_STORE'] = ObjectStore()
+    app.register_blueprint(standin_bp)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='S3本地替身服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    app = create_standin_app()
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+"""
+全文检索模块：基于SQLite FTS5为整个文档库建立增量索引
+
+每个layout块（原文）和每条块级译文作为一条记录，带有文档、语言、页码和block_id。
+MinerU结果落盘和翻译完成时按（文档, 语言）增量更新，/api/search按bm25排序返回带高亮的片段。
+
+unicode61分词器把连续的中日韩文字视为一个词，因此入库和查询前都在每个CJK字符两侧插入分隔符（\x1f，
+分词器视为分隔符、正文中不会出现），按字切分后用短语查询匹配相邻字符；返回片段时只去掉这些分隔符，原文的空格保持不变。
+"""
+import html
+import logging
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# 索引数据库文件名（位于MINERU_FOLDER下）
+SEARCH_DB_FILENAME = 'search_index.db'
+
+# 原文记录使用的语言标记
+SOURCE_LANG = 'source'
+
+# 片段高亮标记（先用控制字符占位，转义HTML后再替换）
+_MARK_OPEN, _MARK_CLOSE = '\x02', '\x03'
+
+# 片段长度（词数）
+SNIPPET_TOKENS = 24
+
+# 入库时在CJK字符两侧插入的分隔符
+_CJK_GAP = '\x1f'
+
+_CJK_CHAR = re.compile(r'([぀-ヿ㐀-䶿一-鿿가-힯])')
+_WORD = re.compile(r'\w+')
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS documents (
+        doc_key TEXT PRIMARY KEY,
+        task_id TEXT,
+        sha256 TEXT,
+        title TEXT,
+        updated_at INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS passages (
+        id INTEGER PRIMARY KEY,
+        doc_key TEXT NOT NULL,
+        lang TEXT NOT NULL,
+        page INTEGER,
+        block_id TEXT,
+        body TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS passages_doc ON passages(doc_key, lang, block_id)",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS passages_fts USING fts5(
+        body, content='passages', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS passages_ai AFTER INSERT ON passages BEGIN
+        INSERT INTO passages_fts(rowid, body) VALUES (new.id, new.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS passages_ad AFTER DELETE ON passages BEGIN
+        INSERT INTO passages_fts(passages_fts, rowid, body) VALUES ('delete', old.id, old.body);
+    END""",
+]
+
+# 写操作串行执行；已初始化的数据库路径
+_write_lock = threading.Lock()
+_initialized = set()
+
+
+def get_search_db_path() -> Path:
+    return Path(current_app.config['MINERU_FOLDER']) / SEARCH_DB_FILENAME
+
+
+@contextmanager
+def _connect():
+    path = get_search_db_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    try:
+        if str(path) not in _initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            _initialized.add(str(path))
+        yield conn
+    finally:
+        conn.close()
+
+
+def _space_cjk(text: str) -> str:
+    return _CJK_CHAR.sub(_CJK_GAP + r'\1' + _CJK_GAP, text)
+
+
+def _unspace_cjk(text: str) -> str:
+    return re.sub(r'\s+', ' ', text.replace(_CJK_GAP, '')).strip()
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    把用户输入转换为FTS5查询：各词之间为AND，拉丁词按前缀匹配，CJK词按逐字短语匹配
+
+    Args:
+        query: 用户输入
+
+    Returns:
+        FTS5 MATCH表达式；没有可检索的词时返回None
+    """
+    terms = []
+    for word in (query or '').split():
+        for token in _WORD.findall(word):
+            if _CJK_CHAR.search(token):
+                terms.append('"' + ' '.join(_WORD.findall(_space_cjk(token))) + '"')
+            else:
+                terms.append(f'"{token}"*')
+    return ' '.join(terms) if terms else None
+
+
+def _upsert_document(conn, doc_key: str, task_id: str = None, sha256: str = None, title: str = None):
+    conn.execute(
+        """INSERT INTO documents(doc_key, task_id, sha256, title, updated_at) VALUES (?, ?, ?, ?, ?)
+           ON CONFLICT(doc_key) DO UPDATE SET
+               task_id = COALESCE(excluded.task_id, task_id),
+               sha256 = COALESCE(excluded.sha256, sha256),
+               title = COALESCE(excluded.title, title),
+               updated_at = excluded.updated_at""",
+        (doc_key, task_id, sha256, title, int(time.time()))
+    )
+
+
+def _insert_passages(conn, doc_key: str, lang: str, passages: Iterable[Dict[str, Any]]) -> int:
+    rows = [
+        (doc_key, lang, passage.get('page'), passage.get('block_id'), _space_cjk(text))
+        for passage in passages
+        for text in [(passage.get('text') or '').strip()]
+        if text
+    ]
+    conn.executemany("INSERT INTO passages(doc_key, lang, page, block_id, body) VALUES (?, ?, ?, ?, ?)", rows)
+    return len(rows)
+
+
+def index_document(doc_key: str, layout: List[Dict[str, Any]], task_id: str = None,
+                   sha256: str = None, title: str = None) -> int:
+    """
+    用layout块的原文替换文档在索引中的原文记录
+
+    Args:
+        doc_key: 文档标识（内容哈希或task_id）
+        layout: layout列表
+        task_id: 任务ID或batch_id
+        sha256: 文档内容哈希
+        title: 文档标题（原始文件名）
+
+    Returns:
+        写入的记录数
+    """
+    if not doc_key:
+        return 0
+    with _write_lock, _connect() as conn:
+        _upsert_document(conn, doc_key, task_id, sha256, title)
+        conn.execute("DELETE FROM passages WHERE doc_key = ? AND lang = ?", (doc_key, SOURCE_LANG))
+        count = _insert_passages(conn, doc_key, SOURCE_LANG, layout)
+        conn.commit()
+    logger.info(f"全文检索：已索引原文 {doc_key[:12]}（{count} 条）")
+    return count
+
+
+def index_translations(doc_key: str, target_lang: str, passages: List[Dict[str, Any]],
+                       task_id: str = None, replace: bool = True) -> int:
+    """
+    写入文档的块级译文
+
+    Args:
+        doc_key: 文档标识
+        target_lang: 目标语言
+        passages: [{"page": 1, "block_id": "p1_b0", "text": "译文"}, ...]
+        task_id: 任务ID或batch_id
+        replace: 为True时替换该语言的全部译文（全文翻译），否则只替换涉及的block_id（layout翻译）
+
+    Returns:
+        写入的记录数
+    """
+    if not doc_key or not target_lang or target_lang == SOURCE_LANG:
+        return 0
+    with _write_lock, _connect() as conn:
+        _upsert_document(conn, doc_key, task_id)
+        if replace:
+            conn.execute("DELETE FROM passages WHERE doc_key = ? AND lang = ?", (doc_key, target_lang))
+        else:
+            conn.executemany(
+                "DELETE FROM passages WHERE doc_key = ? AND lang = ? AND block_id = ?",
+                [(doc_key, target_lang, passage.get('block_id')) for passage in passages if passage.get('block_id')]
+            )
+        count = _insert_passages(conn, doc_key, target_lang, passages)
+        conn.commit()
+    logger.info(f"全文检索：已索引译文 {doc_key[:12]} {target_lang}（{count} 条）")
+    return count
+
+
+def remove_document(doc_key: str):
+    """
+    从索引中删除文档的全部记录
+    """
+    with _write_lock, _connect() as conn:
+        conn.execute("DELETE FROM passages WHERE doc_key = ?", (doc_key,))
+        conn.execute("DELETE FROM documents WHERE doc_key = ?", (doc_key,))
+        conn.commit()
+
+
+def indexed_documents() -> set:
+    """
+    返回已索引原文的文档标识集合
+    """
+    with _connect() as conn:
+        rows = conn.execute("SELECT DISTINCT doc_key FROM passages WHERE lang = ?", (SOURCE_LANG,)).fetchall()
+    return {row[0] for row in rows}
+
+
+def _format_snippet(snippet: str) -> str:
+    text = html.escape(_unspace_cjk(snippet))
+    return text.replace(_MARK_OPEN, '<mark>').replace(_MARK_CLOSE, '</mark>')
+
+
+def search(query: str, lang: str = None, task_id: str = None, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+    """
+    检索文档库
+
+    Args:
+        query: 检索词（空格分隔的多个词须同时出现）
+        lang: 只检索原文（source）或某种译文（如zh）；为空时都检索
+        task_id: 只检索某个任务的文档
+        limit: 返回条数
+        offset: 跳过的条数
+
+    Returns:
+        {"results": [...], "took_ms": 1.2}；每条结果包含文档信息、页码、block_id、高亮片段和得分
+    """
+    start_time = time.perf_counter()
+    match = build_match_query(query)
+    if match is None:
+        return {"results": [], "took_ms": 0}
+
+    sql = f"""
+        SELECT p.doc_key, d.task_id, d.sha256, d.title, p.lang, p.page, p.block_id,
+               snippet(passages_fts, 0, ?, ?, '…', {SNIPPET_TOKENS}) AS snippet,
+               bm25(passages_fts) AS score
+        FROM passages_fts
+        JOIN passages p ON p.id = passages_fts.rowid
+        JOIN documents d ON d.doc_key = p.doc_key
+        WHERE passages_fts MATCH ?
+    """
+    params: List[Any] = [_MARK_OPEN, _MARK_CLOSE, match]
+    if lang:
+        sql += " AND p.lang = ?"
+        params.append(lang)
+    if task_id:
+        sql += " AND d.task_id = ?"
+        params.append(task_id)
+    sql += " ORDER BY score LIMIT ? OFFSET ?"
+    params.extend([limit, offset])
+
+    with _connect() as conn:
+        rows = conn.execute(sql, params).fetchall()
+
+    results = [{
+        "doc_key": doc_key,
+        "task_id": row_task_id,
+        "sha256": sha256,
+        "title": title,
+        "lang": row_lang,
+        "page": page,
+        "block_id": block_id,
+        "snippet": _format_snippet(snippet),
+        "score": round(-score, 4)
+    } for doc_key, row_task_id, sha256, title, row_lang, page, block_id, snippet, score in rows]
+    return {"results": results, "took_ms": round((time.perf_counter() - start_time) * 1000, 2)}
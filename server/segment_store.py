@@ -0,0 +1,245 @@
+"""
+段落级译文存储模块：按文档保存“规范化段落哈希 -> 译文”
+layout模式和全文模式共用同一份存储，任一模式翻译过的段落在另一模式中直接复用
+"""
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from flask import current_app
+
+from server.block_alignment import HEADING_PREFIX, split_paragraphs
+
+from server.fast_json import dump_file, load_file
+
+try:
+    import fcntl
+except ImportError:  # Windows下只做进程内加锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 存储目录（位于MINERU_FOLDER下）
+SEGMENTS_DIRNAME = 'segments'
+
+# 文档标识和目标语言的允许格式（二者组成存储文件名）
+DOCUMENT_KEY_PATTERN = re.compile(r'[A-Za-z0-9_-]+')
+TARGET_LANG_PATTERN = re.compile(r'[A-Za-z-]{1,16}')
+
+# 同一文档的存储对象在进程内共享，避免并发翻译时互相覆盖；只保留最近使用的若干个
+MAX_CACHED_STORES = 64
+_stores = OrderedDict()
+_stores_lock = threading.Lock()
+
+
+def segment_key(text: str) -> Optional[str]:
+    """
+    计算段落的规范化哈希（忽略大小写、空白、标点和Markdown标记）
+
+    Args:
+        text: 段落原文
+
+    Returns:
+        SHA256哈希；段落不含任何字母或数字时返回None
+    """
+    normalized = "".join(ch.lower() for ch in HEADING_PREFIX.sub('', text or '') if ch.isalnum())
+    if not normalized:
+        return None
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def _strip_heading(text: str) -> str:
+    return HEADING_PREFIX.sub('', text.strip(), count=1)
+
+
+@contextmanager
+def _file_lock(path: Path):
+    # 跨进程互斥：多个进程（gunicorn worker）可能同时保存同一文档的存储
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _mtime(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class SegmentStore:
+    """
+    单个文档、单个目标语言的段落译文存储
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(self.path.name + '.lock')
+        self._lock = threading.Lock()
+        self._segments: Dict[str, str] = {}
+        # 本实例写入但尚未保存的段落，保存时合并到磁盘上的最新内容
+        self._pending: Dict[str, str] = {}
+        self._mtime = None
+        self._reload()
+
+    def _reload(self):
+        mtime = _mtime(self.path)
+        segments = {}
+        if mtime is not None:
+            try:
+                segments = load_file(self.path)
+            except Exception as e:
+                logger.warning(f"读取段落译文存储失败，将重建: {e}")
+        self._segments = {**segments, **self._pending}
+        self._mtime = mtime
+
+    def refresh(self):
+        """
+        存储文件被其他进程更新时重新加载
+        """
+        with self._lock:
+            if _mtime(self.path) != self._mtime:
+                self._reload()
+
+    def get(self, text: str) -> Optional[str]:
+        key = segment_key(text)
+        if key is None:
+            return None
+        with self._lock:
+            return self._segments.get(key)
+
+    def put(self, text: str, translation: str):
+        key = segment_key(text)
+        if key is None or not translation or not translation.strip():
+            return
+        translation = _strip_heading(translation)
+        with self._lock:
+            if self._segments.get(key) != translation:
+                self._segments[key] = translation
+                self._pending[key] = translation
+
+    def put_paragraphs(self, source: str, translated: str) -> int:
+        """
+        按段落拆分原文和译文并逐段写入（段落数不一致时无法对应，不写入）
+
+        Returns:
+            写入的段落数
+        """
+        source_paragraphs = split_paragraphs(source)
+        translated_paragraphs = split_paragraphs(translated)
+        if len(source_paragraphs) != len(translated_paragraphs):
+            return 0
+        for src, dst in zip(source_paragraphs, translated_paragraphs):
+            self.put(src, dst)
+        return len(source_paragraphs)
+
+    def save(self):
+        """
+        在文件锁内重新读取磁盘上的存储，合并本实例新写入的段落后原子写回，
+        不覆盖其他进程在此期间保存的段落
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with _file_lock(self.lock_path):
+                self._reload()
+                dump_file(self.path, self._segments, atomic=True)
+                self._mtime = _mtime(self.path)
+            self._pending = {}
+
+
+def get_segment_store(document_key: str, target_lang: str) -> Optional[SegmentStore]:
+    """
+    获取文档的段落译文存储
+
+    Args:
+        document_key: 文档标识（优先使用内容哈希，其次task_id）
+        target_lang: 目标语言
+
+    Returns:
+        SegmentStore；未提供文档标识时返回None
+
+    Raises:
+        ValueError: 文档标识或目标语言格式不合法
+    """
+    if not document_key:
+        return None
+    if not isinstance(document_key, str) or not DOCUMENT_KEY_PATTERN.fullmatch(document_key):
+        raise ValueError(f"无效的文档标识: {document_key}")
+    if not isinstance(target_lang, str) or not TARGET_LANG_PATTERN.fullmatch(target_lang):
+        raise ValueError(f"无效的目标语言: {target_lang}")
+    segments_dir = (Path(current_app.config['MINERU_FOLDER']) / SEGMENTS_DIRNAME).resolve()
+    path = segments_dir / f"{document_key}_{target_lang}.json"
+    if path.resolve().parent != segments_dir:
+        raise ValueError(f"无效的文档标识: {document_key}")
+    with _stores_lock:
+        store = _stores.get(str(path))
+        if store is None:
+            store = SegmentStore(path)
+            _stores[str(path)] = store
+            while len(_stores) > MAX_CACHED_STORES:
+                _stores.popitem(last=False)
+        else:
+            _stores.move_to_end(str(path))
+    store.refresh()
+    return store
+
+
+def translate_chunk_with_segments(chunk: str, store: Optional[SegmentStore], translate: Callable[[str], str]) -> tuple:
+    """
+    翻译一个Markdown分块，已存储的段落直接复用，只把缺失的段落交给LLM
+
+    Args:
+        chunk: Markdown分块
+        store: 段落译文存储（为None时直接整块翻译）
+        translate: 翻译函数，输入原文返回译文
+
+    Returns:
+        (译文, 复用的段落数)
+    """
+    if store is None:
+        return translate(chunk), 0
+
+    paragraphs = split_paragraphs(chunk)
+    cached = [store.get(paragraph) for paragraph in paragraphs]
+    missing = [idx for idx, value in enumerate(cached) if value is None and segment_key(paragraphs[idx])]
+    reused = sum(1 for value in cached if value is not None)
+
+    if missing:
+        if reused == 0:
+            translated_chunk = translate(chunk)
+            store.put_paragraphs(chunk, translated_chunk)
+            return translated_chunk, 0
+
+        missing_text = "\n\n".join(paragraphs[idx] for idx in missing)
+        translated_missing = split_paragraphs(translate(missing_text))
+        if len(translated_missing) != len(missing):
+            # LLM合并或拆分了段落，无法逐段对应，退回整块翻译
+            translated_chunk = translate(chunk)
+            store.put_paragraphs(chunk, translated_chunk)
+            return translated_chunk, 0
+        for idx, translation in zip(missing, translated_missing):
+            store.put(paragraphs[idx], translation)
+            cached[idx] = _strip_heading(translation)
+
+    parts = []
+    for paragraph, translation in zip(paragraphs, cached):
+        if translation is None:
+            # 纯符号/公式段落，原样保留
+            parts.append(paragraph)
+            continue
+        heading = HEADING_PREFIX.match(paragraph)
+        parts.append(f"{heading.group(1)} {translation}" if heading else translation)
+    return "\n\n".join(parts), reused
+
@@ -0,0 +1,137 @@
+"""
+空间索引模块：为每页layout建立均匀网格索引，支持点击命中测试和可视区域查询
+
+坐标与layout中的bbox一致：有PDF页面尺寸时统一为页面坐标（pt），否则为MinerU原始坐标。
+每页的网格在首次查询时建立，并随对应的ColumnarLayout一起缓存。
+"""
+import math
+import threading
+import weakref
+from typing import Dict, List, Optional
+
+from server.columnar_layout import ColumnarLayout
+
+# 网格每边的最大格数
+MAX_GRID_SIZE = 64
+
+
+class PageGrid:
+    """
+    单页的均匀网格索引：每个格子记录与之相交的块序号
+    """
+
+    def __init__(self, page_layout: ColumnarLayout):
+        self.layout = page_layout
+        self.boxes = [page_layout.raw_bbox(i) for i in range(len(page_layout))]
+
+        count = len(self.boxes)
+        self.width = max((box[2] for box in self.boxes), default=0) or 1.0
+        self.height = max((box[3] for box in self.boxes), default=0) or 1.0
+        # 每格平均约一个块
+        self.size = max(1, min(MAX_GRID_SIZE, math.ceil(math.sqrt(count))))
+        self.cells: Dict[tuple, List[int]] = {}
+
+        for index, (x0, y0, x1, y1) in enumerate(self.boxes):
+            cx0, cy0 = self._cell(min(x0, x1), min(y0, y1))
+            cx1, cy1 = self._cell(max(x0, x1), max(y0, y1))
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    self.cells.setdefault((cx, cy), []).append(index)
+
+    def _cell(self, x: float, y: float) -> tuple:
+        cx = int(x / self.width * self.size)
+        cy = int(y / self.height * self.size)
+        return min(max(cx, 0), self.size - 1), min(max(cy, 0), self.size - 1)
+
+    def query_point(self, x: float, y: float) -> List[int]:
+        """
+        返回包含点(x, y)的块序号，面积小的（更内层的）在前
+        """
+        hits = []
+        for index in self.cells.get(self._cell(x, y), []):
+            x0, y0, x1, y1 = self.boxes[index]
+            if min(x0, x1) <= x <= max(x0, x1) and min(y0, y1) <= y <= max(y0, y1):
+                hits.append(index)
+        hits.sort(key=lambda i: abs((self.boxes[i][2] - self.boxes[i][0]) * (self.boxes[i][3] - self.boxes[i][1])))
+        return hits
+
+    def query_rect(self, x0: float, y0: float, x1: float, y1: float) -> List[int]:
+        """
+        返回与矩形相交的块序号（按阅读顺序）
+        """
+        left, right = min(x0, x1), max(x0, x1)
+        top, bottom = min(y0, y1), max(y0, y1)
+        cx0, cy0 = self._cell(left, top)
+        cx1, cy1 = self._cell(right, bottom)
+
+        candidates = set()
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                candidates.update(self.cells.get((cx, cy), ()))
+
+        hits = []
+        for index in sorted(candidates):
+            bx0, by0, bx1, by1 = self.boxes[index]
+            if min(bx0, bx1) <= right and max(bx0, bx1) >= left and min(by0, by1) <= bottom and max(by0, by1) >= top:
+                hits.append(index)
+        return hits
+
+
+class LayoutSpatialIndex:
+    """
+    整个文档的空间索引，按页懒加载PageGrid
+    """
+
+    def __init__(self, layout: ColumnarLayout):
+        self.layout = layout
+        self._grids: Dict[int, PageGrid] = {}
+        self._lock = threading.Lock()
+
+    def page_grid(self, page_no: int) -> PageGrid:
+        with self._lock:
+            grid = self._grids.get(page_no)
+            if grid is None:
+                grid = PageGrid(self.layout.page_slice(page_no))
+                self._grids[page_no] = grid
+            return grid
+
+    def hit(self, page_no: int, x: float, y: float) -> List[dict]:
+        grid = self.page_grid(page_no)
+        return [grid.layout[i].to_dict() for i in grid.query_point(x, y)]
+
+    def viewport(self, page_no: int, x0: float, y0: float, x1: float, y1: float) -> List[dict]:
+        grid = self.page_grid(page_no)
+        return [grid.layout[i].to_dict() for i in grid.query_rect(x0, y0, x1, y1)]
+
+
+# 索引与ColumnarLayout同生命周期：layout被LRU淘汰后索引随之释放
+_indexes: "weakref.WeakKeyDictionary[ColumnarLayout, LayoutSpatialIndex]" = weakref.WeakKeyDictionary()
+_indexes_lock = threading.Lock()
+
+
+def get_spatial_index(layout: ColumnarLayout) -> LayoutSpatialIndex:
+    """
+    获取layout对应的空间索引（同一layout对象只建立一次）
+
+    Args:
+        layout: ColumnarLayout
+
+    Returns:
+        LayoutSpatialIndex
+    """
+    with _indexes_lock:
+        index = _indexes.get(layout)
+        if index is None:
+            index = LayoutSpatialIndex(layout)
+            _indexes[layout] = index
+        return index
+
+
+def parse_float_args(args, names: List[str]) -> Optional[List[float]]:
+    """
+    从查询参数中读取一组浮点数；任一缺失时返回None，格式错误时抛出ValueError
+    """
+    values = [args.get(name) for name in names]
+    if any(value is None or value == '' for value in values):
+        return None
+    return [float(value) for value in values]
@@ -0,0 +1,305 @@
+"""
+存储后端模块：多个服务节点共享上传文件、MinerU结果和翻译归档
+
+本地的UPLOAD_FOLDER和MINERU_FOLDER始终是工作目录（也是读穿缓存），存储后端保存所有节点共享的副本：
+- local：共享文件系统目录（如NFS挂载点），STORAGE_LOCAL_ROOT
+- s3：S3兼容的对象存储（AWS S3、MinIO等），使用路径风格URL和SigV4签名，只依赖requests
+
+对象键为 files/<文件名>、mineru/<task_id>/<相对路径>、mineru/translations/<文件名>，
+索引记录为 index/documents/<sha256>.json 和 index/tasks/<task_id>.json。
+文件的mtime随对象保存，下载后恢复，layout产物的源文件指纹保持有效。
+"""
+import datetime
+import hashlib
+import hmac
+import logging
+import os
+import shutil
+import threading
+import xml.etree.ElementTree as ElementTree
+from pathlib import Path
+from typing import Any, List, Optional
+from urllib.parse import quote, urlsplit
+
+import requests
+from flask import current_app
+
+from server.fast_json import dumps_bytes, loads
+
+logger = logging.getLogger(__name__)
+
+# 对象元数据中保存文件mtime的字段
+MTIME_META = 'mtime-ns'
+
+# S3 ListObjectsV2响应的XML命名空间
+S3_NAMESPACE = '{http://s3.amazonaws.com/doc/2006-03-01/}'
+
+# 上传/下载时每次读写的字节数
+CHUNK_SIZE = 1024 * 1024
+
+
+class StorageError(Exception):
+    """存储后端请求失败"""
+
+
+class StorageBackend:
+    """
+    存储后端接口：按对象键读写文件和JSON记录
+    """
+
+    name = 'base'
+
+    def put_file(self, key: str, path: Path):
+        raise NotImplementedError
+
+    def get_file(self, key: str, path: Path) -> bool:
+        """
+        下载对象到本地文件（先写临时文件再替换，并恢复mtime）
+
+        Returns:
+            对象是否存在
+        """
+        raise NotImplementedError
+
+    def list_keys(self, prefix: str) -> List[str]:
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def put_json(self, key: str, data: Any):
+        raise NotImplementedError
+
+    def get_json(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+
+def _restore_mtime(path: Path, mtime_ns: Optional[str]):
+    if mtime_ns:
+        os.utime(path, ns=(int(mtime_ns), int(mtime_ns)))
+
+
+class LocalStorage(StorageBackend):
+    """
+    共享文件系统目录：对象键即相对路径
+    """
+
+    name = 'local'
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if self.root.resolve() not in path.parents:
+            raise StorageError(f"非法的对象键: {key}")
+        return path
+
+    def put_file(self, key: str, path: Path):
+        target = self._path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(target.name + '.tmp')
+        # copy2保留mtime
+        shutil.copy2(path, tmp_path)
+        os.replace(tmp_path, target)
+
+    def get_file(self, key: str, path: Path) -> bool:
+        source = self._path(key)
+        if not source.is_file():
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        shutil.copy2(source, tmp_path)
+        os.replace(tmp_path, path)
+        return True
+
+    def list_keys(self, prefix: str) -> List[str]:
+        # 只遍历前缀中最后一个/之前的目录
+        root = self.root.resolve()
+        directory = prefix.rsplit('/', 1)[0] if '/' in prefix else ''
+        base = self._path(directory) if directory else root
+        if not base.is_dir():
+            return []
+        keys = []
+        for current, _, files in os.walk(base):
+            for filename in files:
+                if filename.endswith('.tmp'):
+                    continue
+                key = (Path(current) / filename).relative_to(root).as_posix()
+                if key.startswith(prefix):
+                    keys.append(key)
+        return sorted(keys)
+
+    def delete(self, key: str):
+        path = self._path(key)
+        if path.exists():
+            path.unlink()
+
+    def put_json(self, key: str, data: Any):
+        target = self._path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(target.name + '.tmp')
+        tmp_path.write_bytes(dumps_bytes(data))
+        os.replace(tmp_path, target)
+
+    def get_json(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        return loads(path.read_bytes()) if path.is_file() else None
+
+
+class S3Storage(StorageBackend):
+    """
+    S3兼容对象存储（路径风格URL，SigV4签名，请求体不参与签名）
+    """
+
+    name = 's3'
+
+    def __init__(self, endpoint: str, bucket: str, access_key: str, secret_key: str,
+                 region: str = 'us-east-1', prefix: str = '', timeout: int = 60):
+        self.endpoint = endpoint.rstrip('/')
+        self.host = urlsplit(self.endpoint).netloc
+        self.base_path = urlsplit(self.endpoint).path.rstrip('/')
+        self.bucket = bucket
+        self.access_key = access_key or ''
+        self.secret_key = secret_key or ''
+        self.region = region
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _signing_key(self, datestamp: str) -> bytes:
+        key = ('AWS4' + self.secret_key).encode('utf-8')
+        for part in (datestamp, self.region, 's3', 'aws4_request'):
+            key = hmac.new(key, part.encode('utf-8'), hashlib.sha256).digest()
+        return key
+
+    def _request(self, method: str, key: str = None, params: dict = None, headers: dict = None,
+                 data=None, stream: bool = False) -> requests.Response:
+        path = f"{self.base_path}/{quote(self.bucket)}"
+        if key is not None:
+            path += '/' + quote(self.prefix + key, safe='/~')
+        query = '&'.join(f"{quote(k, safe='~')}={quote(str(v), safe='~')}" for k, v in sorted((params or {}).items()))
+
+        now = datetime.datetime.now(datetime.timezone.utc)
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        datestamp = now.strftime('%Y%m%d')
+        headers = {k.lower(): str(v) for k, v in (headers or {}).items()}
+        headers.update({'host': self.host, 'x-amz-date': amz_date, 'x-amz-content-sha256': 'UNSIGNED-PAYLOAD'})
+
+        signed_headers = ';'.join(sorted(headers))
+        canonical_request = '\n'.join([
+            method, path, query,
+            ''.join(f"{name}:{headers[name].strip()}\n" for name in sorted(headers)),
+            signed_headers, 'UNSIGNED-PAYLOAD'
+        ])
+        scope = f"{datestamp}/{self.region}/s3/aws4_request"
+        string_to_sign = '\n'.join([
+            'AWS4-HMAC-SHA256', amz_date, scope, hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+        ])
+        signature = hmac.new(self._signing_key(datestamp), string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+        headers['authorization'] = (f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+                                    f"SignedHeaders={signed_headers}, Signature={signature}")
+        del headers['host']
+
+        url = f"{urlsplit(self.endpoint).scheme}://{self.host}{path}" + (f"?{query}" if query else '')
+        try:
+            return self.session.request(method, url, headers=headers, data=data, stream=stream, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise StorageError(f"S3请求失败: {method} {key}: {e}") from e
+
+    @staticmethod
+    def _check(response: requests.Response, key: str):
+        if response.status_code >= 300:
+            raise StorageError(f"S3请求失败: {key}: HTTP {response.status_code} {response.text[:200]}")
+
+    def put_file(self, key: str, path: Path):
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            response = self._request('PUT', key, headers={
+                'content-length': stat.st_size,
+                f'x-amz-meta-{MTIME_META}': stat.st_mtime_ns
+            }, data=f)
+        self._check(response, key)
+
+    def get_file(self, key: str, path: Path) -> bool:
+        response = self._request('GET', key, stream=True)
+        if response.status_code == 404:
+            response.close()
+            return False
+        self._check(response, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with response, open(tmp_path, 'wb') as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+        os.replace(tmp_path, path)
+        _restore_mtime(path, response.headers.get(f'x-amz-meta-{MTIME_META}'))
+        return True
+
+    def list_keys(self, prefix: str) -> List[str]:
+        keys, token = [], None
+        while True:
+            params = {'list-type': '2', 'prefix': self.prefix + prefix}
+            if token:
+                params['continuation-token'] = token
+            response = self._request('GET', params=params)
+            self._check(response, prefix)
+            root = ElementTree.fromstring(response.content)
+            for item in root.iter(f'{S3_NAMESPACE}Contents'):
+                keys.append(item.find(f'{S3_NAMESPACE}Key').text[len(self.prefix):])
+            token_node = root.find(f'{S3_NAMESPACE}NextContinuationToken')
+            if root.findtext(f'{S3_NAMESPACE}IsTruncated') != 'true' or token_node is None:
+                return keys
+            token = token_node.text
+
+    def delete(self, key: str):
+        response = self._request('DELETE', key)
+        if response.status_code != 404:
+            self._check(response, key)
+
+    def put_json(self, key: str, data: Any):
+        body = dumps_bytes(data)
+        response = self._request('PUT', key, headers={'content-type': 'application/json',
+                                                       'content-length': len(body)}, data=body)
+        self._check(response, key)
+
+    def get_json(self, key: str) -> Optional[Any]:
+        response = self._request('GET', key)
+        if response.status_code == 404:
+            return None
+        self._check(response, key)
+        return loads(response.content)
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_storage_backend() -> Optional[StorageBackend]:
+    """
+    按配置STORAGE_BACKEND（none/local/s3）获取存储后端（同一配置在进程内共享）
+
+    Returns:
+        存储后端；未配置时返回None（只使用本地目录）
+    """
+    config = current_app.config
+    kind = (config.get('STORAGE_BACKEND') or 'none').lower()
+    if kind == 'local':
+        settings = (kind, config.get('STORAGE_LOCAL_ROOT'))
+    elif kind == 's3':
+        settings = (kind, config.get('STORAGE_S3_ENDPOINT'), config.get('STORAGE_S3_BUCKET'),
+                    config.get('STORAGE_S3_ACCESS_KEY'), config.get('STORAGE_S3_SECRET_KEY'),
+                    config.get('STORAGE_S3_REGION') or 'us-east-1', config.get('STORAGE_S3_PREFIX') or '')
+    else:
+        return None
+    if not all(settings[:3]):
+        logger.warning(f"存储后端 {kind} 配置不完整，只使用本地目录")
+        return None
+
+    with _backends_lock:
+        backend = _backends.get(settings)
+        if backend is None:
+            backend = LocalStorage(settings[1]) if kind == 'local' else S3Storage(*settings[1:])
+            _backends[settings] = backend
+            logger.info(f"使用存储后端: {kind}")
+    return backend
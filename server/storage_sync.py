@@ -0,0 +1,335 @@
+"""
+存储同步模块：本地目录与共享存储后端之间的写入发布和读穿获取
+
+- 上传文件、完成的MinerU结果目录和翻译结果写入本地后，在后台线程中发布到存储后端；
+  结果目录的索引记录最后写入，其他节点看到索引时文件已全部上传
+- 本地缺少的文档、结果目录和文件按需从存储后端下载到本地目录，之后直接从本地磁盘读取，
+  并登记到本节点的文档目录（catalog）
+未配置存储后端（STORAGE_BACKEND=none）时所有函数都不做任何操作。
+"""
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+from flask import current_app
+
+from server.catalog import get_document_task, get_task, record_result, record_task, record_upload
+from server.disk_quota import ARCHIVES_DIRNAME, ensure_extracted, hold_extracted, track_result
+from server.storage import StorageBackend, get_storage_backend
+from server.stored_files import SUFFIXES, resolve_stored
+
+logger = logging.getLogger(__name__)
+
+# 存储后端中没有的对象在该时间（秒）内不再重复查询
+MISS_TTL = 30
+
+# 发布结果目录失败时的重试次数和首次重试间隔（秒，之后按次数递增）
+PUBLISH_RETRIES = 3
+PUBLISH_RETRY_DELAY = 2
+
+# 结果目录中不发布的文件
+_SKIPPED_SUFFIXES = ('.tmp', '.jsonl')
+
+_misses: Dict[str, float] = {}
+_fetch_locks: Dict[str, threading.Lock] = {}
+_fetch_locks_lock = threading.Lock()
+
+
+def _fetch_lock(key: str) -> threading.Lock:
+    with _fetch_locks_lock:
+        return _fetch_locks.setdefault(key, threading.Lock())
+
+
+def _recent_miss(key: str) -> bool:
+    return time.time() - _misses.get(key, 0) < MISS_TTL
+
+
+def _folders():
+    return Path(current_app.config['UPLOAD_FOLDER']), Path(current_app.config['MINERU_FOLDER'])
+
+
+def object_key(path) -> Optional[str]:
+    """
+    本地文件对应的对象键；不在UPLOAD_FOLDER或MINERU_FOLDER下时返回None
+    """
+    path = Path(path).resolve()
+    upload_folder, mineru_folder = (folder.resolve() for folder in _folders())
+    for prefix, folder in (('files', upload_folder), ('mineru', mineru_folder)):
+        if folder in path.parents:
+            return f"{prefix}/{path.relative_to(folder).as_posix()}"
+    return None
+
+
+def _relative(path) -> Optional[str]:
+    if not path:
+        return None
+    mineru_folder = _folders()[1].resolve()
+    path = Path(path).resolve()
+    return path.relative_to(mineru_folder).as_posix() if mineru_folder in path.parents else None
+
+
+def _absolute(relative: Optional[str]) -> Optional[str]:
+    return str(_folders()[1] / relative) if relative else None
+
+
+def run_in_background(func: Callable, *args):
+    """
+    在带应用上下文的后台线程中执行（失败只记录日志）
+    """
+    app = current_app._get_current_object()
+
+    def run():
+        try:
+            with app.app_context():
+                func(*args)
+        except Exception as e:
+            logger.warning(f"同步到存储后端失败: {e}")
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def publish_files(paths: Iterable, backend: StorageBackend = None):
+    """
+    把本地文件上传到存储后端（逻辑路径自动使用实际的压缩存储文件）
+
+    Args:
+        paths: 本地文件路径（可以是逻辑路径）
+        backend: 存储后端（默认按配置获取）
+    """
+    backend = backend or get_storage_backend()
+    if backend is None:
+        return
+    for path in paths:
+        resolved = resolve_stored(path)[0]
+        key = object_key(resolved) if resolved else None
+        if key:
+            backend.put_file(key, resolved)
+            _misses.pop(key, None)
+
+
+def publish_files_in_background(paths: Iterable):
+    if get_storage_backend() is not None:
+        run_in_background(publish_files, list(paths))
+
+
+def make_publisher() -> Optional[Callable[[Path], None]]:
+    """
+    返回可以在没有应用上下文的线程中调用的发布函数（如翻译日志压缩完成后）；未配置存储后端时返回None
+    """
+    if get_storage_backend() is None:
+        return None
+    app = current_app._get_current_object()
+
+    def publish(path: Path):
+        try:
+            with app.app_context():
+                publish_files([path])
+        except Exception as e:
+            logger.warning(f"同步到存储后端失败: {path}: {e}")
+
+    return publish
+
+
+def publish_result(task_id: str):
+    """
+    上传结果目录中的全部文件（包括layout产物），最后写入索引记录
+
+    上传期间持有结果目录（已回收时先恢复），磁盘配额检查不会在上传中途删除文件。
+
+    Args:
+        task_id: 任务ID或batch_id
+    """
+    backend = get_storage_backend()
+    entry = get_task(task_id)
+    if backend is None or not entry or entry.get('state') != 'done':
+        return
+    with hold_extracted(task_id):
+        task_dir = _folders()[1] / task_id
+        files = [path for path in task_dir.rglob('*')
+                 if path.is_file() and not path.name.endswith(_SKIPPED_SUFFIXES)]
+        publish_files(files, backend)
+
+    record = {
+        "task_id": task_id,
+        "sha256": entry.get('sha256'),
+        "original_filename": entry.get('original_filename'),
+        "json_path": _relative(entry.get('json_path')),
+        "extract_dir": _relative(entry.get('extract_dir')),
+        "full_md_path": _relative(entry.get('full_md_path')),
+        "images_dir": _relative(entry.get('images_dir')),
+        "completed_at": entry.get('completed_at')
+    }
+    index_keys = [f"index/tasks/{task_id}.json"]
+    if record['sha256']:
+        index_keys.append(f"index/documents/{record['sha256']}.json")
+    for key in index_keys:
+        backend.put_json(key, record)
+        _misses.pop(key, None)
+    _misses.pop(f"mineru/{task_id}/", None)
+    logger.info(f"已发布结果到存储后端: {task_id}（{len(files)} 个文件）")
+
+
+def publish_result_with_retry(task_id: str) -> bool:
+    """
+    发布结果目录，失败时重试（索引记录只在全部文件上传成功后写入，重试会重新上传）
+
+    Args:
+        task_id: 任务ID或batch_id
+
+    Returns:
+        是否发布成功
+    """
+    for attempt in range(1, PUBLISH_RETRIES + 1):
+        try:
+            publish_result(task_id)
+            return True
+        except Exception as e:
+            if attempt == PUBLISH_RETRIES:
+                logger.error(f"发布结果到存储后端失败（已重试 {PUBLISH_RETRIES - 1} 次）: {task_id}: {e}")
+                return False
+            delay = PUBLISH_RETRY_DELAY * attempt
+            logger.warning(f"发布结果到存储后端失败，{delay} 秒后重试: {task_id}: {e}")
+            time.sleep(delay)
+    return False
+
+
+def publish_result_in_background(task_id: str):
+    if get_storage_backend() is not None:
+        run_in_background(publish_result_with_retry, task_id)
+
+
+def fetch_file(path) -> bool:
+    """
+    本地缺少文件时从存储后端下载（逻辑路径会同时查找压缩存储的版本）
+
+    Args:
+        path: 本地文件路径（逻辑路径）
+
+    Returns:
+        是否下载了文件
+    """
+    backend = get_storage_backend()
+    if backend is None or resolve_stored(path)[0] is not None:
+        return False
+    key = object_key(path)
+    if key is None or _recent_miss(key):
+        return False
+    with _fetch_lock(key):
+        if resolve_stored(path)[0] is not None:
+            return False
+        candidates = [key] + [key + suffix for suffix in SUFFIXES.values()]
+        for candidate in candidates:
+            target = Path(path).with_name(Path(path).name + candidate[len(key):])
+            if backend.get_file(candidate, target):
+                logger.info(f"已从存储后端获取: {candidate}")
+                return True
+        _misses[key] = time.time()
+    return False
+
+
+def fetch_result(task_id: str) -> bool:
+    """
+    下载结果目录中本地缺少的文件
+
+    Args:
+        task_id: 任务ID或batch_id
+
+    Returns:
+        存储后端中是否有该结果目录
+    """
+    backend = get_storage_backend()
+    prefix = f"mineru/{task_id}/"
+    if backend is None or not task_id or task_id == ARCHIVES_DIRNAME or _recent_miss(prefix):
+        return False
+    mineru_folder = _folders()[1]
+    with _fetch_lock(prefix):
+        keys = backend.list_keys(prefix)
+        if not keys:
+            _misses[prefix] = time.time()
+            return False
+        count = 0
+        for key in keys:
+            target = mineru_folder / key[len('mineru/'):]
+            if not target.exists() and backend.get_file(key, target):
+                count += 1
+    if count:
+        logger.info(f"已从存储后端获取结果目录: {task_id}（{count} 个文件）")
+    return True
+
+
+def ensure_local_result(task_id: str) -> bool:
+    """
+    访问结果目录前调用：按磁盘配额回收的从归档恢复，本地没有的从存储后端下载
+
+    Args:
+        task_id: 任务ID或batch_id
+
+    Returns:
+        是否恢复或下载了文件
+    """
+    if ensure_extracted(task_id):
+        return True
+    if (_folders()[1] / task_id).is_dir():
+        return False
+    return fetch_result(task_id)
+
+
+def _import_record(record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    task_id = record['task_id']
+    if not fetch_result(task_id):
+        return None
+    record_task(task_id, record.get('sha256'), record.get('original_filename'))
+    record_result(task_id, {
+        "original_filename": record.get('original_filename'),
+        "json_path": _absolute(record.get('json_path')),
+        "extract_dir": _absolute(record.get('extract_dir')),
+        "full_md_path": _absolute(record.get('full_md_path')),
+        "images_dir": _absolute(record.get('images_dir'))
+    }, sha256=record.get('sha256'))
+    sha256 = record.get('sha256')
+    if sha256:
+        upload_folder = _folders()[0]
+        pdf_path = upload_folder / f"{sha256}.pdf"
+        if fetch_file(pdf_path) or pdf_path.exists():
+            record_upload(sha256, pdf_path.name, pdf_path.stat().st_size, record.get('original_filename'))
+    track_result(task_id)
+    logger.info(f"已从存储后端导入文档: {task_id}")
+    return get_task(task_id)
+
+
+def import_remote_task(task_id: str) -> Optional[Dict[str, Any]]:
+    """
+    本节点没有该任务的完成记录时，按存储后端中的索引记录下载结果目录并登记
+
+    Returns:
+        登记后的任务记录；存储后端中也没有时返回None
+    """
+    backend = get_storage_backend()
+    key = f"index/tasks/{task_id}.json"
+    if backend is None or not task_id or _recent_miss(key):
+        return None
+    record = backend.get_json(key)
+    if record is None:
+        _misses[key] = time.time()
+        return None
+    return _import_record(record)
+
+
+def import_remote_document(sha256: str) -> Optional[Dict[str, Any]]:
+    """
+    本节点没有该文档的完成记录时，按存储后端中的索引记录下载结果目录并登记
+
+    Returns:
+        登记后的任务记录；存储后端中也没有时返回None
+    """
+    backend = get_storage_backend()
+    key = f"index/documents/{sha256}.json"
+    if backend is None or not sha256 or _recent_miss(key):
+        return None
+    record = backend.get_json(key)
+    if record is None:
+        _misses[key] = time.time()
+        return None
+    _import_record(record)
+    return get_document_task(sha256)
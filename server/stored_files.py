@@ -0,0 +1,233 @@
+"""
+压缩存储模块：MinerU原始JSON、译文和翻译归档以gzip（或zstd）压缩形式落盘
+
+调用方始终使用逻辑路径（如 layout.json、full_xxx.md），实际文件可能是未压缩文件，
+也可能是带 .gz / .zst 后缀的压缩文件。读取时自动解压（流式），写入时按配置压缩。
+客户端接受对应编码时，压缩文件直接带Content-Encoding返回，不在服务端解压再压缩。
+"""
+import gzip
+import io
+import logging
+import mimetypes
+import os
+import shutil
+from pathlib import Path
+from typing import Any, BinaryIO, Optional, Tuple
+from flask import Response, current_app, has_app_context, request, send_file
+
+from server.fast_json import dumps_bytes, loads
+from server.http_cache import apply_cache_headers, file_etag
+
+try:
+    import zstandard
+except ImportError:  # zstd为可选依赖，未安装时使用gzip
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# 压缩编码与文件后缀（同时也是HTTP Content-Encoding的取值）
+SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+# 流式读写的块大小
+CHUNK_SIZE = 1024 * 1024
+
+# 默认压缩级别
+DEFAULT_LEVELS = {'gzip': 6, 'zstd': 3}
+
+
+def get_compression_codec() -> Optional[str]:
+    """
+    读取配置的压缩编码（gzip/zstd/none），zstd不可用时退回gzip
+
+    Returns:
+        编码名称；不压缩时返回None
+    """
+    codec = (current_app.config.get('ARTIFACT_COMPRESSION', 'gzip') if has_app_context() else 'gzip') or 'none'
+    codec = codec.lower()
+    if codec == 'zstd' and zstandard is None:
+        logger.warning("未安装zstandard，压缩存储改用gzip")
+        return 'gzip'
+    return codec if codec in SUFFIXES else None
+
+
+def resolve_stored(path) -> Tuple[Optional[Path], Optional[str]]:
+    """
+    查找逻辑路径对应的实际文件
+
+    Args:
+        path: 逻辑路径（不带压缩后缀）
+
+    Returns:
+        (实际路径, 压缩编码)；未压缩时编码为None，文件不存在时返回(None, None)
+    """
+    path = Path(path)
+    if path.exists():
+        return path, None
+    for encoding, suffix in SUFFIXES.items():
+        candidate = path.with_name(path.name + suffix)
+        if candidate.exists():
+            return candidate, encoding
+    return None, None
+
+
+def stored_exists(path) -> bool:
+    return resolve_stored(path)[0] is not None
+
+
+def open_stored(path, mode: str = 'rb'):
+    """
+    打开逻辑路径对应的文件（压缩文件流式解压）
+
+    Args:
+        path: 逻辑路径
+        mode: 'rb' 或 'r'（文本模式按UTF-8解码）
+
+    Returns:
+        文件对象
+    """
+    resolved, encoding = resolve_stored(path)
+    if resolved is None:
+        raise FileNotFoundError(str(path))
+    if encoding is None:
+        return open(resolved, mode, encoding='utf-8') if 'b' not in mode else open(resolved, 'rb')
+    if encoding == 'gzip':
+        raw = gzip.open(resolved, 'rb')
+    else:
+        if zstandard is None:
+            raise RuntimeError(f"读取 {resolved.name} 需要安装zstandard")
+        raw = zstandard.ZstdDecompressor().stream_reader(open(resolved, 'rb'), closefd=True)
+    return raw if 'b' in mode else io.TextIOWrapper(raw, encoding='utf-8')
+
+
+def read_stored_text(path) -> str:
+    with open_stored(path, 'r') as f:
+        return f.read()
+
+
+def read_stored_json(path) -> Any:
+    with open_stored(path, 'rb') as f:
+        return loads(f.read())
+
+
+def _compressor(encoding: str, dst: BinaryIO, level: Optional[int]):
+    level = level or DEFAULT_LEVELS[encoding]
+    if encoding == 'gzip':
+        return gzip.GzipFile(fileobj=dst, mode='wb', compresslevel=level, mtime=0)
+    return zstandard.ZstdCompressor(level=level).stream_writer(dst, closefd=False)
+
+
+def _remove_variants(path: Path, keep: Path):
+    for candidate in [path] + [path.with_name(path.name + suffix) for suffix in SUFFIXES.values()]:
+        if candidate != keep and candidate.exists():
+            candidate.unlink()
+
+
+def write_stored_bytes(path, data: bytes, codec: Optional[str] = None) -> Path:
+    """
+    按压缩编码原子写入文件，并删除同一逻辑路径的其他版本
+
+    Args:
+        path: 逻辑路径
+        data: 文件内容
+        codec: 压缩编码（None为不压缩）
+
+    Returns:
+        实际写入的路径
+    """
+    path = Path(path)
+    target = path.with_name(path.name + SUFFIXES[codec]) if codec else path
+    tmp_path = target.with_name(target.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        if codec:
+            with _compressor(codec, f, None) as writer:
+                writer.write(data)
+        else:
+            f.write(data)
+    os.replace(tmp_path, target)
+    _remove_variants(path, target)
+    return target
+
+
+def write_stored_text(path, text: str, codec: Optional[str] = None) -> Path:
+    return write_stored_bytes(path, text.encode('utf-8'), codec)
+
+
+def write_stored_json(path, data: Any, codec: Optional[str] = None) -> Path:
+    # 紧凑格式，不缩进
+    return write_stored_bytes(path, dumps_bytes(data), codec)
+
+
+def compress_stored(path, codec: Optional[str]) -> Path:
+    """
+    把已有的未压缩文件流式压缩（原文件删除）
+
+    Args:
+        path: 逻辑路径
+        codec: 压缩编码（None时不处理）
+
+    Returns:
+        压缩后的实际路径；未压缩时返回原路径
+    """
+    path = Path(path)
+    if not codec or not path.exists():
+        return resolve_stored(path)[0] or path
+    target = path.with_name(path.name + SUFFIXES[codec])
+    tmp_path = target.with_name(target.name + '.tmp')
+    with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+        with _compressor(codec, dst, None) as writer:
+            shutil.copyfileobj(src, writer, CHUNK_SIZE)
+    original_size = path.stat().st_size
+    os.replace(tmp_path, target)
+    path.unlink()
+    logger.info(f"已压缩存储: {path.name} {original_size} -> {target.stat().st_size} 字节")
+    return target
+
+
+def _iter_decompressed(path):
+    with open_stored(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def send_stored(path, as_attachment: bool = False, download_name: str = None, mimetype: str = None) -> Response:
+    """
+    返回存储的文件：客户端接受压缩编码时直接发送压缩字节（Content-Encoding），否则流式解压后发送
+
+    两种表示使用不同的强ETag；直接发送文件时支持Range请求，流式解压时只支持条件请求。
+
+    Args:
+        path: 逻辑路径
+        as_attachment: 是否作为附件下载
+        download_name: 下载文件名（默认为逻辑文件名）
+        mimetype: 内容类型（默认按逻辑文件名推断）
+    """
+    path = Path(path)
+    resolved, encoding = resolve_stored(path)
+    if resolved is None:
+        raise FileNotFoundError(str(path))
+    download_name = download_name or path.name
+    mimetype = mimetype or mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+
+    etag = file_etag(resolved)
+
+    if encoding is None:
+        response = send_file(resolved, mimetype=mimetype, as_attachment=as_attachment, download_name=download_name,
+                             etag=etag)
+        return apply_cache_headers(response)
+
+    if request.accept_encodings.quality(encoding) > 0:
+        response = send_file(resolved, mimetype=mimetype, as_attachment=as_attachment, download_name=download_name,
+                             etag=f"{etag}.{encoding}")
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = Response(_iter_decompressed(path), mimetype=mimetype)
+        if as_attachment:
+            response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+        response.set_etag(f"{etag}.identity")
+        response.last_modified = resolved.stat().st_mtime
+        response = response.make_conditional(request, accept_ranges=False)
+    response.vary.add('Accept-Encoding')
+    return apply_cache_headers(response)
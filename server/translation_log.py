@@ -0,0 +1,269 @@
+"""
+layout翻译结果日志模块：每次/translate-layout调用只向JSONL日志追加一行，后台定期压缩为合并快照
+
+前端逐块增量翻译时，原实现每次都读取整个translation_{id}_{ts}.json、重建映射、重新统计并整体重写，
+一次会话的I/O为O(n²)，并发调用还会互相覆盖。现在：
+- translation_{id}_{ts}.jsonl：追加日志，每行是一次调用的翻译块，写入时加文件锁
+- translation_{id}_{ts}.json：合并快照（内容格式与原来相同，按ARTIFACT_COMPRESSION压缩存储），由压缩任务根据快照和日志重新生成
+统计数据在内存中按块增量维护；其他进程追加的行或压缩后的快照在下次写入时补读。
+"""
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from server.fast_json import dumps_bytes, loads
+from server.stored_files import read_stored_json, resolve_stored, stored_exists, write_stored_json
+
+try:
+    import fcntl
+except ImportError:  # Windows下只做进程内加锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 日志累计追加该行数后触发后台压缩
+COMPACT_EVERY = 50
+
+# 同一翻译的日志对象在进程内共享
+_logs = {}
+_logs_lock = threading.Lock()
+
+
+def get_block_key(block: Dict[str, Any]) -> str:
+    """
+    合并翻译块时使用的键：优先block_id，其次页码+原文
+    """
+    block_id = block.get('block_id')
+    if block_id:
+        return f"id_{block_id}"
+    block_text = (block.get('text') or '').strip()
+    block_page = block.get('page') or block.get('page_no') or block.get('pageNo') or 1
+    return f"text_{block_page}_{block_text}"
+
+
+def block_status(block: Dict[str, Any]) -> str:
+    translated_text = block.get('translated_text')
+    if not translated_text:
+        return 'failed'
+    return 'skipped' if translated_text == block.get('text') else 'translated'
+
+
+@contextmanager
+def _file_lock(f):
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _read_snapshot(path: Path) -> Dict[str, Any]:
+    if not stored_exists(path):
+        return {}
+    try:
+        data = read_stored_json(path)
+        return data if isinstance(data, dict) else {}
+    except Exception as e:
+        logger.warning(f"读取翻译结果快照失败: {e}")
+        return {}
+
+
+def _parse_lines(data: bytes) -> List[Dict[str, Any]]:
+    entries = []
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        try:
+            entries.append(loads(line))
+        except ValueError:
+            # 写入中断留下的半行，压缩时丢弃
+            logger.warning("翻译日志存在不完整的行，已跳过")
+    return entries
+
+
+def _mtime(path: Path) -> Optional[int]:
+    resolved = resolve_stored(path)[0]
+    try:
+        return resolved.stat().st_mtime_ns if resolved else None
+    except FileNotFoundError:
+        return None
+
+
+class TranslationLog:
+    """
+    单个translation_id + timestamp的翻译结果（快照 + 追加日志）
+    """
+
+    def __init__(self, snapshot_path: Path, codec: Optional[str] = None):
+        self.snapshot_path = Path(snapshot_path)
+        self.codec = codec
+        self.log_path = self.snapshot_path.with_suffix('.jsonl')
+        self._lock = threading.Lock()
+        self._statuses: Dict[str, str] = {}
+        self._counts = {'translated': 0, 'skipped': 0, 'failed': 0}
+        self._offset = 0
+        self._snapshot_mtime = None
+        self._loaded = False
+        self._pending_lines = 0
+        self._compacting = False
+        # 写入新快照后调用（如发布到共享存储后端）
+        self.on_compact: Optional[Callable[[Path], None]] = None
+
+    def _apply(self, blocks: List[Dict[str, Any]]):
+        for block in blocks:
+            key = get_block_key(block)
+            status = block_status(block)
+            previous = self._statuses.get(key)
+            if previous:
+                self._counts[previous] -= 1
+            self._statuses[key] = status
+            self._counts[status] += 1
+
+    def _reload(self):
+        self._statuses.clear()
+        self._counts = {'translated': 0, 'skipped': 0, 'failed': 0}
+        self._apply(_read_snapshot(self.snapshot_path).get('layout') or [])
+        self._snapshot_mtime = _mtime(self.snapshot_path)
+        self._offset = 0
+        self._loaded = True
+
+    def _catch_up(self, f):
+        # 快照被（其他进程）压缩过时重新加载，然后补读日志中尚未统计的行
+        if not self._loaded or _mtime(self.snapshot_path) != self._snapshot_mtime:
+            self._reload()
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size < self._offset:
+            self._reload()
+        if size > self._offset:
+            f.seek(self._offset)
+            for entry in _parse_lines(f.read(size - self._offset)):
+                self._apply(entry.get('blocks') or [])
+            self._offset = size
+
+    def append(self, meta: Dict[str, Any], blocks: List[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        追加一次调用的翻译块
+
+        Args:
+            meta: 翻译信息（translation_id、timestamp、target_lang、model）
+            blocks: 本次翻译的块
+
+        Returns:
+            合并后整个翻译的统计数据
+        """
+        line = dumps_bytes({**meta, "blocks": blocks}) + b'\n'
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.log_path, 'a+b') as f, _file_lock(f):
+            self._catch_up(f)
+            f.write(line)
+            f.flush()
+            self._offset += len(line)
+            self._apply(blocks)
+            self._pending_lines += 1
+            stats = self.stats()
+        return stats
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "translated_count": self._counts['translated'],
+            "skipped_count": self._counts['skipped'],
+            "failed_count": self._counts['failed'],
+            "total_count": len(self._statuses)
+        }
+
+    def compact(self) -> bool:
+        """
+        把日志合并进快照并清空日志
+
+        Returns:
+            是否写入了新快照
+        """
+        if not self.log_path.exists():
+            return False
+        with self._lock, open(self.log_path, 'a+b') as f, _file_lock(f):
+            f.seek(0)
+            entries = _parse_lines(f.read())
+            if not entries:
+                return False
+
+            data = _read_snapshot(self.snapshot_path)
+            # 已有块原位替换，新块追加到末尾
+            merged = {get_block_key(block): block for block in data.get('layout') or []}
+            for entry in entries:
+                for block in entry.get('blocks') or []:
+                    merged[get_block_key(block)] = block
+                for field in ('translation_id', 'timestamp', 'target_lang', 'model'):
+                    if entry.get(field) is not None:
+                        data[field] = entry[field]
+            layout = list(merged.values())
+
+            counts = {'translated': 0, 'skipped': 0, 'failed': 0}
+            for block in layout:
+                counts[block_status(block)] += 1
+            data.update({
+                "translated_count": counts['translated'],
+                "skipped_count": counts['skipped'],
+                "failed_count": counts['failed'],
+                "total_count": len(layout),
+                "layout": layout
+            })
+
+            write_stored_json(self.snapshot_path, data, self.codec)
+            f.truncate(0)
+
+            # 压缩结果与内存中的统计一致，直接从新快照继续
+            self._statuses = {get_block_key(block): block_status(block) for block in layout}
+            self._counts = counts
+            self._snapshot_mtime = _mtime(self.snapshot_path)
+            self._offset = 0
+            self._loaded = True
+            self._pending_lines = 0
+        logger.debug(f"翻译结果已压缩: {self.snapshot_path.name}（{len(entries)} 行日志，共 {len(layout)} 个块）")
+        if self.on_compact is not None:
+            self.on_compact(self.snapshot_path)
+        return True
+
+    def schedule_compaction(self, every: int = COMPACT_EVERY):
+        """
+        累计追加的行数达到阈值时在后台线程中压缩
+        """
+        if self._pending_lines < every or self._compacting:
+            return
+        self._compacting = True
+
+        def run():
+            try:
+                self.compact()
+            except Exception as e:
+                logger.warning(f"压缩翻译结果日志失败: {e}")
+            finally:
+                self._compacting = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+
+def get_translation_log(snapshot_path: Path, codec: Optional[str] = None,
+                        on_compact: Optional[Callable[[Path], None]] = None) -> TranslationLog:
+    """
+    获取翻译结果对应的日志对象（进程内共享）
+
+    Args:
+        snapshot_path: 合并快照路径（translation_{id}_{ts}.json，实际可能压缩存储）
+        codec: 快照的压缩编码（None为不压缩）
+        on_compact: 写入新快照后的回调（参数为快照逻辑路径）
+    """
+    with _logs_lock:
+        log = _logs.get(str(snapshot_path))
+        if log is None:
+            log = TranslationLog(snapshot_path, codec)
+            _logs[str(snapshot_path)] = log
+        log.codec = codec
+        log.on_compact = on_compact
+    return log
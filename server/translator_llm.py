@@ -10,6 +10,9 @@ from typing import Dict, Any, Optional
 from openai import OpenAI
 from flask import current_app
 
+from server.fast_json import dump_file
+from server.stored_files import read_stored_json
+
 logger = logging.getLogger(__name__)
 
 def get_cache():
@@ -219,8 +222,7 @@ def translate_mineru_json(
         翻译后的JSON数据
     """
     try:
-        with open(input_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = read_stored_json(input_path)
         
         total_blocks = 0
         translated_blocks = 0
@@ -251,8 +253,7 @@ def translate_mineru_json(
         if output_path:
             output_file = Path(output_path)
             output_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            dump_file(output_file, data)
             logger.info(f"翻译文件已保存到: {output_path}")
         
         logger.info(f"翻译完成: {translated_blocks}/{total_blocks} 个文本块")
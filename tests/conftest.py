@@ -0,0 +1,152 @@
+"""
+pytest公共fixture：临时目录中的应用实例，在本地端口上运行的MinerU/S3替身服务，以及上传和轮询解析结果的辅助函数
+"""
+import io
+import sys
+import threading
+import time
+from pathlib import Path
+
+import fitz  # PyMuPDF
+import pytest
+from werkzeug.serving import make_server
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from server.config import Config
+from server.mineru_standin import create_standin_app as create_mineru_standin
+from server.s3_standin import create_standin_app as create_s3_standin
+
+
+def _serve(app):
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture(scope='session')
+def mineru_base_url():
+    """
+    MinerU替身服务的API地址（任务立即完成，使用pdf_info格式）
+    """
+    server = _serve(create_mineru_standin(delay=0, layout_format='pdf_info', seed=0))
+    yield f"http://127.0.0.1:{server.server_port}/api/v4"
+    server.shutdown()
+
+
+@pytest.fixture(scope='session')
+def s3_endpoint():
+    """
+    S3替身服务的地址
+    """
+    server = _serve(create_s3_standin())
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def serve():
+    """
+    在本地端口上运行WSGI应用，测试结束后关闭；返回服务地址
+    """
+    servers = []
+
+    def start(app) -> str:
+        servers.append(_serve(app))
+        return f"http://127.0.0.1:{servers[-1].server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch, mineru_base_url):
+    """
+    使用临时目录和MinerU替身服务的应用实例（不调用LLM，不使用共享存储和磁盘配额）
+    """
+    overrides = {
+        'CACHE_TYPE': 'SimpleCache',
+        'UPLOAD_FOLDER': tmp_path / 'files',
+        'MINERU_FOLDER': tmp_path / 'mineru',
+        'MINERU_BASE_URL': mineru_base_url,
+        'MINERU_TOKEN': 'dummy',
+        'MINERU_SELECTIVE_OCR': False,
+        'QWEN_API_KEY': '',
+        'OPENAI_API_KEY': '',
+        'STORAGE_BACKEND': 'none',
+        'DISK_QUOTA_MB': 0,
+    }
+    for name, value in overrides.items():
+        monkeypatch.setattr(Config, name, value)
+
+    from server import create_app
+    return create_app('development')
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def build_pdf(page_count: int = 3, label: str = 'Doc', width: float = 612, height: float = 792) -> bytes:
+    """
+    生成每页带一行文本层的PDF
+    """
+    with fitz.open() as doc:
+        for idx in range(page_count):
+            page = doc.new_page(width=width, height=height)
+            page.insert_text((72, 90), f"{label} page {idx + 1} heading text")
+        return doc.tobytes()
+
+
+@pytest.fixture
+def make_pdf():
+    return build_pdf
+
+
+@pytest.fixture
+def upload(client):
+    """
+    通过/api/parse-pdf上传PDF（不等待完成，不分片，整份提交MinerU），返回响应的data
+    """
+    def upload(content: bytes, filename: str = 'paper.pdf', **form) -> dict:
+        data = {'file': (io.BytesIO(content), filename), 'wait': 'false', 'sharded': 'false', 'routing': 'full',
+                **form}
+        response = client.post('/api/parse-pdf', data=data, content_type='multipart/form-data')
+        assert response.status_code == 200, response.get_json()
+        return response.get_json()['data']
+
+    return upload
+
+
+@pytest.fixture
+def wait_for_batch(client):
+    """
+    轮询/api/batch直到任务完成或失败，返回最后一次响应的data
+    """
+    def wait(batch_id: str, timeout: float = 15) -> dict:
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            data = client.get(f'/api/batch/{batch_id}').get_json()['data']
+            if data.get('state') == 'failed' or (data.get('state') == 'done' and data.get('layout')):
+                return data
+            time.sleep(0.1)
+        pytest.fail(f"批量任务未在 {timeout} 秒内完成: {batch_id}")
+
+    return wait
+
+
+@pytest.fixture
+def parsed(upload, wait_for_batch):
+    """
+    上传PDF并等待MinerU替身服务解析完成，返回/api/batch的结果（附带上传的PDF内容）
+    """
+    def parse(content: bytes = None, filename: str = 'paper.pdf') -> dict:
+        content = content or build_pdf()
+        result = wait_for_batch(upload(content, filename)['batch_id'])
+        assert result['state'] == 'done'
+        return {**result, "content": content}
+
+    return parse
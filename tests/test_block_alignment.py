@@ -0,0 +1,99 @@
+"""
+块-译文对齐：对齐索引构建、按段落分配译文，以及/api/block-translations接口
+"""
+from pathlib import Path
+
+from server.block_alignment import (
+    align_block_translations,
+    build_alignment_index,
+    get_alignment_path,
+    get_translated_chunks_path,
+    save_alignment_index,
+    save_translated_chunks,
+    split_paragraphs
+)
+from server.routes import chunk_markdown_text, load_task_layout
+from server.storage_sync import publish_files
+
+TEXT = "# Introduction\n\nFirst paragraph of the body.\n\n## Method\n\nWe use $x^2$ in the second paragraph.\n"
+LAYOUT = [
+    {"block_id": "b0", "text": "Introduction"},
+    {"block_id": "b1", "text": "First paragraph of the body."},
+    {"block_id": "b2", "text": "Method"},
+    {"block_id": "b3", "text": "We use x2 in the second paragraph."},
+    {"block_id": "b4", "text": "Text that is not in full.md at all"},
+]
+
+
+def test_split_paragraphs():
+    assert split_paragraphs("a\n\n  \n\nb\nc\n\n") == ["a", "b\nc"]
+    assert split_paragraphs("") == []
+
+
+def test_build_alignment_index():
+    chunks = ["# Introduction\n\nFirst paragraph of the body.", "## Method\n\nWe use $x^2$ in the second paragraph."]
+    index = build_alignment_index(TEXT, chunks, LAYOUT)
+
+    assert [chunk['paragraph_count'] for chunk in index['chunks']] == [2, 2]
+    assert {block_id: entry['paragraphs'] for block_id, entry in index['blocks'].items()} == {
+        "b0": [[0, 0]], "b1": [[0, 1]], "b2": [[1, 0]], "b3": [[1, 1]]
+    }
+    assert index['unaligned'] == ["b4"]
+
+
+def test_align_strips_headings_and_reports_mismatched_chunks():
+    chunks = ["# Introduction\n\nFirst paragraph of the body.", "## Method\n\nWe use $x^2$ in the second paragraph."]
+    index = build_alignment_index(TEXT, chunks, LAYOUT)
+
+    translations, mismatched = align_block_translations(index, ["# 引言\n\n正文第一段。", "## 方法\n\n第二段。"])
+    assert translations == {"b0": "引言", "b1": "正文第一段。", "b2": "方法", "b3": "第二段。"}
+    assert mismatched == []
+
+    # LLM合并了第二个分块的段落：该分块的块不分配译文
+    translations, mismatched = align_block_translations(index, ["# 引言\n\n正文第一段。", "## 方法 第二段。"])
+    assert translations == {"b0": "引言", "b1": "正文第一段。"}
+    assert sorted(mismatched) == ["b2", "b3"]
+
+
+def save_fake_translation(app, task_id: str, target_lang: str = 'zh') -> Path:
+    with app.app_context():
+        full_path = Path(app.config['MINERU_FOLDER']) / task_id / 'full.md'
+        text = full_path.read_text(encoding='utf-8')
+        chunks = chunk_markdown_text(text)
+        save_alignment_index(full_path, build_alignment_index(text, chunks, load_task_layout(task_id)))
+        translated = ['\n\n'.join(f"译文{idx}" for idx, _ in enumerate(split_paragraphs(chunk))) for chunk in chunks]
+        save_translated_chunks(full_path, target_lang, translated)
+    return full_path
+
+
+def test_block_translations_route(app, client, parsed):
+    task_id = parsed()['batch_id']
+    assert client.get(f'/api/block-translations/{task_id}').status_code == 404
+
+    save_fake_translation(app, task_id)
+    data = client.get(f'/api/block-translations/{task_id}?target_lang=zh').get_json()['data']
+    assert data['aligned_count'] > 0
+    assert all(text.startswith('译文') for text in data['translations'].values())
+
+
+def test_block_translations_rejects_invalid_ids(client):
+    assert client.get('/api/block-translations/bad.id').status_code == 400
+    assert client.get('/api/block-translations/task1?target_lang=../zh').status_code == 400
+
+
+def test_block_translations_fetched_from_storage_backend(app, client, parsed, tmp_path):
+    task_id = parsed()['batch_id']
+    full_path = save_fake_translation(app, task_id)
+    expected = client.get(f'/api/block-translations/{task_id}').get_json()['data']['translations']
+
+    # 全文翻译在其他节点完成：本节点有结果目录，但没有对齐索引和分块译文
+    app.config.update(STORAGE_BACKEND='local', STORAGE_LOCAL_ROOT=str(tmp_path / 'shared'))
+    paths = [get_alignment_path(full_path), get_translated_chunks_path(full_path, 'zh')]
+    with app.app_context():
+        publish_files(paths)
+    for path in paths:
+        path.unlink()
+
+    response = client.get(f'/api/block-translations/{task_id}')
+    assert response.status_code == 200
+    assert response.get_json()['data']['translations'] == expected
@@ -0,0 +1,110 @@
+"""
+文档目录数据库：旧版索引导入、任务和结果记录、文档列表查询，以及/api/documents接口
+"""
+import json
+
+import pytest
+from flask import Flask
+
+from server.catalog import (
+    get_document_task,
+    get_task,
+    get_translation,
+    get_upload,
+    init_catalog,
+    query_documents,
+    record_result,
+    record_task,
+    record_translation,
+    record_upload
+)
+
+
+@pytest.fixture
+def catalog_app(tmp_path):
+    app = Flask(__name__)
+    app.config['MINERU_FOLDER'] = str(tmp_path / 'mineru')
+    with app.app_context():
+        yield app
+
+
+def test_init_imports_legacy_index_and_result_dirs(catalog_app, tmp_path):
+    mineru = tmp_path / 'mineru'
+    (mineru / 'old_task').mkdir(parents=True)
+    legacy = {
+        "tasks": {"pending_task": {"sha256": "b" * 64, "state": "pending", "original_filename": "b.pdf"}},
+        "documents": {"a" * 64: {"task_id": "legacy_task", "json_path": "/x/layout.json", "completed_at": 100}},
+    }
+    (mineru / 'document_index.json').write_text(json.dumps(legacy), encoding='utf-8')
+    (mineru / 'old_task' / 'layout.json').write_text('{}', encoding='utf-8')
+    (mineru / 'old_task' / 'full.md').write_text('# Old', encoding='utf-8')
+
+    init_catalog()
+    assert (mineru / 'document_index.json.migrated').exists()
+    assert get_document_task('a' * 64)['task_id'] == 'legacy_task'
+    assert get_task('pending_task')['state'] == 'pending'
+    scanned = get_task('old_task')
+    assert scanned['state'] == 'done'
+    assert scanned['full_md_path'] == str(mineru / 'old_task' / 'full.md')
+
+    # 只导入一次：之后新增的目录不再自动登记
+    (mineru / 'new_task').mkdir()
+    (mineru / 'new_task' / 'layout.json').write_text('{}', encoding='utf-8')
+    init_catalog()
+    assert get_task('new_task') is None
+
+
+def test_task_lifecycle(catalog_app):
+    sha256 = 'c' * 64
+    record_upload(sha256, f'{sha256}.pdf', 1234, original_filename='paper.pdf')
+    record_upload(sha256, f'{sha256}.pdf', 1234, pages=3)
+    assert (get_upload(sha256)['original_filename'], get_upload(sha256)['pages']) == ('paper.pdf', 3)
+
+    record_task('task1', sha256, 'paper.pdf')
+    assert get_task('task1')['state'] == 'pending'
+    assert get_document_task(sha256) is None
+
+    # 未传sha256时使用提交任务时记录的哈希
+    assert record_result('task1', {"json_path": "/r/layout.json", "full_md_path": None}) == sha256
+    task = get_document_task(sha256)
+    assert (task['task_id'], task['state'], task['json_path']) == ('task1', 'done', '/r/layout.json')
+    assert get_task('missing') is None
+
+
+def test_query_documents_filters_and_pages(catalog_app):
+    for idx, name in enumerate(['attention.pdf', 'vision.pdf', 'attention-2.pdf']):
+        sha256 = str(idx) * 64
+        record_upload(sha256, f'{sha256}.pdf', 100 + idx, original_filename=name)
+        record_task(f'task{idx}', sha256, name)
+        record_result(f'task{idx}', {"full_md_path": f"/r/{idx}/full.md"})
+    record_translation('translation_x_1.json', 'layout', doc_key='0' * 64, task_id='task0', translation_id='x',
+                       target_lang='zh', stats={"translated_count": 5, "total_count": 6})
+    record_translation('translation_x_1.json', 'layout', stats={"translated_count": 6, "total_count": 6})
+
+    result = query_documents(query='attention')
+    assert result['total'] == 2
+    assert {document['task_id'] for document in result['documents']} == {'task0', 'task2'}
+    document = next(document for document in result['documents'] if document['task_id'] == 'task0')
+    assert document['has_full_md'] is True
+    assert document['size'] == 100
+    [translation] = document['translations']
+    assert (translation['target_lang'], translation['translated_count']) == ('zh', 6)
+    assert get_translation('translation_x_1.json')['doc_key'] == '0' * 64
+
+    page = query_documents(limit=1, offset=1)
+    assert page['total'] == 3
+    assert len(page['documents']) == 1
+
+
+def test_documents_route(client, parsed):
+    result = parsed(filename='attention.pdf')
+
+    data = client.get('/api/documents?q=attention').get_json()['data']
+    assert data['total'] == 1
+    [document] = data['documents']
+    assert document['task_id'] == result['batch_id']
+    assert document['original_filename'] == 'attention.pdf'
+    assert document['artifacts']
+
+    assert client.get('/api/documents?q=missing').get_json()['data']['total'] == 0
+    assert client.get('/api/documents?limit=abc').status_code == 400
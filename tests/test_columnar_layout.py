@@ -0,0 +1,54 @@
+"""
+列式layout：与字典列表互相转换、按页切片，以及二进制文件的保存和mmap加载
+"""
+import pytest
+
+from server.columnar_layout import ColumnarLayout, load_layout_dicts
+
+LAYOUT = [
+    {"page": 2, "bbox": [10, 20, 300.5, 40], "text": "第二页标题", "type": "title", "block_id": "p2_b0"},
+    {"page": 1, "bbox": [10, 20, 300, 40], "text": "Page one", "type": "text", "block_id": "p1_b0",
+     "source": "local", "page_size": [612, 792]},
+    {"page": 1, "bbox": [10, 50, 300, 90.25], "text": "", "type": "text", "block_id": "p1_b1"},
+    {"page": 3, "bbox": [0, 0, 1, 1], "text": "no id", "type": "image"},
+]
+
+
+def test_round_trip_sorts_by_page():
+    layout = ColumnarLayout.from_dicts(LAYOUT)
+    assert len(layout) == 4
+    assert layout.pages() == [1, 2, 3]
+    # 按页码稳定排序，附加字段和缺失的block_id保持原样
+    assert layout.to_dicts() == [LAYOUT[1], LAYOUT[2], LAYOUT[0], LAYOUT[3]]
+
+
+def test_page_slice_and_range():
+    layout = ColumnarLayout.from_dicts(LAYOUT)
+    assert [row.block_id for row in layout.page_slice(1)] == ['p1_b0', 'p1_b1']
+    assert len(layout.page_slice(4)) == 0
+    assert [row.page for row in layout.page_range(2, 3)] == [2, 3]
+    assert layout.page_slice(2)[0].text == '第二页标题'
+    with pytest.raises(IndexError):
+        layout.page_slice(2)[1]
+
+
+@pytest.mark.parametrize('use_mmap', [True, False])
+def test_save_and_load(tmp_path, use_mmap):
+    path = tmp_path / 'layout.json.mineru.layout'
+    ColumnarLayout.from_dicts(LAYOUT).save(path)
+    assert not path.with_suffix('.layout.tmp').exists()
+
+    loaded = ColumnarLayout.load(path, use_mmap=use_mmap)
+    assert loaded.to_dicts() == ColumnarLayout.from_dicts(LAYOUT).to_dicts()
+    # 切片后重新序列化只包含切片内的块和附加字段
+    page_one = ColumnarLayout.from_buffer(loaded.page_slice(1).to_bytes())
+    assert page_one.to_dicts() == [LAYOUT[1], LAYOUT[2]]
+
+
+def test_from_buffer_rejects_other_files():
+    with pytest.raises(ValueError):
+        ColumnarLayout.from_buffer(b'NOTALAYOUT' + b'\0' * 64)
+
+
+def test_load_layout_dicts_missing_file(tmp_path):
+    assert load_layout_dicts(tmp_path / 'missing.layout') is None
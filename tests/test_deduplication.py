@@ -0,0 +1,50 @@
+"""
+按内容哈希保存上传文件，相同内容的PDF只解析一次
+"""
+import hashlib
+import io
+
+from werkzeug.datastructures import FileStorage
+
+from server.document_store import save_upload_content_addressed
+
+
+def test_save_upload_content_addressed(tmp_path):
+    content = b'%PDF-1.4 same content'
+    first = save_upload_content_addressed(FileStorage(io.BytesIO(content), 'a.pdf'), tmp_path)
+    second = save_upload_content_addressed(FileStorage(io.BytesIO(content), 'other name.PDF'), tmp_path)
+
+    sha256 = hashlib.sha256(content).hexdigest()
+    assert first == second == {"sha256": sha256, "filename": f"{sha256}.pdf", "filepath": tmp_path / f"{sha256}.pdf",
+                               "size": len(content)}
+    assert first['filepath'].read_bytes() == content
+    # 临时文件不会残留
+    assert sorted(path.name for path in tmp_path.iterdir()) == [f"{sha256}.pdf"]
+
+
+def test_reupload_returns_existing_result(client, parsed, upload):
+    result = parsed()
+
+    duplicate = upload(result['content'], filename='copy.pdf')
+    assert duplicate['deduplicated'] is True
+    assert duplicate['task_id'] == result['batch_id']
+    assert duplicate['layout'] == result['layout']
+    assert 'mineru_data' not in duplicate
+
+    response = client.post('/api/upload', data={'file': (io.BytesIO(result['content']), 'again.pdf')},
+                           content_type='multipart/form-data').get_json()['data']
+    assert response['deduplicated'] is True
+    assert response['task_id'] == result['batch_id']
+    assert response['layout'] == result['layout']
+    assert 'mineru_data' not in response
+
+    response = client.post('/api/upload', data={'file': (io.BytesIO(result['content']), 'again.pdf'),
+                                                'include_mineru_data': 'true'},
+                           content_type='multipart/form-data').get_json()['data']
+    assert len(response['mineru_data']['pdf_info']) == 3
+
+
+def test_different_content_is_parsed_separately(parsed, make_pdf):
+    first = parsed(make_pdf(label='First'))
+    second = parsed(make_pdf(label='Second'))
+    assert first['batch_id'] != second['batch_id']
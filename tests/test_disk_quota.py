@@ -0,0 +1,110 @@
+"""
+磁盘配额：结果目录的回收和恢复（文件mtime不变、保留文件不归档），以及按LRU回收到配额以下
+"""
+import os
+
+import pytest
+from flask import Flask
+
+from server.disk_quota import (
+    enforce_quota,
+    ensure_extracted,
+    evict,
+    get_archive_path,
+    hold_extracted,
+    is_evicted,
+    track_result
+)
+
+FILES = {
+    'layout.json': b'{"pdf_info": []}' * 100,
+    'full.md': '# 标题\n\n正文'.encode('utf-8'),
+    'images/fig1.png': os.urandom(2048),
+    'layout.json.mineru.layout': b'PTLAYOUT',
+    'layout.json.mineru.layout.meta': b'{}',
+    'full_translated_zh.md': '译文'.encode('utf-8'),
+}
+RETAINED = {'layout.json.mineru.layout', 'layout.json.mineru.layout.meta', 'full_translated_zh.md'}
+
+
+@pytest.fixture
+def quota_app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(MINERU_FOLDER=str(tmp_path), DISK_QUOTA_MB=0, DISK_QUOTA_MIN_IDLE_SECONDS=0)
+    with app.app_context():
+        yield app
+
+
+def make_result(root, task_id, files=FILES):
+    for idx, (relpath, content) in enumerate(files.items()):
+        path = root / task_id / relpath
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        mtime_ns = 1_600_000_000_000_000_000 + idx * 1_000_123
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    track_result(task_id)
+    return {relpath: (root / task_id / relpath).stat().st_mtime_ns for relpath in files}
+
+
+def test_evict_and_rehydrate_round_trip(quota_app, tmp_path):
+    mtimes = make_result(tmp_path, 'task1')
+
+    assert evict('task1') > 0
+    assert is_evicted('task1')
+    assert {path.relative_to(tmp_path / 'task1').as_posix() for path in (tmp_path / 'task1').rglob('*')
+            if path.is_file()} == RETAINED
+    assert not (tmp_path / 'task1' / 'images').exists()
+    # 已回收的结果不重复回收
+    assert evict('task1') == 0
+
+    assert ensure_extracted('task1') is True
+    assert not is_evicted('task1')
+    for relpath, content in FILES.items():
+        path = tmp_path / 'task1' / relpath
+        assert path.read_bytes() == content
+        assert path.stat().st_mtime_ns == mtimes[relpath]
+    assert ensure_extracted('task1') is False
+
+    # 恢复后未变化的结果再次回收时直接复用已有归档
+    archive_mtime = get_archive_path('task1').stat().st_mtime_ns
+    evict('task1')
+    assert get_archive_path('task1').stat().st_mtime_ns == archive_mtime
+
+
+def test_held_result_is_not_evicted(quota_app, tmp_path):
+    make_result(tmp_path, 'task1')
+    evict('task1')
+
+    with hold_extracted('task1'):
+        assert (tmp_path / 'task1' / 'full.md').exists()
+        assert evict('task1') == 0
+    assert evict('task1') > 0
+
+
+def test_enforce_quota_evicts_until_below_watermark(quota_app, tmp_path):
+    for task_id in ('task1', 'task2'):
+        make_result(tmp_path, task_id, {'layout.json': b'\0' * (1024 * 1024), 'full_translated_zh.md': b'x'})
+    quota_app.config['DISK_QUOTA_MB'] = 1.5
+
+    result = enforce_quota()
+    assert len(result['evicted']) == 1
+    assert result['used_bytes'] <= 1.5 * 1024 * 1024 * 0.9
+    assert [is_evicted(task_id) for task_id in ('task1', 'task2')].count(True) == 1
+
+
+def test_evicted_result_serves_layout_and_rehydrates_on_full_text(app, client, parsed):
+    result = parsed()
+    task_id = result['batch_id']
+    with app.app_context():
+        evict(task_id)
+        assert is_evicted(task_id)
+
+    # 只读取layout时使用保留的layout产物，不恢复归档
+    data = client.get(f'/api/batch/{task_id}').get_json()['data']
+    assert data['layout'] == result['layout']
+    with app.app_context():
+        assert is_evicted(task_id)
+
+    assert client.get(f'/api/full-text/{task_id}').status_code == 200
+    with app.app_context():
+        assert not is_evicted(task_id)
@@ -0,0 +1,84 @@
+"""
+HTTP缓存：强ETag、条件请求（304）和Range请求（206）
+"""
+import hashlib
+import io
+
+import pytest
+from flask import Flask
+
+from server.http_cache import file_etag, is_content_addressed
+from server.stored_files import send_stored, write_stored_bytes
+
+CONTENT = bytes(range(256)) * 64
+
+
+def test_file_etag(tmp_path):
+    sha256 = hashlib.sha256(b'pdf').hexdigest()
+    assert is_content_addressed(tmp_path / f'{sha256}.pdf')
+    assert file_etag(tmp_path / f'{sha256}.pdf') == sha256
+
+    path = tmp_path / 'full.md'
+    path.write_bytes(b'first')
+    assert not is_content_addressed(path)
+    assert file_etag(path) == hashlib.sha256(b'first').hexdigest()
+    path.write_bytes(b'second version')
+    assert file_etag(path) == hashlib.sha256(b'second version').hexdigest()
+
+
+def test_uploaded_pdf_range_and_conditional(client, make_pdf):
+    content = make_pdf()
+    response = client.post('/api/upload', data={'file': (io.BytesIO(content), 'paper.pdf')},
+                           content_type='multipart/form-data')
+    filename = response.get_json()['data']['filename']
+    sha256 = hashlib.sha256(content).hexdigest()
+
+    response = client.get(f'/api/files/{filename}')
+    assert response.headers['ETag'] == f'"{sha256}"'
+    assert response.cache_control.immutable
+    assert response.headers['Accept-Ranges'] == 'bytes'
+
+    response = client.get(f'/api/files/{filename}', headers={'Range': 'bytes=0-99'})
+    assert response.status_code == 206
+    assert response.get_data() == content[:100]
+    assert response.headers['Content-Range'] == f'bytes 0-99/{len(content)}'
+
+    response = client.get(f'/api/files/{filename}', headers={'If-None-Match': f'"{sha256}"'})
+    assert response.status_code == 304
+
+
+@pytest.fixture
+def stored_client(tmp_path):
+    app = Flask(__name__)
+    path = tmp_path / 'translation.json'
+    write_stored_bytes(path, CONTENT, 'gzip')
+
+    @app.route('/stored')
+    def stored():
+        return send_stored(path)
+
+    return app.test_client()
+
+
+def test_stored_representations_have_distinct_etags(stored_client):
+    compressed = stored_client.get('/stored', headers={'Accept-Encoding': 'gzip'})
+    identity = stored_client.get('/stored', headers={'Accept-Encoding': 'identity'})
+    assert compressed.headers['ETag'] != identity.headers['ETag']
+    assert compressed.cache_control.no_cache
+
+    for response in (compressed, identity):
+        etag = response.headers['ETag']
+        encoding = response.headers.get('Content-Encoding') or 'identity'
+        again = stored_client.get('/stored', headers={'Accept-Encoding': encoding, 'If-None-Match': etag})
+        assert again.status_code == 304
+
+
+def test_stored_range_on_compressed_bytes(stored_client, tmp_path):
+    response = stored_client.get('/stored', headers={'Accept-Encoding': 'gzip', 'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.get_data() == (tmp_path / 'translation.json.gz').read_bytes()[10:20]
+
+    # 流式解压的表示不支持Range，返回完整内容
+    response = stored_client.get('/stored', headers={'Accept-Encoding': 'identity', 'Range': 'bytes=10-19'})
+    assert response.status_code == 200
+    assert response.get_data() == CONTENT
@@ -0,0 +1,95 @@
+"""
+layout产物：源JSON只解析一次，源文件变化时重新解析，源文件回收后按元数据中的指纹继续使用
+"""
+import json
+import os
+
+import pytest
+
+from server import layout_artifact
+from server.layout_artifact import LayoutLRU, get_artifact_paths, get_layout_artifact
+
+
+def write_source(path, title):
+    data = {"pdf_info": [{"page_idx": 0, "page_size": [600, 800], "para_blocks": [
+        {"type": "title", "bbox": [10, 10, 200, 30], "lines": [{"spans": [{"type": "text", "content": title}]}]}
+    ]}]}
+    path.write_text(json.dumps(data), encoding='utf-8')
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = LayoutLRU(max_entries=4)
+    monkeypatch.setattr(layout_artifact, '_cache', cache)
+    return cache
+
+
+@pytest.fixture
+def parse_calls(monkeypatch):
+    calls = []
+    parse_source = layout_artifact._parse_source
+
+    def counting_parse(source_path, kind):
+        calls.append(source_path)
+        return parse_source(source_path, kind)
+
+    monkeypatch.setattr(layout_artifact, '_parse_source', counting_parse)
+    return calls
+
+
+def test_parsed_once_then_served_from_cache_and_artifact(tmp_path, cache, parse_calls):
+    source = tmp_path / 'layout.json'
+    write_source(source, 'Introduction')
+
+    layout = get_layout_artifact(source)
+    assert [row.text for row in layout] == ['Introduction']
+    artifact, meta_path = get_artifact_paths(source)
+    assert artifact.exists() and meta_path.exists()
+
+    assert get_layout_artifact(source) is layout
+    assert cache.stats()['hits'] == 1
+
+    # 新进程（空缓存）直接读取产物，不重新解析
+    cache.invalidate(f"mineru:{source.resolve()}")
+    assert get_layout_artifact(source).to_dicts() == layout.to_dicts()
+    assert len(parse_calls) == 1
+
+
+def test_changed_source_is_reparsed(tmp_path, cache, parse_calls):
+    source = tmp_path / 'layout.json'
+    write_source(source, 'Old title')
+    get_layout_artifact(source)
+
+    write_source(source, 'New title')
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert [row.text for row in get_layout_artifact(source)] == ['New title']
+    assert len(parse_calls) == 2
+
+
+def test_evicted_source_uses_recorded_fingerprint(tmp_path, cache, parse_calls):
+    source = tmp_path / 'layout.json'
+    write_source(source, 'Introduction')
+    expected = get_layout_artifact(source).to_dicts()
+    cache.invalidate(f"mineru:{source.resolve()}")
+
+    source.unlink()
+    assert get_layout_artifact(source).to_dicts() == expected
+    assert len(parse_calls) == 1
+
+    # 产物也不存在时由调用方恢复结果目录
+    for path in get_artifact_paths(source):
+        path.unlink()
+    with pytest.raises(FileNotFoundError):
+        get_layout_artifact(source)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LayoutLRU(max_entries=2)
+    cache.put('a', (1,), 'A')
+    cache.put('b', (1,), 'B')
+    assert cache.get('a', (1,)) == 'A'
+    cache.put('c', (1,), 'C')
+    assert cache.get('b', (1,)) is None
+    assert cache.get('a', (2,)) is None
+    assert cache.stats() == {"entries": 2, "max_entries": 2, "hits": 1, "misses": 2}
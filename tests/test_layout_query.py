@@ -0,0 +1,63 @@
+"""
+layout裁剪参数：页码范围解析和结果裁剪
+"""
+import pytest
+
+from server.routes import parse_page_ranges, shape_layout_result
+
+
+def make_query(pages=None, pages_spec=None, fields=None, include_mineru_data=False):
+    return {"pages": pages, "pages_spec": pages_spec, "fields": fields, "include_mineru_data": include_mineru_data}
+
+
+@pytest.mark.parametrize('spec, expected', [
+    ('3', {3}),
+    ('1-5', {1, 2, 3, 4, 5}),
+    ('1-3,8,10-12', {1, 2, 3, 8, 10, 11, 12}),
+    (' 2 , 2-3 ,', {2, 3}),
+])
+def test_parse_page_ranges(spec, expected):
+    assert parse_page_ranges(spec) == expected
+
+
+@pytest.mark.parametrize('spec', ['', ',', '0', '5-3', 'a', '1-b', '-2'])
+def test_parse_page_ranges_invalid(spec):
+    with pytest.raises(ValueError):
+        parse_page_ranges(spec)
+
+
+LAYOUT = [
+    {"block_id": "p1_b0", "page": 1, "bbox": [0, 0, 10, 10], "text": "a", "type": "text"},
+    {"block_id": "p2_b0", "page": 2, "bbox": [0, 0, 10, 10], "text": "b", "type": "text"},
+    {"block_id": "p3_b0", "page": 3, "bbox": [0, 0, 10, 10], "text": "c", "type": "title"},
+]
+
+
+def test_shape_layout_result_drops_mineru_data_by_default():
+    data = {"layout": LAYOUT, "layout_count": 3, "mineru_data": {"pdf_info": []}}
+    result = shape_layout_result(data, make_query())
+    assert 'mineru_data' not in result
+    assert result['layout'] == LAYOUT
+    assert 'mineru_data' in data
+
+
+def test_shape_layout_result_keeps_mineru_data_when_requested():
+    data = {"layout": LAYOUT, "mineru_data": {"pdf_info": []}}
+    assert shape_layout_result(data, make_query(include_mineru_data=True))['mineru_data'] == {"pdf_info": []}
+
+
+def test_shape_layout_result_filters_pages_and_fields():
+    data = {"layout": LAYOUT, "layout_count": 3, "local_layout": LAYOUT[:2]}
+    result = shape_layout_result(data, make_query(pages={2, 3}, pages_spec='2-3', fields=['block_id', 'page']))
+
+    assert result['layout'] == [{"block_id": "p2_b0", "page": 2}, {"block_id": "p3_b0", "page": 3}]
+    assert result['local_layout'] == [{"block_id": "p2_b0", "page": 2}]
+    assert result['layout_count'] == 2
+    assert result['total_layout_count'] == 3
+    assert result['layout_pages'] == [1, 2, 3]
+    assert result['pages'] == '2-3'
+
+
+def test_shape_layout_result_without_layout():
+    data = {"batch_id": "b1", "state": "running", "layout": None}
+    assert shape_layout_result(data, make_query(pages={1}, pages_spec='1')) == {**data, "pages": '1'}
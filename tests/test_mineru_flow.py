@@ -0,0 +1,50 @@
+"""
+端到端流程（对接server/mineru_standin.py）：上传PDF、轮询批量任务、下载解压结果
+"""
+from server.mineru_standin import create_standin_app
+
+
+def test_parse_and_poll(client, upload, wait_for_batch, make_pdf):
+    submitted = upload(make_pdf())
+    batch_id = submitted['batch_id']
+    assert submitted['state'] == 'waiting-file'
+    assert submitted['page_sizes'] == [[612, 792]] * 3
+
+    result = wait_for_batch(batch_id)
+    assert result['state'] == 'done'
+    assert {block['page'] for block in result['layout']} == {1, 2, 3}
+    assert result['layout_count'] == len(result['layout'])
+    assert 'mineru_data' not in result
+    for block in result['layout']:
+        x0, y0, x1, y1 = block['bbox']
+        assert 0 <= x0 <= x1 <= 612 and 0 <= y0 <= y1 <= 792
+
+    # 再次查询直接读取本地结果
+    cached = client.get(f'/api/batch/{batch_id}').get_json()['data']
+    assert cached['deduplicated'] is True
+    assert cached['layout'] == result['layout']
+
+    assert client.get(f'/api/full-text/{batch_id}').status_code == 200
+    mineru_data = client.get(f'/api/batch/{batch_id}?include_mineru_data=true').get_json()['data']['mineru_data']
+    assert len(mineru_data['pdf_info']) == 3
+
+
+def test_failed_task(client, serve, upload, wait_for_batch, make_pdf, monkeypatch):
+    base_url = serve(create_standin_app(delay=0, fail_rate=1.0, seed=0)) + '/api/v4'
+    monkeypatch.setitem(client.application.config, 'MINERU_BASE_URL', base_url)
+
+    result = wait_for_batch(upload(make_pdf(label='Failed'))['batch_id'])
+    assert result['state'] == 'failed'
+    assert result['err_msg']
+    assert result['layout'] == []
+
+
+def test_standin_layout_formats(client, serve, upload, wait_for_batch, make_pdf, monkeypatch):
+    base_url = serve(create_standin_app(delay=0, layout_format='cycle', seed=0)) + '/api/v4'
+    monkeypatch.setitem(client.application.config, 'MINERU_BASE_URL', base_url)
+
+    # 四种JSON格式解析出的layout都覆盖全部页面
+    for idx in range(4):
+        result = wait_for_batch(upload(make_pdf(label=f'Format{idx}'))['batch_id'])
+        assert result['state'] == 'done'
+        assert {block['page'] for block in result['layout']} == {1, 2, 3}
@@ -0,0 +1,63 @@
+"""
+pdf_info按页分段并行解析：分段点定位和并行结果与串行一致
+"""
+import json
+
+import pytest
+
+from server import mineru_parser
+from server.mineru_parser import _find_page_start, parse_mineru_layout_from_data, parse_pdf_info_parallel
+
+
+def build_pdf_info(page_count):
+    pages = []
+    for idx in range(page_count):
+        pages.append({
+            "page_idx": idx,
+            "page_size": [600, 800],
+            "para_blocks": [
+                {"type": "title", "bbox": [10, 10, 200, 30],
+                 "lines": [{"spans": [{"type": "text", "content": f"Section {idx + 1}"}]}]},
+                {"type": "text", "bbox": [10, 40, 590, 120], "lines": [{"spans": [
+                    {"type": "inline_equation", "content": "x^{"},
+                    # 字符串中的 {" 不是页起点
+                    {"type": "text", "content": f'page {idx} quotes {{"k": 1}} and 中文'},
+                ]}]},
+            ],
+        })
+    return {"pdf_info": pages, "_backend": "pipeline"}
+
+
+@pytest.fixture
+def pdf_info_file(tmp_path):
+    data = build_pdf_info(30)
+    text = json.dumps(data, ensure_ascii=False)
+    path = tmp_path / 'layout.json'
+    path.write_text(text, encoding='utf-8')
+    raw = text.encode('utf-8')
+    starts = sorted(raw.index(json.dumps(page, ensure_ascii=False).encode('utf-8')) for page in data['pdf_info'])
+    return path, raw, starts, data
+
+
+@pytest.mark.parametrize('window', [1 << 20, 64])
+def test_find_page_start_at_every_offset(pdf_info_file, monkeypatch, window):
+    path, raw, starts, _ = pdf_info_file
+    monkeypatch.setattr(mineru_parser, 'BOUNDARY_WINDOW', window)
+    with open(path, 'rb') as f:
+        for offset in range(raw.index(b'['), len(raw)):
+            expected = next((start for start in starts if start >= offset), None)
+            assert _find_page_start(f, offset) == expected, offset
+
+
+@pytest.mark.parametrize('workers', [2, 4, 7])
+def test_parallel_matches_serial(pdf_info_file, workers):
+    path, _, _, data = pdf_info_file
+    parallel = parse_pdf_info_parallel(str(path), workers)
+    assert parallel is not None
+    assert parallel == parse_mineru_layout_from_data(data)
+
+
+def test_parallel_returns_none_for_other_formats(tmp_path):
+    path = tmp_path / 'content_list.json'
+    path.write_text(json.dumps([{"type": "text", "text": "a", "page_idx": 0, "bbox": [0, 0, 1, 1]}]), encoding='utf-8')
+    assert parse_pdf_info_parallel(str(path), 4) is None
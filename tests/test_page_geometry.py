@@ -0,0 +1,49 @@
+"""
+bbox坐标单位推断（相对坐标、千分比坐标、页面坐标）
+"""
+import numpy as np
+
+from server.page_geometry import normalize_bbox_array
+
+PAGE_SIZES = [[600, 800], [500, 1000]]
+
+
+def normalize(pages, boxes, page_sizes=PAGE_SIZES):
+    return normalize_bbox_array(np.asarray(pages), np.asarray(boxes, dtype=np.float64), page_sizes).tolist()
+
+
+def test_relative_coordinates():
+    assert normalize([1], [[0.1, 0.1, 0.5, 0.5]]) == [[60, 80, 300, 400]]
+
+
+def test_permille_coordinates():
+    assert normalize([1, 1], [[100, 100, 900, 900], [0, 0, 500, 250]]) == [[60, 80, 540, 720], [0, 0, 300, 200]]
+
+
+def test_page_coordinates_unchanged():
+    assert normalize([1], [[10, 20, 300, 400]]) == [[10, 20, 300, 400]]
+
+
+def test_small_page_coordinates_are_not_relative():
+    # 同一页中有坐标大于1时整页按页面坐标处理
+    assert normalize([1, 1], [[0.5, 0.5, 1, 1], [10, 10, 20, 20]]) == [[0.5, 0.5, 1, 1], [10, 10, 20, 20]]
+
+
+def test_unit_inferred_per_page():
+    result = normalize([1, 2], [[0.5, 0.5, 1, 1], [50, 100, 250, 500]])
+    assert result == [[300, 400, 600, 800], [50, 100, 250, 500]]
+
+
+def test_reversed_corners_and_clipping():
+    assert normalize([1], [[300, 400, 10, 20]]) == [[10, 20, 300, 400]]
+    assert normalize([2], [[-5, 10, 520, 990]]) == [[0, 10, 500, 990]]
+
+
+def test_page_without_size_only_orders_corners():
+    result = normalize([3], [[0.4, 0.3, 0.2, 0.1]])
+    assert np.allclose(result, [[0.2, 0.1, 0.4, 0.3]])
+    assert np.allclose(normalize([1], [[0.1, 0.1, 0.5, 0.5]], page_sizes=None), [[0.1, 0.1, 0.5, 0.5]])
+
+
+def test_empty():
+    assert normalize([], np.zeros((0, 4))) == []
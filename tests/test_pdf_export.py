@@ -0,0 +1,125 @@
+"""
+双语PDF导出：译文整理、原位覆盖和左右对照渲染、并行分段合并，以及/api/export-pdf接口
+"""
+import hashlib
+import io
+
+import fitz  # PyMuPDF
+import pytest
+
+from server.pdf_export import collect_page_blocks, export_key, export_pdf
+
+HEADING_BBOX = [70, 70, 400, 100]
+
+
+def make_layout(page_count, translated_text='Translated heading'):
+    return [{"page": idx + 1, "bbox": HEADING_BBOX, "type": "text", "text": f"Doc page {idx + 1} heading text",
+             "translated_text": translated_text} for idx in range(page_count)]
+
+
+def test_collect_page_blocks_skips_untranslated_blocks():
+    layout = make_layout(2) + [
+        {"page": 1, "bbox": [0, 0, 1, 1], "type": "text", "text": "Same", "translated_text": "Same"},
+        {"page": 1, "bbox": [0, 0, 1, 1], "type": "text", "text": "Empty", "translated_text": " "},
+        {"page": 1, "bbox": [0, 0, 1, 1], "type": "image", "text": "Figure", "translated_text": "图"},
+        {"page": 1, "bbox": [0, 0, 1], "type": "text", "text": "Bad bbox", "translated_text": "坏"},
+        {"page_no": 3, "bbox": [1, 2, 3, 4], "type": "text", "text": "Legacy", "translated_text": "旧格式"},
+    ]
+    assert collect_page_blocks(layout) == {
+        0: [([70.0, 70.0, 400.0, 100.0], 'Translated heading')],
+        1: [([70.0, 70.0, 400.0, 100.0], 'Translated heading')],
+        2: [([1.0, 2.0, 3.0, 4.0], '旧格式')],
+    }
+
+
+def test_export_key_depends_on_mode_and_translations():
+    blocks = collect_page_blocks(make_layout(2))
+    assert export_key('a' * 64, 'overlay', blocks) == export_key('a' * 64, 'overlay', dict(reversed(blocks.items())))
+    assert export_key('a' * 64, 'overlay', blocks) != export_key('a' * 64, 'side_by_side', blocks)
+    assert export_key('a' * 64, 'overlay', blocks) != export_key('a' * 64, 'overlay', collect_page_blocks(make_layout(1)))
+
+
+@pytest.fixture
+def source_pdf(tmp_path, make_pdf):
+    path = tmp_path / 'source.pdf'
+    path.write_bytes(make_pdf(page_count=6))
+    return path
+
+
+def test_overlay_replaces_original_text(source_pdf, tmp_path):
+    output = tmp_path / 'exports' / 'overlay.pdf'
+    progress = list(export_pdf(str(source_pdf), collect_page_blocks(make_layout(6)), output))
+    assert progress == [{"first_page": 1, "last_page": 6, "completed_pages": 6, "total_pages": 6}]
+
+    with fitz.open(output) as doc:
+        assert doc.page_count == 6
+        for page in doc:
+            text = page.get_text()
+            assert 'heading text' not in text
+            assert 'Translated' in text
+    assert not list(output.parent.glob('*.tmp'))
+
+
+def test_overlay_without_line_art_option(source_pdf, tmp_path, monkeypatch):
+    # PyMuPDF 1.24.1之前没有PDF_REDACT_LINE_ART_NONE，apply_redactions也不接受graphics参数
+    monkeypatch.delattr(fitz, 'PDF_REDACT_LINE_ART_NONE')
+    calls = []
+    apply_redactions = fitz.Page.apply_redactions
+
+    def legacy_apply_redactions(page, images=2):
+        calls.append(images)
+        return apply_redactions(page, images=images)
+
+    monkeypatch.setattr(fitz.Page, 'apply_redactions', legacy_apply_redactions)
+    output = tmp_path / 'legacy.pdf'
+    list(export_pdf(str(source_pdf), collect_page_blocks(make_layout(6)), output))
+    assert calls == [fitz.PDF_REDACT_IMAGE_NONE] * 6
+    with fitz.open(output) as doc:
+        assert 'heading text' not in doc[0].get_text()
+
+
+def test_side_by_side_keeps_original_page(source_pdf, tmp_path):
+    output = tmp_path / 'side.pdf'
+    list(export_pdf(str(source_pdf), collect_page_blocks(make_layout(6, '标题译文')), output, mode='side_by_side'))
+
+    with fitz.open(output) as doc:
+        page = doc[0]
+        assert (page.rect.width, page.rect.height) == (612 * 2, 792)
+        assert 'Doc page 1 heading text' in page.get_text(clip=fitz.Rect(0, 0, 612, 792))
+        assert 'heading text' not in page.get_text(clip=fitz.Rect(612, 0, 612 * 2, 792))
+
+
+def test_parallel_export_matches_page_order(source_pdf, tmp_path):
+    layout = [dict(block, translated_text=f"Translated {block['page']}") for block in make_layout(6)]
+    output = tmp_path / 'parallel.pdf'
+    progress = list(export_pdf(str(source_pdf), collect_page_blocks(layout), output,
+                               parallel_threshold=2, max_workers=2))
+    assert len(progress) > 1
+    assert max(item['completed_pages'] for item in progress) == 6
+
+    with fitz.open(output) as doc:
+        assert [f"Translated {idx + 1}" in page.get_text() for idx, page in enumerate(doc)] == [True] * 6
+        # 合并时去除各段重复嵌入的字体
+        assert len({font[0] for page in doc for font in page.get_fonts()}) <= 2
+
+    with pytest.raises(ValueError):
+        list(export_pdf(str(source_pdf), {}, tmp_path / 'bad.pdf', mode='columns'))
+
+
+def test_export_route_caches_result(client, make_pdf):
+    content = make_pdf()
+    client.post('/api/upload', data={'file': (io.BytesIO(content), 'paper.pdf')}, content_type='multipart/form-data')
+    request = {"sha256": hashlib.sha256(content).hexdigest(), "layout": make_layout(3)}
+
+    response = client.post('/api/export-pdf', json=request)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/pdf'
+    assert 'paper_translated_overlay.pdf' in response.headers['Content-Disposition']
+    etag = response.headers['ETag']
+    with fitz.open('pdf', response.get_data()) as doc:
+        assert doc.page_count == 3
+
+    assert client.post('/api/export-pdf', json=request).headers['ETag'] == etag
+    assert client.post('/api/export-pdf', json={**request, "mode": "columns"}).status_code == 400
+    assert client.post('/api/export-pdf', json={**request, "layout": make_layout(3, '')}).status_code == 400
+    assert client.post('/api/export-pdf', json={"layout": make_layout(3), "sha256": "f" * 64}).status_code == 404
@@ -0,0 +1,37 @@
+"""
+PyMuPDF文本层快速解析：标题识别和并行解析
+"""
+import fitz  # PyMuPDF
+
+from server.pdf_local import extract_layout_local
+
+
+def write_pdf(path, pages):
+    with fitz.open() as doc:
+        for lines in pages:
+            page = doc.new_page(width=612, height=792)
+            y = 60
+            for text, size in lines:
+                page.insert_text((72, y), text, fontsize=size)
+                y += size * 4
+        doc.save(str(path))
+    return str(path)
+
+
+def test_titles_are_larger_than_most_frequent_size(tmp_path):
+    # 正文（10pt）块最多，但各级标题比正文多时中位数会落在标题字号上
+    lines = [("Body paragraph one.", 10), ("Body paragraph two.", 10), ("Body paragraph three.", 10),
+             ("Heading A", 13), ("Heading B", 14), ("Heading C", 15), ("Heading D", 16)]
+    layout = extract_layout_local(write_pdf(tmp_path / 'a.pdf', [lines]))
+
+    types = {block['text']: block['type'] for block in layout}
+    assert types == {text: 'text' if size == 10 else 'title' for text, size in lines}
+    assert all(block['page'] == 1 and block['page_size'] == [612, 792] for block in layout)
+
+
+def test_parallel_matches_serial(tmp_path):
+    pages = [[(f"Page {idx} heading", 16), (f"Body text of page {idx}.", 10)] for idx in range(1, 9)]
+    path = write_pdf(tmp_path / 'b.pdf', pages)
+    serial = extract_layout_local(path, parallel_threshold=100)
+    assert extract_layout_local(path, parallel_threshold=2, max_workers=3) == serial
+    assert [block['page'] for block in serial] == [page for page in range(1, 9) for _ in range(2)]
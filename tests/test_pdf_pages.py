@@ -0,0 +1,111 @@
+"""
+页面缩略图与PDF切片：页码范围和宽度参数、缩略图格式、切片缓存范围，以及/api/documents/<sha256>下的接口
+"""
+import hashlib
+import io
+import time
+from pathlib import Path
+
+import fitz  # PyMuPDF
+import pytest
+from flask import Flask
+from PIL import Image
+
+from server import pdf_pages
+from server.pdf_pages import PAGE_CACHE_DIRNAME, get_thumbnail_format, normalize_width, parse_page_range
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('3', (3, 3)), ('2-5', (2, 5)), ('5', (5, 5)),
+    ('0', None), ('6', None), ('4-2', None), ('a', None), ('1-b', None), ('', None),
+])
+def test_parse_page_range(value, expected):
+    assert parse_page_range(value, 5) == expected
+
+
+@pytest.fixture
+def pages_app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(MINERU_FOLDER=str(tmp_path), THUMBNAIL_WIDTH=160)
+    with app.app_context():
+        yield app
+
+
+@pytest.mark.parametrize('width, expected', [(None, 160), (1, 32), (100, 96), (5000, 1600)])
+def test_normalize_width(pages_app, width, expected):
+    assert normalize_width(width) == expected
+
+
+def test_thumbnail_format_falls_back_to_jpeg(pages_app, monkeypatch):
+    assert get_thumbnail_format() == 'webp'
+    pages_app.config['THUMBNAIL_FORMAT'] = 'jpg'
+    assert get_thumbnail_format() == 'jpeg'
+    pages_app.config['THUMBNAIL_FORMAT'] = 'webp'
+    monkeypatch.setattr(pdf_pages, 'Image', None)
+    assert get_thumbnail_format() == 'jpeg'
+
+
+@pytest.fixture
+def document(client, make_pdf):
+    content = make_pdf(page_count=5, width=400, height=600)
+    client.post('/api/upload', data={'file': (io.BytesIO(content), 'paper.pdf')}, content_type='multipart/form-data')
+    return hashlib.sha256(content).hexdigest()
+
+
+def page_cache(client, sha256) -> Path:
+    return Path(client.application.config['MINERU_FOLDER']) / PAGE_CACHE_DIRNAME / sha256
+
+
+def test_thumbnails(client, document):
+    data = client.get(f'/api/documents/{document}/thumbnails?width=100').get_json()['data']
+    assert (data['page_count'], data['width'], data['format']) == (5, 96, 'webp')
+    assert data['page_sizes'] == [[400, 600]] * 5
+    assert data['thumbnail_urls'][2] == f'/api/documents/{document}/thumbnails/3?width=96'
+
+    response = client.get(f'/api/documents/{document}/thumbnails/3?width=96')
+    assert response.mimetype == 'image/webp'
+    assert response.cache_control.immutable
+    with Image.open(io.BytesIO(response.get_data())) as image:
+        assert image.size == (96, 144)
+
+    # 后台生成其余页
+    deadline = time.time() + 10
+    while client.get(f'/api/documents/{document}/thumbnails?width=96').get_json()['data']['ready_count'] < 5:
+        assert time.time() < deadline
+        time.sleep(0.05)
+
+    assert client.get(f'/api/documents/{document}/thumbnails/6').status_code == 404
+    assert client.get(f'/api/documents/{"0" * 64}/thumbnails').status_code == 404
+
+
+def test_single_page_slices_are_cached(client, document):
+    response = client.get(f'/api/documents/{document}/pages/2')
+    assert response.status_code == 200
+    with fitz.open('pdf', response.get_data()) as doc:
+        assert doc.page_count == 1
+        assert 'Doc page 2 heading text' in doc[0].get_text()
+    assert [path.name for path in page_cache(client, document).glob('*.pdf')] == ['page_2.pdf']
+
+    etag = response.headers['ETag']
+    assert client.get(f'/api/documents/{document}/pages/2', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_page_range_slices_are_not_cached(client, document):
+    response = client.get(f'/api/documents/{document}/pages/2-4')
+    with fitz.open('pdf', response.get_data()) as doc:
+        assert [page.get_text().strip() for page in doc] == [f'Doc page {idx} heading text' for idx in (2, 3, 4)]
+    assert not list(page_cache(client, document).glob('*.pdf'))
+
+    # 每次生成的字节相同，ETag和Range请求保持一致
+    again = client.get(f'/api/documents/{document}/pages/2-4', headers={'Range': 'bytes=100-199'})
+    assert again.status_code == 206
+    assert again.headers['ETag'] == response.headers['ETag']
+    assert again.get_data() == response.get_data()[100:200]
+
+
+def test_invalid_page_ranges(client, document, monkeypatch):
+    assert client.get(f'/api/documents/{document}/pages/0').status_code == 400
+    assert client.get(f'/api/documents/{document}/pages/4-6').status_code == 400
+    monkeypatch.setitem(client.application.config, 'PDF_SLICE_MAX_PAGES', 2)
+    assert client.get(f'/api/documents/{document}/pages/1-3').status_code == 400
+    assert client.get(f'/api/documents/{"0" * 64}/pages/1').status_code == 404
@@ -0,0 +1,75 @@
+"""
+阅读顺序重建：续接片段分组和译文拆分
+"""
+from server.reading_order import build_reading_segments, join_fragments, split_translation
+
+
+def block(text, page=1, bbox=(0, 0, 100, 10), type='text'):
+    return {"text": text, "page": page, "bbox": list(bbox), "type": type}
+
+
+def test_continuation_in_same_column():
+    layout = [
+        block("The model is trained on", bbox=(0, 0, 100, 10)),
+        block("large corpora.", bbox=(0, 20, 100, 30)),
+        block("A new paragraph starts here.", bbox=(0, 40, 100, 50)),
+    ]
+    assert build_reading_segments(layout) == [[0, 1], [2]]
+
+
+def test_continuation_across_columns_and_pages():
+    layout = [
+        block("left column ends with", bbox=(0, 500, 100, 510)),
+        block("the right column", bbox=(120, 0, 220, 10)),
+        block("which then continues on", bbox=(120, 20, 220, 30)),
+        block("the next page.", page=2),
+    ]
+    assert build_reading_segments(layout) == [[0, 1, 2, 3]]
+
+
+def test_no_continuation_across_non_adjacent_pages_or_titles():
+    layout = [
+        block("Introduction", type='title'),
+        block("this lowercase block follows a title."),
+        block("text without a full stop", page=1, bbox=(0, 20, 100, 30)),
+        block("continued three pages later", page=4),
+    ]
+    assert build_reading_segments(layout) == [[0], [1], [2], [3]]
+
+
+def test_cjk_continuation():
+    layout = [block("本文提出了一种新的"), block("注意力机制。", bbox=(0, 20, 100, 30)), block("下一段。", bbox=(0, 40, 100, 50))]
+    assert build_reading_segments(layout) == [[0, 1], [2]]
+
+
+def test_empty_blocks_and_max_chars():
+    # 空文本块（如图片）单独成组，不打断前后片段的续接
+    layout = [block("aaaa bbbb"), block(""), block("cccc dddd", bbox=(0, 20, 100, 30))]
+    assert build_reading_segments(layout) == [[0, 2], [1]]
+
+    layout = [block("a" * 6), block("bbbbbb", bbox=(0, 20, 100, 30))]
+    assert build_reading_segments(layout, max_chars=10) == [[0], [1]]
+    assert build_reading_segments(layout, max_chars=12) == [[0, 1]]
+
+
+def test_join_fragments():
+    assert join_fragments(["The trans-", "former model"]) == "The transformer model"
+    assert join_fragments(["本文提出", "一种方法"]) == "本文提出一种方法"
+    assert join_fragments(["trained on", "large corpora"]) == "trained on large corpora"
+
+
+def test_split_translation_breaks_after_punctuation():
+    assert split_translation("第一部分，第二部分", ["aaaa", "bbbb"]) == ["第一部分，", "第二部分"]
+
+
+def test_split_translation_keeps_all_text():
+    translated = "模型在大规模语料上训练，然后在下游任务上微调，最后在基准测试上评估。"
+    sources = ["The model is trained on large", "corpora, then fine-tuned on downstream", "tasks and evaluated."]
+    parts = split_translation(translated, sources)
+    assert len(parts) == len(sources)
+    assert ''.join(parts) == translated
+    assert all(parts)
+
+
+def test_split_translation_single_source():
+    assert split_translation("  译文  ", ["source"]) == ["译文"]
@@ -0,0 +1,99 @@
+"""
+全文检索：FTS5查询构造和中日韩文本的高亮片段
+"""
+import pytest
+from flask import Flask
+
+from server.routes import index_library
+from server.search_index import (
+    build_match_query,
+    index_document,
+    index_translations,
+    indexed_documents,
+    remove_document,
+    search
+)
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('attention mech', '"attention"* "mech"*'),
+    ('注意力机制', '"注 意 力 机 制"'),
+    ('attention 注意力', '"attention"* "注 意 力"'),
+    ('self-attention', '"self"* "attention"*'),
+    ('"quoted" OR NOT', '"quoted"* "OR"* "NOT"*'),
+    ('!!', None),
+    ('', None),
+    (None, None),
+])
+def test_build_match_query(query, expected):
+    assert build_match_query(query) == expected
+
+
+@pytest.fixture
+def search_app(tmp_path):
+    app = Flask(__name__)
+    app.config['MINERU_FOLDER'] = str(tmp_path)
+    with app.app_context():
+        yield app
+
+
+LAYOUT = [
+    {"page": 1, "block_id": "p1_b0", "text": "Attention mechanisms for <transformers>"},
+    {"page": 2, "block_id": "p2_b0", "text": "Results on the benchmark."},
+]
+
+
+def test_search_source_and_translation(search_app):
+    index_document('doc1', LAYOUT, task_id='task1', sha256='doc1', title='paper.pdf')
+    index_translations('doc1', 'zh', [{"page": 1, "block_id": "p1_b0", "text": "本文提出了一种新的注意力机制 for 变换器，效果 好。"}],
+                       task_id='task1')
+
+    [result] = search('transf')['results']
+    assert result['task_id'] == 'task1'
+    assert result['title'] == 'paper.pdf'
+    assert result['page'] == 1
+    assert result['snippet'] == 'Attention mechanisms for &lt;<mark>transformers</mark>&gt;'
+
+    [result] = search('注意力', lang='zh')['results']
+    assert result['block_id'] == 'p1_b0'
+    # 原文中CJK与拉丁文字之间、CJK之间的空格保持不变
+    assert result['snippet'] == '本文提出了一种新的<mark>注意力</mark>机制 for 变换器，效果 好。'
+
+    assert search('注意力', lang='source')['results'] == []
+    assert search('attention', task_id='other')['results'] == []
+
+
+def test_cjk_phrase_must_be_adjacent(search_app):
+    index_translations('doc1', 'zh', [{"page": 1, "block_id": "b0", "text": "注意力和机制"}])
+    assert search('注意力')['results']
+    assert search('力机')['results'] == []
+
+
+def test_reindex_replaces_source(search_app):
+    index_document('doc1', LAYOUT)
+    index_document('doc1', LAYOUT[1:])
+    assert search('attention')['results'] == []
+    assert len(search('benchmark')['results']) == 1
+
+    remove_document('doc1')
+    assert search('benchmark')['results'] == []
+
+
+def test_completed_result_is_searchable(client, parsed):
+    result = parsed()
+
+    data = client.get('/api/search?q=paragraph&lang=source').get_json()['data']
+    assert data['count'] > 0
+    assert {item['task_id'] for item in data['results']} == {result['batch_id']}
+    assert all('<mark>paragraph</mark>' in item['snippet'] for item in data['results'])
+
+
+def test_index_library_backfills_missing_documents(app, parsed):
+    result = parsed()
+    with app.app_context():
+        [doc_key] = indexed_documents()
+        remove_document(doc_key)
+        assert search('paragraph')['results'] == []
+
+        index_library()
+        assert {item['task_id'] for item in search('paragraph')['results']} == {result['batch_id']}
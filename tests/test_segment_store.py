@@ -0,0 +1,66 @@
+"""
+段落级译文存储：复用已翻译段落、多个实例（进程）保存时合并，以及存储路径校验
+"""
+import pytest
+from flask import Flask
+
+from server import segment_store
+from server.segment_store import SegmentStore, get_segment_store, translate_chunk_with_segments
+
+
+@pytest.fixture
+def store_app(tmp_path):
+    app = Flask(__name__)
+    app.config['MINERU_FOLDER'] = str(tmp_path)
+    with app.app_context():
+        yield app
+
+
+def test_translate_chunk_reuses_stored_paragraphs(tmp_path):
+    store = SegmentStore(tmp_path / 'doc_zh.json')
+    requests = []
+
+    def translate(text):
+        requests.append(text)
+        return '\n\n'.join(f"译:{paragraph}" for paragraph in text.split('\n\n'))
+
+    translated, reused = translate_chunk_with_segments('# Intro\n\nFirst.', store, translate)
+    assert (translated, reused) == ('译:# Intro\n\n译:First.', 0)
+
+    translated, reused = translate_chunk_with_segments('## INTRO\n\nSecond.', store, translate)
+    assert (translated, reused) == ('## 译:# Intro\n\n译:Second.', 1)
+    assert requests[-1] == 'Second.'
+
+
+def test_save_merges_segments_from_other_writers(tmp_path):
+    path = tmp_path / 'doc_zh.json'
+    first, second = SegmentStore(path), SegmentStore(path)
+    first.put('Hello', '你好')
+    second.put('World', '世界')
+    first.save()
+    second.save()
+
+    reloaded = SegmentStore(path)
+    assert (reloaded.get('hello'), reloaded.get('world')) == ('你好', '世界')
+
+    # 已加载的实例在文件被其他实例更新后重新读取
+    first.refresh()
+    assert first.get('World') == '世界'
+
+
+def test_get_segment_store_is_bounded(store_app, monkeypatch):
+    monkeypatch.setattr(segment_store, '_stores', segment_store.OrderedDict())
+    monkeypatch.setattr(segment_store, 'MAX_CACHED_STORES', 2)
+    first = get_segment_store('doc1', 'zh')
+    assert get_segment_store('doc1', 'zh') is first
+    get_segment_store('doc2', 'zh')
+    get_segment_store('doc3', 'zh')
+    assert len(segment_store._stores) == 2
+    assert get_segment_store('doc1', 'zh') is not first
+
+
+@pytest.mark.parametrize('document_key, target_lang', [('../doc', 'zh'), ('doc', '../zh'), ('doc.1', 'zh')])
+def test_get_segment_store_rejects_invalid_names(store_app, document_key, target_lang):
+    with pytest.raises(ValueError):
+        get_segment_store(document_key, target_lang)
+    assert get_segment_store('', 'zh') is None
@@ -0,0 +1,72 @@
+"""
+空间索引：命中测试、可视区域查询，以及/api/layout/<task_id>/hit和/viewport接口
+"""
+import random
+
+from server.columnar_layout import ColumnarLayout
+from server.spatial_index import PageGrid, get_spatial_index
+
+LAYOUT = [
+    {"page": 1, "bbox": [0, 0, 600, 800], "text": "figure", "type": "image", "block_id": "p1_b0"},
+    {"page": 1, "bbox": [50, 50, 150, 100], "text": "caption", "type": "text", "block_id": "p1_b1"},
+    {"page": 1, "bbox": [300, 500, 550, 700], "text": "body", "type": "text", "block_id": "p1_b2"},
+    {"page": 2, "bbox": [50, 50, 150, 100], "text": "next page", "type": "text", "block_id": "p2_b0"},
+]
+
+
+def test_hit_returns_innermost_block_first():
+    index = get_spatial_index(ColumnarLayout.from_dicts(LAYOUT))
+    assert [block['block_id'] for block in index.hit(1, 100, 75)] == ['p1_b1', 'p1_b0']
+    assert [block['block_id'] for block in index.hit(2, 100, 75)] == ['p2_b0']
+    assert index.hit(2, 400, 600) == []
+    assert index.hit(5, 100, 75) == []
+
+
+def test_viewport_returns_blocks_in_reading_order():
+    layout = ColumnarLayout.from_dicts(LAYOUT)
+    index = get_spatial_index(layout)
+    assert get_spatial_index(layout) is index
+    assert [block['block_id'] for block in index.viewport(1, 200, 400, 400, 600)] == ['p1_b0', 'p1_b2']
+    # 坐标顺序颠倒的矩形等价
+    assert index.viewport(1, 400, 600, 200, 400) == index.viewport(1, 200, 400, 400, 600)
+
+
+def test_grid_matches_linear_scan():
+    rng = random.Random(0)
+    blocks = []
+    for idx in range(200):
+        x0, y0 = rng.uniform(0, 550), rng.uniform(0, 750)
+        blocks.append({"page": 1, "bbox": [x0, y0, x0 + rng.uniform(1, 50), y0 + rng.uniform(1, 50)],
+                       "text": str(idx), "type": "text", "block_id": f"b{idx}"})
+    grid = PageGrid(ColumnarLayout.from_dicts(blocks).page_slice(1))
+
+    for _ in range(100):
+        x, y = rng.uniform(0, 600), rng.uniform(0, 800)
+        expected = {i for i, (x0, y0, x1, y1) in enumerate(grid.boxes) if x0 <= x <= x1 and y0 <= y <= y1}
+        assert set(grid.query_point(x, y)) == expected
+
+        left, top = rng.uniform(0, 500), rng.uniform(0, 700)
+        right, bottom = left + 100, top + 100
+        expected = [i for i, (x0, y0, x1, y1) in enumerate(grid.boxes)
+                    if x0 <= right and x1 >= left and y0 <= bottom and y1 >= top]
+        assert grid.query_rect(left, top, right, bottom) == expected
+
+
+def test_hit_and_viewport_routes(client, parsed):
+    result = parsed()
+    task_id = result['batch_id']
+    block = next(block for block in result['layout'] if block['page'] == 2)
+    x0, y0, x1, y1 = block['bbox']
+
+    data = client.get(f'/api/layout/{task_id}/hit?page=2&x={(x0 + x1) / 2}&y={(y0 + y1) / 2}').get_json()['data']
+    assert block['block_id'] in data['block_ids']
+
+    page_blocks = [b for b in result['layout'] if b['page'] == 2]
+    data = client.get(f'/api/layout/{task_id}/viewport?page=2').get_json()['data']
+    assert [b['block_id'] for b in data['layout']] == [b['block_id'] for b in page_blocks]
+    data = client.get(f'/api/layout/{task_id}/viewport?page=2&x0={x0}&y0={y0}&x1={x1}&y1={y1}').get_json()['data']
+    assert block['block_id'] in [b['block_id'] for b in data['layout']]
+
+    assert client.get(f'/api/layout/{task_id}/hit?page=2&x=1').status_code == 400
+    assert client.get(f'/api/layout/{task_id}/hit?page=2&x=a&y=1').status_code == 400
+    assert client.get('/api/layout/missing/hit?page=1&x=1&y=1').status_code == 404
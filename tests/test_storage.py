@@ -0,0 +1,79 @@
+"""
+存储后端：共享目录（LocalStorage）和S3（S3Storage，对接server/s3_standin.py）的读写行为一致
+"""
+import os
+import uuid
+
+import pytest
+
+from server import s3_standin
+from server.storage import LocalStorage, S3Storage, StorageError
+
+
+@pytest.fixture(params=['local', 's3'])
+def backend(request, tmp_path):
+    if request.param == 'local':
+        return LocalStorage(tmp_path / 'shared')
+    endpoint = request.getfixturevalue('s3_endpoint')
+    return S3Storage(endpoint, f"bucket-{uuid.uuid4().hex[:8]}", 'dummy', 'dummy', prefix='pfx')
+
+
+@pytest.fixture
+def source_file(tmp_path):
+    path = tmp_path / 'source' / 'layout.json.gz'
+    path.parent.mkdir()
+    path.write_bytes(os.urandom(3000))
+    os.utime(path, ns=(1_600_000_000_123_456_789, 1_600_000_000_123_456_789))
+    return path
+
+
+def test_file_round_trip_keeps_mtime(backend, source_file, tmp_path):
+    backend.put_file('mineru/t1/layout.json.gz', source_file)
+
+    target = tmp_path / 'node_b' / 'mineru' / 't1' / 'layout.json.gz'
+    assert backend.get_file('mineru/t1/layout.json.gz', target) is True
+    assert target.read_bytes() == source_file.read_bytes()
+    assert target.stat().st_mtime_ns == source_file.stat().st_mtime_ns
+    assert not target.with_name(target.name + '.tmp').exists()
+
+
+def test_missing_objects(backend, tmp_path):
+    assert backend.get_file('mineru/missing.json', tmp_path / 'missing.json') is False
+    assert not (tmp_path / 'missing.json').exists()
+    assert backend.get_json('index/tasks/missing.json') is None
+    backend.delete('mineru/missing.json')
+
+
+def test_json_round_trip(backend):
+    record = {"task_id": "t1", "original_filename": "论文.pdf", "completed_at": 1700000000}
+    backend.put_json('index/tasks/t1.json', record)
+    assert backend.get_json('index/tasks/t1.json') == record
+
+    backend.delete('index/tasks/t1.json')
+    assert backend.get_json('index/tasks/t1.json') is None
+
+
+def test_list_keys_by_prefix(backend, source_file):
+    for key in ('mineru/t1/full.md', 'mineru/t1/images/a.png', 'mineru/t10/full.md', 'files/x.pdf'):
+        backend.put_file(key, source_file)
+
+    assert sorted(backend.list_keys('mineru/t1/')) == ['mineru/t1/full.md', 'mineru/t1/images/a.png']
+    assert sorted(backend.list_keys('mineru/t1')) == ['mineru/t1/full.md', 'mineru/t1/images/a.png',
+                                                      'mineru/t10/full.md']
+    assert backend.list_keys('translations/') == []
+
+
+def test_s3_list_keys_follows_pagination(s3_endpoint, source_file, monkeypatch):
+    monkeypatch.setattr(s3_standin, 'MAX_KEYS', 2)
+    backend = S3Storage(s3_endpoint, f"bucket-{uuid.uuid4().hex[:8]}", 'dummy', 'dummy')
+    keys = [f"mineru/t1/images/{idx}.png" for idx in range(5)]
+    for key in keys:
+        backend.put_file(key, source_file)
+    assert sorted(backend.list_keys('mineru/')) == keys
+
+
+def test_local_storage_rejects_keys_outside_root(tmp_path, source_file):
+    backend = LocalStorage(tmp_path / 'shared')
+    with pytest.raises(StorageError):
+        backend.put_file('../escape.txt', source_file)
+    assert not (tmp_path / 'escape.txt').exists()
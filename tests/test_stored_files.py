@@ -0,0 +1,90 @@
+"""
+压缩存储：逻辑路径的读写和压缩，以及按Accept-Encoding直接返回压缩内容
+"""
+import gzip
+
+import pytest
+from flask import Flask
+
+from server.stored_files import (
+    compress_stored,
+    read_stored_json,
+    read_stored_text,
+    resolve_stored,
+    send_stored,
+    write_stored_json,
+    write_stored_text
+)
+
+DATA = {"pdf_info": [{"page_idx": 0, "text": "中文" * 1000}]}
+
+
+def test_write_read_and_replace_variants(tmp_path):
+    path = tmp_path / 'layout.json'
+    assert resolve_stored(path) == (None, None)
+
+    target = write_stored_json(path, DATA, 'gzip')
+    assert target == tmp_path / 'layout.json.gz'
+    assert resolve_stored(path) == (target, 'gzip')
+    assert read_stored_json(path) == DATA
+
+    # 改为不压缩写入时删除旧的压缩版本
+    write_stored_text(path, '{"a": 1}')
+    assert resolve_stored(path) == (path, None)
+    assert not target.exists()
+    assert read_stored_text(path) == '{"a": 1}'
+
+
+def test_compress_existing_file(tmp_path):
+    path = tmp_path / 'full.md'
+    path.write_text('# Title\n\n' + 'body ' * 1000, encoding='utf-8')
+
+    target = compress_stored(path, 'gzip')
+    assert target == tmp_path / 'full.md.gz'
+    assert not path.exists()
+    assert target.stat().st_size < 5000
+    assert read_stored_text(path).startswith('# Title')
+    # 已压缩或不压缩时不再处理
+    assert compress_stored(path, 'gzip') == target
+    assert compress_stored(path, None) == target
+
+
+@pytest.fixture
+def stored_client(tmp_path):
+    app = Flask(__name__)
+    path = tmp_path / 'layout.json'
+    write_stored_json(path, DATA, 'gzip')
+
+    @app.route('/stored')
+    def stored():
+        return send_stored(path)
+
+    return app.test_client()
+
+
+def test_send_stored_passes_through_compressed_bytes(stored_client, tmp_path):
+    response = stored_client.get('/stored', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype == 'application/json'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert response.get_data() == (tmp_path / 'layout.json.gz').read_bytes()
+    assert gzip.decompress(response.get_data()).decode('utf-8') == (
+        read_stored_text(tmp_path / 'layout.json'))
+
+
+def test_send_stored_decompresses_for_other_clients(stored_client):
+    response = stored_client.get('/stored', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json() == DATA
+
+
+def test_mineru_route_serves_compressed_json(client, parsed):
+    task_id = parsed()['batch_id']
+    response = client.get(f'/api/mineru/{task_id}/layout.json', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers.get('Content-Encoding') == 'gzip'
+    assert len(gzip.decompress(response.get_data())) > 0
+
+    response = client.get(f'/api/mineru/{task_id}/layout.json')
+    assert 'Content-Encoding' not in response.headers
+    assert len(response.get_json()['pdf_info']) == 3
@@ -0,0 +1,56 @@
+"""
+layout翻译结果日志：追加统计、压缩快照和重新加载
+"""
+from server.stored_files import read_stored_json
+from server.translation_log import TranslationLog
+
+META = {"translation_id": "abc", "timestamp": 1, "target_lang": "zh", "model": "qwen-plus"}
+
+
+def block(block_id, text, translated):
+    return {"block_id": block_id, "page": 1, "text": text, "translated_text": translated}
+
+
+def test_append_counts(tmp_path):
+    log = TranslationLog(tmp_path / 'translation_abc_1.json')
+
+    stats = log.append(META, [block('b0', 'Hello', '你好'), block('b1', '42', '42'), block('b2', 'World', '')])
+    assert stats == {"translated_count": 1, "skipped_count": 1, "failed_count": 1, "total_count": 3}
+
+    # 重新翻译的块替换原状态，不重复计数
+    stats = log.append(META, [block('b2', 'World', '世界'), block('b3', 'Again', '再次')])
+    assert stats == {"translated_count": 3, "skipped_count": 1, "failed_count": 0, "total_count": 4}
+
+
+def test_compact_writes_snapshot_and_truncates_log(tmp_path):
+    snapshot_path = tmp_path / 'translation_abc_1.json'
+    log = TranslationLog(snapshot_path)
+    log.append(META, [block('b0', 'Hello', '你好'), block('b1', 'World', '')])
+    log.append({**META, "timestamp": 2}, [block('b1', 'World', '世界')])
+
+    assert log.compact() is True
+    assert log.log_path.stat().st_size == 0
+    assert log.compact() is False
+
+    data = read_stored_json(snapshot_path)
+    assert data['timestamp'] == 2
+    assert [b['translated_text'] for b in data['layout']] == ['你好', '世界']
+    assert (data['translated_count'], data['failed_count'], data['total_count']) == (2, 0, 2)
+    assert log.stats() == {"translated_count": 2, "skipped_count": 0, "failed_count": 0, "total_count": 2}
+
+
+def test_counts_survive_reload_and_other_writers(tmp_path):
+    snapshot_path = tmp_path / 'translation_abc_1.json'
+    first = TranslationLog(snapshot_path)
+    first.append(META, [block('b0', 'Hello', '你好')])
+    first.compact()
+    first.append(META, [block('b1', 'World', '')])
+
+    # 另一个实例（如其他进程）读取快照并补读日志
+    second = TranslationLog(snapshot_path)
+    stats = second.append(META, [block('b2', 'Again', '再次')])
+    assert stats == {"translated_count": 2, "skipped_count": 0, "failed_count": 1, "total_count": 3}
+
+    # 第一个实例写入时补读第二个实例追加的行
+    stats = first.append(META, [block('b1', 'World', '世界')])
+    assert stats == {"translated_count": 3, "skipped_count": 0, "failed_count": 0, "total_count": 3}